@@ -38,6 +38,96 @@ export interface ChatMessage {
   is_read: boolean
 }
 
+/**
+ * Событие списка чатов: новые счетчики и, для нового сообщения, last_message
+ */
+export interface ChatUpdatedEvent {
+  chat_id: number
+  unread_by_executor: number
+  unread_by_client: number
+  last_message_at: string | null
+  last_message?: ChatLastMessage
+}
+
+export type ChatEvent =
+  | { event: 'message'; data: { chat_id: number; message: ChatMessage } }
+  | { event: 'read'; data: { chat_id: number; reader: 'client' | 'executor'; message_ids: number[]; read_at: string } }
+  | { event: 'unread'; data: Omit<ChatUpdatedEvent, 'last_message'> }
+
+const RECONNECT_DELAY = 3000
+
+function authHeaders(): Record<string, string> {
+  const authString = localStorage.getItem('auth')
+  if (!authString) return {}
+  try {
+    const { username, password } = JSON.parse(authString)
+    return { Authorization: `Basic ${btoa(`${username}:${password}`)}` }
+  } catch (e) {
+    console.error('❌ Error parsing auth from localStorage:', e)
+    return {}
+  }
+}
+
+/**
+ * Подписка на SSE-поток с переподключением.
+ *
+ * EventSource не умеет передавать заголовок Authorization, поэтому поток
+ * читается через fetch. getUrl вызывается перед каждым подключением, чтобы
+ * после обрыва запросить пропущенное (after_id). Возвращает функцию отписки.
+ */
+function subscribe(getUrl: () => string, onEvent: (event: string, data: any) => void) {
+  const controller = new AbortController()
+
+  const run = async () => {
+    while (!controller.signal.aborted) {
+      try {
+        const response = await fetch(getUrl(), {
+          headers: { ...authHeaders(), Accept: 'text/event-stream' },
+          signal: controller.signal,
+        })
+        if (response.status === 401 || response.status === 403 || response.status === 404) {
+          console.error(`❌ Chat events stream rejected: ${response.status}`)
+          return
+        }
+        if (!response.ok || !response.body) {
+          throw new Error(`HTTP ${response.status}`)
+        }
+
+        const reader = response.body.pipeThrough(new TextDecoderStream()).getReader()
+        let buffer = ''
+        for (;;) {
+          const { value, done } = await reader.read()
+          if (done) break
+          buffer += value
+          let boundary = buffer.indexOf('\n\n')
+          while (boundary !== -1) {
+            const block = buffer.slice(0, boundary)
+            buffer = buffer.slice(boundary + 2)
+            boundary = buffer.indexOf('\n\n')
+
+            let event = 'message'
+            const dataLines: string[] = []
+            for (const line of block.split('\n')) {
+              if (line.startsWith('event: ')) event = line.slice(7)
+              else if (line.startsWith('data: ')) dataLines.push(line.slice(6))
+            }
+            if (dataLines.length) {
+              onEvent(event, JSON.parse(dataLines.join('\n')))
+            }
+          }
+        }
+      } catch (error) {
+        if (controller.signal.aborted) return
+        console.error('Chat events stream error:', error)
+      }
+      await new Promise((resolve) => setTimeout(resolve, RECONNECT_DELAY))
+    }
+  }
+
+  run()
+  return () => controller.abort()
+}
+
 const chatsApi = {
   /**
    * Получить список всех чатов
@@ -48,10 +138,12 @@ const chatsApi = {
   },
 
   /**
-   * Получить сообщения чата
+   * Получить сообщения чата (с afterId - только новее этого сообщения)
    */
-  getChatMessages: async (chatId: number) => {
-    const response = await axiosInstance.get(`/admin/api/chats/${chatId}/messages`)
+  getChatMessages: async (chatId: number, afterId?: number) => {
+    const response = await axiosInstance.get(`/admin/api/chats/${chatId}/messages`, {
+      params: afterId ? { after_id: afterId } : undefined,
+    })
     return response.data as {
       messages: ChatMessage[]
     }
@@ -73,6 +165,31 @@ const chatsApi = {
     return response.data as ChatMessage
   },
 
+  /**
+   * Подписаться на изменения списка чатов (event: chat_updated)
+   */
+  subscribeChats: (onUpdate: (update: ChatUpdatedEvent) => void) =>
+    subscribe(
+      () => '/admin/api/chats/events',
+      (event, data) => {
+        if (event === 'chat_updated') onUpdate(data as ChatUpdatedEvent)
+      }
+    ),
+
+  /**
+   * Подписаться на события чата: новые сообщения, прочтения и счетчики.
+   * getAfterId - id последнего известного сообщения: сервер досылает
+   * пропущенное при каждом (пере)подключении.
+   */
+  subscribeChat: (chatId: number, getAfterId: () => number | undefined, onEvent: (event: ChatEvent) => void) =>
+    subscribe(
+      () => {
+        const afterId = getAfterId()
+        return `/admin/api/chats/${chatId}/events${afterId ? `?after_id=${afterId}` : ''}`
+      },
+      (event, data) => onEvent({ event, data } as ChatEvent)
+    ),
+
   /**
    * Закрепить/открепить чат
    */
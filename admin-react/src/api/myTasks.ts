@@ -47,7 +47,6 @@ export interface TaskComment {
   is_internal: boolean
   attachments: TaskAttachment[]
   is_read: boolean
-  read_by: number[]
   created_at: string
   author?: {
     id: number
@@ -70,7 +70,6 @@ export interface TaskComment {
     size: number
   }>
   is_read?: boolean
-  read_by?: number[]
   is_read_by_me?: boolean
   created_at: string
 }
@@ -247,6 +246,15 @@ const tasksApi = {
     return response.data as { success: boolean; task_id: number; unread_count: number }
   },
 
+  // Количество непрочитанных комментариев для списка задач одним запросом
+  getUnreadCommentsCounts: async (taskIds: number[]) => {
+    const response = await axiosInstance.get('/admin/api/tasks/comments/unread_counts', {
+      params: { task_ids: taskIds },
+      paramsSerializer: { indexes: null },
+    })
+    return response.data as { success: boolean; unread_counts: Record<string, number> }
+  },
+
   // Получение статистики
   getStats: async () => {
     const response = await axiosInstance.get('/admin/api/tasks/stats/dashboard')
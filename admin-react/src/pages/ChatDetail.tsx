@@ -3,7 +3,7 @@ import { useParams, useNavigate } from 'react-router-dom'
 import { ArrowLeft, Send, Paperclip, X, Loader2, User } from 'lucide-react'
 // API imports
 import chatsApi from '../api/chats'
-import type { ChatMessage } from '../api/chats'
+import type { ChatEvent, ChatMessage } from '../api/chats'
 
 export const ChatDetail = () => {
   const { chatId } = useParams<{ chatId: string }>()
@@ -26,37 +26,80 @@ export const ChatDetail = () => {
     }, 4000)
   }, [])
 
-  const loadMessages = useCallback(async () => {
+  // id последнего известного сообщения: с него поток событий досылает пропущенное
+  const lastMessageIdRef = useRef<number | undefined>(undefined)
+
+  const mergeMessages = useCallback((incoming: ChatMessage[], forceScroll = false) => {
+    if (incoming.length === 0) return
+
+    const wasAtBottom =
+      messagesEndRef.current &&
+      messagesEndRef.current.getBoundingClientRect().bottom <= window.innerHeight + 100
+
+    setMessages((prev) => {
+      const byId = new Map(prev.map((msg) => [msg.id, msg]))
+      incoming.forEach((msg) => byId.set(msg.id, msg))
+      return Array.from(byId.values()).sort((a, b) => a.id - b.id)
+    })
+    lastMessageIdRef.current = Math.max(lastMessageIdRef.current ?? 0, ...incoming.map((msg) => msg.id))
+
+    // Прокручиваем вниз только если были внизу или при первой загрузке
+    if (wasAtBottom || forceScroll) {
+      setTimeout(() => {
+        messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' })
+      }, 100)
+    }
+  }, [])
+
+  useEffect(() => {
     if (!chatId) return
 
-    try {
-      const data = await chatsApi.getChatMessages(parseInt(chatId))
-      const wasAtBottom =
-        messagesEndRef.current &&
-        messagesEndRef.current.getBoundingClientRect().bottom <= window.innerHeight + 100
-
-      setMessages(data.messages)
-
-      // Прокручиваем вниз только если были внизу или при первой загрузке
-      if (wasAtBottom || loading) {
-        setTimeout(() => {
-          messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' })
-        }, 100)
+    const id = parseInt(chatId)
+    let cancelled = false
+    let unsubscribe: (() => void) | undefined
+
+    setMessages([])
+    setLoading(true)
+    lastMessageIdRef.current = undefined
+
+    const handleEvent = (event: ChatEvent) => {
+      if (event.event === 'message') {
+        const { message } = event.data
+        mergeMessages([message])
+        // Чат открыт: запрос с after_id отмечает новое сообщение клиента прочитанным
+        if (message.sender_type === 'client' && !message.is_read) {
+          chatsApi
+            .getChatMessages(id, message.id - 1)
+            .then((data) => mergeMessages(data.messages))
+            .catch((error) => console.error('Error marking messages as read:', error))
+        }
+      } else if (event.event === 'read') {
+        const readIds = new Set(event.data.message_ids)
+        setMessages((prev) => prev.map((msg) => (readIds.has(msg.id) ? { ...msg, is_read: true } : msg)))
       }
-    } catch (error) {
-      console.error('Error loading messages:', error)
-      showToast('Ошибка загрузки сообщений', 'error')
-    } finally {
-      setLoading(false)
     }
-  }, [chatId, loading, showToast])
 
-  useEffect(() => {
-    loadMessages()
-    // Автообновление каждые 3 секунды
-    const interval = setInterval(loadMessages, 3000)
-    return () => clearInterval(interval)
-  }, [loadMessages])
+    chatsApi
+      .getChatMessages(id)
+      .then((data) => {
+        if (cancelled) return
+        mergeMessages(data.messages, true)
+        // Дальше сообщения приходят потоком событий вместо периодического опроса
+        unsubscribe = chatsApi.subscribeChat(id, () => lastMessageIdRef.current, handleEvent)
+      })
+      .catch((error) => {
+        console.error('Error loading messages:', error)
+        showToast('Ошибка загрузки сообщений', 'error')
+      })
+      .finally(() => {
+        if (!cancelled) setLoading(false)
+      })
+
+    return () => {
+      cancelled = true
+      unsubscribe?.()
+    }
+  }, [chatId, mergeMessages, showToast])
 
   const handleFileSelect = (e: React.ChangeEvent<HTMLInputElement>) => {
     if (e.target.files) {
@@ -88,7 +131,7 @@ export const ChatDetail = () => {
         formData.append('attachments', file)
       })
 
-      await chatsApi.sendMessage(parseInt(chatId), formData)
+      const sent = await chatsApi.sendMessage(parseInt(chatId), formData)
 
       setMessageText('')
       setSelectedFiles([])
@@ -97,7 +140,7 @@ export const ChatDetail = () => {
       }
 
       showToast('Сообщение отправлено', 'success')
-      await loadMessages()
+      mergeMessages([{ ...sent, is_read: sent.is_read ?? false }], true)
     } catch (error) {
       console.error('Error sending message:', error)
       showToast('Ошибка отправки сообщения', 'error')
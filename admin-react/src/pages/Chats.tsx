@@ -1,4 +1,4 @@
-import { useState, useEffect, useCallback } from 'react'
+import { useState, useEffect, useCallback, useRef } from 'react'
 import { useNavigate } from 'react-router-dom'
 import { MessageCircle, User, Clock, Pin, EyeOff, Eye, Paperclip, Loader2 } from 'lucide-react'
 // API imports
@@ -31,11 +31,36 @@ export const Chats = () => {
     }
   }, [showToast])
 
+  // Актуальный список для обработчика событий, подписанного один раз
+  const chatsRef = useRef<Chat[]>([])
+  useEffect(() => {
+    chatsRef.current = chats
+  }, [chats])
+
   useEffect(() => {
     loadChats()
-    // Автообновление каждые 10 секунд
-    const interval = setInterval(loadChats, 10000)
-    return () => clearInterval(interval)
+    // Счетчики и последние сообщения приходят потоком событий вместо периодического опроса
+    const unsubscribe = chatsApi.subscribeChats((update) => {
+      if (!chatsRef.current.some((chat) => chat.id === update.chat_id)) {
+        // Чата еще нет в списке (новый проект) - перечитаем список
+        loadChats()
+        return
+      }
+      setChats((prev) =>
+        prev.map((chat) =>
+          chat.id === update.chat_id
+            ? {
+                ...chat,
+                unread_by_executor: update.unread_by_executor,
+                unread_by_client: update.unread_by_client,
+                last_message_at: update.last_message_at,
+                last_message: update.last_message ?? chat.last_message,
+              }
+            : chat
+        )
+      )
+    })
+    return unsubscribe
   }, [loadChats])
 
   const handlePinChat = async (chatId: number, e: React.MouseEvent) => {
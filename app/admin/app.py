@@ -1,7 +1,7 @@
 from fastapi import FastAPI, HTTPException, Depends, Request, Form, APIRouter, File, UploadFile
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, Response
 from datetime import datetime, timedelta
 from sqlalchemy import func
 import secrets
@@ -12,10 +12,11 @@ import calendar
 
 from ..config.settings import settings
 from ..config.logging import get_logger
-from ..database.database import get_db_context
+from ..database.database import get_db_context, run_in_db_thread, wait_on_event_loop
 from ..database.models import User, Project, ConsultantSession, Portfolio, Settings as DBSettings, AdminUser, ProjectFile, FinanceTransaction
 from ..services.analytics_service import analytics_service, get_dashboard_data
 from ..services.auth_service import AuthService
+from ..services.portfolio_repository import bump_catalog_version, not_modified, portfolio_repository
 from .middleware.roles import RoleMiddleware
 from .navigation import get_navigation_items
 
@@ -527,7 +528,7 @@ async def create_portfolio_item(
 ):
     """API для создания элемента портфолио"""
     try:
-        with get_db_context() as db:
+        def _handle(db):
             # Создаем новый элемент портфолио
             new_portfolio = Portfolio(
                 title=title,
@@ -557,7 +558,7 @@ async def create_portfolio_item(
                 # Сохраняем файл
                 file_path = f"{upload_dir}/{datetime.now().strftime('%Y%m%d_%H%M%S')}_{main_image.filename}"
                 with open(file_path, "wb") as buffer:
-                    content = await main_image.read()
+                    content = wait_on_event_loop(main_image.read())
                     buffer.write(content)
                 
                 image_paths.append(file_path)
@@ -565,18 +566,21 @@ async def create_portfolio_item(
             new_portfolio.image_paths = image_paths
             
             db.add(new_portfolio)
+            bump_catalog_version(db)
             db.commit()
             
             logger.info(f"Создан новый элемент портфолио: {title}")
             
             return {"success": True, "message": "Проект добавлен в портфолио", "id": new_portfolio.id}
+
+        return await run_in_db_thread(_handle)
         
     except Exception as e:
         logger.error(f"Ошибка в create_portfolio_item: {e}")
         return {"success": False, "error": str(e)}
 
 @admin_router.delete("/api/portfolio/{item_id}")
-async def delete_portfolio_item(item_id: int, username: str = Depends(authenticate)):
+def delete_portfolio_item(item_id: int, username: str = Depends(authenticate)):
     """API для удаления элемента портфолио"""
     try:
         with get_db_context() as db:
@@ -596,6 +600,7 @@ async def delete_portfolio_item(item_id: int, username: str = Depends(authentica
             
             # Удаляем элемент из базы
             db.delete(portfolio_item)
+            bump_catalog_version(db)
             db.commit()
             
             logger.info(f"Удален элемент портфолио: {portfolio_item.title}")
@@ -607,7 +612,7 @@ async def delete_portfolio_item(item_id: int, username: str = Depends(authentica
         return {"success": False, "error": str(e)}
 
 @admin_router.get("/api/portfolio/{item_id}")
-async def get_portfolio_item(item_id: int, username: str = Depends(authenticate)):
+def get_portfolio_item(item_id: int, username: str = Depends(authenticate)):
     """API для получения элемента портфолио для редактирования"""
     try:
         with get_db_context() as db:
@@ -653,7 +658,7 @@ async def update_portfolio_item(
 ):
     """API для обновления элемента портфолио"""
     try:
-        with get_db_context() as db:
+        def _handle(db):
             portfolio_item = db.query(Portfolio).filter(Portfolio.id == item_id).first()
             
             if not portfolio_item:
@@ -690,16 +695,19 @@ async def update_portfolio_item(
                 
                 file_path = f"{upload_dir}/{datetime.now().strftime('%Y%m%d_%H%M%S')}_{main_image.filename}"
                 with open(file_path, "wb") as buffer:
-                    content = await main_image.read()
+                    content = wait_on_event_loop(main_image.read())
                     buffer.write(content)
                 
                 portfolio_item.image_paths = [file_path]
             
+            bump_catalog_version(db)
             db.commit()
             
             logger.info(f"Обновлен элемент портфолио: {title}")
             
             return {"success": True, "message": "Элемент портфолио обновлен"}
+
+        return await run_in_db_thread(_handle)
         
     except Exception as e:
         logger.error(f"Ошибка в update_portfolio_item: {e}")
@@ -720,19 +728,21 @@ async def api_stats(username: str = Depends(authenticate)):
 async def api_dashboard_stats(username: str = Depends(authenticate)):
     """API для получения статистики дашборда - новый формат для React"""
     try:
-        from ..database.models import Project, Task, User, Transaction, AdminUser
+        from ..database.models import Project, Task, User, AdminUser
+        from ..services.dashboard_snapshot_service import dashboard_snapshot_service
         from datetime import datetime, timedelta
+        from sqlalchemy import and_, or_
 
-        with get_db_context() as db:
+        # Счетчики берутся из снимка dashboard_counters, списки задач - LIMIT-запросами
+        # по индексам deadline/created_at: время ответа не зависит от размера таблиц
+        def _collect(db):
             now = datetime.utcnow()
-            month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+            tomorrow_start = now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
 
             # Получаем информацию о пользователе из admin_users таблицы
             user = db.query(AdminUser).filter(AdminUser.username == username).first()
             user_role = user.role if user and hasattr(user, 'role') else 'owner'
 
-            # Проекты - получаем все для финансовых расчетов
-            all_projects = db.query(Project).all()
             recent_projects = db.query(Project).order_by(Project.created_at.desc()).limit(10).all()
             projects_list = []
             for proj in recent_projects:
@@ -745,60 +755,60 @@ async def api_dashboard_stats(username: str = Depends(authenticate)):
                     "progress": int(proj.progress) if hasattr(proj, 'progress') and proj.progress else 0,
                 })
 
+            snapshot = dashboard_snapshot_service.get_snapshot(db)
+
             # Финансовые метрики из проектов
             active_statuses = ['new', 'in_progress', 'review', 'accepted', 'testing']
-            active_projects = [p for p in all_projects if p.status in active_statuses]
 
             # Общая сумма активных проектов
-            total_active_projects_sum = sum(p.estimated_cost or 0 for p in active_projects)
+            total_active_projects_sum = snapshot.sum_for('projects.estimated_sum', active_statuses)
 
             # Сумма полученных от клиентов (по всем проектам)
-            total_received_from_clients = sum(p.client_paid_total or 0 for p in all_projects)
+            total_received_from_clients = snapshot.get('projects.client_paid')
 
-            # Сумма ожидаемых платежей (разница между оценкой и полученным по активным проектам)
-            total_pending_payments = sum(
-                (p.estimated_cost or 0) - (p.client_paid_total or 0)
-                for p in active_projects
-                if (p.estimated_cost or 0) > (p.client_paid_total or 0)
-            )
+            # Ожидаемые платежи (разница между оценкой и полученным по активным проектам)
+            total_pending_payments = snapshot.sum_for('projects.pending_sum', active_statuses)
 
             # Сумма выплат исполнителям
-            total_paid_to_executors = sum(p.executor_paid_total or 0 for p in all_projects)
+            total_paid_to_executors = snapshot.get('projects.executor_paid')
 
             # Чистая прибыль (полученное от клиентов минус выплаченное исполнителям)
             net_profit = total_received_from_clients - total_paid_to_executors
 
-            # Финансы за месяц из Transaction
-            try:
-                month_income = db.query(func.sum(Transaction.amount)).filter(
-                    Transaction.transaction_type == 'income',
-                    Transaction.status == 'completed',
-                    Transaction.transaction_date >= month_start
-                ).scalar() or 0
+            projects_by_status = snapshot.projects_by_status()
 
-                month_expenses = db.query(func.sum(Transaction.amount)).filter(
-                    Transaction.transaction_type == 'expense',
-                    Transaction.status == 'completed',
-                    Transaction.transaction_date >= month_start
-                ).scalar() or 0
-
-                month_revenue = month_income - month_expenses
-            except Exception as e:
-                logger.warning(f"Ошибка подсчета транзакций за месяц: {e}")
-                month_revenue = 0
+            # Финансы за месяц из Transaction
+            month_revenue = snapshot.month_revenue(now)
 
             # Задачи - разбиваем на категории
             # Для исполнителей показываем только их задачи
+            tasks_query = db.query(Task)
             if user_role == 'executor':
-                all_tasks = db.query(Task).filter(Task.assigned_to_id == user.id).all()
+                tasks_query = tasks_query.filter(Task.assigned_to_id == user.id)
+                tasks_by_status = snapshot.tasks_by_status(assignee_id=user.id)
             else:
-                all_tasks = db.query(Task).all()
+                tasks_by_status = snapshot.tasks_by_status()
+            total_tasks = sum(tasks_by_status.values())
+
+            # Просроченные
+            overdue_filter = and_(
+                Task.deadline < now,
+                or_(Task.status.is_(None), Task.status != "completed")
+            )
+            # Предстоящие (в течение недели)
+            upcoming_filter = and_(Task.deadline > now, Task.deadline < now + timedelta(days=7))
+            # Новые (созданы за последние 3 дня, не попавшие в другие категории)
+            new_filter = and_(
+                Task.created_at > now - timedelta(days=3),
+                or_(Task.deadline.is_(None), and_(~overdue_filter, ~upcoming_filter))
+            )
 
-            overdue_tasks = []
-            upcoming_tasks = []
-            new_tasks = []
+            overdue_count = tasks_query.filter(overdue_filter).count()
+            tasks_today = tasks_query.filter(
+                Task.deadline > now, Task.deadline < tomorrow_start
+            ).count()
 
-            for task in all_tasks:
+            def _task_data(task, with_created=False):
                 task_data = {
                     "id": task.id,
                     "title": task.title or "Без названия",
@@ -807,25 +817,29 @@ async def api_dashboard_stats(username: str = Depends(authenticate)):
                     "status": task.status or "pending",
                     "executor_name": task.executor_name if hasattr(task, 'executor_name') else None,
                 }
-
-                # Просроченные
-                if task.deadline and task.deadline < now and task.status != "completed":
-                    overdue_tasks.append(task_data)
-                # Предстоящие (в течение недели)
-                elif task.deadline and task.deadline > now and task.deadline < now + timedelta(days=7):
-                    upcoming_tasks.append(task_data)
-                # Новые (созданы за последние 3 дня)
-                elif task.created_at and task.created_at > now - timedelta(days=3):
+                if with_created:
                     task_data["created_at"] = task.created_at.isoformat()
-                    new_tasks.append(task_data)
-
-            # Клиенты - подсчитываем уникальных из проектов
-            unique_users = set(p.user_id for p in all_projects if p.user_id)
-            active_clients = len(unique_users)
+                return task_data
+
+            overdue_tasks = [
+                _task_data(task)
+                for task in tasks_query.filter(overdue_filter).order_by(Task.deadline.asc()).limit(10)
+            ]
+            upcoming_tasks = [
+                _task_data(task)
+                for task in tasks_query.filter(upcoming_filter).order_by(Task.deadline.asc()).limit(10)
+            ]
+            new_tasks = [
+                _task_data(task, with_created=True)
+                for task in tasks_query.filter(new_filter).order_by(Task.created_at.desc()).limit(10)
+            ]
+
+            # Клиенты - уникальные из проектов
+            active_clients = snapshot.clients_count
             new_leads_week = 0
 
             # Формируем ответ в новом формате
-            response_data = {
+            return {
                 "user": {
                     "id": user.id if user else 1,
                     "username": username,
@@ -834,24 +848,24 @@ async def api_dashboard_stats(username: str = Depends(authenticate)):
                 },
                 "greeting": {
                     "title": f"Привет, {username}!",
-                    "subtitle": f"У вас {len(overdue_tasks)} просроченных задач"
+                    "subtitle": f"У вас {overdue_count} просроченных задач"
                 },
                 "summary": {
-                    "active_projects": len(active_projects),
+                    "active_projects": snapshot.active_projects,
                     "active_clients": active_clients,
                     "month_revenue": round(month_revenue, 2),
-                    "overdue_tasks": len(overdue_tasks),
-                    "tasks_today": len([t for t in upcoming_tasks if t.get('deadline') and datetime.fromisoformat(t['deadline']).date() == now.date()]),
+                    "overdue_tasks": overdue_count,
+                    "tasks_today": tasks_today,
                     "total_active_projects_sum": round(total_active_projects_sum, 2),
                     "net_profit": round(net_profit, 2),
-                    "total_projects": len(all_projects),
-                    "total_tasks": len(all_tasks),
+                    "total_projects": snapshot.total_projects,
+                    "total_tasks": total_tasks,
                 },
                 "projects": projects_list,
                 "tasks": {
-                    "overdue": overdue_tasks[:10],
-                    "upcoming": upcoming_tasks[:10],
-                    "new": new_tasks[:10],
+                    "overdue": overdue_tasks,
+                    "upcoming": upcoming_tasks,
+                    "new": new_tasks,
                 },
                 "clients": {
                     "active_count": active_clients,
@@ -876,25 +890,26 @@ async def api_dashboard_stats(username: str = Depends(authenticate)):
                 ],
                 "charts": {
                     "tasks_by_status": {
-                        "pending": len([t for t in all_tasks if t.status == 'pending']),
-                        "in_progress": len([t for t in all_tasks if t.status == 'in_progress']),
-                        "completed": len([t for t in all_tasks if t.status == 'completed']),
+                        "pending": tasks_by_status.get('pending', 0),
+                        "in_progress": tasks_by_status.get('in_progress', 0),
+                        "completed": tasks_by_status.get('completed', 0),
                     },
                     "projects_distribution": {
-                        "new": len([p for p in all_projects if p.status == 'new']),
-                        "in_progress": len([p for p in all_projects if p.status == 'in_progress']),
-                        "completed": len([p for p in all_projects if p.status == 'completed']),
+                        "new": projects_by_status.get('new', 0),
+                        "in_progress": projects_by_status.get('in_progress', 0),
+                        "completed": projects_by_status.get('completed', 0),
                     }
                 }
             }
 
-            return {"success": True, "data": response_data}
+        response_data = await run_in_db_thread(_collect)
+        return {"success": True, "data": response_data}
     except Exception as e:
         logger.error(f"Ошибка в api_dashboard_stats: {e}", exc_info=True)
         return {"success": False, "error": str(e)}
 
 @admin_router.get("/api/dashboard/charts/daily")
-async def api_dashboard_daily_charts(
+def api_dashboard_daily_charts(
     days: int = 30,
     username: str = Depends(authenticate)
 ):
@@ -967,12 +982,13 @@ async def api_dashboard_daily_charts(
         return {"success": False, "error": str(e)}
 
 @admin_router.get("/api/dashboard/crm")
-async def api_dashboard_crm(username: str = Depends(authenticate)):
+def api_dashboard_crm(username: str = Depends(authenticate)):
     """API для получения данных CRM дашборда"""
     try:
         with get_db_context() as db:
             from ..services.reports_service import ReportsService
             from ..database.crm_models import Client, Lead, Deal, DealStatus, LeadStatus
+            from ..services.dashboard_snapshot_service import dashboard_snapshot_service
             
             reports_service = ReportsService(db)
             
@@ -1012,19 +1028,16 @@ async def api_dashboard_crm(username: str = Depends(authenticate)):
             if last_month_revenue > 0:
                 revenue_change = ((month_revenue - last_month_revenue) / last_month_revenue) * 100
             
-            # Проекты
-            active_projects = db.query(func.count(Project.id)).filter(
-                Project.status == 'in_progress'
-            ).scalar()
+            # Проекты (счетчики по статусам - из снимка дашборда)
+            snapshot = dashboard_snapshot_service.get_snapshot(db)
+            active_projects = int(snapshot.get('projects.count.in_progress'))
             
             completed_projects = db.query(func.count(Project.id)).filter(
                 Project.status == 'completed',
                 Project.actual_end_date >= month_start
             ).scalar()
             
-            total_projects = db.query(func.count(Project.id)).filter(
-                Project.status.in_(['in_progress', 'completed'])
-            ).scalar()
+            total_projects = int(snapshot.sum_for('projects.count', ['in_progress', 'completed']))
             
             projects_completion = (completed_projects / total_projects * 100) if total_projects > 0 else 0
             
@@ -1192,7 +1205,7 @@ async def update_project_status(
 ):
     """API для обновления статуса проекта с уведомлением клиента"""
     try:
-        with get_db_context() as db:
+        def _handle(db):
             project = db.query(Project).filter(Project.id == project_id).first()
             if not project:
                 raise HTTPException(status_code=404, detail="Проект не найден")
@@ -1240,10 +1253,10 @@ async def update_project_status(
 <i>Дата обновления: {datetime.now().strftime('%d.%m.%Y %H:%M')}</i>
                     """
                     
-                    await notification_service.send_user_notification(
+                    wait_on_event_loop(notification_service.send_user_notification(
                         user.telegram_id, 
                         notification_text
-                    )
+                    ))
                     
                     logger.info(f"Уведомление о смене статуса отправлено пользователю {user.telegram_id}")
                     
@@ -1256,6 +1269,8 @@ async def update_project_status(
                 "message": f"Статус проекта изменен на '{new_status_name}'" + 
                           (" и клиент уведомлен" if user and user.telegram_id else "")
             }
+
+        return await run_in_db_thread(_handle)
         
     except Exception as e:
         logger.error(f"Ошибка в update_project_status: {e}")
@@ -1276,7 +1291,7 @@ def _get_status_description(status: str) -> str:
     return descriptions.get(status, 'Статус проекта обновлен.')
 
 @admin_router.post("/api/settings/update")
-async def update_settings(
+def update_settings(
     key: str = Form(...),
     value: str = Form(...),
     username: str = Depends(authenticate)
@@ -1306,7 +1321,7 @@ async def update_settings(
         return {"success": False, "error": str(e)}
 
 @admin_router.get("/api/export/projects")
-async def export_projects(username: str = Depends(authenticate)):
+def export_projects(username: str = Depends(authenticate)):
     """Экспорт проектов в JSON"""
     try:
         with get_db_context() as db:
@@ -1324,7 +1339,7 @@ async def export_projects(username: str = Depends(authenticate)):
         return {"success": False, "error": str(e)}
 
 @admin_router.get("/health")
-async def health_check():
+def health_check():
     """Проверка здоровья сервиса"""
     try:
         # Проверяем подключение к базе данных
@@ -1489,7 +1504,7 @@ async def test_daily_report(request: Request):
     """Тестовый ежедневный отчет"""
     try:
         # Генерируем тестовый ежедневный отчет
-        with get_db_context() as db:
+        def _build_report(db):
             # Статистика проектов
             total_projects = db.query(Project).count()
             new_projects = db.query(Project).filter(Project.status == 'new').count()
@@ -1512,6 +1527,9 @@ async def test_daily_report(request: Request):
 
 📅 Дата отчета: {datetime.now().strftime('%d.%m.%Y %H:%M')}
 🤖 Сгенерировано автоматически"""
+            return report
+
+        report = await run_in_db_thread(_build_report)
         
         # Отправляем отчет в admin chat
         from telegram import Bot
@@ -1557,21 +1575,26 @@ async def avito_notification_webhook(request: Request):
         
         if message_type == 'message' and chat_id and message:
             # Находим всех продажников, которые должны получить уведомления
-            with get_db_context() as db:
-                salespeople = db.query(AdminUser).filter(
-                    AdminUser.role.in_(['salesperson', 'sales']),
-                    AdminUser.is_active == True
-                ).all()
-                
-                # Отправляем уведомления всем продажникам
-                from telegram import Bot
-                bot = Bot(settings.BOT_TOKEN)
-                
-                for salesperson in salespeople:
-                    if salesperson.telegram_id:
-                        try:
-                            notification_text = f"""📩 Новое сообщение в Авито!
-                            
+            def _load_salespeople(db):
+                return [
+                    (salesperson.username, salesperson.telegram_id)
+                    for salesperson in db.query(AdminUser).filter(
+                        AdminUser.role.in_(['salesperson', 'sales']),
+                        AdminUser.is_active == True
+                    ).all()
+                ]
+
+            salespeople = await run_in_db_thread(_load_salespeople)
+            
+            # Отправляем уведомления всем продажникам
+            from telegram import Bot
+            bot = Bot(settings.BOT_TOKEN)
+            
+            for salesperson_username, salesperson_telegram_id in salespeople:
+                if salesperson_telegram_id:
+                    try:
+                        notification_text = f"""📩 Новое сообщение в Авито!
+                        
 🔗 Чат ID: {chat_id}
 👤 От: {message.get('author_name', 'Неизвестно')}
 📝 Сообщение: {message.get('content', message.get('text', 'Без текста'))}
@@ -1579,20 +1602,20 @@ async def avito_notification_webhook(request: Request):
 
 👈 Перейти в админ-панель для ответа"""
 
-                            await bot.send_message(
-                                chat_id=salesperson.telegram_id,
-                                text=notification_text
-                            )
-                            
-                            logger.info(f"Уведомление отправлено продажнику {salesperson.username}")
-                            
-                        except Exception as e:
-                            logger.error(f"Не удалось отправить уведомление продажнику {salesperson.username}: {e}")
-                
-                return JSONResponse({
-                    "success": True,
-                    "message": "Уведомления отправлены продажникам"
-                })
+                        await bot.send_message(
+                            chat_id=salesperson_telegram_id,
+                            text=notification_text
+                        )
+                        
+                        logger.info(f"Уведомление отправлено продажнику {salesperson_username}")
+                        
+                    except Exception as e:
+                        logger.error(f"Не удалось отправить уведомление продажнику {salesperson_username}: {e}")
+            
+            return JSONResponse({
+                "success": True,
+                "message": "Уведомления отправлены продажникам"
+            })
         
         return JSONResponse({
             "success": True,
@@ -1634,23 +1657,28 @@ async def test_avito_notification(request: Request):
 <i>Это тестовое уведомление от админ-панели</i>"""
         
         # Отправляем всем продавцам
-        with get_db_context() as db:
-            salespersons = db.query(AdminUser).filter(
-                AdminUser.role == 'salesperson',
-                AdminUser.telegram_id.isnot(None),
-                AdminUser.is_active == True
-            ).all()
-            
-            sent_count = 0
-            for person in salespersons:
-                try:
-                    await notification_service.send_notification(
-                        chat_id=person.telegram_id,
-                        message=message
-                    )
-                    sent_count += 1
-                except Exception as e:
-                    logger.error(f"Ошибка отправки уведомления {person.username}: {e}")
+        def _load_salespersons(db):
+            return [
+                (person.username, person.telegram_id)
+                for person in db.query(AdminUser).filter(
+                    AdminUser.role == 'salesperson',
+                    AdminUser.telegram_id.isnot(None),
+                    AdminUser.is_active == True
+                ).all()
+            ]
+
+        salespersons = await run_in_db_thread(_load_salespersons)
+        
+        sent_count = 0
+        for person_username, person_telegram_id in salespersons:
+            try:
+                await notification_service.send_notification(
+                    chat_id=person_telegram_id,
+                    message=message
+                )
+                sent_count += 1
+            except Exception as e:
+                logger.error(f"Ошибка отправки уведомления {person_username}: {e}")
         
         return JSONResponse({
             "success": True,
@@ -1694,7 +1722,7 @@ async def update_project_status_direct(
         if not new_status or new_status not in PROJECT_STATUSES:
             raise HTTPException(status_code=400, detail="Неверный статус")
         
-        with get_db_context() as db:
+        def _handle(db):
             project = db.query(Project).filter(Project.id == project_id).first()
             if not project:
                 raise HTTPException(status_code=404, detail="Проект не найден")
@@ -1732,9 +1760,9 @@ async def update_project_status_direct(
                     notification_service = NotificationService()
                     notification_service.set_bot(Bot(settings.BOT_TOKEN))
                     
-                    notification_sent = await notification_service.notify_project_status_changed(
+                    notification_sent = wait_on_event_loop(notification_service.notify_project_status_changed(
                         project, old_status, user
-                    )
+                    ))
                     
                     logger.info(f"[DIRECT] Уведомление клиенту {user.telegram_id}: {'отправлено' if notification_sent else 'ошибка'}")
                     
@@ -1754,6 +1782,8 @@ async def update_project_status_direct(
                     "updated_at": project.updated_at.isoformat()
                 }
             }
+
+        return await run_in_db_thread(_handle)
         
     except HTTPException:
         raise
@@ -1763,7 +1793,7 @@ async def update_project_status_direct(
 
 
 @admin_router.post("/api/projects/{project_id}/assign-executor")
-async def assign_executor_to_project(
+def assign_executor_to_project(
     project_id: int,
     executor_id: int = Form(...),
     username: str = Depends(authenticate)
@@ -1808,34 +1838,44 @@ def _get_full_analytics_data() -> Dict[str, Any]:
     """Получение полных данных аналитики из базы данных"""
     try:
         with get_db_context() as db:
+            from ..services.dashboard_snapshot_service import dashboard_snapshot_service
+
+            # Все показатели берутся из счетчиков dashboard_counters
+            snapshot = dashboard_snapshot_service.get_snapshot(db)
+            active_statuses = ['new', 'review', 'accepted', 'in_progress', 'testing']
+
+            def _avg(sum_prefix: str, n_prefix: str, statuses=None) -> float:
+                sums = snapshot.by_prefix(sum_prefix)
+                counts = snapshot.by_prefix(n_prefix)
+                if statuses is not None:
+                    sums = {k: v for k, v in sums.items() if k in statuses}
+                    counts = {k: v for k, v in counts.items() if k in statuses}
+                n = sum(counts.values())
+                return sum(sums.values()) / n if n else 0
+
             # Общая статистика проектов
-            total_projects = db.query(Project).count()
-            active_projects = db.query(Project).filter(
-                Project.status.in_(['new', 'review', 'accepted', 'in_progress', 'testing'])
-            ).count()
-            completed_projects = db.query(Project).filter(Project.status == 'completed').count()
-            cancelled_projects = db.query(Project).filter(Project.status == 'cancelled').count()
+            total_projects = snapshot.total_projects
+            active_projects = snapshot.active_projects
+            completed_projects = int(snapshot.get('projects.count.completed'))
+            cancelled_projects = int(snapshot.get('projects.count.cancelled'))
             
             # Финансовая статистика
-            total_estimated_cost = db.query(func.sum(Project.estimated_cost)).scalar() or 0
-            total_completed_cost = db.query(func.sum(Project.final_cost)).filter(
-                Project.status == 'completed'
-            ).scalar() or 0
+            total_estimated_cost = sum(snapshot.by_prefix('projects.estimated_sum').values())
+            total_completed_cost = snapshot.get('projects.final_sum.completed')
             
             # Открытые заказы (не завершенные)
-            open_orders_sum = db.query(func.sum(Project.estimated_cost)).filter(
-                Project.status.in_(['new', 'review', 'accepted', 'in_progress', 'testing'])
-            ).scalar() or 0
+            open_orders_sum = snapshot.sum_for('projects.estimated_sum', active_statuses)
             
             # Платежи клиентов
-            total_client_payments = db.query(func.sum(Project.client_paid_total)).scalar() or 0
+            total_client_payments = snapshot.get('projects.client_paid')
             
             # Выплаты исполнителям
-            total_executor_payments = db.query(func.sum(Project.executor_paid_total)).scalar() or 0
+            total_executor_payments = snapshot.get('projects.executor_paid')
             
             # Средние показатели
-            avg_project_cost = db.query(func.avg(Project.estimated_cost)).scalar() or 0
-            avg_completion_time = db.query(func.avg(Project.estimated_hours)).scalar() or 0
+            avg_project_cost = _avg('projects.estimated_sum', 'projects.estimated_n')
+            hours_n = snapshot.get('projects.hours_n')
+            avg_completion_time = snapshot.get('projects.hours_sum') / hours_n if hours_n else 0
             
             # Статистика по статусам
             status_stats = {}
@@ -1850,29 +1890,22 @@ def _get_full_analytics_data() -> Dict[str, Any]:
             }
             
             for status_key, status_name in status_names.items():
-                count = db.query(Project).filter(Project.status == status_key).count()
-                sum_cost = db.query(func.sum(Project.estimated_cost)).filter(
-                    Project.status == status_key
-                ).scalar() or 0
                 status_stats[status_key] = {
                     'name': status_name,
-                    'count': count,
-                    'sum': float(sum_cost)
+                    'count': int(snapshot.get(f'projects.count.{status_key}')),
+                    'sum': float(snapshot.get(f'projects.estimated_sum.{status_key}'))
                 }
             
             # Статистика по типам проектов
-            type_stats = {}
-            project_types = db.query(Project.project_type, func.count(Project.id)).group_by(
-                Project.project_type
-            ).all()
-            
-            for project_type, count in project_types:
-                if project_type:
-                    type_stats[project_type] = count
+            type_stats = {
+                project_type: int(count)
+                for project_type, count in snapshot.by_prefix('projects.type').items()
+                if count
+            }
             
             # Статистика пользователей
-            total_users = db.query(User).count()
-            active_users = db.query(User).filter(User.projects.any()).count()
+            total_users = int(snapshot.get('users.count'))
+            active_users = snapshot.clients_count
             
             # Прибыль (разница между платежами клиентов и выплатами исполнителям)
             profit = total_client_payments - total_executor_payments
@@ -1881,9 +1914,7 @@ def _get_full_analytics_data() -> Dict[str, Any]:
             completion_rate = (completed_projects / total_projects * 100) if total_projects > 0 else 0
             
             # Средняя стоимость завершенного проекта
-            avg_completed_cost = db.query(func.avg(Project.final_cost)).filter(
-                Project.status == 'completed'
-            ).scalar() or 0
+            avg_completed_cost = _avg('projects.final_sum', 'projects.final_n', ['completed'])
             
             return {
                 'total_projects': total_projects,
@@ -1916,39 +1947,38 @@ def _get_full_analytics_data() -> Dict[str, Any]:
 # =============================================================================
 
 @admin_router.get("/api/portfolio/public/categories")
-async def get_public_portfolio_categories():
+async def get_public_portfolio_categories(request: Request, response: Response):
     """Получить список категорий портфолио для бота"""
     try:
-        with get_db_context() as db:
-            # Получаем уникальные категории из видимых проектов
-            categories_raw = db.query(Portfolio.category).filter(
-                Portfolio.is_visible == True
-            ).distinct().all()
-            
-            # Преобразуем в список с названиями
-            category_map = {
-                "telegram_bots": "🤖 Telegram боты",
-                "web_development": "🌐 Веб-разработка", 
-                "mobile_apps": "📱 Мобильные приложения",
-                "ai_integration": "🧠 AI интеграции",
-                "automation": "⚙️ Автоматизация",
-                "ecommerce": "🛒 E-commerce",
-                "other": "🔧 Другое"
-            }
-            
-            categories = []
-            for (cat,) in categories_raw:
-                if cat in category_map:
-                    categories.append({
-                        "key": cat,
-                        "name": category_map[cat],
-                        "emoji": category_map[cat].split()[0]
-                    })
-            
-            return {
-                "success": True,
-                "categories": categories
-            }
+        catalog = await portfolio_repository.catalog()
+        cached = not_modified(request, response, catalog)
+        if cached:
+            return cached
+        
+        # Преобразуем в список с названиями
+        category_map = {
+            "telegram_bots": "🤖 Telegram боты",
+            "web_development": "🌐 Веб-разработка", 
+            "mobile_apps": "📱 Мобильные приложения",
+            "ai_integration": "🧠 AI интеграции",
+            "automation": "⚙️ Автоматизация",
+            "ecommerce": "🛒 E-commerce",
+            "other": "🔧 Другое"
+        }
+        
+        categories = []
+        for cat in catalog.categories:
+            if cat in category_map:
+                categories.append({
+                    "key": cat,
+                    "name": category_map[cat],
+                    "emoji": category_map[cat].split()[0]
+                })
+        
+        return {
+            "success": True,
+            "categories": categories
+        }
             
     except Exception as e:
         logger.error(f"Ошибка получения категорий портфолио: {e}")
@@ -1959,35 +1989,23 @@ async def get_public_portfolio_categories():
         }
 
 @admin_router.get("/api/portfolio/public/featured")
-async def get_public_featured_portfolio():
+async def get_public_featured_portfolio(request: Request, response: Response):
     """Получить рекомендуемые проекты портфолио для бота"""
     try:
-        with get_db_context() as db:
-            projects = db.query(Portfolio).filter(
-                Portfolio.is_visible == True,
-                Portfolio.is_featured == True
-            ).order_by(Portfolio.sort_order.asc(), Portfolio.created_at.desc()).limit(10).all()
-            
-            projects_data = []
-            for project in projects:
-                project_dict = project.to_dict()
-                
-                # Добавляем полные URL для изображений
-                if project_dict.get('main_image'):
-                    project_dict['main_image'] = get_image_url(project_dict['main_image'])
-                
-                if project_dict.get('image_paths'):
-                    project_dict['image_paths'] = [
-                        get_image_url(img) for img in project_dict['image_paths']
-                    ]
-                
-                projects_data.append(project_dict)
-            
-            return {
-                "success": True,
-                "projects": projects_data,
-                "count": len(projects_data)
-            }
+        catalog = await portfolio_repository.catalog()
+        cached = not_modified(request, response, catalog)
+        if cached:
+            return cached
+        
+        projects_data, _ = await portfolio_repository.list_projects(
+            featured_only=True, limit=10, view="api", catalog=catalog
+        )
+        
+        return {
+            "success": True,
+            "projects": projects_data,
+            "count": len(projects_data)
+        }
             
     except Exception as e:
         logger.error(f"Ошибка получения рекомендуемых проектов: {e}")
@@ -1998,50 +2016,35 @@ async def get_public_featured_portfolio():
         }
 
 @admin_router.get("/api/portfolio/public/category/{category}")
-async def get_public_portfolio_by_category(category: str, page: int = 0, limit: int = 5):
+async def get_public_portfolio_by_category(
+    category: str,
+    request: Request,
+    response: Response,
+    page: int = 0,
+    limit: int = 5
+):
     """Получить проекты портфолио по категории для бота"""
     try:
-        with get_db_context() as db:
-            offset = page * limit
-            
-            projects = db.query(Portfolio).filter(
-                Portfolio.is_visible == True,
-                Portfolio.category == category
-            ).order_by(
-                Portfolio.sort_order.asc(), 
-                Portfolio.created_at.desc()
-            ).offset(offset).limit(limit).all()
-            
-            total_count = db.query(Portfolio).filter(
-                Portfolio.is_visible == True,
-                Portfolio.category == category
-            ).count()
-            
-            projects_data = []
-            for project in projects:
-                project_dict = project.to_dict()
-                
-                # Добавляем полные URL для изображений
-                if project_dict.get('main_image'):
-                    project_dict['main_image'] = get_image_url(project_dict['main_image'])
-                
-                if project_dict.get('image_paths'):
-                    project_dict['image_paths'] = [
-                        get_image_url(img) for img in project_dict['image_paths']
-                    ]
-                
-                projects_data.append(project_dict)
-            
-            return {
-                "success": True,
-                "projects": projects_data,
-                "pagination": {
-                    "page": page,
-                    "limit": limit,
-                    "total": total_count,
-                    "has_more": (offset + limit) < total_count
-                }
+        catalog = await portfolio_repository.catalog()
+        cached = not_modified(request, response, catalog)
+        if cached:
+            return cached
+        
+        offset = page * limit
+        projects_data, total_count = await portfolio_repository.list_projects(
+            category, offset=offset, limit=limit, view="api", catalog=catalog
+        )
+        
+        return {
+            "success": True,
+            "projects": projects_data,
+            "pagination": {
+                "page": page,
+                "limit": limit,
+                "total": total_count,
+                "has_more": (offset + limit) < total_count
             }
+        }
             
     except Exception as e:
         logger.error(f"Ошибка получения проектов категории {category}: {e}")
@@ -2055,37 +2058,19 @@ async def get_public_portfolio_by_category(category: str, page: int = 0, limit:
 async def get_public_portfolio_item(project_id: int):
     """Получить детальную информацию о проекте портфолио для бота"""
     try:
-        with get_db_context() as db:
-            project = db.query(Portfolio).filter(
-                Portfolio.id == project_id,
-                Portfolio.is_visible == True
-            ).first()
-            
-            if not project:
-                return {
-                    "success": False,
-                    "error": "Проект не найден или недоступен"
-                }
-            
-            # Увеличиваем счетчик просмотров
-            project.views_count = (project.views_count or 0) + 1
-            db.commit()
-            
-            project_dict = project.to_dict()
-            
-            # Добавляем полные URL для изображений
-            if project_dict.get('main_image'):
-                project_dict['main_image'] = get_image_url(project_dict['main_image'])
-            
-            if project_dict.get('image_paths'):
-                project_dict['image_paths'] = [
-                    get_image_url(img) for img in project_dict['image_paths']
-                ]
-            
+        # Карточка из снимка каталога, просмотр засчитывается в БД
+        project = await portfolio_repository.get_project(project_id, view="api")
+        
+        if not project:
             return {
-                "success": True,
-                "project": project_dict
+                "success": False,
+                "error": "Проект не найден или недоступен"
             }
+        
+        return {
+            "success": True,
+            "project": project
+        }
             
     except Exception as e:
         logger.error(f"Ошибка получения проекта {project_id}: {e}")
@@ -2096,6 +2081,8 @@ async def get_public_portfolio_item(project_id: int):
 
 @admin_router.get("/api/portfolio/public/list")
 async def get_public_portfolio_list(
+    request: Request,
+    response: Response,
     category: str = None, 
     featured: bool = None,
     page: int = 0, 
@@ -2103,48 +2090,26 @@ async def get_public_portfolio_list(
 ):
     """Получить список проектов портфолио с фильтрами для бота"""
     try:
-        with get_db_context() as db:
-            query = db.query(Portfolio).filter(Portfolio.is_visible == True)
-            
-            if category:
-                query = query.filter(Portfolio.category == category)
-            
-            if featured is not None:
-                query = query.filter(Portfolio.is_featured == featured)
-            
-            total_count = query.count()
-            offset = page * limit
-            
-            projects = query.order_by(
-                Portfolio.sort_order.asc(), 
-                Portfolio.created_at.desc()
-            ).offset(offset).limit(limit).all()
-            
-            projects_data = []
-            for project in projects:
-                project_dict = project.to_dict()
-                
-                # Добавляем полные URL для изображений
-                if project_dict.get('main_image'):
-                    project_dict['main_image'] = get_image_url(project_dict['main_image'])
-                
-                if project_dict.get('image_paths'):
-                    project_dict['image_paths'] = [
-                        get_image_url(img) for img in project_dict['image_paths']
-                    ]
-                
-                projects_data.append(project_dict)
-            
-            return {
-                "success": True,
-                "projects": projects_data,
-                "pagination": {
-                    "page": page,
-                    "limit": limit,
-                    "total": total_count,
-                    "has_more": (offset + limit) < total_count
-                }
+        catalog = await portfolio_repository.catalog()
+        cached = not_modified(request, response, catalog)
+        if cached:
+            return cached
+        
+        offset = page * limit
+        projects_data, total_count = await portfolio_repository.list_projects(
+            category, featured_only=bool(featured), offset=offset, limit=limit, view="api", catalog=catalog
+        )
+        
+        return {
+            "success": True,
+            "projects": projects_data,
+            "pagination": {
+                "page": page,
+                "limit": limit,
+                "total": total_count,
+                "has_more": (offset + limit) < total_count
             }
+        }
             
     except Exception as e:
         logger.error(f"Ошибка получения списка портфолио: {e}")
@@ -2158,27 +2123,19 @@ async def get_public_portfolio_list(
 async def like_portfolio_project(project_id: int):
     """Лайкнуть проект портфолио"""
     try:
-        with get_db_context() as db:
-            project = db.query(Portfolio).filter(
-                Portfolio.id == project_id,
-                Portfolio.is_visible == True
-            ).first()
-            
-            if not project:
-                return {
-                    "success": False,
-                    "error": "Проект не найден"
-                }
-            
-            # Увеличиваем счетчик лайков
-            project.likes_count = (project.likes_count or 0) + 1
-            db.commit()
-            
+        likes_count = await portfolio_repository.like(project_id)
+        
+        if likes_count is None:
             return {
-                "success": True,
-                "likes": project.likes_count,
-                "message": "Спасибо за лайк!"
+                "success": False,
+                "error": "Проект не найден"
             }
+        
+        return {
+            "success": True,
+            "likes": likes_count,
+            "message": "Спасибо за лайк!"
+        }
             
     except Exception as e:
         logger.error(f"Ошибка лайка проекта {project_id}: {e}")
@@ -2192,7 +2149,7 @@ async def like_portfolio_project(project_id: int):
 async def publish_to_telegram(portfolio_id: int, username: str = Depends(authenticate)):
     """Опубликовать элемент портфолио в Telegram канал"""
     try:
-        with get_db_context() as db:
+        def _handle(db):
             # Получаем элемент портфолио
             portfolio_item = db.query(Portfolio).filter(Portfolio.id == portfolio_id).first()
             if not portfolio_item:
@@ -2212,9 +2169,10 @@ async def publish_to_telegram(portfolio_id: int, username: str = Depends(authent
             try:
                 from ...services.portfolio_telegram_service import portfolio_telegram_service
                 # Публикуем в Telegram канал
-                result = await portfolio_telegram_service.publish_portfolio_item(portfolio_item, db)
+                result = wait_on_event_loop(portfolio_telegram_service.publish_portfolio_item(portfolio_item, db))
                 
                 if result["success"]:
+                    bump_catalog_version(db)
                     return JSONResponse(content={
                         "success": True,
                         "message": "Элемент портфолио опубликован в Telegram канал",
@@ -2231,6 +2189,8 @@ async def publish_to_telegram(portfolio_id: int, username: str = Depends(authent
                     status_code=500,
                     content={"success": False, "error": "Telegram сервис недоступен"}
                 )
+
+        return await run_in_db_thread(_handle)
         
     except Exception as e:
         logger.error(f"Ошибка публикации в Telegram: {e}")
@@ -2243,7 +2203,7 @@ async def publish_to_telegram(portfolio_id: int, username: str = Depends(authent
 async def update_published_item(portfolio_id: int, username: str = Depends(authenticate)):
     """Обновить уже опубликованный элемент портфолио в Telegram канале"""
     try:
-        with get_db_context() as db:
+        def _handle(db):
             # Получаем элемент портфолио
             portfolio_item = db.query(Portfolio).filter(Portfolio.id == portfolio_id).first()
             if not portfolio_item:
@@ -2256,9 +2216,10 @@ async def update_published_item(portfolio_id: int, username: str = Depends(authe
             try:
                 from ...services.portfolio_telegram_service import portfolio_telegram_service
                 # Обновляем в Telegram канале
-                result = await portfolio_telegram_service.update_published_item(portfolio_item, db)
+                result = wait_on_event_loop(portfolio_telegram_service.update_published_item(portfolio_item, db))
                 
                 if result["success"]:
+                    bump_catalog_version(db)
                     return JSONResponse(content={
                         "success": True,
                         "message": "Элемент портфолио обновлен в Telegram канале"
@@ -2273,6 +2234,8 @@ async def update_published_item(portfolio_id: int, username: str = Depends(authe
                     status_code=500,
                     content={"success": False, "error": "Telegram сервис недоступен"}
                 )
+
+        return await run_in_db_thread(_handle)
         
     except Exception as e:
         logger.error(f"Ошибка обновления в Telegram: {e}")
@@ -2285,7 +2248,7 @@ async def update_published_item(portfolio_id: int, username: str = Depends(authe
 async def unpublish_from_telegram(portfolio_id: int, username: str = Depends(authenticate)):
     """Удалить элемент портфолио из Telegram канала"""
     try:
-        with get_db_context() as db:
+        def _handle(db):
             # Получаем элемент портфолио
             portfolio_item = db.query(Portfolio).filter(Portfolio.id == portfolio_id).first()
             if not portfolio_item:
@@ -2298,9 +2261,10 @@ async def unpublish_from_telegram(portfolio_id: int, username: str = Depends(aut
             try:
                 from ...services.portfolio_telegram_service import portfolio_telegram_service
                 # Удаляем из Telegram канала
-                result = await portfolio_telegram_service.delete_published_item(portfolio_item, db)
+                result = wait_on_event_loop(portfolio_telegram_service.delete_published_item(portfolio_item, db))
                 
                 if result["success"]:
+                    bump_catalog_version(db)
                     return JSONResponse(content={
                         "success": True,
                         "message": "Элемент портфолио удален из Telegram канала"
@@ -2315,6 +2279,8 @@ async def unpublish_from_telegram(portfolio_id: int, username: str = Depends(aut
                     status_code=500,
                     content={"success": False, "error": "Telegram сервис недоступен"}
                 )
+
+        return await run_in_db_thread(_handle)
         
     except Exception as e:
         logger.error(f"Ошибка удаления из Telegram: {e}")
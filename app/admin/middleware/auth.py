@@ -4,8 +4,6 @@ from fastapi.responses import RedirectResponse
 from sqlalchemy.orm import Session
 import secrets
 
-from ...database.database import get_db_context
-from ...database.models import AdminUser
 from ...config.settings import settings
 from ...services.auth_service import AuthService
 
@@ -30,28 +28,11 @@ def require_admin_auth(credentials: HTTPBasicCredentials = Depends(security)) ->
             "is_active": True
         }
 
-    # Проверяем пользователей из БД с использованием context manager
-    with get_db_context() as db:
-        from sqlalchemy import select
-        stmt = select(AdminUser).where(
-            AdminUser.username == credentials.username,
-            AdminUser.is_active == True
-        )
-        user = db.execute(stmt).scalar_one_or_none()
-
-        if user and AuthService.verify_password(credentials.password, user.password_hash):
-            # Извлекаем все атрибуты пока сессия активна
-            user_data = {
-                "id": user.id,
-                "username": user.username,
-                "password": credentials.password,
-                "email": user.email,
-                "first_name": user.first_name,
-                "last_name": user.last_name,
-                "role": user.role,
-                "is_active": user.is_active
-            }
-            return user_data
+    # Проверяем пользователей из БД (успешные проверки кешируются)
+    user_data = AuthService.get_cached_user(credentials.username, credentials.password)
+    if user_data:
+        user_data["password"] = credentials.password  # Добавляем пароль для JavaScript
+        return user_data
 
     # Если ни один способ не сработал
     raise HTTPException(
@@ -13,7 +13,7 @@ import logging
 import base64
 from datetime import datetime
 
-from app.core.database import get_db
+from app.core.database import get_db, get_db_context_async
 from ...database.models import AdminUser
 from ...config.settings import settings
 
@@ -158,12 +158,12 @@ async def get_current_user_info(credentials: HTTPBasicCredentials = Depends(secu
             )
 
         # Поиск пользователя в базе
-        with get_db_context() as db:
+        async with get_db_context_async() as db:
             stmt = select(AdminUser).where(
                 AdminUser.username == username,
                 AdminUser.is_active == True
             )
-            result = db.execute(stmt)
+            result = await db.execute(stmt)
             user = result.scalar_one_or_none()
 
             if not user:
@@ -217,12 +217,12 @@ async def verify_user(credentials: HTTPBasicCredentials) -> Optional[AdminUser]:
             return user
 
         # Проверяем в базе
-        with get_db_context() as db:
+        async with get_db_context_async() as db:
             stmt = select(AdminUser).where(
                 AdminUser.username == credentials.username,
                 AdminUser.is_active == True
             )
-            result = db.execute(stmt)
+            result = await db.execute(stmt)
             user = result.scalar_one_or_none()
 
             if user and verify_password(credentials.password, user.password_hash):
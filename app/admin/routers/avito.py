@@ -10,7 +10,7 @@ from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse, JSONResponse
 from sqlalchemy.orm import Session
-from typing import Optional, List, Dict, Any
+from typing import Optional, Dict, Any
 import json
 import asyncio
 from datetime import datetime
@@ -18,6 +18,7 @@ import logging
 import os
 
 from ...core.database import get_db_context, get_db
+from ...database.database import run_in_db_thread
 from ...services.notification_service import NotificationService
 from ...services.avito_polling_service import polling_service
 from ...database.crm_models import Client, ClientStatus, ClientType, AvitoClientStatus
@@ -25,6 +26,7 @@ from ...database.models import AdminUser
 from ...services.avito_service import get_avito_service, init_avito_service, AvitoService
 from ...services.openai_service import generate_conversation_summary
 from ...services.ai_sales_service import get_ai_sales_service
+from ...services.realtime_hub import realtime_hub
 from ..navigation import get_navigation_items
 from ...config.settings import settings
 # Импортируем функции аутентификации из middleware.auth
@@ -54,8 +56,35 @@ def get_current_user(username: str):
                 }
     return None
 
-# WebSocket connections storage
-websocket_connections = {}
+# Каналы realtime_hub для WebSocket-клиентов (доставка между воркерами через Redis)
+AVITO_CHATS_CHANNEL = "avito:chats"
+
+
+def avito_chat_channel(chat_id: str) -> str:
+    return f"avito:chat:{chat_id}"
+
+
+async def pump_websocket(websocket: WebSocket, channel: str, on_text):
+    """Пересылает события канала в WebSocket, пока клиент не отключится
+
+    on_text(text) обрабатывает входящие сообщения клиента (ping и т.п.).
+    """
+    async with realtime_hub.subscribe(channel) as queue:
+        async def forward():
+            while True:
+                item = await queue.get()
+                await websocket.send_text(json.dumps(item["data"]))
+
+        forward_task = asyncio.create_task(forward())
+        try:
+            while True:
+                await on_text(await websocket.receive_text())
+        except WebSocketDisconnect:
+            pass
+        except Exception as e:
+            logger.error(f"WebSocket error: {e}")
+        finally:
+            forward_task.cancel()
 
 # Инициализация сервиса Авито через Settings
 logger.info(f"Avito environment check: CLIENT_ID={settings.AVITO_CLIENT_ID[:10] + '...' if settings.AVITO_CLIENT_ID else 'None'}, CLIENT_SECRET={'***' if settings.AVITO_CLIENT_SECRET else 'None'}, USER_ID={settings.AVITO_USER_ID}")
@@ -87,7 +116,7 @@ async def startup_event():
                 logger.error(f"Failed to initialize Avito service in startup: {e}")
 
 @router.get("/", response_class=HTMLResponse)
-async def avito_messenger(
+def avito_messenger(
     request: Request,
     username: str = Depends(authenticate)
 ):
@@ -453,78 +482,80 @@ async def create_client_from_chat(
 ):
     """Создание клиента из чата Авито с AI-сводкой"""
     try:
-        current_user = get_current_user(username)
-        with get_db_context() as db:
-            service = get_avito_service()
-            
-            # Получаем информацию о чате
-            chat = await service.get_chat_info(chat_id)
-            
-            # Получаем сообщения для анализа
-            messages = await service.get_chat_messages(chat_id, limit=50)
-            
-            # Находим информацию о собеседнике
-            other_user = None
-            for user in chat.users:
-                if user.get("id") != service.user_id:
-                    other_user = user
-                    break
-            
-            if not other_user:
-                raise HTTPException(status_code=400, detail="Cannot find chat participant")
-            
-            # Проверяем, не существует ли уже клиент
-            existing_client = db.query(Client).filter(
-                Client.source == f"avito_{other_user.get('id')}"
-            ).first()
-            
-            if existing_client:
-                return JSONResponse({
-                    "status": "exists",
-                    "client_id": existing_client.id,
-                    "message": "Client already exists"
-                })
-            
-            # Подготавливаем историю сообщений для AI
-            conversation_text = ""
-            for msg in reversed(messages):  # От старых к новым
-                if msg.type.value == "text":
-                    sender = "Клиент" if msg.direction == "in" else "Мы"
-                    text = msg.content.get("text", "")
-                    conversation_text += f"{sender}: {text}\n"
-            
-            # Генерируем AI-сводку диалога
-            summary = ""
-            preferences = {}
-            
-            if conversation_text:
-                try:
-                    summary = await generate_conversation_summary(conversation_text)
-                    
-                    # Извлекаем ключевую информацию из сводки
-                    if "интерес" in summary.lower():
-                        preferences["interests"] = summary
-                    if "бюджет" in summary.lower():
-                        preferences["budget_mentioned"] = True
-                except Exception as e:
-                    logger.error(f"Failed to generate AI summary: {e}")
-                    summary = "Автоматическая сводка недоступна"
-            
-            # Получаем информацию об объявлении, если есть
-            item_info = ""
-            if chat.context and chat.context.get("type") == "item":
-                item = chat.context.get("value", {})
-                item_info = f"Объявление: {item.get('title', 'Без названия')}"
-                if item.get('price'):
-                    item_info += f" (Цена: {item['price']} руб.)"
-            
-            # Создаем нового клиента
+        service = get_avito_service()
+        
+        # Получаем информацию о чате
+        chat = await service.get_chat_info(chat_id)
+        
+        # Получаем сообщения для анализа
+        messages = await service.get_chat_messages(chat_id, limit=50)
+        
+        # Находим информацию о собеседнике
+        other_user = None
+        for user in chat.users:
+            if user.get("id") != service.user_id:
+                other_user = user
+                break
+        
+        if not other_user:
+            raise HTTPException(status_code=400, detail="Cannot find chat participant")
+        
+        source = f"avito_{other_user.get('id')}"
+        
+        # Проверяем, не существует ли уже клиент
+        def _find_existing(db):
+            return db.query(Client.id).filter(Client.source == source).scalar()
+        
+        existing_client_id = await run_in_db_thread(_find_existing)
+        if existing_client_id:
+            return JSONResponse({
+                "status": "exists",
+                "client_id": existing_client_id,
+                "message": "Client already exists"
+            })
+        
+        # Подготавливаем историю сообщений для AI
+        conversation_text = ""
+        for msg in reversed(messages):  # От старых к новым
+            if msg.type.value == "text":
+                sender = "Клиент" if msg.direction == "in" else "Мы"
+                text = msg.content.get("text", "")
+                conversation_text += f"{sender}: {text}\n"
+        
+        # Генерируем AI-сводку диалога (без открытой сессии БД)
+        summary = ""
+        preferences = {}
+        
+        if conversation_text:
+            try:
+                summary = await generate_conversation_summary(conversation_text)
+                
+                # Извлекаем ключевую информацию из сводки
+                if "интерес" in summary.lower():
+                    preferences["interests"] = summary
+                if "бюджет" in summary.lower():
+                    preferences["budget_mentioned"] = True
+            except Exception as e:
+                logger.error(f"Failed to generate AI summary: {e}")
+                summary = "Автоматическая сводка недоступна"
+        
+        # Получаем информацию об объявлении, если есть
+        item_info = ""
+        if chat.context and chat.context.get("type") == "item":
+            item = chat.context.get("value", {})
+            item_info = f"Объявление: {item.get('title', 'Без названия')}"
+            if item.get('price'):
+                item_info += f" (Цена: {item['price']} руб.)"
+        
+        # Создаем нового клиента
+        def _create(db):
+            current_user = get_current_user(username)
             new_client = Client(
                 name=other_user.get("name", "Клиент из Авито"),
                 type=ClientType.INDIVIDUAL,
                 status=ClientStatus.NEW,
                 phone=other_user.get("phone"),
-                source=f"avito_{other_user.get('id')}",
+                source=source,
                 description=f"{item_info}\n\nСводка диалога:\n{summary}",
                 preferences=preferences,
                 communication_history=[{
@@ -540,13 +571,16 @@ async def create_client_from_chat(
             db.add(new_client)
             db.commit()
             db.refresh(new_client)
-            
-            return JSONResponse({
-                "status": "success",
-                "client_id": new_client.id,
-                "client_name": new_client.name,
-                "summary": summary
-            })
+            return new_client.id, new_client.name
+        
+        client_id, client_name = await run_in_db_thread(_create)
+        
+        return JSONResponse({
+            "status": "success",
+            "client_id": client_id,
+            "client_name": client_name,
+            "summary": summary
+        })
             
     except Exception as e:
         logger.error(f"Failed to create client from chat: {e}")
@@ -559,49 +593,21 @@ async def websocket_endpoint_chat(
 ):
     """WebSocket для real-time обновлений конкретного чата"""
     await websocket.accept()
-    
-    # Сохраняем соединение
-    if chat_id not in websocket_connections:
-        websocket_connections[chat_id] = []
-    websocket_connections[chat_id].append(websocket)
-    
-    try:
-        while True:
-            # Ждем сообщений от клиента
-            data = await websocket.receive_text()
-            message = json.loads(data)
-            
-            # Обработка различных типов сообщений
-            if message.get("type") == "ping":
-                await websocket.send_json({"type": "pong"})
-            
-    except WebSocketDisconnect:
-        # Удаляем соединение при отключении
-        if chat_id in websocket_connections:
-            websocket_connections[chat_id].remove(websocket)
-            if not websocket_connections[chat_id]:
-                del websocket_connections[chat_id]
-    except Exception as e:
-        logger.error(f"WebSocket error: {e}")
-        if chat_id in websocket_connections and websocket in websocket_connections[chat_id]:
-            websocket_connections[chat_id].remove(websocket)
+
+    async def on_text(data: str):
+        message = json.loads(data)
+        # Обработка различных типов сообщений
+        if message.get("type") == "ping":
+            await websocket.send_json({"type": "pong"})
+
+    await pump_websocket(websocket, avito_chat_channel(chat_id), on_text)
 
 async def broadcast_message(chat_id: str, message: Dict):
-    """Отправка сообщения всем подключенным WebSocket клиентам"""
-    if chat_id in websocket_connections:
-        disconnected = []
-        for ws in websocket_connections[chat_id]:
-            try:
-                await ws.send_json({
-                    "type": "new_message",
-                    "message": message
-                })
-            except:
-                disconnected.append(ws)
-        
-        # Удаляем отключенные соединения
-        for ws in disconnected:
-            websocket_connections[chat_id].remove(ws)
+    """Отправка сообщения всем WebSocket клиентам чата (во всех воркерах)"""
+    await realtime_hub.publish(avito_chat_channel(chat_id), "new_message", {
+        "type": "new_message",
+        "message": message
+    })
 
 @router.post("/setup-webhook")
 async def setup_avito_webhook(request: Request, db: Session = Depends(get_db)):
@@ -1015,67 +1021,22 @@ async def export_chat_dialog(
         return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
 
 
-# WebSocket connections для real-time обновлений
-active_connections: List[WebSocket] = []
-
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-        logger.info(f"WebSocket подключен. Всего подключений: {len(self.active_connections)}")
-
-    def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-            logger.info(f"WebSocket отключен. Всего подключений: {len(self.active_connections)}")
-
-    async def send_personal_message(self, message: str, websocket: WebSocket):
-        try:
-            await websocket.send_text(message)
-        except Exception as e:
-            logger.error(f"Ошибка отправки сообщения WebSocket: {e}")
-            self.disconnect(websocket)
-
-    async def broadcast(self, message: dict):
-        """Отправка сообщения всем подключенным клиентам"""
-        if not self.active_connections:
-            return
-        
-        message_str = json.dumps(message)
-        disconnected = []
-        
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message_str)
-            except Exception as e:
-                logger.error(f"Ошибка отправки broadcast сообщения: {e}")
-                disconnected.append(connection)
-        
-        # Удаляем неактивные соединения
-        for connection in disconnected:
-            self.disconnect(connection)
-
-manager = ConnectionManager()
+async def broadcast_chats_event(message: dict):
+    """Событие списка чатов всем WebSocket клиентам /ws (во всех воркерах)"""
+    await realtime_hub.publish(AVITO_CHATS_CHANNEL, message["type"], message)
 
 
 @router.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     """WebSocket endpoint для real-time обновлений чатов"""
-    await manager.connect(websocket)
-    try:
-        while True:
-            # Ждем сообщения от клиента (ping для поддержания соединения)
-            data = await websocket.receive_text()
-            if data == "ping":
-                await websocket.send_text("pong")
-    except WebSocketDisconnect:
-        manager.disconnect(websocket)
-    except Exception as e:
-        logger.error(f"Ошибка WebSocket: {e}")
-        manager.disconnect(websocket)
+    await websocket.accept()
+
+    async def on_text(data: str):
+        # ping для поддержания соединения
+        if data == "ping":
+            await websocket.send_text("pong")
+
+    await pump_websocket(websocket, AVITO_CHATS_CHANNEL, on_text)
 
 
 @router.post("/webhook")
@@ -1156,7 +1117,7 @@ async def handle_new_message_webhook(webhook_data: dict):
                 logger.error(f"Ошибка отправки Telegram уведомления: {e}")
         
         # Отправляем обновление через WebSocket
-        await manager.broadcast({
+        await broadcast_chats_event({
             "type": "new_message",
             "chat_id": chat_id,
             "message": message_data,
@@ -1181,7 +1142,7 @@ async def handle_chat_update_webhook(webhook_data: dict):
         logger.info(f"Обновление чата {chat_id}")
         
         # Отправляем обновление через WebSocket
-        await manager.broadcast({
+        await broadcast_chats_event({
             "type": "chat_update", 
             "chat_id": chat_id,
             "chat": chat_data,
@@ -1198,7 +1159,7 @@ async def webhook_status():
     return {
         "status": "active",
         "timestamp": datetime.now().isoformat(),
-        "websocket_connections": len(manager.active_connections),
+        "websocket_connections": realtime_hub.subscriber_count("avito:"),
         "message": "Avito webhook endpoint is working"
     }
 
@@ -1,5 +1,5 @@
-from fastapi import APIRouter, Request, Depends, HTTPException, File, UploadFile, Form
-from fastapi.responses import HTMLResponse
+from fastapi import APIRouter, Request, Response, Depends, Header, HTTPException, File, UploadFile, Form, Query
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
 from typing import List, Optional
@@ -8,9 +8,22 @@ import shutil
 import os
 import uuid
 
-from ...database.database import get_db
+from ...database.database import get_db, run_in_db_thread
+from ...database.chat_inbox import client_display_name, decode_cursor, fetch_chat_inbox, last_message_dict
 from ...database.models import ProjectChat, ProjectChatMessage, Project, AdminUser
 from ..middleware.auth import get_current_admin_user
+from ...services.notification_outbox import notification_outbox
+from ...services.project_chat_events import (
+    ALL_CHATS_CHANNEL,
+    SSE_HEADERS,
+    chat_channel,
+    executor_channel,
+    message_event_id,
+    message_events,
+    read_events,
+    replay_chat_messages,
+)
+from ...services.realtime_hub import realtime_hub
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/admin/templates")
@@ -55,98 +68,86 @@ async def chat_detail_page(
 # API: Получить список всех чатов
 @router.get("/api/chats")
 async def get_chats(
-    current_user: dict = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=200),
+    current_user: dict = Depends(get_current_admin_user)
 ):
-    """API: Получить чаты проектов (с фильтрацией для исполнителей)"""
-    print(f"🔍 Запрос чатов от админ-пользователя: id={current_user.get('id')}, username={current_user.get('username')}, role={current_user.get('role')}")
-
-    # Получаем чаты с учетом роли пользователя
-    query = db.query(ProjectChat).join(Project)
+    """API: Получить чаты проектов (с фильтрацией для исполнителей)
 
+    Без limit возвращаются все чаты; с limit - страница, курсор следующей
+    страницы передается в заголовке X-Next-Cursor.
+    """
+    filters = []
     # Если пользователь - исполнитель, показываем только его проекты
     if current_user.get("role") == "executor":
-        print(f"👷 Пользователь - исполнитель, фильтруем по assigned_executor_id={current_user.get('id')}")
-        query = query.filter(Project.assigned_executor_id == current_user.get("id"))
-
-        # Проверим, сколько проектов назначено на этого исполнителя
-        executor_projects = db.query(Project).filter(Project.assigned_executor_id == current_user.get("id")).all()
-        print(f"📊 Найдено проектов для исполнителя: {len(executor_projects)}")
-        for p in executor_projects[:5]:
-            print(f"  - Проект ID:{p.id}, Название:{p.title}")
-
-    chats = query.all()
-    print(f"✅ Возвращаем чатов: {len(chats)}")
-
-    result = []
-    for chat in chats:
-        project = db.query(Project).filter(Project.id == chat.project_id).first()
-
-        # Получаем имя клиента
-        client_name = None
-        if project.user:
-            if project.user.first_name:
-                client_name = project.user.first_name
-                if project.user.last_name:
-                    client_name += f' {project.user.last_name}'
-            elif project.user.username:
-                client_name = f'@{project.user.username}'
-
-        # Получаем последнее сообщение
-        last_message = db.query(ProjectChatMessage).filter(
-            ProjectChatMessage.chat_id == chat.id
-        ).order_by(ProjectChatMessage.created_at.desc()).first()
-
-        result.append({
-            'id': chat.id,
+        filters.append(Project.assigned_executor_id == current_user.get("id"))
+
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    rows, next_cursor = await run_in_db_thread(fetch_chat_inbox, filters, after, limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+
+    return [
+        {
+            'id': row["id"],
             'project': {
-                'id': project.id,
-                'title': project.title,
-                'client_name': client_name,
-                'status': project.status
+                'id': row["project_id"],
+                'title': row["project_title"],
+                'client_name': client_display_name(
+                    row["client_first_name"], row["client_last_name"], row["client_username"]
+                ),
+                'status': row["project_status"]
             },
-            'last_message': {
-                'sender_type': last_message.sender_type,
-                'message_text': last_message.message_text,
-                'created_at': last_message.created_at.isoformat()
-            } if last_message else None,
-            'last_message_at': chat.last_message_at.isoformat() if chat.last_message_at else None,
-            'unread_by_executor': chat.unread_by_executor,
-            'unread_by_client': chat.unread_by_client,
-            'is_pinned_by_owner': chat.is_pinned_by_owner if hasattr(chat, 'is_pinned_by_owner') else False,
-            'is_hidden_by_owner': chat.is_hidden_by_owner if hasattr(chat, 'is_hidden_by_owner') else False,
-            'created_at': chat.created_at.isoformat()
-        })
-
-    return result
+            'last_message': last_message_dict(row),
+            'last_message_at': row["last_message_at"].isoformat() if row["last_message_at"] else None,
+            'unread_by_executor': row["unread_by_executor"],
+            'unread_by_client': row["unread_by_client"],
+            'is_pinned_by_owner': bool(row["is_pinned_by_owner"]),
+            'is_hidden_by_owner': bool(row["is_hidden_by_owner"]),
+            'created_at': row["created_at"].isoformat()
+        }
+        for row in rows
+    ]
 
 
 # API: Получить сообщения чата
 @router.get("/api/chats/{chat_id}/messages")
 async def get_chat_messages(
     chat_id: int,
+    after_id: Optional[int] = None,
     current_user: dict = Depends(get_current_admin_user),
     db: Session = Depends(get_db)
 ):
-    """API: Получить сообщения чата"""
+    """API: Получить сообщения чата (с after_id - только новее этого сообщения)"""
     chat = db.query(ProjectChat).filter(ProjectChat.id == chat_id).first()
     if not chat:
         raise HTTPException(status_code=404, detail="Chat not found")
 
-    # Получаем все сообщения
-    messages = db.query(ProjectChatMessage).filter(
-        ProjectChatMessage.chat_id == chat_id
-    ).order_by(ProjectChatMessage.created_at.asc()).all()
+    query = db.query(ProjectChatMessage).filter(ProjectChatMessage.chat_id == chat_id)
+    if after_id:
+        query = query.filter(ProjectChatMessage.id > after_id)
+    messages = query.order_by(ProjectChatMessage.created_at.asc()).all()
 
     # Помечаем сообщения от клиента как прочитанные исполнителем
+    read_ids = []
     for msg in messages:
         if not msg.is_read_by_executor and msg.sender_type == 'client':
             msg.is_read_by_executor = True
             msg.read_at = datetime.utcnow()
+            read_ids.append(msg.id)
 
+    had_unread = bool(chat.unread_by_executor)
     chat.unread_by_executor = 0
     db.commit()
 
+    if read_ids or had_unread:
+        await realtime_hub.publish_many(read_events(chat, chat.project, 'executor', read_ids))
+
     return {
         'messages': [
             {
@@ -162,6 +163,61 @@ async def get_chat_messages(
     }
 
 
+# API: Поток событий списка чатов (SSE)
+@router.get("/api/chats/events")
+async def stream_chats_events(
+    request: Request,
+    current_user: dict = Depends(get_current_admin_user)
+):
+    """API: Изменения счетчиков и последних сообщений чатов (event: chat_updated)"""
+    if current_user.get("role") == "executor":
+        channel = executor_channel(current_user.get("id"))
+    else:
+        channel = ALL_CHATS_CHANNEL
+
+    return StreamingResponse(
+        realtime_hub.sse_stream([channel], request.is_disconnected),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+
+# API: Поток событий чата (SSE)
+@router.get("/api/chats/{chat_id}/events")
+async def stream_chat_events(
+    chat_id: int,
+    request: Request,
+    after_id: Optional[int] = None,
+    last_event_id: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_admin_user),
+    db: Session = Depends(get_db)
+):
+    """API: Новые сообщения (event: message, id = id сообщения), прочтения (read) и счетчики (unread)
+
+    Сообщения новее after_id (или Last-Event-ID при переподключении) отдаются
+    из БД перед живыми событиями.
+    """
+    chat = db.query(ProjectChat).filter(ProjectChat.id == chat_id).first()
+    if not chat:
+        raise HTTPException(status_code=404, detail="Chat not found")
+    if current_user.get("role") == "executor" and chat.project.assigned_executor_id != current_user.get("id"):
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    if last_event_id and last_event_id.isdigit():
+        after_id = int(last_event_id)
+
+    return StreamingResponse(
+        realtime_hub.sse_stream(
+            [chat_channel(chat_id)],
+            request.is_disconnected,
+            replay=(lambda: replay_chat_messages(chat_id, after_id)) if after_id else None,
+            event_id=message_event_id
+        ),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+
 # API: Отправить сообщение в чат
 @router.post("/api/chats/{chat_id}/messages")
 def send_chat_message(
@@ -216,16 +272,9 @@ def send_chat_message(
     chat.last_message_at = datetime.utcnow()
     chat.unread_by_client += 1
 
-    db.commit()
-    db.refresh(message)
-
-    # Отправляем уведомление клиенту в Telegram
+    # Уведомление клиенту в Telegram - в outbox той же транзакцией
     project = db.query(Project).filter(Project.id == chat.project_id).first()
     if project and project.user and project.user.telegram_id:
-        from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup, WebAppInfo
-        from ...config.settings import settings
-        import asyncio
-
         # Получаем имя исполнителя
         executor_name = 'Исполнитель'
         if current_user.get('first_name'):
@@ -235,54 +284,19 @@ def send_chat_message(
         elif current_user.get('username'):
             executor_name = current_user['username']
 
-        print(f"🔔 [NOTIFICATION DEBUG] Отправляем уведомление клиенту {project.user.telegram_id}, от исполнителя {executor_name}")
-
-        # Отправляем уведомление асинхронно
-        async def send_notification():
-            try:
-                bot = Bot(settings.BOT_TOKEN)
-                preview_text = message_text[:150] + "..." if message_text and len(message_text) > 150 else (message_text or "📎 Вложение")
-
-                notification_message = f"""
-💬 <b>Новое сообщение в проекте</b>
-
-📋 <b>Проект:</b> {project.title}
-👤 <b>От:</b> {executor_name} (Исполнитель)
-
-💬 <b>Сообщение:</b>
-{preview_text}
-
-🕐 <b>Время:</b> {datetime.utcnow().strftime('%d.%m.%Y %H:%M')}
-                """
-
-                # Для клиента используем WebAppInfo чтобы открыть мини-приложение
-                miniapp_url = f"{settings.MINIAPP_URL}#/chat/{chat_id}"
-                keyboard = InlineKeyboardMarkup([[
-                    InlineKeyboardButton("💬 Ответить", web_app=WebAppInfo(url=miniapp_url))
-                ]])
-
-                await bot.send_message(
-                    chat_id=project.user.telegram_id,
-                    text=notification_message,
-                    parse_mode='HTML',
-                    reply_markup=keyboard,
-                    disable_web_page_preview=True
-                )
-                print(f"✅ [NOTIFICATION DEBUG] Уведомление клиенту успешно отправлено!")
-            except Exception as e:
-                print(f"❌ [NOTIFICATION DEBUG] Ошибка отправки уведомления клиенту: {e}")
-
-        # Запускаем уведомление в отдельном потоке
-        import threading
-        def run_async():
-            try:
-                import asyncio
-                asyncio.run(send_notification())
-            except Exception as e:
-                print(f"Error running notification: {e}")
-
-        thread = threading.Thread(target=run_async)
-        thread.start()
+        notification_outbox.enqueue(db, project.user.telegram_id, "project_chat_message", {
+            "chat_id": chat_id,
+            "project_title": project.title,
+            "sender_name": executor_name,
+            "sender_role": "Исполнитель",
+            "message_text": message_text,
+            "created_at": message.created_at.isoformat()
+        })
+
+    db.commit()
+    db.refresh(message)
+    notification_outbox.wake()
+    realtime_hub.publish_sync(message_events(chat, project, message))
 
     return {
         'id': message.id,
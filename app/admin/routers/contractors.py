@@ -10,6 +10,7 @@ from pydantic import BaseModel
 from ...database.database import get_db
 from ...database.models import User, AdminUser, ContractorPayment, Task
 from ...config.logging import get_logger
+from ...services.auth_service import credential_cache
 from ..middleware.auth import require_admin_auth
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 import secrets
@@ -382,6 +383,7 @@ async def delete_contractor(
             contractor.is_active = False
             contractor.updated_at = datetime.utcnow()
             db.commit()
+            credential_cache.invalidate_user(contractor_id)
 
             logger.info(f"Исполнитель деактивирован: ID={contractor_id}, username={contractor.username}")
             return {
@@ -397,6 +399,7 @@ async def delete_contractor(
             contractor.is_active = False
             contractor.updated_at = datetime.utcnow()
             db.commit()
+            credential_cache.invalidate_user(contractor_id)
 
             logger.info(f"Исполнитель деактивирован: ID={contractor_id}, username={contractor.username}")
             return {
@@ -407,6 +410,7 @@ async def delete_contractor(
         # Удаляем исполнителя
         db.delete(contractor)
         db.commit()
+        credential_cache.invalidate_user(contractor_id)
 
         logger.info(f"Исполнитель успешно удален: ID={contractor_id}, username={contractor.username}")
 
@@ -459,6 +463,7 @@ async def change_contractor_password(
         contractor.updated_at = datetime.utcnow()
         
         db.commit()
+        credential_cache.invalidate_user(contractor_id)
         
         logger.info(f"Пароль для исполнителя {contractor_id} ({contractor.username}) успешно изменен пользователем {current_user.username} (роль: {current_user.role})")
         
@@ -6,7 +6,7 @@ import uuid
 from datetime import datetime
 from typing import List, Optional
 from fastapi import APIRouter, HTTPException, Depends, File, UploadFile, Form, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_, desc, asc, func
@@ -18,6 +18,7 @@ from ...core.database import get_db_context, get_db
 from ...database.database import get_db_context as get_sync_db_context
 from ...database.models import Portfolio
 from ...config.settings import settings
+from ...services.portfolio_repository import bump_catalog_version, not_modified, portfolio_repository
 from ...config.logging import get_logger
 from ..middleware.auth import get_current_admin_user
 
@@ -342,6 +343,7 @@ async def create_portfolio_item(request: Request):
             )
 
             sync_db.add(new_project)
+            bump_catalog_version(sync_db)
             sync_db.commit()
             sync_db.refresh(new_project)
 
@@ -466,6 +468,7 @@ async def update_portfolio_item(
 
             project.image_paths = current_images
 
+            bump_catalog_version(sync_db)
             sync_db.commit()
             sync_db.refresh(project)
 
@@ -507,6 +510,7 @@ async def delete_portfolio_item(project_id: int):
 
             # Удаляем проект из базы
             sync_db.delete(project)
+            bump_catalog_version(sync_db)
             sync_db.commit()
 
             logger.info(f"Удален проект портфолио: {project_id}")
@@ -561,6 +565,7 @@ async def reorder_portfolio(order_data: dict):
                 if project:
                     project.sort_order = new_order
 
+            bump_catalog_version(sync_db)
             sync_db.commit()
 
             logger.info("Порядок проектов портфолио обновлен")
@@ -614,39 +619,36 @@ async def get_portfolio_stats():
 # =================== PUBLIC API ДЛЯ БОТА ===================
 
 @router.get("/public/categories")
-async def get_public_categories():
+async def get_public_categories(request: Request, response: Response):
     """Публичное API для получения категорий (для бота)"""
     try:
-        with get_sync_db_context() as sync_db:
-            categories = sync_db.query(Portfolio.category).filter(
-                Portfolio.category.isnot(None),
-                Portfolio.is_visible == True
-            ).distinct().all()
-
-            category_list = [cat[0] for cat in categories if cat[0]]
+        catalog = await portfolio_repository.catalog()
+        cached = not_modified(request, response, catalog)
+        if cached:
+            return cached
+
+        category_map = {
+            "telegram_bots": "🤖 Telegram боты",
+            "web_development": "🌐 Веб-разработка",
+            "mobile_apps": "📱 Мобильные приложения",
+            "ai_integration": "🧠 AI интеграции",
+            "automation": "⚡ Автоматизация",
+            "ecommerce": "🛒 E-commerce",
+            "other": "📦 Другое"
+        }
 
-            category_map = {
-                "telegram_bots": "🤖 Telegram боты",
-                "web_development": "🌐 Веб-разработка",
-                "mobile_apps": "📱 Мобильные приложения",
-                "ai_integration": "🧠 AI интеграции",
-                "automation": "⚡ Автоматизация",
-                "ecommerce": "🛒 E-commerce",
-                "other": "📦 Другое"
+        result = [
+            {
+                "id": cat,
+                "name": category_map.get(cat, cat.replace("_", " ").title())
             }
+            for cat in catalog.categories
+        ]
 
-            result = [
-                {
-                    "id": cat,
-                    "name": category_map.get(cat, cat.replace("_", " ").title())
-                }
-                for cat in category_list
-            ]
-
-            return {
-                "success": True,
-                "categories": result
-            }
+        return {
+            "success": True,
+            "categories": result
+        }
 
     except Exception as e:
         logger.error(f"Ошибка получения публичных категорий: {e}")
@@ -657,6 +659,8 @@ async def get_public_categories():
 
 @router.get("/public/list")
 async def get_public_portfolio_list(
+    request: Request,
+    response: Response,
     category: Optional[str] = None,
     featured_only: bool = False,
     page: int = 1,
@@ -664,39 +668,27 @@ async def get_public_portfolio_list(
 ):
     """Публичное API для получения портфолио (для бота)"""
     try:
-        with get_sync_db_context() as sync_db:
-            query = sync_db.query(Portfolio).filter(Portfolio.is_visible == True)
-
-            if featured_only:
-                query = query.filter(Portfolio.is_featured == True)
-
-            if category:
-                query = query.filter(Portfolio.category == category)
-
-            # Сортировка: сначала рекомендуемые, затем по порядку, затем по дате
-            query = query.order_by(
-                desc(Portfolio.is_featured),
-                asc(Portfolio.sort_order),
-                desc(Portfolio.created_at)
-            )
-
-            # Подсчитываем общее количество
-            total = query.count()
-
-            # Применяем пагинацию
-            offset = (page - 1) * per_page
-            projects = query.offset(offset).limit(per_page).all()
+        catalog = await portfolio_repository.catalog()
+        cached = not_modified(request, response, catalog)
+        if cached:
+            return cached
+
+        # Сортировка: сначала рекомендуемые, затем по порядку, затем по дате
+        offset = (page - 1) * per_page
+        projects, total = await portfolio_repository.list_projects(
+            category, featured_only, offset, per_page, catalog=catalog
+        )
 
-            return {
-                "success": True,
-                "data": [project.to_bot_dict() for project in projects],
-                "pagination": {
-                    "page": page,
-                    "per_page": per_page,
-                    "total": total,
-                    "has_next": offset + per_page < total
-                }
+        return {
+            "success": True,
+            "data": projects,
+            "pagination": {
+                "page": page,
+                "per_page": per_page,
+                "total": total,
+                "has_next": offset + per_page < total
             }
+        }
 
     except Exception as e:
         logger.error(f"Ошибка получения публичного списка портфолио: {e}")
@@ -710,27 +702,20 @@ async def get_public_portfolio_list(
 async def get_public_portfolio_item(project_id: int):
     """Публичное API для получения конкретного проекта (для бота)"""
     try:
-        with get_sync_db_context() as sync_db:
-            project = sync_db.query(Portfolio).filter(
-                Portfolio.id == project_id,
-                Portfolio.is_visible == True
-            ).first()
-
-            if not project:
-                return {
-                    "success": False,
-                    "error": "Проект не найден"
-                }
-
-            # Увеличиваем счетчик просмотров
-            project.views_count += 1
-            sync_db.commit()
+        # Карточка из снимка каталога, просмотр засчитывается в БД
+        project = await portfolio_repository.get_project(project_id)
 
+        if not project:
             return {
-                "success": True,
-                "data": project.to_bot_dict()
+                "success": False,
+                "error": "Проект не найден"
             }
 
+        return {
+            "success": True,
+            "data": project
+        }
+
     except Exception as e:
         logger.error(f"Ошибка получения публичного проекта {project_id}: {e}")
         return {
@@ -742,26 +727,19 @@ async def get_public_portfolio_item(project_id: int):
 async def like_portfolio_item(project_id: int):
     """Публичное API для лайка проекта (для бота)"""
     try:
-        with get_sync_db_context() as sync_db:
-            project = sync_db.query(Portfolio).filter(
-                Portfolio.id == project_id,
-                Portfolio.is_visible == True
-            ).first()
-
-            if not project:
-                return {
-                    "success": False,
-                    "error": "Проект не найден"
-                }
-
-            project.likes_count += 1
-            sync_db.commit()
+        likes_count = await portfolio_repository.like(project_id)
 
+        if likes_count is None:
             return {
-                "success": True,
-                "likes_count": project.likes_count
+                "success": False,
+                "error": "Проект не найден"
             }
 
+        return {
+            "success": True,
+            "likes_count": likes_count
+        }
+
     except Exception as e:
         logger.error(f"Ошибка лайка проекта {project_id}: {e}")
         return {
@@ -798,6 +776,7 @@ async def publish_to_telegram(
             result = await portfolio_telegram_service.publish_portfolio_item(portfolio_item, sync_db)
 
             if result["success"]:
+                bump_catalog_version(sync_db)
                 return JSONResponse(content={
                     "success": True,
                     "message": "Элемент портфолио опубликован в Telegram канал",
@@ -839,6 +818,7 @@ async def update_published_item(
             result = await portfolio_telegram_service.update_published_item(portfolio_item, sync_db)
 
             if result["success"]:
+                bump_catalog_version(sync_db)
                 return JSONResponse(content={
                     "success": True,
                     "message": "Элемент портфолио обновлен в Telegram канале"
@@ -878,6 +858,7 @@ async def unpublish_from_telegram(
             result = await portfolio_telegram_service.delete_published_item(portfolio_item, sync_db)
 
             if result["success"]:
+                bump_catalog_version(sync_db)
                 return JSONResponse(content={
                     "success": True,
                     "message": "Элемент портфолио удален из Telegram канала"
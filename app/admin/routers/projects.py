@@ -12,7 +12,8 @@ from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_, desc, asc, func, text, select
 from pydantic import BaseModel
 
-from ...database.database import get_db, get_db_context
+from ...database.database import get_db, get_db_context, run_in_db_thread
+from ...core.database import get_db_context_async
 from ...database.models import (
     Project, User, AdminUser, ProjectFile, ProjectStatus, ProjectRevision,
     RevisionMessage, RevisionFile, ProjectStatusLog, ConsultantSession,
@@ -140,25 +141,17 @@ async def get_current_user(credentials: HTTPBasicCredentials = Depends(security)
 
     # Если не подошло, проверяем новую систему (исполнители)
     try:
-        with get_db_context() as db:
-            from ...services.auth_service import AuthService
-            from sqlalchemy.orm import selectinload
+        from ...services.auth_service import AuthService
 
-            stmt = select(AdminUser).filter(
-                AdminUser.username == credentials.username,
-                AdminUser.is_active == True
-            )
-            result = db.execute(stmt)
-            admin_user = result.scalar_one_or_none()
-
-            if admin_user and AuthService.verify_password(credentials.password, admin_user.password_hash):
-                logger.info(f"[API] Пользователь {credentials.username} = {admin_user.role.upper()} (ID: {admin_user.id})")
-                return {
-                    "id": admin_user.id,
-                    "username": admin_user.username,
-                    "role": admin_user.role,
-                    "is_active": admin_user.is_active
-                }
+        admin_user = AuthService.get_cached_user(credentials.username, credentials.password)
+        if admin_user:
+            logger.info(f"[API] Пользователь {credentials.username} = {admin_user['role'].upper()} (ID: {admin_user['id']})")
+            return {
+                "id": admin_user["id"],
+                "username": admin_user["username"],
+                "role": admin_user["role"],
+                "is_active": admin_user["is_active"]
+            }
     except Exception as e:
         logger.error(f"Ошибка проверки в новой системе: {e}")
 
@@ -198,6 +191,54 @@ PROJECT_STATUSES = {
     "в работе": "В работе"
 }
 
+def _load_project_list_relations(db: Session, projects: List[Project]) -> dict:
+    """Пакетная загрузка связанных данных для страницы списка проектов.
+
+    Вместо четырех запросов на каждый проект выполняет по одному запросу
+    на всю страницу: исполнители и менеджеры через IN, количество файлов
+    и ревизий через сгруппированные агрегаты.
+    """
+    relations = {
+        "executors": {},
+        "managers": {},
+        "files_count": {},
+        "revisions_count": {},
+    }
+    if not projects:
+        return relations
+
+    project_ids = [p.id for p in projects]
+    executor_ids = {p.assigned_executor_id for p in projects if p.assigned_executor_id}
+    manager_ids = {p.responsible_manager_id for p in projects if p.responsible_manager_id}
+
+    if executor_ids:
+        executors = db.execute(
+            select(AdminUser).filter(AdminUser.id.in_(executor_ids))
+        ).scalars().all()
+        relations["executors"] = {u.id: u for u in executors}
+
+    if manager_ids:
+        managers = db.execute(
+            select(AdminUser).filter(AdminUser.id.in_(manager_ids))
+        ).scalars().all()
+        relations["managers"] = {u.id: u for u in managers}
+
+    files_stmt = (
+        select(ProjectFile.project_id, func.count(ProjectFile.id))
+        .filter(ProjectFile.project_id.in_(project_ids))
+        .group_by(ProjectFile.project_id)
+    )
+    relations["files_count"] = dict(db.execute(files_stmt).all())
+
+    revisions_stmt = (
+        select(ProjectRevision.project_id, func.count(ProjectRevision.id))
+        .filter(ProjectRevision.project_id.in_(project_ids))
+        .group_by(ProjectRevision.project_id)
+    )
+    relations["revisions_count"] = dict(db.execute(revisions_stmt).all())
+
+    return relations
+
 @router.get("/", response_class=JSONResponse)
 async def get_projects(
     request: Request,
@@ -214,7 +255,8 @@ async def get_projects(
     try:
         logger.info(f"[API] GET /api/projects/ - Пользователь: {current_user['username']}, Роль: {current_user['role']}, ID: {current_user['id']}")
 
-        with get_db_context() as db:
+        # Синхронные запросы выполняются в пуле потоков, а не в event loop
+        def _load_page(db: Session) -> dict:
             from sqlalchemy.orm import selectinload
 
             # Начинаем с базового запроса
@@ -278,6 +320,9 @@ async def get_projects(
             projects = result.scalars().all()
             logger.info(f"[API] Возвращаем проектов на странице: {len(projects)}")
 
+            # Связанные данные для всей страницы - фиксированное число запросов
+            relations = _load_project_list_relations(db, projects)
+
             # Конвертируем в словари с дополнительной информацией
             projects_data = []
             for project in projects:
@@ -305,48 +350,34 @@ async def get_projects(
 
                     project_dict["user"] = user_dict
 
-                # Добавляем информацию об исполнителе
-                if project.assigned_executor_id:
-                    executor_stmt = select(AdminUser).filter(AdminUser.id == project.assigned_executor_id)
-                    executor_result = db.execute(executor_stmt)
-                    executor = executor_result.scalar_one_or_none()
-
-                    if executor:
-                        executor_data = {
-                            "id": executor.id,
-                            "username": executor.username,
-                            "first_name": executor.first_name,
-                            "last_name": executor.last_name,
-                            "role": executor.role
-                        }
-                        project_dict["executor"] = executor_data
-                        project_dict["assigned_executor"] = executor_data
-                        project_dict["assigned_to"] = executor_data  # Алиас для совместимости с шаблоном
-
-                # Добавляем информацию о менеджере
-                if project.responsible_manager_id:
-                    manager_stmt = select(AdminUser).filter(AdminUser.id == project.responsible_manager_id)
-                    manager_result = db.execute(manager_stmt)
-                    manager = manager_result.scalar_one_or_none()
-
-                    if manager:
-                        manager_data = {
-                            "id": manager.id,
-                            "username": manager.username,
-                            "first_name": manager.first_name,
-                            "last_name": manager.last_name
-                        }
-                        project_dict["responsible_manager"] = manager_data
-
-                # Добавляем количество файлов
-                files_stmt = select(func.count()).select_from(ProjectFile).filter(ProjectFile.project_id == project.id)
-                files_result = db.execute(files_stmt)
-                project_dict["files_count"] = files_result.scalar()
+                # Информация об исполнителе (из пакетной загрузки)
+                executor = relations["executors"].get(project.assigned_executor_id)
+                if executor:
+                    executor_data = {
+                        "id": executor.id,
+                        "username": executor.username,
+                        "first_name": executor.first_name,
+                        "last_name": executor.last_name,
+                        "role": executor.role
+                    }
+                    project_dict["executor"] = executor_data
+                    project_dict["assigned_executor"] = executor_data
+                    project_dict["assigned_to"] = executor_data  # Алиас для совместимости с шаблоном
+
+                # Информация о менеджере (из пакетной загрузки)
+                manager = relations["managers"].get(project.responsible_manager_id)
+                if manager:
+                    manager_data = {
+                        "id": manager.id,
+                        "username": manager.username,
+                        "first_name": manager.first_name,
+                        "last_name": manager.last_name
+                    }
+                    project_dict["responsible_manager"] = manager_data
 
-                # Добавляем количество ревизий
-                revisions_stmt = select(func.count()).select_from(ProjectRevision).filter(ProjectRevision.project_id == project.id)
-                revisions_result = db.execute(revisions_stmt)
-                project_dict["revisions_count"] = revisions_result.scalar()
+                # Количество файлов и ревизий (из сгруппированных агрегатов)
+                project_dict["files_count"] = relations["files_count"].get(project.id, 0)
+                project_dict["revisions_count"] = relations["revisions_count"].get(project.id, 0)
 
                 # Добавляем читаемые названия статуса и приоритета
                 project_dict["status_name"] = PROJECT_STATUSES.get(project.status, project.status)
@@ -410,6 +441,8 @@ async def get_projects(
 
             return response_data
 
+        return await run_in_db_thread(_load_page)
+
     except Exception as e:
         logger.error(f"Ошибка получения проектов: {e}")
         import traceback
@@ -430,7 +463,7 @@ async def get_projects_stats(
     try:
         logger.info(f"[API] GET /api/projects/statistics - Пользователь: {current_user['username']}, Роль: {current_user['role']}")
 
-        with get_db_context() as db:
+        async with get_db_context_async() as db:
             # Базовый запрос проектов
             stmt = select(Project)
 
@@ -445,7 +478,7 @@ async def get_projects_stats(
                 stmt = stmt.filter(Project.assigned_executor_id == current_user["id"])
 
             # Получаем все проекты для расчетов
-            result = db.execute(stmt)
+            result = await db.execute(stmt)
             projects = result.scalars().all()
 
             # Расчет статистики ВНУТРИ контекста сессии
@@ -2100,7 +2133,7 @@ async def get_project_integration_chain(
         }# Добавить в конец файла projects.py
 
 @router.post("/{project_id}/payments")
-async def add_project_payment(
+def add_project_payment(
     project_id: int,
     payment_data: PaymentCreate,
     current_user: dict = Depends(get_current_admin_user)
@@ -2163,7 +2196,7 @@ async def add_project_payment(
 
 
 @router.post("/{project_id}/executor-payments")
-async def add_executor_payment(
+def add_executor_payment(
     project_id: int,
     payment_data: PaymentCreate,
     current_user: dict = Depends(get_current_admin_user)
@@ -2230,7 +2263,7 @@ async def add_executor_payment(
 
 
 @router.post("/{project_id}/assign")
-async def assign_executor(
+def assign_executor(
     project_id: int,
     executor_data: ExecutorAssign,
     current_user: dict = Depends(get_current_admin_user)
@@ -2369,7 +2402,7 @@ def create_project_task(
 
 
 @router.get("/api/tasks", response_class=JSONResponse)
-async def get_all_tasks(
+def get_all_tasks(
     project_id: Optional[int] = None,
     current_user: dict = Depends(get_current_admin_user)
 ):
@@ -4,7 +4,7 @@
 from sqlalchemy import select, or_, desc, asc, func
 from sqlalchemy.orm import joinedload
 
-async def get_projects_fixed(
+def get_projects_fixed(
     request: Request,
     page: int = 1,
     per_page: int = 20,
@@ -14,10 +14,10 @@ from pathlib import Path
 from PIL import Image
 import io
 
-from ...database.database import get_db
+from ...database.database import get_db, run_in_db_thread
 from ...database.models import (
     ProjectRevision, RevisionMessage, RevisionFile, RevisionMessageFile,
-    Project, User, AdminUser
+    Project, User
 )
 from ...config.logging import get_logger
 from ...admin.middleware.auth import get_current_admin_user
@@ -734,23 +734,27 @@ async def send_revision_notification(revision: ProjectRevision, action: str):
     """Отправить уведомление о правке"""
     try:
         from ...services.notification_service import notification_service
-        from ...core.database import get_db_context
         
-        with get_db_context() as db:
+        def _load(db):
             # Получаем данные проекта и клиента
             project = db.get(Project, revision.project_id)
             client_user = db.get(User, project.user_id)
-            
-            if action == "new":
-                await notification_service.notify_new_revision(revision, project, client_user)
-            elif action == "completed":
-                await notification_service.notify_revision_status_changed(
-                    revision, project, client_user, "in_progress"
-                )
-            elif action in ["open", "in_progress", "rejected"]:
-                await notification_service.notify_revision_status_changed(
-                    revision, project, client_user, "open"
-                )
+            # Объекты используются после закрытия сессии
+            db.expunge_all()
+            return project, client_user
+
+        project, client_user = await run_in_db_thread(_load)
+
+        if action == "new":
+            await notification_service.notify_new_revision(revision, project, client_user)
+        elif action == "completed":
+            await notification_service.notify_revision_status_changed(
+                revision, project, client_user, "in_progress"
+            )
+        elif action in ["open", "in_progress", "rejected"]:
+            await notification_service.notify_revision_status_changed(
+                revision, project, client_user, "open"
+            )
                 
         logger.info(f"Revision notification sent: revision_id={revision.id}, action={action}")
         
@@ -761,39 +765,36 @@ async def send_revision_message_notification(revision: ProjectRevision, message:
     """Отправить уведомление о новом сообщении"""
     try:
         from ...services.notification_service import notification_service
-        from ...core.database import get_db_context
         from telegram import Bot
         from ...config.settings import settings
 
         # Инициализируем бота для отправки уведомлений
         notification_service.set_bot(Bot(settings.BOT_TOKEN))
 
-        with get_db_context() as db:
-            # Получаем данные проекта и пользователей
+        def _load(db):
+            # Получаем данные проекта и клиента
             project = db.get(Project, revision.project_id)
             client_user = db.get(User, project.user_id)
-
-            # Получаем отправителя в зависимости от типа
-            sender_user = None
-            if message.sender_type == "client" and message.sender_user_id:
-                sender_user = db.get(User, message.sender_user_id)
-            elif message.sender_type in ["admin", "executor"] and message.sender_admin_id:
-                sender_user = db.get(AdminUser, message.sender_admin_id)
-
-            # Определяем получателя по типу отправителя
-            if message.sender_type == "client":
-                # Сообщение от клиента - уведомляем админа
-                await notification_service.send_admin_notification(
-                    f"💬 Новое сообщение от клиента по правке #{revision.revision_number}\n"
-                    f"📋 Проект: {project.title}\n"
-                    f"📝 Сообщение: {message.message[:200]}{'...' if len(message.message) > 200 else ''}"
-                )
-            else:
-                # Сообщение от исполнителя/админа - уведомляем клиента
-                sender_user = message.sender_admin if message.sender_admin else None
-                await notification_service.notify_revision_message(
-                    revision, project, message, sender_user, client_user
-                )
+            # Объекты используются после закрытия сессии
+            db.expunge_all()
+            return project, client_user
+
+        project, client_user = await run_in_db_thread(_load)
+
+        # Определяем получателя по типу отправителя
+        if message.sender_type == "client":
+            # Сообщение от клиента - уведомляем админа
+            await notification_service.send_admin_notification(
+                f"💬 Новое сообщение от клиента по правке #{revision.revision_number}\n"
+                f"📋 Проект: {project.title}\n"
+                f"📝 Сообщение: {message.message[:200]}{'...' if len(message.message) > 200 else ''}"
+            )
+        else:
+            # Сообщение от исполнителя/админа - уведомляем клиента
+            sender_user = message.sender_admin if message.sender_admin else None
+            await notification_service.notify_revision_message(
+                revision, project, message, sender_user, client_user
+            )
 
         logger.info(f"Revision message notification sent: revision_id={revision.id}, message_id={message.id}")
 
@@ -2,23 +2,24 @@
 Router для управления задачами
 """
 
-from fastapi import APIRouter, HTTPException, Depends, Request, Form, File, UploadFile
+from fastapi import APIRouter, HTTPException, Depends, Request, Form, File, UploadFile, Query
 from fastapi.responses import JSONResponse, HTMLResponse
 from fastapi.templating import Jinja2Templates
 from datetime import datetime, timedelta
-from typing import Optional, List
+from typing import Dict, Iterable, Optional, List
 import json
-from sqlalchemy import desc, or_, cast, String, select
+from sqlalchemy import and_, desc, func, or_, select
 from sqlalchemy.orm import joinedload, selectinload
 import os
 import uuid
 from pathlib import Path
 
 from ...config.logging import get_logger
-from ...database.database import get_db_context  # Use sync context manager
-from ...database.models import Task, TaskComment, AdminUser, Project
+from ...database.database import get_db_context, run_in_db_thread, wait_on_event_loop  # Use sync context manager
+from ...database.models import Task, TaskComment, TaskCommentRead, AdminUser, Project
 from ..middleware.auth import get_current_admin_user
 from ...services.task_notification_service import task_notification_service
+from ...services.dashboard_snapshot_service import dashboard_snapshot_service
 from fastapi import Cookie
 from ..middleware.roles import RoleMiddleware
 
@@ -71,7 +72,7 @@ def get_current_user_from_request(request: Request):
         raise HTTPException(status_code=401, detail="Не авторизован")
 
 @router.get("/archive", response_class=HTMLResponse)
-async def tasks_archive_page(request: Request, current_user: dict = Depends(get_current_admin_user)):
+def tasks_archive_page(request: Request, current_user: dict = Depends(get_current_admin_user)):
     """Страница архива задач"""
     try:
         with get_db_context() as db:
@@ -100,7 +101,7 @@ async def tasks_archive_page(request: Request, current_user: dict = Depends(get_
         raise HTTPException(status_code=500, detail="Ошибка при загрузке архива задач")
 
 @router.get("/kanban", response_class=HTMLResponse)
-async def kanban_board_page(request: Request, current_user: dict = Depends(get_current_admin_user)):
+def kanban_board_page(request: Request, current_user: dict = Depends(get_current_admin_user)):
     """Страница канбан-доски с исполнителями (только для владельца)"""
     try:
         # Проверяем, что пользователь - владелец
@@ -128,7 +129,7 @@ async def kanban_board_page(request: Request, current_user: dict = Depends(get_c
         raise HTTPException(status_code=500, detail="Ошибка при загрузке канбан-доски")
 
 @router.get("/user/my-tasks", response_class=HTMLResponse)
-async def my_tasks_page(request: Request, current_user: dict = Depends(get_current_admin_user)):
+def my_tasks_page(request: Request, current_user: dict = Depends(get_current_admin_user)):
     """Страница 'Мои задачи' для всех пользователей с канбан-доской"""
     try:
         with get_db_context() as db:
@@ -209,7 +210,7 @@ async def my_tasks_page(request: Request, current_user: dict = Depends(get_curre
 #     """Страница детального просмотра задачи"""
 #     Закомментировано из-за конфликта с JSON API
 
-async def _get_tasks_logic(
+def _get_tasks_logic(
     request: Request,
     status: Optional[str] = None,
     assigned_to_id: Optional[int] = None,
@@ -224,12 +225,12 @@ async def _get_tasks_logic(
         logger.info(f"🔍 _get_tasks_logic: user={current_user.get('username')}, role={current_user.get('role')}, id={current_user.get('id')}")
 
         with get_db_context() as db:
-            # Строим базовый запрос
+            # Строим базовый запрос (архивные задачи исключаются в SQL, до LIMIT)
             stmt = select(Task).options(
                 joinedload(Task.created_by),
                 joinedload(Task.assigned_to),
                 selectinload(Task.comments)  # Предзагрузка комментариев для избежания lazy loading
-            )
+            ).filter(Task.is_archived == False)
 
             # Владелец видит все задачи, исполнители только свои
             if current_user["role"] != "owner":
@@ -253,15 +254,8 @@ async def _get_tasks_logic(
 
             # Выполняем запрос
             result = db.execute(stmt)
-            all_tasks = result.scalars().all()
-            logger.info(f"🔍 Query returned {len(all_tasks)} tasks before filtering")
-
-            # Фильтруем архивные задачи
-            tasks = [
-                task for task in all_tasks
-                if not task.task_metadata.get('archived', False)
-            ]
-            logger.info(f"🔍 After archive filter: {len(tasks)} tasks")
+            tasks = result.scalars().all()
+            logger.info(f"🔍 Query returned {len(tasks)} tasks")
 
             # Преобразуем задачи в словари
             tasks_data = []
@@ -295,7 +289,7 @@ async def _get_tasks_logic(
 
 # Wrapper routes для поддержки обоих вариантов путей (с и без trailing slash)
 @router.get("/", response_class=JSONResponse)
-async def get_tasks_with_slash(
+def get_tasks_with_slash(
     request: Request,
     status: Optional[str] = None,
     assigned_to_id: Optional[int] = None,
@@ -304,11 +298,11 @@ async def get_tasks_with_slash(
     per_page: Optional[int] = 100
 ):
     """Получить список задач с фильтрацией - вариант с trailing slash"""
-    return await _get_tasks_logic(request, status, assigned_to_id, created_by_id, priority, per_page)
+    return _get_tasks_logic(request, status, assigned_to_id, created_by_id, priority, per_page)
 
 
 @router.get("", response_class=JSONResponse)
-async def get_tasks_no_slash(
+def get_tasks_no_slash(
     request: Request,
     status: Optional[str] = None,
     assigned_to_id: Optional[int] = None,
@@ -317,7 +311,7 @@ async def get_tasks_no_slash(
     per_page: Optional[int] = 100
 ):
     """Получить список задач с фильтрацией - вариант без trailing slash"""
-    return await _get_tasks_logic(request, status, assigned_to_id, created_by_id, priority, per_page)
+    return _get_tasks_logic(request, status, assigned_to_id, created_by_id, priority, per_page)
 
 
 # Общая логика создания задачи
@@ -367,7 +361,8 @@ async def _create_task_logic(
             except ValueError:
                 return {"success": False, "error": "Неверный формат даты"}
 
-        with get_db_context() as db:
+        def _handle(db):
+            nonlocal assigned_to_id
             # Если исполнитель не указан, назначаем на создателя
             if not assigned_to_id:
                 assigned_to_id = current_user["id"]
@@ -402,7 +397,7 @@ async def _create_task_logic(
 
             # Отправляем уведомление о назначенной задаче
             try:
-                await task_notification_service.notify_task_assigned(db, new_task)
+                wait_on_event_loop(task_notification_service.notify_task_assigned(db, new_task))
             except Exception as e:
                 logger.error(f"Ошибка отправки уведомления о назначенной задаче {new_task.id}: {e}")
 
@@ -429,6 +424,8 @@ async def _create_task_logic(
                 "task": task_dict
             }
 
+        return await run_in_db_thread(_handle)
+
     except Exception as e:
         logger.error(f"Ошибка создания задачи: {e}")
         return {"success": False, "error": str(e)}
@@ -452,7 +449,7 @@ async def create_task_no_slash(
     return await _create_task_logic(request, current_user)
 
 @router.get("/my-tasks")
-async def get_my_tasks(
+def get_my_tasks(
     current_user: dict = Depends(get_current_admin_user)
 ):
     """Получить задачи для канбан-доски"""
@@ -500,7 +497,7 @@ async def get_my_tasks(
         return {"success": False, "error": str(e)}
 
 @router.get("/employee/{employee_id}")
-async def get_employee_tasks(
+def get_employee_tasks(
     employee_id: str,
     current_user: dict = Depends(get_current_admin_user)
 ):
@@ -555,7 +552,7 @@ async def get_employee_tasks(
         return {"success": False, "error": str(e)}
 
 @router.get("/{task_id}")
-async def get_task(
+def get_task(
     task_id: int,
     current_user: dict = Depends(get_current_admin_user)
 ):
@@ -645,7 +642,7 @@ async def update_task(
             tags = None
             deploy_url = form.get("deploy_url")
         
-        with get_db_context() as db:
+        def _handle(db):
             task = db.query(Task).filter(Task.id == task_id).first()
             
             if not task:
@@ -728,7 +725,7 @@ async def update_task(
                 
                 # Отправляем уведомление об изменении статуса
                 try:
-                    await task_notification_service.notify_task_status_changed(db, task, old_status)
+                    wait_on_event_loop(task_notification_service.notify_task_status_changed(db, task, old_status))
                 except Exception as e:
                     logger.error(f"Ошибка отправки уведомления об изменении статуса задачи {task.id}: {e}")
             
@@ -753,13 +750,15 @@ async def update_task(
                 "message": "Задача обновлена",
                 "task": task.to_dict()
             }
+
+        return await run_in_db_thread(_handle)
         
     except Exception as e:
         logger.error(f"Ошибка обновления задачи {task_id}: {e}")
         return {"success": False, "error": str(e)}
 
 @router.delete("/{task_id}")
-async def delete_task(
+def delete_task(
     task_id: int,
     current_user: dict = Depends(get_current_admin_user)
 ):
@@ -793,7 +792,7 @@ async def delete_task(
                 return {"success": False, "error": "Недостаточно прав для удаления этой задачи"}
             
             # Удаляем комментарии
-            db.query(TaskComment).filter(TaskComment.task_id == task_id).delete()
+            _delete_task_comments(db, task_id)
             
             # Удаляем задачу
             task_title = task.title
@@ -818,7 +817,7 @@ async def add_task_comment(
 ):
     """Добавить комментарий к задаче с возможностью прикрепления фотографий"""
     try:
-        with get_db_context() as db:
+        def _handle(db):
             task = db.query(Task).filter(Task.id == task_id).first()
 
             if not task:
@@ -848,7 +847,7 @@ async def add_task_comment(
 
                         # Сохраняем файл
                         with open(file_path, "wb") as f:
-                            content = await file.read()
+                            content = wait_on_event_loop(file.read())
                             f.write(content)
 
                         # Определяем тип файла
@@ -871,8 +870,7 @@ async def add_task_comment(
                 comment=comment,
                 is_internal=is_internal and current_user["role"] == "owner",  # Только владелец может создавать внутренние комментарии
                 attachments=attachments,
-                is_read=False,
-                read_by=[]
+                is_read=False
             )
 
             db.add(new_comment)
@@ -881,7 +879,7 @@ async def add_task_comment(
 
             # Отправляем уведомление о новом комментарии
             try:
-                await task_notification_service.notify_new_task_comment(db, task, new_comment, current_user)
+                wait_on_event_loop(task_notification_service.notify_new_task_comment(db, task, new_comment, current_user))
             except Exception as e:
                 logger.error(f"Ошибка отправки уведомления о комментарии к задаче {task.id}: {e}")
 
@@ -893,12 +891,74 @@ async def add_task_comment(
                 "comment": new_comment.to_dict()
             }
 
+        return await run_in_db_thread(_handle)
+
     except Exception as e:
         logger.error(f"Ошибка добавления комментария к задаче {task_id}: {e}")
         return {"success": False, "error": str(e)}
 
+def _unread_comment_ids(db, user_id: int, task_ids: Iterable[int], include_own: bool = False) -> List[int]:
+    """ID комментариев задач без отметки о прочтении пользователем"""
+    stmt = select(TaskComment.id).outerjoin(
+        TaskCommentRead,
+        and_(TaskCommentRead.comment_id == TaskComment.id, TaskCommentRead.user_id == user_id)
+    ).where(
+        TaskComment.task_id.in_(list(task_ids)),
+        TaskCommentRead.comment_id.is_(None)
+    )
+    if not include_own:
+        stmt = stmt.where(TaskComment.author_id != user_id)
+    return list(db.scalars(stmt))
+
+
+def _unread_counts(db, user_id: int, task_ids: Iterable[int]) -> Dict[int, int]:
+    """Количество непрочитанных чужих комментариев по задачам - один GROUP BY запрос"""
+    stmt = select(TaskComment.task_id, func.count(TaskComment.id)).outerjoin(
+        TaskCommentRead,
+        and_(TaskCommentRead.comment_id == TaskComment.id, TaskCommentRead.user_id == user_id)
+    ).where(
+        TaskComment.task_id.in_(list(task_ids)),
+        TaskComment.author_id != user_id,
+        TaskCommentRead.comment_id.is_(None)
+    ).group_by(TaskComment.task_id)
+    return dict(db.execute(stmt).all())
+
+
+def _mark_comments_read(db, user_id: int, comment_ids: List[int]) -> int:
+    """Добавляет отметки о прочтении (уже прочитанные пропускаются), возвращает число новых"""
+    if not comment_ids:
+        return 0
+    already_read = set(db.scalars(
+        select(TaskCommentRead.comment_id).where(
+            TaskCommentRead.user_id == user_id,
+            TaskCommentRead.comment_id.in_(comment_ids)
+        )
+    ))
+    new_ids = [comment_id for comment_id in comment_ids if comment_id not in already_read]
+    if not new_ids:
+        return 0
+
+    now = datetime.utcnow()
+    db.bulk_insert_mappings(TaskCommentRead, [
+        {"comment_id": comment_id, "user_id": user_id, "read_at": now}
+        for comment_id in new_ids
+    ])
+    db.query(TaskComment).filter(TaskComment.id.in_(new_ids)).update(
+        {TaskComment.is_read: True}, synchronize_session=False
+    )
+    db.commit()
+    return len(new_ids)
+
+
+def _delete_task_comments(db, task_id: int):
+    """Удаляет комментарии задачи вместе с отметками о прочтении"""
+    comment_ids = select(TaskComment.id).where(TaskComment.task_id == task_id)
+    db.query(TaskCommentRead).filter(TaskCommentRead.comment_id.in_(comment_ids)).delete(synchronize_session=False)
+    db.query(TaskComment).filter(TaskComment.task_id == task_id).delete()
+
+
 @router.post("/{task_id}/comments/{comment_id}/mark_read")
-async def mark_comment_as_read(
+def mark_comment_as_read(
     task_id: int,
     comment_id: int,
     current_user: dict = Depends(get_current_admin_user)
@@ -914,13 +974,8 @@ async def mark_comment_as_read(
             if not comment:
                 return {"success": False, "error": "Комментарий не найден"}
 
-            # Добавляем пользователя в список прочитавших
-            read_by = comment.read_by or []
-            if current_user["id"] not in read_by:
-                read_by.append(current_user["id"])
-                comment.read_by = read_by
-                comment.is_read = True  # Помечаем как прочитанный
-                db.commit()
+            # Добавляем отметку о прочтении пользователем
+            _mark_comments_read(db, current_user["id"], [comment.id])
 
             return {"success": True, "message": "Комментарий отмечен как прочитанный"}
 
@@ -929,29 +984,16 @@ async def mark_comment_as_read(
         return {"success": False, "error": str(e)}
 
 @router.post("/{task_id}/mark_all_comments_read")
-async def mark_all_comments_as_read(
+def mark_all_comments_as_read(
     task_id: int,
     current_user: dict = Depends(get_current_admin_user)
 ):
     """Отметить все комментарии задачи как прочитанные"""
     try:
         with get_db_context() as db:
-            # Получаем все комментарии задачи
-            comments = db.query(TaskComment).filter(
-                TaskComment.task_id == task_id
-            ).all()
-
-            marked_count = 0
-            for comment in comments:
-                # Проверяем, не прочитан ли уже комментарий этим пользователем
-                read_by = comment.read_by or []
-                if current_user["id"] not in read_by:
-                    read_by.append(current_user["id"])
-                    comment.read_by = read_by
-                    comment.is_read = True
-                    marked_count += 1
-
-            db.commit()
+            # Комментарии задачи, еще не прочитанные этим пользователем
+            comment_ids = _unread_comment_ids(db, current_user["id"], [task_id], include_own=True)
+            marked_count = _mark_comments_read(db, current_user["id"], comment_ids)
             logger.info(f"Отмечено {marked_count} комментариев как прочитанные для задачи {task_id}")
 
             return {"success": True, "marked_count": marked_count}
@@ -961,37 +1003,45 @@ async def mark_all_comments_as_read(
         return {"success": False, "error": str(e)}
 
 @router.get("/{task_id}/unread_comments_count")
-async def get_unread_comments_count(
+def get_unread_comments_count(
     task_id: int,
     current_user: dict = Depends(get_current_admin_user)
 ):
     """Получить количество непрочитанных комментариев для задачи"""
     try:
         with get_db_context() as db:
-            # Получаем все комментарии задачи, которые не прочитаны текущим пользователем
-            comments = db.query(TaskComment).filter(
-                TaskComment.task_id == task_id,
-                TaskComment.author_id != current_user["id"]  # Исключаем свои комментарии
-            ).all()
-
-            unread_count = 0
-            for comment in comments:
-                read_by = comment.read_by or []
-                if current_user["id"] not in read_by:
-                    unread_count += 1
+            unread_counts = _unread_counts(db, current_user["id"], [task_id])
 
             return {
                 "success": True,
                 "task_id": task_id,
-                "unread_count": unread_count
+                "unread_count": unread_counts.get(task_id, 0)
             }
 
     except Exception as e:
         logger.error(f"Ошибка получения количества непрочитанных комментариев для задачи {task_id}: {e}")
         return {"success": False, "error": str(e)}
 
+@router.get("/comments/unread_counts")
+async def get_unread_comments_counts(
+    task_ids: List[int] = Query(...),
+    current_user: dict = Depends(get_current_admin_user)
+):
+    """Количество непрочитанных комментариев сразу для списка задач (для канбан-доски)"""
+    try:
+        unread_counts = await run_in_db_thread(_unread_counts, current_user["id"], task_ids)
+
+        return {
+            "success": True,
+            "unread_counts": {str(task_id): unread_counts.get(task_id, 0) for task_id in task_ids}
+        }
+
+    except Exception as e:
+        logger.error(f"Ошибка получения количества непрочитанных комментариев: {e}")
+        return {"success": False, "error": str(e)}
+
 @router.get("/{task_id}/comments")
-async def get_task_comments(
+def get_task_comments(
     task_id: int,
     current_user: dict = Depends(get_current_admin_user)
 ):
@@ -1018,13 +1068,13 @@ async def get_task_comments(
             ).order_by(TaskComment.created_at.asc()).all()
 
             # Подсчитываем непрочитанные комментарии
+            unread_ids = set(_unread_comment_ids(db, current_user["id"], [task_id]))
             unread_count = 0
             comments_data = []
             for comment in comments:
                 comment_dict = comment.to_dict()
                 # Проверяем, прочитан ли комментарий текущим пользователем
-                read_by = comment.read_by or []
-                comment_dict["is_read_by_me"] = current_user["id"] in read_by or comment.author_id == current_user["id"]
+                comment_dict["is_read_by_me"] = comment.id not in unread_ids
 
                 if not comment_dict["is_read_by_me"]:
                     unread_count += 1
@@ -1047,42 +1097,47 @@ def get_task_dashboard_stats():
     """Получить статистику для дашборда задач"""
     try:
         with get_db_context() as db:
-            # Получаем все задачи, ИСКЛЮЧАЯ архивные
-            all_tasks = db.query(Task).options(
-                joinedload(Task.assigned_to),
-                joinedload(Task.created_by)
-            ).all()
-
-            # Фильтруем архивные задачи
-            active_tasks = [
-                task for task in all_tasks
-                if not task.task_metadata.get('archived', False)
-            ]
+            # Счетчики по статусам/приоритетам/исполнителям - из снимка дашборда,
+            # задачи в память не загружаются
+            snapshot = dashboard_snapshot_service.get_snapshot(db)
+            by_status = snapshot.tasks_by_status(include_archived=False)
+            archived_count = sum(snapshot.tasks_by_status().values()) - sum(by_status.values())
 
             # Подсчитываем статистику только по активным задачам
-            total_tasks = len(active_tasks)
-            pending_tasks = sum(1 for t in active_tasks if t.status == "pending")
-            in_progress_tasks = sum(1 for t in active_tasks if t.status == "in_progress")
-            completed_tasks = sum(1 for t in active_tasks if t.status == "completed")
-            overdue_tasks = sum(1 for t in active_tasks if t.is_overdue)
+            total_tasks = sum(by_status.values())
+            pending_tasks = by_status.get("pending", 0)
+            in_progress_tasks = by_status.get("in_progress", 0)
+            completed_tasks = by_status.get("completed", 0)
+
+            # Условия, зависящие от текущего времени, считаем запросами по индексу deadline
+            now = datetime.utcnow()
+            not_archived = Task.is_archived == False
+            active_query = db.query(func.count(Task.id)).filter(not_archived)
+
+            overdue_tasks = active_query.filter(
+                Task.deadline.isnot(None),
+                Task.deadline < now,
+                or_(Task.status.is_(None), Task.status != "completed")
+            ).scalar() or 0
 
             # Задачи на сегодня
-            today = datetime.utcnow().date()
-            today_tasks = sum(
-                1 for t in active_tasks
-                if t.deadline and t.deadline.date() == today
-            )
+            today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+            today_tasks = active_query.filter(
+                Task.deadline >= today_start,
+                Task.deadline < today_start + timedelta(days=1)
+            ).scalar() or 0
 
             # Статистика по приоритетам
+            by_priority = snapshot.tasks_by_priority()
             priority_stats = {
-                "urgent": sum(1 for t in active_tasks if t.priority == "urgent"),
-                "high": sum(1 for t in active_tasks if t.priority == "high"),
-                "normal": sum(1 for t in active_tasks if t.priority == "normal"),
-                "low": sum(1 for t in active_tasks if t.priority == "low")
+                priority: by_priority.get(priority, 0)
+                for priority in ("urgent", "high", "normal", "low")
             }
 
             # Последние задачи (только активные)
-            recent_tasks = sorted(active_tasks, key=lambda x: x.created_at, reverse=True)[:5]
+            recent_tasks = db.query(Task).options(
+                joinedload(Task.assigned_to)
+            ).filter(not_archived).order_by(desc(Task.created_at)).limit(5).all()
             recent_tasks_data = []
             for task in recent_tasks:
                 task_dict = task.to_dict()
@@ -1097,14 +1152,14 @@ def get_task_dashboard_stats():
 
             employee_stats = []
             for emp in employees:
-                emp_active_tasks = [t for t in active_tasks if t.assigned_to_id == emp.id]
+                emp_by_status = snapshot.tasks_by_status(include_archived=False, assignee_id=emp.id)
                 employee_stats.append({
                     "id": emp.id,
                     "name": f"{emp.first_name} {emp.last_name}",
-                    "total": len(emp_active_tasks),
-                    "pending": sum(1 for t in emp_active_tasks if t.status == "pending"),
-                    "in_progress": sum(1 for t in emp_active_tasks if t.status == "in_progress"),
-                    "completed": sum(1 for t in emp_active_tasks if t.status == "completed")
+                    "total": sum(emp_by_status.values()),
+                    "pending": emp_by_status.get("pending", 0),
+                    "in_progress": emp_by_status.get("in_progress", 0),
+                    "completed": emp_by_status.get("completed", 0)
                 })
 
             stats = {
@@ -1119,7 +1174,7 @@ def get_task_dashboard_stats():
                 "employee_stats": employee_stats
             }
 
-            logger.info(f"Статистика дашборда: всего активных задач {total_tasks}, архивных исключено {len(all_tasks) - total_tasks}")
+            logger.info(f"Статистика дашборда: всего активных задач {total_tasks}, архивных исключено {archived_count}")
 
             return {"success": True, "stats": stats}
 
@@ -1130,7 +1185,7 @@ def get_task_dashboard_stats():
         return {"success": False, "error": str(e)}
 
 @router.get("/api/employees")
-async def get_employees(
+def get_employees(
     current_user: dict = Depends(get_current_admin_user)
 ):
     """Получить список сотрудников для назначения задач"""
@@ -1181,7 +1236,7 @@ async def update_task_status(
         if not new_status:
             return {"success": False, "error": "Статус не указан"}
         
-        with get_db_context() as db:
+        def _handle(db):
             task = db.query(Task).filter(Task.id == task_id).first()
             
             if not task:
@@ -1208,7 +1263,7 @@ async def update_task_status(
             # Отправляем уведомление об изменении статуса
             if old_status != new_status:
                 try:
-                    await task_notification_service.notify_task_status_changed(db, task, old_status)
+                    wait_on_event_loop(task_notification_service.notify_task_status_changed(db, task, old_status))
                 except Exception as e:
                     logger.error(f"Ошибка отправки уведомления об изменении статуса задачи {task.id}: {e}")
             
@@ -1226,13 +1281,15 @@ async def update_task_status(
             logger.info(f"Обновлен статус задачи {task_id}: {old_status} → {new_status}")
             
             return {"success": True, "message": "Статус обновлен"}
+
+        return await run_in_db_thread(_handle)
         
     except Exception as e:
         logger.error(f"Ошибка обновления статуса задачи {task_id}: {e}")
         return {"success": False, "error": str(e)}
 
 @router.get("/api/users/executors")
-async def get_executors(
+def get_executors(
     current_user: dict = Depends(get_current_admin_user)
 ):
     """Получить список исполнителей для назначения задач"""
@@ -1276,7 +1333,7 @@ async def reassign_task(
         if not new_assignee_id:
             return {"success": False, "error": "Не указан новый исполнитель"}
         
-        with get_db_context() as db:
+        def _handle(db):
             task = db.query(Task).filter(Task.id == task_id).first()
             
             if not task:
@@ -1302,7 +1359,7 @@ async def reassign_task(
             
             # Отправляем уведомление новому исполнителю
             try:
-                await task_notification_service.notify_task_assigned(db, task)
+                wait_on_event_loop(task_notification_service.notify_task_assigned(db, task))
             except Exception as e:
                 logger.error(f"Ошибка отправки уведомления о переназначении задачи {task.id}: {e}")
             
@@ -1323,13 +1380,15 @@ async def reassign_task(
                 "success": True,
                 "message": f"Задача переназначена на {new_name}"
             }
+
+        return await run_in_db_thread(_handle)
         
     except Exception as e:
         logger.error(f"Ошибка переназначения задачи {task_id}: {e}")
         return {"success": False, "error": str(e)}
 
 @router.delete("/api/users/executor/{executor_id}")
-async def delete_executor(
+def delete_executor(
     executor_id: int,
     reassign_to_id: Optional[int] = None,
     current_user: dict = Depends(get_current_admin_user)
@@ -1378,7 +1437,7 @@ async def delete_executor(
                 
                 for task in tasks_to_delete:
                     # Удаляем комментарии к задаче
-                    db.query(TaskComment).filter(TaskComment.task_id == task.id).delete()
+                    _delete_task_comments(db, task.id)
                     db.delete(task)
                 
                 logger.info(f"Удалено {len(tasks_to_delete)} задач исполнителя {executor_id}")
@@ -1388,6 +1447,9 @@ async def delete_executor(
             executor.updated_at = datetime.utcnow()
             
             db.commit()
+
+            from ...services.auth_service import credential_cache
+            credential_cache.invalidate_user(executor_id)
             
             return {
                 "success": True,
@@ -1399,7 +1461,7 @@ async def delete_executor(
         return {"success": False, "error": str(e)}
 
 @router.post("/api/import-projects")
-async def import_projects_as_tasks(
+def import_projects_as_tasks(
     current_user: dict = Depends(get_current_admin_user)
 ):
     """Импортировать все проекты как задачи"""
@@ -1472,7 +1534,7 @@ async def import_projects_as_tasks(
         return {"success": False, "error": str(e)}
 
 @router.post("/{task_id}/progress")
-async def update_task_progress(
+def update_task_progress(
     task_id: int,
     progress_data: dict,
     current_user: dict = Depends(get_current_admin_user)
@@ -1509,7 +1571,7 @@ async def update_task_progress(
         return {"success": False, "message": str(e)}
 
 @router.post("/{task_id}/timer/start")
-async def start_task_timer(
+def start_task_timer(
     task_id: int,
     current_user: dict = Depends(get_current_admin_user)
 ):
@@ -1543,7 +1605,7 @@ async def start_task_timer(
         return {"success": False, "message": str(e)}
 
 @router.post("/{task_id}/timer/stop")
-async def stop_task_timer(
+def stop_task_timer(
     task_id: int,
     current_user: dict = Depends(get_current_admin_user)
 ):
@@ -1597,7 +1659,7 @@ async def upload_task_image(
         if not files:
             return {"success": False, "error": "Файлы не найдены"}
         
-        with get_db_context() as db:
+        def _handle(db):
             task = db.query(Task).filter(Task.id == task_id).first()
             
             if not task:
@@ -1627,7 +1689,7 @@ async def upload_task_image(
                     file_path = os.path.join(upload_dir, unique_filename)
                     
                     # Сохраняем файл
-                    content = await file.read()
+                    content = wait_on_event_loop(file.read())
                     with open(file_path, "wb") as f:
                         f.write(content)
                     
@@ -1656,6 +1718,8 @@ async def upload_task_image(
                 "message": f"Загружено файлов: {len(uploaded_files)}",
                 "files": uploaded_files
             }
+
+        return await run_in_db_thread(_handle)
             
     except Exception as e:
         logger.error(f"Ошибка загрузки файлов к задаче {task_id}: {e}")
@@ -1683,7 +1747,7 @@ async def upload_comment_attachment(
         if not files:
             return {"success": False, "error": "Файлы не найдены"}
         
-        with get_db_context() as db:
+        def _handle(db):
             comment = db.query(TaskComment).filter(TaskComment.id == comment_id).first()
             
             if not comment or comment.task_id != task_id:
@@ -1712,7 +1776,7 @@ async def upload_comment_attachment(
                     file_path = os.path.join(upload_dir, unique_filename)
                     
                     # Сохраняем файл
-                    content = await file.read()
+                    content = wait_on_event_loop(file.read())
                     with open(file_path, "wb") as f:
                         f.write(content)
                     
@@ -1737,6 +1801,8 @@ async def upload_comment_attachment(
                 "message": f"Загружено файлов: {len(uploaded_files)}",
                 "files": uploaded_files
             }
+
+        return await run_in_db_thread(_handle)
             
     except Exception as e:
         logger.error(f"Ошибка загрузки файлов к комментарию {comment_id}: {e}")
@@ -1755,7 +1821,7 @@ async def update_task_progress(
         data = await request.json()
         progress = data.get('progress', 0)
 
-        with get_db_context() as db:
+        def _handle(db):
             task = db.query(Task).filter(Task.id == task_id).first()
             if not task:
                 return {"success": False, "error": "Задача не найдена"}
@@ -1775,6 +1841,8 @@ async def update_task_progress(
                 "message": "Прогресс обновлён"
             }
 
+        return await run_in_db_thread(_handle)
+
     except Exception as e:
         logger.error(f"Ошибка обновления прогресса задачи {task_id}: {e}")
         import traceback
@@ -1782,7 +1850,7 @@ async def update_task_progress(
         return {"success": False, "error": str(e)}
 
 @router.post("/{task_id}/mark-completed")
-async def mark_task_completed(
+def mark_task_completed(
     task_id: int,
     current_user: dict = Depends(get_current_admin_user)
 ):
@@ -1835,7 +1903,7 @@ async def mark_task_completed(
         return {"success": False, "error": str(e)}
 
 @router.post("/{task_id}/archive")
-async def archive_task(
+def archive_task(
     task_id: int,
     current_user: dict = Depends(get_current_admin_user)
 ):
@@ -1862,6 +1930,7 @@ async def archive_task(
                 'archived_at': datetime.utcnow().isoformat()
             }
             task.task_metadata = metadata  # Присваиваем новый объект
+            task.is_archived = True
 
             # Устанавливаем время завершения если не установлено
             if not task.completed_at:
@@ -1885,7 +1954,7 @@ async def archive_task(
         return {"success": False, "error": str(e)}
 
 @router.get("/archive/list")
-async def get_archived_tasks(
+def get_archived_tasks(
     current_user: dict = Depends(get_current_admin_user),
     employee_id: int = None,
     date_from: str = None,
@@ -1895,14 +1964,7 @@ async def get_archived_tasks(
     try:
         with get_db_context() as db:
             # Базовый запрос - только архивные задачи
-            # Проверяем archived как boolean (true) или строку ("true")
-            query = db.query(Task).filter(
-                or_(
-                    cast(Task.task_metadata['archived'], String) == 'true',
-                    cast(Task.task_metadata['archived'], String) == 'True',
-                    cast(Task.task_metadata['archived'], String) == '1'
-                )
-            )
+            query = db.query(Task).filter(Task.is_archived == True)
 
             # Фильтр по сотруднику
             if employee_id:
@@ -1960,7 +2022,7 @@ class TaskUpdateModel(BaseModel):
     deadline: Optional[datetime] = None
 
 @router.put("/api/tasks/{task_id}", response_class=JSONResponse)
-async def update_task(
+def update_task(
     task_id: int,
     task_data: TaskUpdateModel,
     current_user: dict = Depends(get_current_admin_user)
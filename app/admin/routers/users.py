@@ -7,7 +7,7 @@ from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
 
-from ...database.database import get_db
+from ...database.database import get_db, run_in_db_thread
 from ...database.models import AdminUser
 from ...config.logging import get_logger
 from ...services.auth_service import AuthService
@@ -379,7 +379,7 @@ async def deactivate_user(
         }
 
 @router.get("/{user_id}/password/view")
-async def view_user_password(
+def view_user_password(
     user_id: int,
     current_user: AdminUser = Depends(get_current_user)
 ):
@@ -419,7 +419,7 @@ async def view_user_password(
         )
 
 @router.get("/{user_id}")
-async def get_user(
+def get_user(
     user_id: int,
     current_user: AdminUser = Depends(get_current_user)
 ):
@@ -469,8 +469,7 @@ async def update_user(
         
         data = await request.json()
         
-        from ...core.database import get_db_context
-        with get_db_context() as db:
+        def _update(db):
             user = db.query(AdminUser).filter(AdminUser.id == user_id).first()
             if not user:
                 return {
@@ -491,6 +490,10 @@ async def update_user(
                 user.is_active = data["is_active"]
             
             db.commit()
+
+            # Сбрасываем кешированные учетные данные (пароль/статус/имя могли измениться)
+            from ...services.auth_service import credential_cache
+            credential_cache.invalidate_user(user_id)
             
             # Логирование активности временно отключено
             # TODO: Добавить миграцию для таблицы admin_activity_logs
@@ -511,6 +514,8 @@ async def update_user(
                 "message": "Данные пользователя обновлены",
                 "user": user.to_dict()
             }
+
+        return await run_in_db_thread(_update)
     except Exception as e:
         logger.error(f"Ошибка обновления пользователя {user_id}: {e}")
         return {
@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, Header, HTTPException, Form, File, UploadFile, Request
+from fastapi import APIRouter, Depends, Header, HTTPException, Form, File, UploadFile, Request, Response, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import Optional, List
 import hmac
@@ -9,9 +10,20 @@ import os
 import uuid
 import shutil
 
-from ..database.database import get_db, get_or_create_user, create_project
-from ..database.models import User, Project, ProjectRevision, RevisionMessage, RevisionMessageFile, RevisionFile, ProjectChat, ProjectChatMessage, AdminUser
+from ..database.database import get_db, get_or_create_user, create_project, run_in_db_thread
+from ..database.chat_inbox import decode_cursor, fetch_chat_inbox, last_message_dict
+from ..database.models import User, Project, ProjectRevision, RevisionMessage, RevisionMessageFile, RevisionFile, ProjectChat, ProjectChatMessage
 from ..config.settings import get_settings
+from ..services.project_chat_events import (
+    SSE_HEADERS,
+    chat_channel,
+    client_channel,
+    message_event_id,
+    message_events,
+    read_events,
+    replay_chat_messages,
+)
+from ..services.realtime_hub import realtime_hub
 
 router = APIRouter(prefix="/api", tags=["miniapp"])
 settings = get_settings()
@@ -1155,90 +1167,120 @@ async def get_unread_notifications_count(
 
 @router.get("/chats")
 async def get_chats(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=200),
+    current_user: User = Depends(get_current_user)
 ):
-    """Получить все чаты проектов клиента"""
-    try:
-        print(f"🔍 Запрос чатов от пользователя: id={current_user.id}, telegram_id={current_user.telegram_id}")
-
-        # Находим все проекты клиента (используем тот же фильтр что и для /api/projects)
-        from sqlalchemy import or_, and_
-        projects = db.query(Project).filter(
-            or_(
-                Project.user_id == current_user.id,
-                and_(
-                    Project.client_telegram_id.isnot(None),
-                    Project.client_telegram_id == str(current_user.telegram_id)
-                )
-            )
-        ).all()
+    """Получить все чаты проектов клиента
 
-        print(f"📊 Найдено проектов: {len(projects)}")
-
-        chats = []
-        for project in projects:
-            # Находим или создаем чат для проекта
-            chat = db.query(ProjectChat).filter(ProjectChat.project_id == project.id).first()
-
-            if not chat:
-                # Автоматически создаем чат
-                chat = ProjectChat(
-                    project_id=project.id,
-                    created_at=datetime.utcnow(),
-                    updated_at=datetime.utcnow()
-                )
-                db.add(chat)
-                db.flush()
-                print(f"✅ Создан новый чат для проекта {project.id}")
-
-            # Получаем последнее сообщение
-            last_message = db.query(ProjectChatMessage).filter(
-                ProjectChatMessage.chat_id == chat.id
-            ).order_by(ProjectChatMessage.created_at.desc()).first()
-
-            # Получаем исполнителя проекта
-            executor = None
-            if project.assigned_executor_id:
-                executor = db.query(AdminUser).filter(AdminUser.id == project.assigned_executor_id).first()
-
-            chats.append({
-                'id': chat.id,
-                'project': {
-                    'id': project.id,
-                    'title': project.title,
-                    'status': project.status,
-                    'executor': {
-                        'id': executor.id,
-                        'name': executor.username or executor.first_name
-                    } if executor else None
-                },
-                'last_message': {
-                    'sender_type': last_message.sender_type,
-                    'message_text': last_message.message_text,
-                    'created_at': last_message.created_at.isoformat()
-                } if last_message else None,
-                'last_message_at': chat.last_message_at.isoformat() if chat.last_message_at else None,
-                'unread_by_client': chat.unread_by_client,
-                'created_at': chat.created_at.isoformat()
-            })
+    Без limit возвращаются все чаты; с limit - страница, курсор следующей
+    страницы передается в заголовке X-Next-Cursor.
+    """
+    from sqlalchemy import or_, and_
+    # Тот же фильтр проектов клиента, что и для /api/projects
+    filters = [
+        or_(
+            Project.user_id == current_user.id,
+            and_(
+                Project.client_telegram_id.isnot(None),
+                Project.client_telegram_id == str(current_user.telegram_id)
+            )
+        )
+    ]
 
-        db.commit()
-        print(f"✅ Возвращено чатов: {len(chats)}")
-        return chats
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
+    try:
+        rows, next_cursor = await run_in_db_thread(fetch_chat_inbox, filters, after, limit)
     except Exception as e:
         print(f"❌ Ошибка в get_chats: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+
+    return [
+        {
+            'id': row["id"],
+            'project': {
+                'id': row["project_id"],
+                'title': row["project_title"],
+                'status': row["project_status"],
+                'executor': {
+                    'id': row["executor_id"],
+                    'name': row["executor_username"] or row["executor_first_name"]
+                } if row["executor_id"] else None
+            },
+            'last_message': last_message_dict(row),
+            'last_message_at': row["last_message_at"].isoformat() if row["last_message_at"] else None,
+            'unread_by_client': row["unread_by_client"],
+            'created_at': row["created_at"].isoformat()
+        }
+        for row in rows
+    ]
+
+
+@router.get("/chats/events")
+async def stream_chats_events(
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """Поток SSE изменений чатов клиента (event: chat_updated)"""
+    return StreamingResponse(
+        realtime_hub.sse_stream([client_channel(current_user.telegram_id)], request.is_disconnected),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+
+@router.get("/chats/{chat_id}/events")
+async def stream_chat_events(
+    chat_id: int,
+    request: Request,
+    after_id: Optional[int] = None,
+    last_event_id: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Поток SSE чата: новые сообщения (message), прочтения (read), счетчики (unread)
+
+    Сообщения новее after_id (или Last-Event-ID при переподключении) отдаются
+    из БД перед живыми событиями.
+    """
+    chat = db.query(ProjectChat).filter(ProjectChat.id == chat_id).first()
+    if not chat:
+        raise HTTPException(status_code=404, detail="Chat not found")
+
+    project = chat.project
+    if not (project.user_id == current_user.id or project.client_telegram_id == str(current_user.telegram_id)):
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    if last_event_id and last_event_id.isdigit():
+        after_id = int(last_event_id)
+
+    return StreamingResponse(
+        realtime_hub.sse_stream(
+            [chat_channel(chat_id)],
+            request.is_disconnected,
+            replay=(lambda: replay_chat_messages(chat_id, after_id)) if after_id else None,
+            event_id=message_event_id
+        ),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
 
 
 @router.get("/chats/{chat_id}/messages")
 async def get_chat_messages(
     chat_id: int,
+    after_id: Optional[int] = None,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Получить сообщения чата"""
+    """Получить сообщения чата (с after_id - только новее этого сообщения)"""
     try:
         print(f"📨 get_chat_messages: chat_id={chat_id}, user_id={current_user.id}, telegram_id={current_user.telegram_id}")
 
@@ -1260,9 +1302,10 @@ async def get_chat_messages(
             raise HTTPException(status_code=403, detail="Access denied")
 
         # Получаем сообщения
-        messages = db.query(ProjectChatMessage).filter(
-            ProjectChatMessage.chat_id == chat_id
-        ).order_by(ProjectChatMessage.created_at.asc()).all()
+        query = db.query(ProjectChatMessage).filter(ProjectChatMessage.chat_id == chat_id)
+        if after_id:
+            query = query.filter(ProjectChatMessage.id > after_id)
+        messages = query.order_by(ProjectChatMessage.created_at.asc()).all()
 
         print(f"📝 Найдено сообщений: {len(messages)}")
 
@@ -1277,14 +1320,20 @@ async def get_chat_messages(
                 client_name = f'@{project.user.username}'
 
         # Помечаем сообщения как прочитанные клиентом
+        read_ids = []
         for msg in messages:
             if not msg.is_read_by_client and msg.sender_type != 'client':
                 msg.is_read_by_client = True
                 msg.read_at = datetime.utcnow()
+                read_ids.append(msg.id)
 
+        had_unread = bool(chat.unread_by_client)
         chat.unread_by_client = 0
         db.commit()
 
+        if read_ids or had_unread:
+            await realtime_hub.publish_many(read_events(chat, project, 'client', read_ids))
+
         return {
             'project_title': project.title,
             'client_name': client_name,
@@ -1396,6 +1445,8 @@ async def send_chat_message(
 
         db.commit()
 
+        await realtime_hub.publish_many(message_events(chat, project, message))
+
         # Отправляем уведомление исполнителю в Telegram
         print(f"🔔 [NOTIFICATION DEBUG] Начинаем процесс уведомления для chat_id={chat_id}")
         project = db.query(Project).filter(Project.id == chat.project_id).first()
@@ -1510,9 +1561,13 @@ async def mark_chat_as_read(
             msg.is_read_by_client = True
             msg.read_at = datetime.utcnow()
 
+        had_unread = bool(chat.unread_by_client)
         chat.unread_by_client = 0
         db.commit()
 
+        if messages or had_unread:
+            await realtime_hub.publish_many(read_events(chat, project, 'client', [msg.id for msg in messages]))
+
         return {'success': True}
 
     except HTTPException:
@@ -347,33 +347,39 @@ async def upload_chunk(
     chunkIndex: int = Form(...),
     totalChunks: int = Form(...),
     sessionId: str = Form(...),
-    filename: str = Form(...)
+    filename: str = Form(...),
+    chunkSize: Optional[int] = Form(None),
+    totalSize: Optional[int] = Form(None)
 ):
-    """Upload file chunk for large video files"""
-    try:
-        import aiofiles
+    """
+    Upload file chunk for large video files
 
-        # Create session directory
-        session_dir = transcription_service.upload_dir / sessionId
-        session_dir.mkdir(exist_ok=True)
+    The chunk is written directly into the session file at
+    chunkIndex * chunkSize, so chunks may arrive in any order and be retried.
 
-        # Save chunk
-        chunk_path = session_dir / f"chunk_{chunkIndex}"
-        content = await chunk.read()
-
-        async with aiofiles.open(chunk_path, "wb") as f:
-            await f.write(content)
+    Args:
+        chunkSize: Size of every chunk except the last (optional)
+        totalSize: Final file size, used to preallocate the file (optional)
+    """
+    try:
+        result = await transcription_service.save_upload_chunk(
+            sessionId,
+            chunkIndex,
+            totalChunks,
+            chunk.file,
+            chunk_size=chunkSize,
+            total_size=totalSize
+        )
 
         logger.info(
-            "chunk_uploaded",
-            session=sessionId,
-            chunk=chunkIndex,
-            total=totalChunks,
-            size=len(content)
+            f"chunk_uploaded session={sessionId} chunk={chunkIndex} total={totalChunks} "
+            f"size={result['size']} received={result['received']}"
         )
 
-        return JSONResponse(content={"success": True, "chunkIndex": chunkIndex})
+        return JSONResponse(content={"success": True, "chunkIndex": chunkIndex, "received": result["received"]})
 
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"chunk_upload_error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -384,7 +390,7 @@ async def finalize_upload(
     background_tasks: BackgroundTasks,
     request: FinalizeUploadRequest
 ):
-    """Combine chunks and start processing"""
+    """Finish chunked upload and start processing"""
     try:
         session_id = request.sessionId
         filename = request.filename
@@ -393,16 +399,23 @@ async def finalize_upload(
             raise HTTPException(status_code=400, detail="Missing sessionId or filename")
 
         task_id = str(uuid.uuid4())
-        session_dir = transcription_service.upload_dir / session_id
 
-        if not session_dir.exists():
+        try:
+            session = transcription_service.get_upload_session(session_id)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        if not session:
             raise HTTPException(status_code=404, detail="Session not found")
 
         # Check that chunks exist
-        chunks = list(session_dir.glob("chunk_*"))
-        if not chunks:
+        if not session["chunks"]:
             raise HTTPException(status_code=404, detail="No chunks found")
 
+        missing = session["total_chunks"] - len(session["chunks"])
+        if missing:
+            raise HTTPException(status_code=409, detail=f"Upload incomplete: {missing} chunks missing")
+
         # Initialize task IMMEDIATELY
         transcription_service.tasks[task_id] = {
             "status": "processing",
@@ -411,23 +424,20 @@ async def finalize_upload(
             "started_at": str(uuid.uuid4())  # Just a timestamp placeholder
         }
 
-        # Start combining chunks and processing in background
+        # Chunks are already in place - background task only moves the file and processes it
         background_tasks.add_task(
-            transcription_service.combine_chunks_and_process,
+            transcription_service.process_chunked_upload,
             session_id,
             filename,
             task_id
         )
 
         logger.info(
-            "upload_finalized",
-            task_id=task_id,
-            session=session_id,
-            filename=filename,
-            chunk_count=len(chunks)
+            f"upload_finalized task_id={task_id} session={session_id} "
+            f"filename={filename} chunk_count={len(session['chunks'])}"
         )
 
-        # Return IMMEDIATELY - don't wait for chunk combining
+        # Return IMMEDIATELY - don't wait for processing
         return TranscriptionResponse(
             task_id=task_id,
             status="processing",
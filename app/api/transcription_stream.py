@@ -0,0 +1,107 @@
+"""
+Transcription Streaming Routes
+Server-Sent Events with transcript segments as they are decoded
+"""
+
+import json
+import asyncio
+import time
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+import logging
+logger = logging.getLogger(__name__)
+from app.services.transcription_service import transcription_service
+
+
+router = APIRouter(prefix="/transcription", tags=["Transcription"])
+
+# Статусы, после которых задача больше не меняется
+FINAL_STATUSES = ("completed", "error", "failed")
+POLL_INTERVAL = 1.0
+KEEPALIVE_INTERVAL = 15.0
+
+
+def _sse(event: str, data: dict, event_id: Optional[int] = None) -> str:
+    """Format one Server-Sent Event"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
+
+
+@router.get("/stream/{task_id}")
+async def stream_transcript(
+    task_id: str,
+    request: Request,
+    last_event_id: Optional[str] = Header(None)
+):
+    """
+    Stream transcription of a task over SSE
+
+    Events:
+        segment: {"start", "end", "text", "part"} - decoded phrase; with parallel
+            transcription parts arrive concurrently, order by "start"
+        progress: {"progress", "stage"} - on every change of task status
+        done: {"result"} - task completed (full transcript and download links)
+        error: {"error"} - task failed
+
+    A reconnecting client sends Last-Event-ID and receives only newer segments.
+    """
+    if transcription_service.get_task_status(task_id) is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    position = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
+
+    async def events():
+        nonlocal position
+        stream = transcription_service.get_stream(task_id)
+        last_progress = None
+        last_sent = time.monotonic()
+
+        while not await request.is_disconnected():
+            task = transcription_service.get_task_status(task_id) or {"status": "error", "error": "Task not found"}
+            stream = stream or transcription_service.get_stream(task_id)
+
+            progress = (task.get("progress", 0), task.get("stage"))
+            if progress != last_progress:
+                last_progress = progress
+                last_sent = time.monotonic()
+                yield _sse("progress", {"progress": progress[0], "stage": progress[1]})
+
+            if stream is not None:
+                while position < len(stream.segments):
+                    position += 1
+                    last_sent = time.monotonic()
+                    yield _sse("segment", stream.segments[position - 1], event_id=position)
+
+            if task.get("status") in FINAL_STATUSES and (stream is None or stream.closed):
+                if task["status"] == "completed":
+                    yield _sse("done", {"result": task.get("result")})
+                else:
+                    yield _sse("error", {"error": task.get("error")})
+                return
+
+            if time.monotonic() - last_sent > KEEPALIVE_INTERVAL:
+                last_sent = time.monotonic()
+                yield ": keepalive\n\n"
+
+            if stream is not None and not stream.closed:
+                await stream.wait(position, POLL_INTERVAL)
+            else:
+                await asyncio.sleep(POLL_INTERVAL)
+
+    logger.info(f"transcript_stream_opened task_id={task_id} from_segment={position}")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # nginx не должен буферизовать поток
+        }
+    )
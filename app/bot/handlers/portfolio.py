@@ -1,17 +1,15 @@
 from typing import List, Dict, Any
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto
 from telegram.ext import ContextTypes
-import requests
 import json
 import os
 from urllib.parse import urljoin
 
 from ..keyboards.main import get_portfolio_categories_keyboard, get_pagination_keyboard
-from ...database.database import get_db_context
-from ...database.models import Portfolio
 from ...config.logging import get_logger, log_user_action
 from ...utils.decorators import standard_handler
 from ...config.settings import settings
+from ...services.portfolio_repository import portfolio_repository
 
 logger = get_logger(__name__)
 
@@ -46,18 +44,7 @@ class PortfolioHandler:
             user_id = update.effective_user.id
             log_user_action(user_id, "show_portfolio_categories")
             
-            # Получаем категории через API
-            try:
-                response = requests.get(f"{self.base_url}/admin/api/portfolio/public/categories", timeout=15)
-                if response.status_code == 200:
-                    data = response.json()
-                    categories = data.get("categories", [])
-                else:
-                    # Fallback: получаем из базы напрямую
-                    categories = await self._get_categories_from_db()
-            except:
-                # Fallback: получаем из базы напрямую
-                categories = await self._get_categories_from_db()
+            categories = await self._get_categories()
             
             if not categories:
                 text = """
@@ -202,12 +189,7 @@ class PortfolioHandler:
             
             log_user_action(user_id, "show_project_details", project_id)
             
-            # Получаем проект из базы данных напрямую
-            try:
-                project = await self._get_project_from_db(project_id)
-            except Exception as e:
-                logger.error(f"Ошибка получения проекта {project_id} из БД: {e}")
-                project = None
+            project = await self._get_project(project_id)
             
             if not project:
                 await query.answer("❌ Проект не найден", show_alert=True)
@@ -270,18 +252,7 @@ class PortfolioHandler:
             log_user_action(user_id, "show_project_gallery", project_id)
             
             # Получаем проект
-            try:
-                response = requests.get(f"{self.base_url}/admin/api/portfolio/public/{project_id}", timeout=15)
-                if response.status_code == 200:
-                    data = response.json()
-                    if data.get("success"):
-                        project = data.get("data")
-                    else:
-                        raise Exception("Проект не найден")
-                else:
-                    project = await self._get_project_from_db(project_id)
-            except:
-                project = await self._get_project_from_db(project_id)
+            project = await self._get_project(project_id)
             
             if not project:
                 await query.answer("❌ Проект не найден", show_alert=True)
@@ -340,22 +311,11 @@ class PortfolioHandler:
             
             log_user_action(user_id, "like_project", project_id)
             
-            # Отправляем лайк через API
-            try:
-                response = requests.post(f"{self.base_url}/admin/api/portfolio/public/{project_id}/like", timeout=15)
-                if response.status_code == 200:
-                    data = response.json()
-                    if data.get("success"):
-                        likes_count = data.get("likes_count", 0)
-                        await query.answer(f"👍 Спасибо за оценку! Всего лайков: {likes_count}", show_alert=True)
-                    else:
-                        await query.answer("❌ Ошибка при обработке лайка", show_alert=True)
-                else:
-                    await query.answer("❌ Ошибка сервера", show_alert=True)
-            except:
-                # Fallback: обновляем в базе напрямую
-                await self._like_project_in_db(project_id)
-                await query.answer("👍 Спасибо за оценку!", show_alert=True)
+            likes_count = await portfolio_repository.like(project_id)
+            if likes_count is not None:
+                await query.answer(f"👍 Спасибо за оценку! Всего лайков: {likes_count}", show_alert=True)
+            else:
+                await query.answer("❌ Проект не найден", show_alert=True)
                 
         except Exception as e:
             logger.error(f"Ошибка в like_project: {e}")
@@ -376,12 +336,7 @@ class PortfolioHandler:
             if category:
                 params["category"] = category
             
-            # Используем прямое обращение к базе данных чтобы избежать проблем с HTTP запросами
-            try:
-                projects, pagination = await self._get_projects_from_db(category, page, featured_only)
-            except Exception as e:
-                logger.error(f"Ошибка получения проектов из БД: {e}")
-                projects, pagination = [], {}
+            projects, pagination = await self._get_projects(category, page, featured_only)
             
             if not projects:
                 text = f"""
@@ -591,19 +546,8 @@ class PortfolioHandler:
             
             log_user_action(user_id, "show_project_gallery", project_id)
             
-            # Получаем проект через API
-            try:
-                response = requests.get(f"{self.base_url}/admin/api/portfolio/public/{project_id}", timeout=15)
-                if response.status_code == 200:
-                    data = response.json()
-                    if data.get("success"):
-                        project = data.get("project")
-                    else:
-                        raise Exception("Проект не найден")
-                else:
-                    project = await self._get_project_from_db(project_id)
-            except:
-                project = await self._get_project_from_db(project_id)
+            # Получаем проект
+            project = await self._get_project(project_id)
             
             if not project:
                 await query.answer("❌ Проект не найден", show_alert=True)
@@ -676,44 +620,29 @@ class PortfolioHandler:
             
             log_user_action(user_id, "like_project", project_id)
             
-            # Отправляем лайк через API
-            try:
-                response = requests.post(f"{self.base_url}/admin/api/portfolio/public/{project_id}/like", timeout=15)
-                if response.status_code == 200:
-                    data = response.json()
-                    if data.get("success"):
-                        likes_count = data.get("likes", 0)
-                        message = data.get("message", "Спасибо за лайк!")
-                        await query.answer(f"👍 {message} Всего лайков: {likes_count}")
-                        
-                        # Обновляем кнопку с новым количеством лайков
-                        if query.message.reply_markup:
-                            keyboard = query.message.reply_markup.inline_keyboard
-                            for row in keyboard:
-                                for button in row:
-                                    if button.callback_data and button.callback_data.startswith(f"like_{project_id}"):
-                                        button.text = f"👍 {likes_count}"
-                                        break
-                            
-                            # Обновляем сообщение с новой клавиатурой
-                            try:
-                                await query.edit_message_reply_markup(
-                                    reply_markup=InlineKeyboardMarkup(keyboard)
-                                )
-                            except:
-                                pass  # Игнорируем ошибки обновления клавиатуры
-                        
-                        return
-                    else:
-                        error_msg = data.get("error", "Ошибка")
-                        await query.answer(f"❌ {error_msg}", show_alert=True)
-                        return
-                else:
-                    await query.answer("❌ Ошибка сервера", show_alert=True)
-                    return
-            except Exception as e:
-                logger.error(f"Ошибка API лайка: {e}")
-                await query.answer("❌ Ошибка отправки лайка", show_alert=True)
+            likes_count = await portfolio_repository.like(project_id)
+            if likes_count is None:
+                await query.answer("❌ Проект не найден", show_alert=True)
+                return
+            
+            await query.answer(f"👍 Спасибо за лайк! Всего лайков: {likes_count}")
+            
+            # Обновляем кнопку с новым количеством лайков
+            if query.message.reply_markup:
+                keyboard = query.message.reply_markup.inline_keyboard
+                for row in keyboard:
+                    for button in row:
+                        if button.callback_data and button.callback_data.startswith(f"like_{project_id}"):
+                            button.text = f"👍 {likes_count}"
+                            break
+                
+                # Обновляем сообщение с новой клавиатурой
+                try:
+                    await query.edit_message_reply_markup(
+                        reply_markup=InlineKeyboardMarkup(keyboard)
+                    )
+                except:
+                    pass  # Игнорируем ошибки обновления клавиатуры
             
         except Exception as e:
             logger.error(f"Ошибка в like_project: {e}")
@@ -786,105 +715,51 @@ class PortfolioHandler:
         }
         return category_emojis.get(category, "📦")
     
-    async def _get_categories_from_db(self) -> list:
-        """Fallback: получить категории из базы данных напрямую"""
+    async def _get_categories(self) -> list:
+        """Получить категории с видимыми проектами"""
         try:
-            with get_db_context() as db:
-                categories = db.query(Portfolio.category).filter(
-                    Portfolio.category.isnot(None),
-                    Portfolio.is_visible == True
-                ).distinct().all()
-                
-                category_list = [cat[0] for cat in categories if cat[0]]
-                
-                result = []
-                for cat in category_list:
-                    result.append({
-                        "key": cat,
-                        "name": self._get_category_name(cat),
-                        "emoji": self._get_category_emoji(cat)
-                    })
-                
-                return result
+            categories = await portfolio_repository.categories()
         except Exception as e:
-            logger.error(f"Ошибка получения категорий из БД: {e}")
+            logger.error(f"Ошибка получения категорий портфолио: {e}")
             return []
+        
+        return [
+            {
+                "key": category,
+                "name": self._get_category_name(category),
+                "emoji": self._get_category_emoji(category)
+            }
+            for category in categories
+        ]
     
-    async def _get_projects_from_db(self, category: str = None, page: int = 1, 
-                                  featured_only: bool = False) -> tuple:
-        """Fallback: получить проекты из базы данных напрямую"""
+    async def _get_projects(self, category: str = None, page: int = 1, 
+                            featured_only: bool = False) -> tuple:
+        """Получить страницу проектов"""
+        offset = (page - 1) * self.items_per_page
         try:
-            async with get_db_context() as db:
-                query = db.query(Portfolio).filter(Portfolio.is_visible == True)
-                
-                if featured_only:
-                    query = query.filter(Portfolio.is_featured == True)
-                
-                if category:
-                    query = query.filter(Portfolio.category == category)
-                
-                # Сортировка
-                query = query.order_by(
-                    Portfolio.sort_order.desc(),
-                    Portfolio.is_featured.desc(),
-                    Portfolio.created_at.desc()
-                )
-                
-                # Подсчитываем общее количество
-                total = query.count()
-                
-                # Применяем пагинацию
-                offset = (page - 1) * self.items_per_page
-                projects = query.offset(offset).limit(self.items_per_page).all()
-                
-                # Преобразуем в словари
-                projects_data = [project.to_bot_dict() for project in projects]
-                
-                pagination = {
-                    "page": page,
-                    "per_page": self.items_per_page,
-                    "total": total,
-                    "has_next": offset + self.items_per_page < total
-                }
-                
-                return projects_data, pagination
-                
+            projects, total = await portfolio_repository.list_projects(
+                category, featured_only, offset, self.items_per_page
+            )
         except Exception as e:
-            logger.error(f"Ошибка получения проектов из БД: {e}")
+            logger.error(f"Ошибка получения проектов портфолио: {e}")
             return [], {}
+        
+        pagination = {
+            "page": page,
+            "per_page": self.items_per_page,
+            "total": total,
+            "has_next": offset + self.items_per_page < total
+        }
+        return projects, pagination
     
-    async def _get_project_from_db(self, project_id: int) -> dict:
-        """Fallback: получить проект из базы данных напрямую"""
+    async def _get_project(self, project_id: int) -> dict:
+        """Получить проект (засчитывает просмотр)"""
         try:
-            async with get_db_context() as db:
-                project = db.query(Portfolio).filter(
-                    Portfolio.id == project_id,
-                    Portfolio.is_visible == True
-                ).first()
-                
-                if project:
-                    # Увеличиваем счетчик просмотров
-                    project.views_count += 1
-                    db.commit()
-                    return project.to_bot_dict()
-                
-                return None
-                
+            return await portfolio_repository.get_project(project_id)
         except Exception as e:
-            logger.error(f"Ошибка получения проекта из БД: {e}")
+            logger.error(f"Ошибка получения проекта {project_id}: {e}")
             return None
     
-    async def _like_project_in_db(self, project_id: int):
-        """Fallback: поставить лайк проекту в базе данных напрямую"""
-        try:
-            async with get_db_context() as db:
-                project = db.query(Portfolio).filter(Portfolio.id == project_id).first()
-                if project:
-                    project.likes_count += 1
-                    db.commit()
-        except Exception as e:
-            logger.error(f"Ошибка лайка проекта в БД: {e}")
-    
     async def _send_error_message(self, update: Update):
         """Отправить сообщение об ошибке"""
         try:
@@ -1134,29 +1009,6 @@ class PortfolioHandler:
             logger.error(f"Ошибка в navigate_project: {e}")
             await query.answer("❌ Ошибка навигации", show_alert=True)
 
-    async def _get_projects_from_db(self, category: str) -> List[Dict]:
-        """Получить проекты из базы данных"""
-        try:
-            with get_db_context() as db:
-                query = db.query(Portfolio).filter(Portfolio.is_visible == True)
-                
-                if category != "all":
-                    if category == "featured":
-                        query = query.filter(Portfolio.is_featured == True)
-                    else:
-                        query = query.filter(Portfolio.category == category)
-                
-                portfolio_items = query.order_by(Portfolio.created_at.desc()).all()
-                
-                # Используем to_bot_dict() для правильного формирования URL
-                projects = [item.to_bot_dict() for item in portfolio_items]
-                
-                return projects
-                
-        except Exception as e:
-            logger.error(f"Ошибка получения проектов из БД: {e}")
-            return []
-    
     async def _show_projects_page(self, query, projects: List[Dict], category: str, page: int):
         """Показать страницу проектов"""
         try:
@@ -1273,17 +1125,7 @@ class PortfolioHandler:
             log_user_action(user_id, "select_portfolio_project", str(project_id))
             
             # Получаем детали проекта
-            try:
-                response = requests.get(f"{self.base_url}/admin/api/portfolio/public/project/{project_id}", timeout=15)
-                if response.status_code == 200:
-                    data = response.json()
-                    project = data.get("project")
-                else:
-                    # Fallback: получаем из базы напрямую
-                    project = await self._get_project_from_db(project_id)
-            except Exception as e:
-                logger.error(f"Ошибка получения проекта: {e}")
-                project = await self._get_project_from_db(project_id)
+            project = await self._get_project(project_id)
             
             if not project:
                 await query.edit_message_text(
@@ -1356,27 +1198,6 @@ class PortfolioHandler:
                 ])
             )
     
-    async def _get_project_from_db(self, project_id: int) -> Dict:
-        """Получить проект из базы данных"""
-        try:
-            with get_db_context() as db:
-                project = db.query(Portfolio).filter(
-                    Portfolio.id == project_id,
-                    Portfolio.is_visible == True
-                ).first()
-                
-                if project:
-                    # Увеличиваем счетчик просмотров
-                    project.views_count = (project.views_count or 0) + 1
-                    db.commit()
-                    return project.to_bot_dict()
-                
-                return None
-                
-        except Exception as e:
-            logger.error(f"Ошибка получения проекта из БД: {e}")
-            return None
-
     @standard_handler
     async def handle_portfolio_navigation(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработка навигации по страницам портфолио"""
@@ -1,15 +1,13 @@
 from typing import List, Dict, Any
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto
 from telegram.ext import ContextTypes
-import requests
 import json
 
 from ..keyboards.main import get_portfolio_categories_keyboard, get_pagination_keyboard
-from ...database.database import get_db_context
-from ...database.models import Portfolio
 from ...config.logging import get_logger, log_user_action
 from ...utils.decorators import standard_handler
 from ...config.settings import settings
+from ...services.portfolio_repository import portfolio_repository
 
 logger = get_logger(__name__)
 
@@ -27,18 +25,7 @@ class PortfolioHandler:
             user_id = update.effective_user.id
             log_user_action(user_id, "show_portfolio_categories")
             
-            # Получаем категории через API
-            try:
-                response = requests.get(f"{self.base_url}/admin/api/portfolio/public/categories", timeout=5)
-                if response.status_code == 200:
-                    data = response.json()
-                    categories = data.get("categories", [])
-                else:
-                    # Fallback: получаем из базы напрямую
-                    categories = await self._get_categories_from_db()
-            except:
-                # Fallback: получаем из базы напрямую
-                categories = await self._get_categories_from_db()
+            categories = await self._get_categories()
             
             if not categories:
                 text = """
@@ -108,28 +95,25 @@ class PortfolioHandler:
             logger.error(f"Ошибка в show_portfolio_categories: {e}")
             await self._send_error_message(update, "Ошибка загрузки портфолио")
     
-    async def _get_categories_from_db(self):
-        """Получить категории напрямую из базы данных"""
+    async def _get_categories(self):
+        """Получить категории с видимыми проектами"""
         try:
-            with get_db_context() as db:
-                categories = db.query(Portfolio.category).filter(
-                    Portfolio.is_visible == True
-                ).distinct().all()
-                
-                category_names = {
-                    "telegram_bots": "🤖 Telegram боты",
-                    "web_development": "🌐 Веб-разработка", 
-                    "mobile_apps": "📱 Мобильные приложения",
-                    "ai_integration": "🧠 AI интеграции",
-                    "automation": "⚙️ Автоматизация",
-                    "ecommerce": "🛒 E-commerce",
-                    "other": "🔧 Другое"
-                }
-                
-                return [
-                    {"id": cat[0], "name": category_names.get(cat[0], cat[0])}
-                    for cat in categories
-                ]
+            categories = await portfolio_repository.categories()
+            
+            category_names = {
+                "telegram_bots": "🤖 Telegram боты",
+                "web_development": "🌐 Веб-разработка", 
+                "mobile_apps": "📱 Мобильные приложения",
+                "ai_integration": "🧠 AI интеграции",
+                "automation": "⚙️ Автоматизация",
+                "ecommerce": "🛒 E-commerce",
+                "other": "🔧 Другое"
+            }
+            
+            return [
+                {"id": cat, "name": category_names.get(cat, cat)}
+                for cat in categories
+            ]
         except Exception as e:
             logger.error(f"Ошибка получения категорий из БД: {e}")
             return []
@@ -141,18 +125,7 @@ class PortfolioHandler:
             user_id = update.effective_user.id
             log_user_action(user_id, "show_featured_portfolio")
             
-            # Получаем рекомендуемые работы через API
-            try:
-                response = requests.get(f"{self.base_url}/admin/api/portfolio/public/featured", timeout=5)
-                if response.status_code == 200:
-                    data = response.json()
-                    items = data.get("items", [])
-                else:
-                    # Fallback: получаем из базы напрямую
-                    items = await self._get_featured_from_db()
-            except:
-                # Fallback: получаем из базы напрямую
-                items = await self._get_featured_from_db()
+            items = await self._get_featured()
             
             if not items:
                 text = """
@@ -206,19 +179,11 @@ class PortfolioHandler:
             logger.error(f"Ошибка в show_featured_portfolio: {e}")
             await self._send_error_message(update, "Ошибка загрузки рекомендуемых работ")
     
-    async def _get_featured_from_db(self):
-        """Получить рекомендуемые работы напрямую из базы данных"""
+    async def _get_featured(self):
+        """Получить рекомендуемые работы"""
         try:
-            with get_db_context() as db:
-                items = db.query(Portfolio).filter(
-                    Portfolio.is_featured == True,
-                    Portfolio.is_visible == True
-                ).order_by(
-                    Portfolio.sort_order.asc(),
-                    Portfolio.views_count.desc()
-                ).limit(3).all()
-                
-                return [item.to_bot_dict() for item in items]
+            items, _ = await portfolio_repository.list_projects(featured_only=True, limit=3)
+            return items
         except Exception as e:
             logger.error(f"Ошибка получения рекомендуемых из БД: {e}")
             return []
@@ -234,24 +199,7 @@ class PortfolioHandler:
             
             log_user_action(user_id, "show_category_portfolio", {"category": category, "page": page})
             
-            # Получаем проекты по категории через API
-            try:
-                response = requests.get(
-                    f"{self.base_url}/admin/api/portfolio/public/category/{category}",
-                    params={"page": page, "limit": self.items_per_page},
-                    timeout=5
-                )
-                if response.status_code == 200:
-                    data = response.json()
-                    items = data.get("items", [])
-                    total = data.get("total", 0)
-                    pages = data.get("pages", 1)
-                else:
-                    # Fallback: получаем из базы напрямую
-                    items, total, pages = await self._get_category_from_db(category, page)
-            except:
-                # Fallback: получаем из базы напрямую
-                items, total, pages = await self._get_category_from_db(category, page)
+            items, total, pages = await self._get_category(category, page)
             
             # Название категории
             category_names = {
@@ -330,25 +278,16 @@ class PortfolioHandler:
             logger.error(f"Ошибка в show_category_portfolio: {e}")
             await self._send_error_message(update, "Ошибка загрузки проектов")
     
-    async def _get_category_from_db(self, category: str, page: int):
-        """Получить проекты по категории напрямую из базы данных"""
+    async def _get_category(self, category: str, page: int):
+        """Получить страницу проектов категории"""
         try:
-            with get_db_context() as db:
-                query = db.query(Portfolio).filter(
-                    Portfolio.category == category,
-                    Portfolio.is_visible == True
-                ).order_by(
-                    Portfolio.is_featured.desc(),
-                    Portfolio.sort_order.asc(),
-                    Portfolio.created_at.desc()
-                )
-                
-                total = query.count()
-                offset = (page - 1) * self.items_per_page
-                items = query.offset(offset).limit(self.items_per_page).all()
-                pages = (total + self.items_per_page - 1) // self.items_per_page
-                
-                return [item.to_bot_dict() for item in items], total, pages
+            offset = (page - 1) * self.items_per_page
+            items, total = await portfolio_repository.list_projects(
+                category, offset=offset, limit=self.items_per_page
+            )
+            pages = (total + self.items_per_page - 1) // self.items_per_page
+            
+            return items, total, pages
         except Exception as e:
             logger.error(f"Ошибка получения проектов по категории из БД: {e}")
             return [], 0, 1
@@ -383,17 +322,7 @@ class PortfolioHandler:
             
             log_user_action(user_id, "show_portfolio_item", {"item_id": item_id})
             
-            # Получаем детали проекта через API
-            try:
-                response = requests.get(f"{self.base_url}/admin/api/portfolio/public/{item_id}", timeout=5)
-                if response.status_code == 200:
-                    item = response.json()
-                else:
-                    # Fallback: получаем из базы напрямую
-                    item = await self._get_item_from_db(item_id)
-            except:
-                # Fallback: получаем из базы напрямую
-                item = await self._get_item_from_db(item_id)
+            item = await self._get_item(item_id)
             
             if not item:
                 text = "❌ Проект не найден или недоступен."
@@ -462,21 +391,10 @@ class PortfolioHandler:
             logger.error(f"Ошибка в show_portfolio_item: {e}")
             await self._send_error_message(update, "Ошибка загрузки проекта")
     
-    async def _get_item_from_db(self, item_id: int):
-        """Получить проект напрямую из базы данных"""
+    async def _get_item(self, item_id: int):
+        """Получить проект (засчитывает просмотр)"""
         try:
-            with get_db_context() as db:
-                item = db.query(Portfolio).filter(
-                    Portfolio.id == item_id,
-                    Portfolio.is_visible == True
-                ).first()
-                
-                if item:
-                    # Увеличиваем счетчик просмотров
-                    item.increment_views()
-                    db.commit()
-                    return item.to_bot_dict()
-                return None
+            return await portfolio_repository.get_project(item_id)
         except Exception as e:
             logger.error(f"Ошибка получения проекта из БД: {e}")
             return None
@@ -497,49 +415,24 @@ class PortfolioHandler:
                 await update.callback_query.answer("Вы уже поставили лайк этому проекту!", show_alert=True)
                 return
             
-            # Ставим лайк через API
-            try:
-                response = requests.post(f"{self.base_url}/admin/api/portfolio/{item_id}/like", timeout=5)
-                if response.status_code == 200:
-                    data = response.json()
-                    likes_count = data.get('likes_count', 0)
-                    
-                    # Сохраняем лайк пользователя
-                    user_likes.append(item_id)
-                    context.user_data['portfolio_likes'] = user_likes
-                    
-                    await update.callback_query.answer(f"Спасибо за лайк! 👍 ({likes_count})")
-                    
-                    # Обновляем кнопку
-                    await self._update_like_button(update, item_id, likes_count)
-                else:
-                    await update.callback_query.answer("Ошибка при добавлении лайка")
-            except:
-                # Fallback: ставим лайк напрямую в БД
-                await self._like_item_in_db(item_id, user_likes, context, update)
+            likes_count = await portfolio_repository.like(item_id)
+            if likes_count is None:
+                await update.callback_query.answer("Проект не найден")
+                return
+            
+            # Сохраняем лайк пользователя
+            user_likes.append(item_id)
+            context.user_data['portfolio_likes'] = user_likes
+            
+            await update.callback_query.answer(f"Спасибо за лайк! 👍 ({likes_count})")
+            
+            # Обновляем кнопку
+            await self._update_like_button(update, item_id, likes_count)
                 
         except Exception as e:
             logger.error(f"Ошибка в handle_portfolio_like: {e}")
             await update.callback_query.answer("Ошибка при добавлении лайка")
     
-    async def _like_item_in_db(self, item_id: int, user_likes: list, context, update):
-        """Поставить лайк напрямую в базе данных"""
-        try:
-            with get_db_context() as db:
-                item = db.query(Portfolio).filter(Portfolio.id == item_id).first()
-                if item:
-                    item.increment_likes()
-                    db.commit()
-                    
-                    # Сохраняем лайк пользователя
-                    user_likes.append(item_id)
-                    context.user_data['portfolio_likes'] = user_likes
-                    
-                    await update.callback_query.answer(f"Спасибо за лайк! 👍 ({item.likes_count})")
-                    await self._update_like_button(update, item_id, item.likes_count)
-        except Exception as e:
-            logger.error(f"Ошибка лайка в БД: {e}")
-    
     async def _update_like_button(self, update, item_id: int, likes_count: int):
         """Обновить кнопку лайка"""
         try:
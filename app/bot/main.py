@@ -5,7 +5,6 @@ import logging
 import asyncio
 import nest_asyncio
 import sys
-from pathlib import Path
 
 from telegram.ext import (
     Application,
@@ -14,7 +13,6 @@ from telegram.ext import (
     filters,
     CallbackQueryHandler,
     ConversationHandler,
-    PicklePersistence,
 )
 
 from app.config.settings import get_settings
@@ -31,10 +29,23 @@ from app.bot.handlers.bot_creation import BotCreationHandler
 from app.bot.handlers.money_management import money_handler
 from app.bot.handlers.quick_project_request import QuickProjectRequestHandler
 from app.database.database import init_db
+from app.bot.persistence import DatabasePersistence
 
 logger = logging.getLogger(__name__)
 
 
+async def post_init(app: Application):
+    """Фоновые задачи процесса бота"""
+    # Лайки и просмотры портфолио из бота копятся в буфере и пишутся в БД пачками
+    from app.services.portfolio_counters import portfolio_counters
+    await portfolio_counters.start()
+
+
+async def post_shutdown(app: Application):
+    from app.services.portfolio_counters import portfolio_counters
+    await portfolio_counters.stop()
+
+
 async def error_handler(update, context):
     """Обработчик ошибок"""
     logger.error(f"Exception while handling an update: {context.error}")
@@ -286,16 +297,15 @@ async def main():
         # Инициализируем базу данных
         init_db()
         
-        # Создаем persistence для сохранения данных
-        persistence_file = Path("data/bot_persistence.pkl")
-        persistence_file.parent.mkdir(exist_ok=True)
-        
-        persistence = PicklePersistence(filepath=str(persistence_file))
+        # Состояние бота хранится построчно в БД и подгружается по мере обращения
+        persistence = DatabasePersistence()
         
         # Создаем приложение
         app = Application.builder() \
             .token(settings.BOT_TOKEN) \
             .persistence(persistence) \
+            .post_init(post_init) \
+            .post_shutdown(post_shutdown) \
             .build()
         
         # Инициализируем notification_service с ботом
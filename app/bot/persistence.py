@@ -0,0 +1,244 @@
+"""
+Хранение состояния бота в БД вместо PicklePersistence
+
+Каждый user_data, chat_data, bot_data и каждое состояние разговора
+ConversationHandler - отдельная строка таблицы bot_persistence (pickle).
+Пишутся только изменившиеся записи: для каждой запоминается хеш последнего
+сохраненного значения. Строки, не обновлявшиеся BOT_PERSISTENCE_TTL_DAYS
+дней, не загружаются и удаляются.
+
+При запуске user_data и chat_data не загружаются: данные пользователя или
+чата подгружаются при первом его апдейте (refresh_user_data/refresh_chat_data).
+Разговоры загружаются при старте, так как этого требует ConversationHandler,
+но только не истекшие.
+"""
+
+import hashlib
+import json
+import pickle
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+from sqlalchemy.orm import Session
+from telegram.ext import BasePersistence, PersistenceInput
+
+from ..config.logging import get_logger
+from ..config.settings import settings
+from ..database.database import run_in_db_thread
+from ..database.models import BotPersistenceEntry
+
+logger = get_logger(__name__)
+
+# Те же типы, что в telegram.ext._utils.types (модуль приватный)
+ConversationKey = Tuple[Union[int, str], ...]
+ConversationDict = Dict[ConversationKey, object]
+CDCData = Tuple[List[Tuple[str, float, Dict[str, Any]]], Dict[str, str]]
+
+USER_DATA = "user_data"
+CHAT_DATA = "chat_data"
+BOT_DATA = "bot_data"
+CALLBACK_DATA = "callback_data"
+CONVERSATION_PREFIX = "conversation:"
+
+# Неизменившуюся запись активного пользователя раз в столько секунд
+# все равно отмечаем, чтобы она не истекла по TTL
+TOUCH_INTERVAL = 24 * 60 * 60
+
+
+class DatabasePersistence(BasePersistence[Dict[Any, Any], Dict[Any, Any], Dict[Any, Any]]):
+    """BasePersistence с построчным хранением в таблице bot_persistence"""
+
+    def __init__(
+        self,
+        ttl_days: int = None,
+        store_data: PersistenceInput = None,
+        update_interval: float = 60
+    ):
+        super().__init__(store_data=store_data, update_interval=update_interval)
+        self.ttl = timedelta(days=ttl_days or settings.BOT_PERSISTENCE_TTL_DAYS)
+        # user_data/chat_data, уже подгруженные в словари приложения
+        self._loaded: Set[Tuple[str, str]] = set()
+        # (namespace, key) -> (хеш сохраненного pickle, время последней записи)
+        self._written: Dict[Tuple[str, str], Tuple[bytes, float]] = {}
+        self._purged = False
+
+    # --- Загрузка при старте ---
+
+    async def get_user_data(self) -> Dict[int, Dict[Any, Any]]:
+        await self._purge_once()
+        return {}
+
+    async def get_chat_data(self) -> Dict[int, Dict[Any, Any]]:
+        await self._purge_once()
+        return {}
+
+    async def get_bot_data(self) -> Dict[Any, Any]:
+        await self._purge_once()
+        data = await self._load(BOT_DATA, "")
+        return data if data is not None else {}
+
+    async def get_callback_data(self) -> Optional[CDCData]:
+        return await self._load(CALLBACK_DATA, "")
+
+    async def get_conversations(self, name: str) -> ConversationDict:
+        await self._purge_once()
+        rows = await run_in_db_thread(self._load_namespace, CONVERSATION_PREFIX + name, self._cutoff())
+        conversations = {}
+        for key, blob in rows:
+            self._remember(CONVERSATION_PREFIX + name, key, blob)
+            conversations[tuple(json.loads(key))] = pickle.loads(blob)
+        return conversations
+
+    # --- Ленивая подгрузка ---
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict[Any, Any]) -> None:
+        await self._load_into(USER_DATA, str(user_id), user_data)
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict[Any, Any]) -> None:
+        await self._load_into(CHAT_DATA, str(chat_id), chat_data)
+
+    async def refresh_bot_data(self, bot_data: Dict[Any, Any]) -> None:
+        pass
+
+    # --- Запись ---
+
+    async def update_user_data(self, user_id: int, data: Dict[Any, Any]) -> None:
+        await self._save_dict(USER_DATA, str(user_id), data)
+
+    async def update_chat_data(self, chat_id: int, data: Dict[Any, Any]) -> None:
+        await self._save_dict(CHAT_DATA, str(chat_id), data)
+
+    async def update_bot_data(self, data: Dict[Any, Any]) -> None:
+        await self._save(BOT_DATA, "", data)
+
+    async def update_callback_data(self, data: CDCData) -> None:
+        await self._save(CALLBACK_DATA, "", data)
+
+    async def update_conversation(
+        self,
+        name: str,
+        key: ConversationKey,
+        new_state: Optional[object]
+    ) -> None:
+        namespace, row_key = CONVERSATION_PREFIX + name, json.dumps(list(key))
+        if new_state is None:
+            await self._drop(namespace, row_key)
+        else:
+            await self._save(namespace, row_key, new_state)
+
+    async def drop_user_data(self, user_id: int) -> None:
+        await self._drop(USER_DATA, str(user_id))
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        await self._drop(CHAT_DATA, str(chat_id))
+
+    async def flush(self) -> None:
+        # Все изменения уже записаны в update_*; при остановке только чистим истекшее
+        await run_in_db_thread(self._delete_expired, self._cutoff())
+
+    # --- Внутреннее ---
+
+    def _cutoff(self) -> datetime:
+        return datetime.utcnow() - self.ttl
+
+    def _remember(self, namespace: str, key: str, blob: bytes):
+        self._written[(namespace, key)] = (hashlib.sha1(blob).digest(), time.monotonic())
+
+    async def _purge_once(self):
+        if not self._purged:
+            self._purged = True
+            deleted = await run_in_db_thread(self._delete_expired, self._cutoff())
+            if deleted:
+                logger.info(f"Удалено истекших записей состояния бота: {deleted}")
+
+    async def _load(self, namespace: str, key: str) -> Any:
+        blob = await run_in_db_thread(self._load_row, namespace, key, self._cutoff())
+        if blob is None:
+            return None
+        self._remember(namespace, key, blob)
+        return pickle.loads(blob)
+
+    async def _load_into(self, namespace: str, key: str, target: Dict[Any, Any]):
+        """Подгрузить сохраненное в словарь приложения, если еще не подгружали"""
+        if (namespace, key) in self._loaded:
+            return
+        try:
+            data = await self._load(namespace, key)
+        except Exception as e:
+            logger.error(f"Ошибка загрузки состояния бота {namespace}/{key}: {e}")
+            return
+        self._loaded.add((namespace, key))
+        if data:
+            # Значения, уже записанные обработчиками, важнее сохраненных
+            for field, value in data.items():
+                target.setdefault(field, value)
+
+    async def _save_dict(self, namespace: str, key: str, data: Dict[Any, Any]):
+        if (namespace, key) not in self._loaded:
+            # Данные изменили вне апдейта (например, из задачи) до подгрузки -
+            # не затираем сохраненное, а дополняем им записываемую строку.
+            # PTB передает сюда копию словаря, поэтому в словарь приложения
+            # сохраненное попадет только при refresh: ключ остается неподгруженным
+            stored = await self._load(namespace, key)
+            if stored:
+                for field, value in stored.items():
+                    data.setdefault(field, value)
+            else:
+                # Сохраненного нет - словарю приложения подгружать нечего
+                self._loaded.add((namespace, key))
+        await self._save(namespace, key, data)
+
+    async def _save(self, namespace: str, key: str, data: Any):
+        blob = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        digest = hashlib.sha1(blob).digest()
+        written = self._written.get((namespace, key))
+        if written is not None and written[0] == digest and time.monotonic() - written[1] < TOUCH_INTERVAL:
+            return
+        await run_in_db_thread(self._upsert, namespace, key, blob)
+        self._written[(namespace, key)] = (digest, time.monotonic())
+
+    async def _drop(self, namespace: str, key: str):
+        await run_in_db_thread(self._delete_row, namespace, key)
+        self._written.pop((namespace, key), None)
+        self._loaded.add((namespace, key))
+
+    @staticmethod
+    def _load_row(db: Session, namespace: str, key: str, cutoff: datetime) -> Optional[bytes]:
+        return db.query(BotPersistenceEntry.data).filter(
+            BotPersistenceEntry.namespace == namespace,
+            BotPersistenceEntry.key == key,
+            BotPersistenceEntry.updated_at >= cutoff
+        ).scalar()
+
+    @staticmethod
+    def _load_namespace(db: Session, namespace: str, cutoff: datetime):
+        return db.query(BotPersistenceEntry.key, BotPersistenceEntry.data).filter(
+            BotPersistenceEntry.namespace == namespace,
+            BotPersistenceEntry.updated_at >= cutoff
+        ).all()
+
+    @staticmethod
+    def _upsert(db: Session, namespace: str, key: str, blob: bytes):
+        entry = db.query(BotPersistenceEntry).filter(
+            BotPersistenceEntry.namespace == namespace,
+            BotPersistenceEntry.key == key
+        ).first()
+        if entry is None:
+            db.add(BotPersistenceEntry(namespace=namespace, key=key, data=blob, updated_at=datetime.utcnow()))
+        else:
+            entry.data = blob
+            entry.updated_at = datetime.utcnow()
+
+    @staticmethod
+    def _delete_row(db: Session, namespace: str, key: str):
+        db.query(BotPersistenceEntry).filter(
+            BotPersistenceEntry.namespace == namespace,
+            BotPersistenceEntry.key == key
+        ).delete(synchronize_session=False)
+
+    @staticmethod
+    def _delete_expired(db: Session, cutoff: datetime) -> int:
+        return db.query(BotPersistenceEntry).filter(
+            BotPersistenceEntry.updated_at < cutoff
+        ).delete(synchronize_session=False)
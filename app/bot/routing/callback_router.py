@@ -1,15 +1,124 @@
 """
 Единый роутер для всех callback_data
 Решает проблемы конфликтов обработчиков
+
+Паттерны при регистрации разбираются в индекс диспетчеризации:
+- ^main_menu$, ^(faq|contacts)$ - точные значения в словаре;
+- ^step_, ^project_\\d+$ - литеральный префикс в префиксном дереве (для
+  второго после префикса еще проверяется регулярное выражение);
+- остальное - регулярное выражение в корне дерева.
+Поиск маршрута - один проход по callback_data вместо проверки всех паттернов;
+из подошедших выбирается маршрут с наименьшим priority, при равенстве -
+зарегистрированный раньше.
 """
 import re
+import time
 import logging
-from typing import Dict, List, Callable, Tuple, Pattern
+from typing import Dict, List, Callable, Optional, Tuple
 from telegram import Update
 from telegram.ext import ContextTypes
 
+try:
+    from app.core.metrics import bot_callbacks_total, bot_callback_duration_seconds
+except ImportError:  # метрики Prometheus необязательны
+    bot_callbacks_total = bot_callback_duration_seconds = None
+
 logger = logging.getLogger(__name__)
 
+REGEX_META = set(".^$*+?{}[]\\|()")
+QUANTIFIERS = set("*+?{")
+# Больше вариантов (a|b)(c|d)... не раскрываем в литералы
+MAX_EXPANSION = 64
+
+
+def _has_top_level_alternation(pattern: str) -> bool:
+    """Есть ли | вне скобок: тогда ^ относится только к первой альтернативе"""
+    depth, i, in_class = 0, 0, False
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "\\":
+            i += 2
+            continue
+        if in_class:
+            in_class = c != "]"
+        elif c == "[":
+            in_class = True
+            if pattern[i + 1:i + 2] == "]":
+                i += 1
+        elif c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+        elif c == "|" and depth == 0:
+            return True
+        i += 1
+    return False
+
+
+def _first_token(rest: str) -> Optional[str]:
+    """Первый атом остатка паттерна, если он обязателен и соответствует одному символу"""
+    if not rest:
+        return None
+    if rest[0] == "\\":
+        token = rest[:2]
+    elif rest[0] == "[":
+        end = rest.find("]", 2)
+        if end == -1:
+            return None
+        token = rest[:end + 1]
+    elif rest[0] in "()|$^":
+        return None
+    else:
+        token = rest[0]
+    following = rest[len(token):len(token) + 2]
+    if following[:1] in ("*", "?") or following == "{0":
+        return None
+    return token
+
+
+def analyze_pattern(pattern: str) -> Tuple[str, List[str], Optional[str]]:
+    """
+    Разбор паттерна для индекса
+
+    Возвращает (вид, литералы, первый атом остатка):
+    ("exact", значения, None) - паттерн совпадает ровно с этими значениями;
+    ("prefix", префиксы, None) - с любой строкой, начинающейся с префикса;
+    ("regex", префиксы, атом) - только со строками с префиксом, но нужна проверка.
+    """
+    i = 1 if pattern.startswith("^") else 0
+    literals = [""]
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "$" and i == len(pattern) - 1:
+            return "exact", literals, None
+
+        if c == "\\" and i + 1 < len(pattern) and not pattern[i + 1].isalnum():
+            options, size = [pattern[i + 1]], 2
+        elif c == "(":
+            end = pattern.find(")", i)
+            inner = pattern[i + 1:end] if end != -1 else ""
+            if not inner or any(ch in REGEX_META for ch in inner.replace("|", "")):
+                break
+            options, size = inner.split("|"), end + 1 - i
+        elif c in REGEX_META:
+            break
+        else:
+            options, size = [c], 1
+
+        if pattern[i + size:i + size + 1] in QUANTIFIERS:
+            break
+        if len(literals) * len(options) > MAX_EXPANSION:
+            break
+        literals = [literal + option for literal in literals for option in options]
+        i += size
+    else:
+        return "prefix", literals, None
+
+    if _has_top_level_alternation(pattern):
+        return "regex", [""], None
+    return "regex", literals, _first_token(pattern[i:])
+
+
 class CallbackRoute:
     """Маршрут для callback_data"""
     def __init__(self, pattern: str, handler: Callable, priority: int = 100, description: str = ""):
@@ -18,106 +127,242 @@ class CallbackRoute:
         self.handler = handler
         self.priority = priority  # Чем меньше число, тем выше приоритет
         self.description = description
-    
+        self.kind, self.literals, self._next_token = analyze_pattern(pattern)
+        self.order: Tuple[int, int] = (priority, 0)  # (priority, порядковый номер регистрации)
+        self.hits = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+
+    @property
+    def verify(self) -> bool:
+        """Нужна ли проверка регулярным выражением после совпадения по индексу"""
+        return self.kind == "regex"
+
+    @property
+    def anchored(self) -> bool:
+        """Есть ли у маршрута литеральный префикс (иначе это регулярное выражение в корне дерева)"""
+        return self.kind != "regex" or self.literals != [""]
+
     def matches(self, callback_data: str) -> bool:
         """Проверяет соответствие callback_data паттерну"""
         return bool(self.compiled_pattern.match(callback_data))
-    
+
+    def may_continue_with(self, char: str) -> bool:
+        """Может ли строка, совпавшая с маршрутом, продолжиться после префикса символом char"""
+        if self.kind == "prefix" or self._next_token is None:
+            return True
+        return bool(re.fullmatch(self._next_token, char))
+
     def __str__(self):
         return f"Route(pattern={self.pattern}, priority={self.priority}, desc={self.description})"
 
+
+class _TrieNode:
+    __slots__ = ("children", "routes")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.routes: List[CallbackRoute] = []
+
+    def walk(self):
+        """Все маршруты узла и поддерева вместе с их префиксами относительно узла"""
+        stack = [("", self)]
+        while stack:
+            path, node = stack.pop()
+            for route in node.routes:
+                yield path, route
+            for char, child in node.children.items():
+                stack.append((path + char, child))
+
+
 class CallbackRouter:
     """Централизованный роутер для всех callback_data"""
-    
+
     def __init__(self):
         self.routes: List[CallbackRoute] = []
         self.stats = {"total_calls": 0, "handled": 0, "unhandled": 0}
-    
+        self.conflicts: List[str] = []
+        self._exact: Dict[str, List[CallbackRoute]] = {}
+        self._trie = _TrieNode()
+        self._registered = 0
+
     def register(self, pattern: str, handler: Callable, priority: int = 100, description: str = ""):
         """Регистрирует новый маршрут"""
         route = CallbackRoute(pattern, handler, priority, description)
-        
-        # Проверяем конфликты с существующими маршрутами
+        self._registered += 1
+        route.order = (priority, self._registered)
+
+        # Проверяем конфликты с уже проиндексированными маршрутами
         conflicts = self._check_conflicts(route)
         if conflicts:
+            self.conflicts.extend(f"{pattern}: {conflict}" for conflict in conflicts)
             logger.warning(f"Потенциальные конфликты для паттерна '{pattern}': {conflicts}")
-        
+
+        self._index(route)
         self.routes.append(route)
         # Сортируем по приоритету (меньшее число = выше приоритет)
-        self.routes.sort(key=lambda r: r.priority)
-        
-        logger.info(f"Зарегистрирован маршрут: {route}")
+        self.routes.sort(key=lambda r: r.order)
+
+        logger.debug(f"Зарегистрирован маршрут: {route} ({route.kind})")
         return route
-    
-    def _check_conflicts(self, new_route: CallbackRoute) -> List[str]:
-        """Проверяет конфликты с существующими маршрутами"""
-        conflicts = []
-        test_cases = [
-            "main_menu", "portfolio", "create_tz", "project_123", 
-            "portfolio_telegram", "tz_text", "revision_456"
-        ]
-        
-        for test_case in test_cases:
-            matching_routes = [r for r in self.routes if r.matches(test_case)]
-            if matching_routes and new_route.matches(test_case):
-                conflicts.append(f"'{test_case}' -> {[r.pattern for r in matching_routes]}")
-        
-        return conflicts
-    
+
+    def resolve(self, callback_data: str) -> Optional[CallbackRoute]:
+        """Маршрут для callback_data или None"""
+        best = None
+        for route in self._candidates(callback_data):
+            if best is not None and route.order >= best.order:
+                continue
+            if route.verify and not route.matches(callback_data):
+                continue
+            best = route
+        return best
+
     async def route(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
         """Обрабатывает callback и направляет к нужному обработчику"""
         if not update.callback_query:
             return False
-            
-        callback_data = update.callback_query.data
-        user_id = update.effective_user.id
-        
+
+        callback_data = update.callback_query.data or ""
         self.stats["total_calls"] += 1
-        
-        logger.info(f"🔀 ROUTER: callback='{callback_data}' user={user_id}")
-        
-        # Ищем подходящий маршрут
-        for route in self.routes:
-            if route.matches(callback_data):
-                try:
-                    logger.info(f"✅ ROUTER: маршрут найден - {route.pattern} (priority={route.priority})")
-                    await route.handler(update, context)
-                    self.stats["handled"] += 1
-                    return True
-                except Exception as e:
-                    logger.error(f"❌ ROUTER: ошибка в обработчике {route.pattern}: {e}")
-                    raise
-        
-        # Маршрут не найден - передаем обработку дальше
-        logger.info(f"ℹ️ ROUTER: маршрут не найден для '{callback_data}', передаем дальше")
-        self.stats["unhandled"] += 1
-
-        return False
-    
+
+        route = self.resolve(callback_data)
+        if route is None:
+            # Маршрут не найден - передаем обработку дальше
+            logger.debug(f"ROUTER: маршрут не найден для '{callback_data}', передаем дальше")
+            self.stats["unhandled"] += 1
+            if bot_callbacks_total is not None:
+                bot_callbacks_total.labels(route="none", status="unhandled").inc()
+            return False
+
+        started = time.perf_counter()
+        status = "handled"
+        try:
+            await route.handler(update, context)
+        except Exception as e:
+            status = "error"
+            route.errors += 1
+            logger.error(f"❌ ROUTER: ошибка в обработчике {route.pattern}: {e}")
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            route.hits += 1
+            route.total_seconds += elapsed
+            if bot_callbacks_total is not None:
+                bot_callbacks_total.labels(route=route.pattern, status=status).inc()
+                bot_callback_duration_seconds.labels(route=route.pattern).observe(elapsed)
+
+        self.stats["handled"] += 1
+        return True
+
     def get_stats(self) -> Dict:
         """Возвращает статистику работы роутера"""
-        return self.stats.copy()
-    
+        stats = self.stats.copy()
+        stats["routes"] = {
+            route.pattern: {
+                "hits": route.hits,
+                "errors": route.errors,
+                "avg_ms": round(route.total_seconds / route.hits * 1000, 2) if route.hits else 0.0,
+            }
+            for route in self.routes
+        }
+        return stats
+
     def list_routes(self) -> List[str]:
         """Возвращает список всех зарегистрированных маршрутов"""
         return [str(route) for route in self.routes]
-    
+
     def validate_all_patterns(self) -> List[str]:
-        """Валидирует все паттерны на предмет конфликтов"""
-        issues = []
-        
-        test_cases = [
-            "main_menu", "portfolio", "create_tz", "project_123", "portfolio_telegram",
-            "tz_text", "tz_voice", "revision_456", "admin_stats", "consultant_new_session"
+        """Конфликты, найденные при регистрации маршрутов"""
+        return list(self.conflicts)
+
+    # --- Индекс ---
+
+    def _index(self, route: CallbackRoute):
+        if route.kind == "exact":
+            for value in route.literals:
+                self._exact.setdefault(value, []).append(route)
+            return
+        for prefix in route.literals:
+            self._node(prefix, create=True).routes.append(route)
+
+    def _candidates(self, callback_data: str) -> List[CallbackRoute]:
+        """Маршруты, которые могут совпасть: точные и с префиксами callback_data"""
+        candidates = list(self._exact.get(callback_data, ()))
+        if callback_data.endswith("\n"):
+            # $ в паттерне совпадает и перед завершающим переводом строки
+            candidates.extend(self._exact.get(callback_data[:-1], ()))
+        node = self._trie
+        candidates.extend(node.routes)
+        for char in callback_data:
+            node = node.children.get(char)
+            if node is None:
+                break
+            candidates.extend(node.routes)
+        return candidates
+
+    def _node(self, prefix: str, create: bool = False) -> Optional[_TrieNode]:
+        node = self._trie
+        for char in prefix:
+            child = node.children.get(char)
+            if child is None:
+                if not create:
+                    return None
+                child = node.children[char] = _TrieNode()
+            node = child
+        return node
+
+    def _check_conflicts(self, new_route: CallbackRoute) -> List[str]:
+        """Проверяет пересечения нового маршрута с уже проиндексированными"""
+        conflicts = []
+
+        if new_route.kind == "exact":
+            for value in new_route.literals:
+                existing = self._all_matching(value)
+                if existing:
+                    conflicts.append(f"'{value}' -> {[r.pattern for r in existing]}")
+            return conflicts
+
+        for prefix in new_route.literals:
+            # Точные значения, которые новый маршрут тоже перехватит
+            for value, routes in self._exact.items():
+                if value.startswith(prefix) and new_route.matches(value):
+                    conflicts.append(f"'{value}' -> {[r.pattern for r in routes]}")
+
+            # Маршруты с префиксом, который является началом нового
+            node = self._trie
+            for depth in range(len(prefix) + 1):
+                for route in node.routes:
+                    if self._may_overlap(route, prefix, depth):
+                        conflicts.append(f"'{prefix}...' -> {route.pattern}")
+                if depth == len(prefix):
+                    break
+                node = node.children.get(prefix[depth])
+                if node is None:
+                    break
+
+            # Маршруты с более длинным префиксом, начинающимся с нового
+            if node is not None:
+                for path, route in node.walk():
+                    if path and self._may_overlap(new_route, prefix + path, len(prefix)):
+                        conflicts.append(f"'{prefix + path}...' -> {route.pattern}")
+
+        return conflicts
+
+    @staticmethod
+    def _may_overlap(route: CallbackRoute, prefix: str, depth: int) -> bool:
+        """Может ли route с литералом prefix[:depth] совпасть со строкой, начинающейся с prefix"""
+        if not route.anchored:
+            # Без литерала индекс ничего не говорит о совпадениях: проверяем сам
+            # prefix, иначе такой маршрут пересекался бы со всеми остальными.
+            # Два таких маршрута друг с другом не сравниваем
+            return bool(prefix) and route.matches(prefix)
+        return depth == len(prefix) or route.may_continue_with(prefix[depth])
+
+    def _all_matching(self, callback_data: str) -> List[CallbackRoute]:
+        return [
+            route for route in self._candidates(callback_data)
+            if not route.verify or route.matches(callback_data)
         ]
-        
-        for test_case in test_cases:
-            matching_routes = [r for r in self.routes if r.matches(test_case)]
-            if len(matching_routes) > 1:
-                patterns = [r.pattern for r in matching_routes]
-                issues.append(f"Конфликт для '{test_case}': {patterns}")
-        
-        return issues
 
 # Глобальный экземпляр роутера
 callback_router = CallbackRouter()
@@ -12,6 +12,17 @@ class Settings:
     BOT_TOKEN: str = os.getenv("BOT_TOKEN", "")
     BOT_USERNAME: str = os.getenv("BOT_USERNAME", "")
     PORTFOLIO_CHANNEL_ID: str = os.getenv("PORTFOLIO_CHANNEL_ID", "")  # ID канала для портфолио
+    # Массовые рассылки: общий лимит (сообщений/сек), параллельные отправки,
+    # минимальный интервал между сообщениями в один чат (сек)
+    TELEGRAM_BROADCAST_RATE: float = float(os.getenv("TELEGRAM_BROADCAST_RATE", "25"))
+    TELEGRAM_BROADCAST_CONCURRENCY: int = int(os.getenv("TELEGRAM_BROADCAST_CONCURRENCY", "10"))
+    TELEGRAM_PER_CHAT_INTERVAL: float = float(os.getenv("TELEGRAM_PER_CHAT_INTERVAL", "1.0"))
+    # Outbox уведомлений: опрос таблицы (сек), окно склейки сообщений одному
+    # получателю (сек), число попыток и размер пачки
+    NOTIFICATION_OUTBOX_POLL_INTERVAL: float = float(os.getenv("NOTIFICATION_OUTBOX_POLL_INTERVAL", "5"))
+    NOTIFICATION_OUTBOX_COALESCE_SECONDS: float = float(os.getenv("NOTIFICATION_OUTBOX_COALESCE_SECONDS", "3"))
+    NOTIFICATION_OUTBOX_MAX_ATTEMPTS: int = int(os.getenv("NOTIFICATION_OUTBOX_MAX_ATTEMPTS", "5"))
+    NOTIFICATION_OUTBOX_BATCH_SIZE: int = int(os.getenv("NOTIFICATION_OUTBOX_BATCH_SIZE", "100"))
     
     # OpenAI/OpenRouter
     OPENROUTER_API_KEY: str = os.getenv("OPENROUTER_API_KEY", "")
@@ -31,12 +42,26 @@ class Settings:
         # Локальная разработка
         DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./data/bot.db")
     DATABASE_ECHO: bool = os.getenv("DATABASE_ECHO", "False").lower() == "true"
+    # Размер пула потоков для синхронных сессий в async-обработчиках админки
+    DATABASE_THREADPOOL_SIZE: int = int(os.getenv("DATABASE_THREADPOOL_SIZE", "8"))
+    # Интервал полной пересборки счетчиков дашборда (секунды)
+    DASHBOARD_REBUILD_INTERVAL: int = int(os.getenv("DASHBOARD_REBUILD_INTERVAL", "1800"))
     
     # Admin Panel
     ADMIN_SECRET_KEY: str = os.getenv("ADMIN_SECRET_KEY", "default_secret_key_change_me")
     ADMIN_USERNAME: str = os.getenv("ADMIN_USERNAME", "admin")
     ADMIN_PASSWORD: str = os.getenv("ADMIN_PASSWORD", "admin")
     ADMIN_PORT: int = int(os.getenv("ADMIN_PORT", "8000"))
+    # Кеш проверенных учетных данных Basic Auth. Он в памяти процесса:
+    # invalidate_user (смена пароля, деактивация) действует только в текущем
+    # процессе, в остальных воркерах старые учетные данные работают до AUTH_CACHE_TTL.
+    # При запуске в несколько воркеров уменьшите TTL или отключите кеш (0).
+    AUTH_CACHE_TTL: int = int(os.getenv("AUTH_CACHE_TTL", "300"))  # секунды
+    AUTH_CACHE_MAX_SIZE: int = int(os.getenv("AUTH_CACHE_MAX_SIZE", "1024"))
+    # Как часто процесс сверяет версию каталога портфолио в БД (секунды)
+    PORTFOLIO_CATALOG_CHECK_INTERVAL: float = float(os.getenv("PORTFOLIO_CATALOG_CHECK_INTERVAL", "5"))
+    # Как часто накопленные просмотры и лайки портфолио записываются в БД (секунды)
+    PORTFOLIO_COUNTER_FLUSH_INTERVAL: float = float(os.getenv("PORTFOLIO_COUNTER_FLUSH_INTERVAL", "10"))
     
     # File Upload
     MAX_FILE_SIZE: int = int(os.getenv("MAX_FILE_SIZE", "10485760"))  # 10MB
@@ -83,11 +108,28 @@ class Settings:
     )
     CONSULTANT_MAX_TOKENS: int = int(os.getenv("CONSULTANT_MAX_TOKENS", "1000"))
     CONSULTANT_TEMPERATURE: float = float(os.getenv("CONSULTANT_TEMPERATURE", "0.7"))
+    # Ограничение одновременных запросов к LLM (всего и на одну модель), таймаут и повторы
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+    LLM_PER_MODEL_CONCURRENCY: int = int(os.getenv("LLM_PER_MODEL_CONCURRENCY", "4"))
+    LLM_REQUEST_TIMEOUT: float = float(os.getenv("LLM_REQUEST_TIMEOUT", "120"))
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "3"))
+    # Кэш ответов LLM для повторяющихся запросов (TTL в секундах, размер до LRU-вытеснения)
+    LLM_CACHE_ENABLED: bool = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+    LLM_CACHE_TTL: int = int(os.getenv("LLM_CACHE_TTL", "86400"))
+    LLM_CACHE_MAX_ENTRIES: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
     
     # Avito API Settings
     AVITO_CLIENT_ID: str = os.getenv("AVITO_CLIENT_ID", "")
     AVITO_CLIENT_SECRET: str = os.getenv("AVITO_CLIENT_SECRET", "")
     AVITO_USER_ID: str = os.getenv("AVITO_USER_ID", "")
+    # Пул HTTP-соединений к API Авито (одна keep-alive сессия на сервис)
+    AVITO_HTTP_POOL_SIZE: int = int(os.getenv("AVITO_HTTP_POOL_SIZE", "100"))
+    AVITO_HTTP_POOL_PER_HOST: int = int(os.getenv("AVITO_HTTP_POOL_PER_HOST", "20"))
+    AVITO_HTTP_KEEPALIVE: float = float(os.getenv("AVITO_HTTP_KEEPALIVE", "30"))
+    AVITO_HTTP_TIMEOUT: float = float(os.getenv("AVITO_HTTP_TIMEOUT", "30"))
+    AVITO_HTTP_CONNECT_TIMEOUT: float = float(os.getenv("AVITO_HTTP_CONNECT_TIMEOUT", "10"))
+    # Сколько изменившихся чатов polling загружает параллельно
+    AVITO_POLL_CONCURRENCY: int = int(os.getenv("AVITO_POLL_CONCURRENCY", "5"))
     
     # Domain for webhooks
     DOMAIN: str = os.getenv("DOMAIN", "147.45.215.199:8001")
@@ -101,6 +143,8 @@ class Settings:
     
     # Bot persistence
     bot_persistence_file: str = "data/bot_persistence.pkl"
+    # Состояние бота, не обновлявшееся столько дней, удаляется
+    BOT_PERSISTENCE_TTL_DAYS: int = int(os.getenv("BOT_PERSISTENCE_TTL_DAYS", "90"))
     
     # Additional properties that might be needed
     bot_token: str = BOT_TOKEN
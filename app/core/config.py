@@ -117,6 +117,30 @@ class Settings(BaseSettings):
     MAX_FILE_SIZE: int = Field(default=10485760, description="Max file size (10MB)")
     UPLOAD_PATH: str = Field(default="./uploads", description="Upload directory")
 
+    # ========== TRANSCRIPTION ==========
+    WHISPER_MODEL_SIZE: str = Field(default="tiny", description="faster-whisper model size")
+    WHISPER_COMPUTE_TYPE: str = Field(default="int8", description="faster-whisper compute type")
+    WHISPER_WORKERS: int = Field(
+        default=0, description="Warm transcription worker processes (0 = CPU cores, max 4)"
+    )
+    WHISPER_CPU_THREADS: int = Field(
+        default=0, description="CPU threads per worker (0 = cores / workers)"
+    )
+    WHISPER_WORKER_MEMORY_LIMIT_MB: int = Field(
+        default=2048, description="Worker peak RSS that triggers recycling (0 = no limit)"
+    )
+    WHISPER_JOB_TIMEOUT: int = Field(default=7200, description="Transcription job timeout in seconds")
+    TRANSCRIPTION_SEGMENT_SECONDS: int = Field(
+        default=300, description="Max segment length for parallel transcription"
+    )
+    TRANSCRIPTION_SEGMENT_OVERLAP: float = Field(
+        default=2.0, description="Overlap between neighbouring segments in seconds"
+    )
+    TRANSCRIPTION_ANALYSIS_WINDOW_TOKENS: int = Field(
+        default=3000,
+        description="Transcript window size for map-reduce GPT analysis (keep above ~800 so notes can be folded)"
+    )
+
     # ========== LOGGING ==========
     LOG_FORMAT: str = Field(default="json", description="Log format (json/text)")
     LOG_FILE: str = Field(default="./logs/app.log", description="Log file path")
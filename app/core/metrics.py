@@ -12,6 +12,7 @@ from prometheus_client import (
     Enum,
 )
 from typing import Optional
+import asyncio
 import psutil
 import os
 
@@ -268,6 +269,104 @@ db_deadlocks_total = Counter(
     "Total database deadlocks",
 )
 
+# ============================================
+# EVENT LOOP METRICS
+# ============================================
+
+event_loop_lag_seconds = Histogram(
+    "crm_event_loop_lag_seconds",
+    "Delay between scheduled and actual wake-up of the event loop",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+event_loop_lag_last_seconds = Gauge(
+    "crm_event_loop_lag_last_seconds",
+    "Last measured event loop lag in seconds",
+)
+
+# ============================================
+# TELEGRAM DELIVERY METRICS
+# ============================================
+
+telegram_messages_total = Counter(
+    "crm_telegram_messages_total",
+    "Total Telegram broadcast send attempts",
+    ["status"],  # sent, failed, retry_after, network_error
+)
+
+telegram_send_duration_seconds = Histogram(
+    "crm_telegram_send_duration_seconds",
+    "Telegram send_message latency in seconds",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+
+notification_outbox_total = Counter(
+    "crm_notification_outbox_total",
+    "Outbox notifications processed",
+    ["status"],  # sent, coalesced, retry, failed
+)
+
+bot_callbacks_total = Counter(
+    "crm_bot_callbacks_total",
+    "Bot callback queries dispatched by CallbackRouter",
+    ["route", "status"],  # handled, error, unhandled (route="none")
+)
+
+bot_callback_duration_seconds = Histogram(
+    "crm_bot_callback_duration_seconds",
+    "Bot callback handler latency in seconds",
+    ["route"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+
+# ============================================
+# LLM METRICS
+# ============================================
+
+llm_queue_depth = Gauge(
+    "crm_llm_queue_depth",
+    "LLM requests waiting for a concurrency slot",
+    ["model"],
+)
+
+llm_in_flight = Gauge(
+    "crm_llm_in_flight",
+    "LLM requests currently in progress",
+    ["model"],
+)
+
+llm_requests_total = Counter(
+    "crm_llm_requests_total",
+    "Total LLM requests",
+    ["model", "status"],  # success, error, timeout, retry
+)
+
+llm_request_duration_seconds = Histogram(
+    "crm_llm_request_duration_seconds",
+    "LLM request latency in seconds (excluding queue wait)",
+    ["model"],
+    buckets=(0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 60.0, 120.0),
+)
+
+llm_queue_wait_seconds = Histogram(
+    "crm_llm_queue_wait_seconds",
+    "Time LLM requests spend waiting for a concurrency slot",
+    ["model"],
+    buckets=(0.01, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+)
+
+llm_cache_requests_total = Counter(
+    "crm_llm_cache_requests_total",
+    "LLM response cache lookups",
+    ["namespace", "result"],  # hit, miss
+)
+
+llm_cache_latency_saved_seconds_total = Counter(
+    "crm_llm_cache_latency_saved_seconds_total",
+    "Model latency avoided by LLM response cache hits",
+    ["namespace"],
+)
+
 # ============================================
 # REDIS/CACHE METRICS
 # ============================================
@@ -403,6 +502,22 @@ def update_system_metrics():
         logger.error("metrics_update_failed", error=str(e))
 
 
+async def monitor_event_loop_lag(interval: float = 0.5):
+    """
+    Measure event loop lag until cancelled.
+
+    Sleeps for `interval` and records how late the loop woke up: any
+    blocking call in a coroutine shows up here as lag.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - started - interval)
+        event_loop_lag_seconds.observe(lag)
+        event_loop_lag_last_seconds.set(lag)
+
+
 def init_application_info():
     """Initialize application info metrics"""
     from app.core.config import settings
@@ -491,6 +606,7 @@ __all__ = [
     # Functions
     "update_system_metrics",
     "init_application_info",
+    "monitor_event_loop_lag",
     # Business metrics
     "projects_total",
     "tasks_total",
@@ -501,4 +617,5 @@ __all__ = [
     # System metrics
     "system_cpu_usage_percent",
     "system_memory_usage_bytes",
+    "event_loop_lag_seconds",
 ]
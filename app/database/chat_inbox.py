@@ -0,0 +1,141 @@
+"""
+Список чатов проектов (inbox) одним запросом.
+
+Страница чатов выбирается в CTE с keyset-пагинацией по времени последнего
+сообщения (для чатов без сообщений - по времени создания), последнее
+сообщение каждого чата страницы - оконной функцией row_number(), имена
+клиента и исполнителя - LEFT JOIN. Курсор - непрозрачная строка с
+(время, id) последнего чата страницы, поэтому новые сообщения во время
+листания не дают дублей и пропусков внутри уже отданной части списка.
+"""
+
+import base64
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import Session
+
+from .models import AdminUser, Project, ProjectChat, ProjectChatMessage, User
+
+
+def encode_cursor(sort_at: datetime, chat_id: int) -> str:
+    raw = f"{sort_at.isoformat()}|{chat_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Разбор курсора; ValueError для некорректной строки"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        sort_at, chat_id = raw.split("|", 1)
+        return datetime.fromisoformat(sort_at), int(chat_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def client_display_name(first_name: Optional[str], last_name: Optional[str], username: Optional[str]) -> Optional[str]:
+    if first_name:
+        return f"{first_name} {last_name}" if last_name else first_name
+    if username:
+        return f"@{username}"
+    return None
+
+
+def fetch_chat_inbox(
+    db: Session,
+    filters: List[Any],
+    after: Optional[Tuple[datetime, int]] = None,
+    limit: Optional[int] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Чаты с последним сообщением, клиентом и исполнителем за один запрос
+
+    Args:
+        filters: условия на Project/ProjectChat (доступ пользователя)
+        after: decode_cursor(next_cursor) предыдущей страницы
+        limit: размер страницы; None - все чаты
+
+    Returns:
+        (строки, next_cursor); next_cursor = None на последней странице
+    """
+    sort_at = func.coalesce(ProjectChat.last_message_at, ProjectChat.created_at)
+
+    page = (
+        select(ProjectChat.id.label("chat_id"), sort_at.label("sort_at"))
+        .join(Project, Project.id == ProjectChat.project_id)
+        .where(*filters)
+    )
+    if after:
+        cursor_at, cursor_id = after
+        page = page.where(or_(sort_at < cursor_at, and_(sort_at == cursor_at, ProjectChat.id < cursor_id)))
+    page = page.order_by(sort_at.desc(), ProjectChat.id.desc())
+    if limit:
+        # Лишняя строка показывает, есть ли следующая страница
+        page = page.limit(limit + 1)
+    page = page.cte("inbox_page")
+
+    ranked = (
+        select(
+            ProjectChatMessage.chat_id,
+            ProjectChatMessage.sender_type,
+            ProjectChatMessage.message_text,
+            ProjectChatMessage.created_at,
+            func.row_number().over(
+                partition_by=ProjectChatMessage.chat_id,
+                order_by=(ProjectChatMessage.created_at.desc(), ProjectChatMessage.id.desc())
+            ).label("rn")
+        )
+        .where(ProjectChatMessage.chat_id.in_(select(page.c.chat_id)))
+        .subquery("last_messages")
+    )
+
+    query = (
+        select(
+            ProjectChat.id,
+            ProjectChat.created_at,
+            ProjectChat.last_message_at,
+            ProjectChat.unread_by_executor,
+            ProjectChat.unread_by_client,
+            ProjectChat.is_pinned_by_owner,
+            ProjectChat.is_hidden_by_owner,
+            Project.id.label("project_id"),
+            Project.title.label("project_title"),
+            Project.status.label("project_status"),
+            User.first_name.label("client_first_name"),
+            User.last_name.label("client_last_name"),
+            User.username.label("client_username"),
+            AdminUser.id.label("executor_id"),
+            AdminUser.username.label("executor_username"),
+            AdminUser.first_name.label("executor_first_name"),
+            ranked.c.sender_type.label("last_sender_type"),
+            ranked.c.message_text.label("last_message_text"),
+            ranked.c.created_at.label("last_created_at"),
+        )
+        .select_from(page)
+        .join(ProjectChat, ProjectChat.id == page.c.chat_id)
+        .join(Project, Project.id == ProjectChat.project_id)
+        .outerjoin(User, User.id == Project.user_id)
+        .outerjoin(AdminUser, AdminUser.id == Project.assigned_executor_id)
+        .outerjoin(ranked, and_(ranked.c.chat_id == ProjectChat.id, ranked.c.rn == 1))
+        .order_by(page.c.sort_at.desc(), page.c.chat_id.desc())
+    )
+
+    rows = [dict(row._mapping) for row in db.execute(query)]
+
+    next_cursor = None
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last["last_message_at"] or last["created_at"], last["id"])
+    return rows, next_cursor
+
+
+def last_message_dict(row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    if row["last_created_at"] is None:
+        return None
+    return {
+        'sender_type': row["last_sender_type"],
+        'message_text': row["last_message_text"],
+        'created_at': row["last_created_at"].isoformat()
+    }
@@ -0,0 +1,235 @@
+"""
+Инкрементальные счетчики KPI дашборда.
+
+Каждая запись Project/Task/Transaction/User вносит свой «вклад» в набор
+счетчиков (количество по статусам, суммы и т.д.). При flush сессии вклад
+старого состояния вычитается, нового - прибавляется, и разница пишется
+в таблицу dashboard_counters в той же транзакции. Периодическая полная
+пересборка (rebuild_counters) исправляет расхождения после массовых
+UPDATE/DELETE и сырого SQL, которые ORM-события не видят.
+"""
+
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable
+
+from sqlalchemy import event, inspect, select, text
+from sqlalchemy.orm import Session
+
+from .models import DashboardCounter, Project, Task, Transaction, User
+from ..config.logging import get_logger
+
+logger = get_logger(__name__)
+
+ACTIVE_PROJECT_STATUSES = ('new', 'review', 'accepted', 'in_progress', 'testing')
+
+
+def project_contribution(v: Dict[str, Any]) -> Counter:
+    """Вклад проекта в счетчики"""
+    c = Counter()
+    status = v.get('status') or ''
+    estimated = v.get('estimated_cost')
+    final = v.get('final_cost')
+    paid = v.get('client_paid_total') or 0
+
+    c[f'projects.count.{status}'] += 1
+    if estimated is not None:
+        c[f'projects.estimated_sum.{status}'] += estimated
+        c[f'projects.estimated_n.{status}'] += 1
+    if final is not None:
+        c[f'projects.final_sum.{status}'] += final
+        c[f'projects.final_n.{status}'] += 1
+    c[f'projects.pending_sum.{status}'] += max((estimated or 0) - paid, 0)
+    c['projects.client_paid'] += paid
+    c['projects.executor_paid'] += v.get('executor_paid_total') or 0
+    if v.get('estimated_hours') is not None:
+        c['projects.hours_sum'] += v['estimated_hours']
+        c['projects.hours_n'] += 1
+    if v.get('project_type'):
+        c[f"projects.type.{v['project_type']}"] += 1
+    if v.get('user_id'):
+        c[f"projects.user.{v['user_id']}"] += 1
+    return c
+
+
+def task_contribution(v: Dict[str, Any]) -> Counter:
+    """Вклад задачи в счетчики (с разделением на архивные и активные)"""
+    c = Counter()
+    archived = 1 if v.get('is_archived') else 0
+    status = v.get('status') or ''
+
+    c[f'tasks.status.{archived}.{status}'] += 1
+    c[f"tasks.priority.{archived}.{v.get('priority') or ''}"] += 1
+    c[f"tasks.assignee.{v.get('assigned_to_id')}.{archived}.{status}"] += 1
+    return c
+
+
+def transaction_contribution(v: Dict[str, Any]) -> Counter:
+    """Вклад транзакции в помесячные суммы"""
+    c = Counter()
+    if v.get('transaction_date'):
+        month = v['transaction_date'].strftime('%Y-%m')
+        c[f"transactions.{v.get('transaction_type')}.{v.get('status')}.{month}"] += v.get('amount') or 0
+    return c
+
+
+def user_contribution(v: Dict[str, Any]) -> Counter:
+    return Counter({'users.count': 1})
+
+
+# Модель -> (поля, влияющие на счетчики; функция вклада)
+TRACKED_MODELS: Dict[type, tuple] = {
+    Project: (
+        ('status', 'estimated_cost', 'final_cost', 'client_paid_total',
+         'executor_paid_total', 'estimated_hours', 'project_type', 'user_id'),
+        project_contribution,
+    ),
+    Task: (
+        ('status', 'priority', 'assigned_to_id', 'is_archived'),
+        task_contribution,
+    ),
+    Transaction: (
+        ('transaction_type', 'status', 'amount', 'transaction_date'),
+        transaction_contribution,
+    ),
+    User: ((), user_contribution),
+}
+
+
+def _noop_set(target, value, oldvalue, initiator):
+    pass
+
+
+# active_history: при присваивании ORM загружает прежнее значение,
+# иначе для «протухших» после commit атрибутов история будет пустой
+for _model, (_fields, _) in TRACKED_MODELS.items():
+    for _field in _fields:
+        event.listen(getattr(_model, _field), 'set', _noop_set, active_history=True)
+
+
+def _current_values(obj, fields: Iterable[str]) -> Dict[str, Any]:
+    return {field: getattr(obj, field) for field in fields}
+
+
+def _previous_values(obj, fields: Iterable[str]) -> Dict[str, Any]:
+    state = inspect(obj)
+    values = {}
+    for field in fields:
+        history = state.attrs[field].history
+        if history.deleted:
+            values[field] = history.deleted[0]
+        else:
+            values[field] = getattr(obj, field)
+    return values
+
+
+def _contribution(obj, previous: bool = False) -> Counter:
+    fields, contribute = TRACKED_MODELS[type(obj)]
+    values = _previous_values(obj, fields) if previous else _current_values(obj, fields)
+    return contribute(values)
+
+
+@event.listens_for(Session, 'before_flush')
+def _capture_deleted(session, flush_context, instances):
+    """Вклад удаляемых объектов считаем до DELETE, пока строки еще доступны"""
+    deltas = Counter()
+    for obj in session.deleted:
+        if type(obj) in TRACKED_MODELS:
+            deltas.subtract(_contribution(obj))
+    if deltas:
+        session.info.setdefault('dashboard_deltas', Counter()).update(deltas)
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_changes(session, flush_context):
+    """Применяет изменения счетчиков в той же транзакции, что и сами данные"""
+    deltas = session.info.pop('dashboard_deltas', Counter())
+
+    for obj in session.new:
+        if type(obj) in TRACKED_MODELS:
+            deltas.update(_contribution(obj))
+
+    for obj in session.dirty:
+        if type(obj) in TRACKED_MODELS and session.is_modified(obj):
+            deltas.subtract(_contribution(obj, previous=True))
+            deltas.update(_contribution(obj))
+
+    changes = {key: value for key, value in deltas.items() if value}
+    if not changes:
+        return
+
+    # Счетчики не должны ломать запись данных: upsert идет в SAVEPOINT, и его
+    # ошибка (в PostgreSQL она прерывает всю транзакцию) откатывает только его.
+    # Расхождение исправит пересборка
+    connection = session.connection()
+    try:
+        with connection.begin_nested():
+            apply_deltas(connection, changes)
+    except Exception as e:
+        logger.error(f"Не удалось обновить счетчики дашборда: {e}")
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_deltas(session):
+    """Вклад удалений из неудавшегося flush не должен попасть в следующий"""
+    session.info.pop('dashboard_deltas', None)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget_deltas_soft(session, previous_transaction):
+    session.info.pop('dashboard_deltas', None)
+
+
+def apply_deltas(connection, changes: Dict[str, float]):
+    """Атомарно прибавляет изменения к счетчикам (upsert)"""
+    now = datetime.utcnow()
+    connection.execute(
+        text(
+            "INSERT INTO dashboard_counters (key, value, updated_at) "
+            "VALUES (:key, :value, :updated_at) "
+            "ON CONFLICT (key) DO UPDATE SET "
+            "value = dashboard_counters.value + excluded.value, "
+            "updated_at = excluded.updated_at"
+        ),
+        [{"key": key, "value": value, "updated_at": now} for key, value in changes.items()],
+    )
+
+
+def compute_counters(db: Session) -> Counter:
+    """Полный пересчет счетчиков из исходных таблиц"""
+    totals = Counter()
+    for model, (fields, contribute) in TRACKED_MODELS.items():
+        columns = [getattr(model, field) for field in fields] or [model.id]
+        rows = db.execute(select(*columns).execution_options(yield_per=1000))
+        for row in rows:
+            totals.update(contribute(dict(zip(fields, row))))
+    return totals
+
+
+def _lock_counters(db: Session):
+    """
+    Блокирует запись счетчиков до конца транзакции пересборки
+
+    Иначе изменение, закоммиченное между пересчетом и заменой строк, потеряется:
+    его приращение удалится вместе со старыми строками, а в пересчет оно не попало.
+    В PostgreSQL EXCLUSIVE конфликтует с ROW EXCLUSIVE, который берет upsert
+    apply_deltas: пишущие транзакции ждут окончания пересборки, а пересборка -
+    окончания уже начавших обновлять счетчики. В SQLite ту же роль играет
+    блокировка записи, которую берет DELETE до пересчета.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("LOCK TABLE dashboard_counters IN EXCLUSIVE MODE"))
+    db.query(DashboardCounter).delete(synchronize_session=False)
+
+
+def rebuild_counters(db: Session) -> int:
+    """Пересобирает таблицу dashboard_counters с нуля, возвращает число ключей"""
+    _lock_counters(db)
+    totals = compute_counters(db)
+    now = datetime.utcnow()
+    db.bulk_insert_mappings(DashboardCounter, [
+        {"key": key, "value": value, "updated_at": now}
+        for key, value in totals.items() if value
+    ])
+    db.flush()
+    return len(totals)
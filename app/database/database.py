@@ -3,8 +3,11 @@ from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import StaticPool
 from datetime import datetime, timedelta
 import os
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
-from typing import Generator
+from typing import Any, Awaitable, Callable, Generator, TypeVar
 
 from .models import Base
 from ..config.settings import settings
@@ -25,11 +28,13 @@ logger.info(f"🔍 ОТЛАДКА: Исходный DATABASE_URL = {settings.DAT
 logger.info(f"🔍 ОТЛАДКА: Sync DATABASE_URL = {sync_database_url}")
 
 # Создание СИНХРОННОГО движка базы данных для админ-панели
+# StaticPool (одно соединение на процесс) нужен только для in-memory SQLite:
+# файловая БД получает обычный пул, так как сессии работают из пула потоков
 engine = create_engine(
     sync_database_url,
     echo=settings.DATABASE_ECHO,
     connect_args={"check_same_thread": False} if "sqlite" in sync_database_url else {},
-    poolclass=StaticPool if "sqlite" in sync_database_url else None,
+    poolclass=StaticPool if ":memory:" in sync_database_url else None,
 )
 
 logger.info(f"✅ Sync database engine created with dialect: {engine.dialect.name}")
@@ -77,6 +82,61 @@ def get_db_context():
     finally:
         db.close()
 
+# ========== ПУЛ ПОТОКОВ ДЛЯ СИНХРОННЫХ СЕССИЙ ==========
+# Async-обработчики, еще не переведенные на AsyncSession (app/core/database.py),
+# выполняют синхронные запросы здесь, а не в event loop uvicorn.
+# Пул ограничен, чтобы медленные отчеты не исчерпали соединения БД.
+
+db_executor = ThreadPoolExecutor(
+    max_workers=settings.DATABASE_THREADPOOL_SIZE,
+    thread_name_prefix="admin-db",
+)
+
+T = TypeVar("T")
+
+# Цикл событий, ожидающий функцию в текущем потоке пула (для wait_on_event_loop)
+_db_thread_state = threading.local()
+
+async def run_in_db_thread(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Выполняет func(db, *args, **kwargs) с синхронной сессией в пуле потоков.
+
+    Usage:
+        def _load(db):
+            return db.query(Project).count()
+
+        total = await run_in_db_thread(_load)
+    """
+    loop = asyncio.get_running_loop()
+
+    def _call() -> T:
+        _db_thread_state.loop = loop
+        try:
+            with get_db_context() as db:
+                return func(db, *args, **kwargs)
+        finally:
+            _db_thread_state.loop = None
+
+    return await loop.run_in_executor(db_executor, _call)
+
+def wait_on_event_loop(coro: Awaitable[T]) -> T:
+    """Выполняет корутину в цикле событий из функции, запущенной run_in_db_thread.
+
+    Для async-вызовов посреди работы с сессией (уведомление, чтение загруженного
+    файла): корутина идет в цикле событий, поток пула ждет ее результата.
+    Корутина не должна сама вызывать run_in_db_thread - пул может быть занят.
+    """
+    loop = getattr(_db_thread_state, "loop", None)
+    if loop is None:
+        raise RuntimeError("wait_on_event_loop вызывается только внутри run_in_db_thread")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+def shutdown_db_executor():
+    """Останавливает пул потоков БД (вызывается при остановке приложения)"""
+    db_executor.shutdown(wait=True)
+
+# Регистрация обработчиков, поддерживающих счетчики дашборда
+from . import dashboard_counters  # noqa: E402,F401
+
 def seed_initial_data():
     """Добавление начальных данных"""
     from .models import Settings, FAQ, Portfolio
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, Boolean, Float, JSON, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, Boolean, Float, JSON, ForeignKey, Index, LargeBinary, UniqueConstraint, false
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -1295,7 +1295,7 @@ class Task(Base):
     project_id = Column(Integer, ForeignKey("projects.id"), nullable=True)  # Связь с проектом (опционально)
 
     # Временные рамки
-    deadline = Column(DateTime, nullable=True)  # Дедлайн
+    deadline = Column(DateTime, nullable=True, index=True)  # Дедлайн
     estimated_hours = Column(Integer, nullable=True)  # Оценочное время в часах
     actual_hours = Column(Integer, nullable=True)  # Фактическое время
 
@@ -1308,12 +1308,13 @@ class Task(Base):
     deploy_url = Column(String(1000), nullable=True)  # Ссылка на задеплоенное приложение
 
     # Системные поля
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     completed_at = Column(DateTime, nullable=True)  # Время завершения
 
     # Дополнительные данные
     task_metadata = Column(JSON, default=lambda: {})  # Дополнительная информация
+    is_archived = Column(Boolean, default=False, server_default=false(), nullable=False, index=True)  # Архивирована ли задача
     
     # Связи
     assigned_to = relationship("AdminUser", foreign_keys=[assigned_to_id], back_populates="assigned_tasks")
@@ -1321,6 +1322,11 @@ class Task(Base):
     project = relationship("Project", back_populates="tasks")
     comments = relationship("TaskComment", back_populates="task")
     
+    # Индексы для списков задач исполнителя с фильтром по статусу
+    __table_args__ = (
+        Index('ix_tasks_assignee_status_created', 'assigned_to_id', 'status', 'created_at'),
+    )
+    
     def to_dict(self):
         return {
             "id": self.id,
@@ -1344,6 +1350,7 @@ class Task(Base):
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
             "completed_at": self.completed_at.isoformat() if self.completed_at else None,
             "task_metadata": self.task_metadata,
+            "is_archived": bool(self.is_archived),
             "assigned_to": self.assigned_to.to_dict() if self.assigned_to else None,
             "created_by": self.created_by.to_dict() if self.created_by else None,
             "comments_count": len(self.comments) if self.comments else 0
@@ -1374,14 +1381,13 @@ class TaskComment(Base):
     __tablename__ = "task_comments"
 
     id = Column(Integer, primary_key=True, index=True)
-    task_id = Column(Integer, ForeignKey("tasks.id"), nullable=False)
+    task_id = Column(Integer, ForeignKey("tasks.id"), nullable=False, index=True)
     author_id = Column(Integer, ForeignKey("admin_users.id"), nullable=False)  # Автор комментария
     comment = Column(Text, nullable=False)  # Текст комментария
     comment_type = Column(String(50), default="general")  # general, status_change, deadline_change
     is_internal = Column(Boolean, default=False)  # Внутренний комментарий (только для команды)
     attachments = Column(JSON, default=lambda: [])  # Прикрепленные файлы/скриншоты [{"filename": "...", "path": "...", "type": "image"}]
-    is_read = Column(Boolean, default=False)  # Прочитан ли комментарий
-    read_by = Column(JSON, default=lambda: [])  # Список ID пользователей, прочитавших комментарий
+    is_read = Column(Boolean, default=False)  # Прочитан ли комментарий хоть кем-то
     created_at = Column(DateTime, default=datetime.utcnow)
 
     # Связи
@@ -1398,11 +1404,18 @@ class TaskComment(Base):
             "is_internal": self.is_internal,
             "attachments": self.attachments or [],
             "is_read": self.is_read,
-            "read_by": self.read_by or [],
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "author": self.author.to_dict() if self.author else None
         }
 
+class TaskCommentRead(Base):
+    """Отметка о прочтении комментария к задаче пользователем"""
+    __tablename__ = "task_comment_reads"
+
+    comment_id = Column(Integer, ForeignKey("task_comments.id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("admin_users.id"), primary_key=True)
+    read_at = Column(DateTime, default=datetime.utcnow)
+
 # Модели для системы учета средств с OCR распознаванием чеков
 
 class MoneyTransaction(Base):
@@ -1856,6 +1869,11 @@ class ProjectChatMessage(Base):
     chat = relationship("ProjectChat", back_populates="messages")
     related_revision = relationship("ProjectRevision", foreign_keys=[related_revision_id])
 
+    __table_args__ = (
+        # Последнее сообщение чата для списка чатов (app/database/chat_inbox.py)
+        Index('ix_project_chat_messages_chat_created', 'chat_id', 'created_at'),
+    )
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -1972,6 +1990,104 @@ class BalanceTransaction(Base):
         }
 
 
+# === DASHBOARD: Инкрементальные счетчики KPI ===
+
+class DashboardCounter(Base):
+    """Счетчик KPI дашборда, обновляемый инкрементально при изменении данных"""
+    __tablename__ = "dashboard_counters"
+
+    key = Column(String(200), primary_key=True)  # projects.count.new, tasks.status.0.pending, ...
+    value = Column(Float, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            "key": self.key,
+            "value": self.value,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None
+        }
+
+# === AVITO: Курсоры polling'а чатов ===
+
+class AvitoPollCursor(Base):
+    """Позиция polling'а чата Avito: до какого сообщения чат уже обработан"""
+    __tablename__ = "avito_poll_cursors"
+
+    chat_id = Column(String(100), primary_key=True)
+    chat_updated = Column(BigInteger, nullable=False, default=0)  # chat.updated на момент последней проверки
+    last_message_created = Column(BigInteger, nullable=False, default=0)  # created последнего обработанного сообщения
+    last_message_ids = Column(JSON, default=lambda: [])  # ID сообщений с этим created (их немного)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+# === TELEGRAM: Прогресс массовых рассылок ===
+
+class BroadcastDelivery(Base):
+    """Итог доставки сообщения рассылки одному получателю (для возобновления рассылки)"""
+    __tablename__ = "broadcast_deliveries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    broadcast_id = Column(String(64), nullable=False)
+    chat_id = Column(BigInteger, nullable=False)
+    status = Column(String(20), nullable=False)  # sent, failed, blocked
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, default=1)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index('ix_broadcast_deliveries_broadcast_chat', 'broadcast_id', 'chat_id', unique=True),
+    )
+
+# === LLM: Кэш ответов модели ===
+
+class LLMCacheEntry(Base):
+    """Сохраненный ответ LLM, ключ - хэш модели, промптов и параметров запроса"""
+    __tablename__ = "llm_cache_entries"
+
+    key = Column(String(64), primary_key=True)
+    namespace = Column(String(50), nullable=False)  # вызывающий метод: consultant, tz, sales_offer
+    model = Column(String(100), nullable=False)
+    response = Column(JSON, nullable=False)  # ChatCompletion.model_dump()
+    latency = Column(Float, default=0.0)  # время исходного запроса к модели, сек
+    hits = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+# === Уведомления: транзакционный outbox ===
+
+class NotificationOutbox(Base):
+    """Уведомление в Telegram, записанное в одной транзакции с исходным событием"""
+    __tablename__ = "notification_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    recipient_id = Column(BigInteger, nullable=False)  # telegram_id получателя
+    kind = Column(String(50), nullable=False)  # project_chat_message
+    payload = Column(JSON, nullable=False)
+    status = Column(String(20), default="pending")  # pending, sent, failed
+    attempts = Column(Integer, default=0)
+    last_error = Column(Text, nullable=True)
+    available_at = Column(DateTime, default=datetime.utcnow)  # не раньше этого времени (повторы, аренда воркером)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index('ix_notification_outbox_status_available', 'status', 'available_at'),
+    )
+
+class BotPersistenceEntry(Base):
+    """Сохраненное состояние бота: user_data, chat_data, bot_data или состояние разговора"""
+    __tablename__ = "bot_persistence"
+
+    id = Column(Integer, primary_key=True, index=True)
+    namespace = Column(String(100), nullable=False)  # user_data, chat_data, bot_data, callback_data, conversation:<имя>
+    key = Column(String(255), nullable=False)  # id пользователя/чата или ключ разговора в JSON
+    data = Column(LargeBinary, nullable=False)  # pickle
+    updated_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+    __table_args__ = (
+        UniqueConstraint('namespace', 'key', name='uq_bot_persistence_namespace_key'),
+    )
+
 # === CRM AUTO-SYNC: Автоматическое создание клиента при создании пользователя ===
 from sqlalchemy import event
 
@@ -2014,3 +2130,18 @@ def create_crm_client_for_user(mapper, connection, target):
         print(f"❌ [AUTO-CRM] Ошибка: {e}")
         import traceback
         traceback.print_exc()
+
+
+@event.listens_for(Project, 'after_insert')
+def create_chat_for_project(mapper, connection, target):
+    """Чат создается вместе с проектом, чтобы список чатов ничего не создавал при чтении"""
+    now = datetime.utcnow()
+    connection.execute(ProjectChat.__table__.insert().values(
+        project_id=target.id,
+        created_at=now,
+        updated_at=now,
+        unread_by_executor=0,
+        unread_by_client=0,
+        is_pinned_by_owner=False,
+        is_hidden_by_owner=False
+    ))
@@ -2,6 +2,7 @@
 Enterprise CRM - FastAPI Application Entry Point
 """
 
+import asyncio
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request, Response
@@ -67,10 +68,15 @@ async def lifespan(app: FastAPI):
 
     # Initialize metrics
     logger.info("initializing_metrics")
-    from app.core.metrics import init_application_info, update_system_metrics
+    from app.core.metrics import (
+        init_application_info,
+        update_system_metrics,
+        monitor_event_loop_lag,
+    )
 
     init_application_info()
     update_system_metrics()
+    lag_monitor = asyncio.create_task(monitor_event_loop_lag())
     logger.info("metrics_initialized")
 
     # Application is ready
@@ -84,11 +90,15 @@ async def lifespan(app: FastAPI):
     # ==== SHUTDOWN ====
     logger.info("application_shutdown")
 
+    lag_monitor.cancel()
+
     # Close database connections
     await close_db_connection()
     logger.info("database_connections_closed")
 
     # Close Redis connections
+    from app.services.realtime_hub import realtime_hub
+    await realtime_hub.close()
     await redis_manager.close_all()
     logger.info("redis_connections_closed")
 
@@ -240,11 +250,13 @@ from app.modules.users import router as users_router, auth_router
 
 # Import transcription router
 from app.api.transcription import router as transcription_router
+from app.api.transcription_stream import router as transcription_stream_router
 
 # Register module routers to API v1
 api_v1_router.include_router(auth_router)
 api_v1_router.include_router(users_router)
 api_v1_router.include_router(transcription_router)
+api_v1_router.include_router(transcription_stream_router)
 
 # Register logistics routers (temporarily commented out)
 # api_v1_router.include_router(vehicles_router)
@@ -300,6 +312,7 @@ async def api_v1_root():
                 "finalize": "/api/v1/transcription/finalize",
                 "upload_video": "/api/v1/transcription/upload-video",
                 "status": "/api/v1/transcription/status/{task_id}",
+                "stream": "/api/v1/transcription/stream/{task_id}",
                 "download": "/api/v1/transcription/download/{filename}",
                 "health": "/api/v1/transcription/health",
             },
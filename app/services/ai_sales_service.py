@@ -4,9 +4,11 @@ AI Sales Assistant Service - Умный помощник продажника д
 
 import json
 import logging
+import time
 from typing import Dict, List, Optional, Any
 from datetime import datetime
 
+from ..services.llm_cache import llm_cache
 from ..services.openai_service import get_openai_client
 from ..config.settings import settings
 
@@ -171,16 +173,24 @@ class AISalesService:
         
         Максимум 1000 символов, без воды!"""
 
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+        
         try:
-            response = self.openai_client.chat.completions.create(
-                model=settings.DEFAULT_MODEL,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                max_tokens=500,
-                temperature=0.8
-            )
+            # Оффер зависит только от сферы и контекста клиента - повторные запросы берем из кэша
+            cache_key = llm_cache.make_key(settings.DEFAULT_MODEL, messages, max_tokens=500, temperature=0.8)
+            response = llm_cache.get(cache_key, "sales_offer")
+            if response is None:
+                started = time.perf_counter()
+                response = self.openai_client.chat.completions.create(
+                    model=settings.DEFAULT_MODEL,
+                    messages=messages,
+                    max_tokens=500,
+                    temperature=0.8
+                )
+                llm_cache.set(cache_key, "sales_offer", settings.DEFAULT_MODEL, response, time.perf_counter() - started)
             
             offer = response.choices[0].message.content.strip()
             
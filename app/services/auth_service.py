@@ -5,11 +5,79 @@
 from sqlalchemy.orm import Session
 from app.database.models import AdminUser
 from app.database.database import get_db_connection
+from app.config.settings import settings
+from collections import OrderedDict
 from datetime import datetime
 import hashlib
+import hmac
 import base64
+import secrets
+import threading
+import time
 from typing import Optional, Tuple
 
+class CredentialCache:
+    """Кеш проверенных учетных данных HTTP Basic с TTL и ограничением размера.
+
+    Ключ - HMAC от пары логин/пароль с секретом процесса, поэтому пароли
+    в памяти не хранятся. Значение - снимок данных пользователя из БД.
+    """
+
+    def __init__(self, ttl_seconds: int = 300, max_size: int = 1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._secret = secrets.token_bytes(32)
+        self._entries: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, username: str, password: str) -> str:
+        message = f"{username}\0{password}".encode()
+        return hmac.new(self._secret, message, hashlib.sha256).hexdigest()
+
+    def get(self, username: str, password: str) -> Optional[dict]:
+        """Данные пользователя, если учетные данные недавно проверялись"""
+        key = self._key(username, password)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, user_data = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return dict(user_data)
+
+    def put(self, username: str, password: str, user_data: dict):
+        """Запоминает успешно проверенные учетные данные"""
+        if self.ttl_seconds <= 0:
+            return  # кеш отключен
+        key = self._key(username, password)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, dict(user_data))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id: int):
+        """Удаляет все записи пользователя (смена пароля, деактивация).
+
+        Только в текущем процессе: другие воркеры сбросят запись по TTL.
+        """
+        with self._lock:
+            stale = [key for key, (_, data) in self._entries.items() if data.get("id") == user_id]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+credential_cache = CredentialCache(
+    ttl_seconds=settings.AUTH_CACHE_TTL,
+    max_size=settings.AUTH_CACHE_MAX_SIZE,
+)
+
 class AuthService:
     """Сервис для управления аутентификацией админ-панели"""
     
@@ -18,6 +86,42 @@ class AuthService:
         """Хеширование пароля"""
         return hashlib.sha256(password.encode()).hexdigest()
     
+    @staticmethod
+    def get_cached_user(username: str, password: str) -> Optional[dict]:
+        """Данные пользователя из БД с кешированием успешных проверок.
+
+        Повторные запросы с теми же учетными данными не обращаются к БД
+        и не пересчитывают хеш пароля, пока запись кеша не устарела.
+        """
+        user_data = credential_cache.get(username, password)
+        if user_data is not None:
+            return user_data
+
+        db = next(get_db_connection())
+        try:
+            user = db.query(AdminUser).filter(
+                AdminUser.username == username,
+                AdminUser.is_active == True
+            ).first()
+
+            if not user or not AuthService.verify_password(password, user.password_hash):
+                return None
+
+            user_data = {
+                "id": user.id,
+                "username": user.username,
+                "email": user.email,
+                "first_name": user.first_name,
+                "last_name": user.last_name,
+                "role": user.role,
+                "is_active": user.is_active
+            }
+        finally:
+            db.close()
+
+        credential_cache.put(username, password, user_data)
+        return dict(user_data)
+
     @staticmethod
     def verify_password(password: str, password_hash: str) -> bool:
         """Проверка пароля"""
@@ -155,6 +259,7 @@ class AuthService:
             if user:
                 user.password_hash = AuthService.hash_password(new_password)
                 db.commit()
+                credential_cache.invalidate_user(user_id)
                 return True
             return False
         except Exception as e:
@@ -173,6 +278,7 @@ class AuthService:
             if user:
                 user.is_active = False
                 db.commit()
+                credential_cache.invalidate_user(user_id)
                 return True
             return False
         except Exception as e:
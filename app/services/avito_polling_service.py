@@ -4,14 +4,15 @@
 
 import asyncio
 import logging
-from datetime import datetime, timedelta
+from datetime import timedelta
 from typing import Dict, List, Optional
 import json
 
 from ..services.avito_service import get_avito_service
 from ..services.notification_service import NotificationService
 from ..services.employee_notification_service import employee_notification_service
-from ..database.database import get_db_context
+from ..database.database import get_db_context, run_in_db_thread
+from ..database.models import AvitoPollCursor
 from ..config.settings import settings
 
 logger = logging.getLogger(__name__)
@@ -21,8 +22,10 @@ class AvitoPollingService:
     
     def __init__(self):
         self.notification_service = NotificationService()
-        self.last_check: Dict[str, datetime] = {}
-        self.known_messages: Dict[str, set] = {}  # chat_id -> set of message IDs
+        # chat_id -> {"chat_updated", "last_message_created", "last_message_ids"};
+        # загружаются из avito_poll_cursors при первой проверке
+        self.cursors: Optional[Dict[str, dict]] = None
+        self.concurrency = settings.AVITO_POLL_CONCURRENCY
         self.auto_response_enabled = False
         self.polling_active = False
         self._initialize_bot()
@@ -66,7 +69,7 @@ class AvitoPollingService:
         logger.info("Avito polling остановлен")
     
     async def check_new_messages(self):
-        """Проверка новых сообщений во всех чатах"""
+        """Проверка новых сообщений в чатах, изменившихся с прошлой проверки"""
         try:
             avito_service = get_avito_service()  # Убираем await - это обычная функция
             if not avito_service:
@@ -78,54 +81,132 @@ class AvitoPollingService:
             if not chats:
                 logger.info("Чаты не найдены")
                 return
+            
+            # Первый запуск без сохраненных курсоров: только запоминаем текущее состояние
+            if self.cursors is None:
+                self.cursors = await run_in_db_thread(self._load_cursors)
+            first_run = not self.cursors
+            
+            # Сообщения загружаем только для чатов, у которых изменился updated
+            changed_chats = [
+                chat for chat in chats
+                if chat.updated > self.cursors.get(chat.id, {}).get("chat_updated", 0)
+            ]
+            if not changed_chats:
+                logger.debug(f"Изменений в {len(chats)} чатах нет")
+                return
                 
-            logger.info(f"Проверяем {len(chats)} чатов на новые сообщения")
+            logger.info(f"Проверяем {len(changed_chats)} из {len(chats)} чатов на новые сообщения")
+            
+            semaphore = asyncio.Semaphore(self.concurrency)
+            
+            async def check(chat):
+                async with semaphore:
+                    return await self.check_chat_for_new_messages(chat, notify=not first_run)
             
-            for chat in chats:
-                await self.check_chat_for_new_messages(chat)
+            results = await asyncio.gather(*(check(chat) for chat in changed_chats))
+            
+            updated_cursors = {
+                chat.id: cursor for chat, cursor in zip(changed_chats, results) if cursor
+            }
+            if updated_cursors:
+                self.cursors.update(updated_cursors)
+                await run_in_db_thread(self._save_cursors, updated_cursors)
                 
         except Exception as e:
             logger.error(f"Ошибка при проверке новых сообщений: {e}")
             import traceback
             logger.error(f"Traceback: {traceback.format_exc()}")
     
-    async def check_chat_for_new_messages(self, chat):
-        """Проверка новых сообщений в конкретном чате"""
+    async def check_chat_for_new_messages(self, chat, notify: bool = True) -> Optional[dict]:
+        """Проверка новых сообщений в конкретном чате, возвращает новый курсор чата"""
         chat_id = chat.id  # Используем атрибут объекта, а не индекс словаря
+        cursor = (self.cursors or {}).get(chat_id, {})
+        previous_updated = cursor.get("chat_updated", 0)
+        last_created = cursor.get("last_message_created", 0)
+        last_ids = set(cursor.get("last_message_ids") or [])
         
         try:
             # Получаем сообщения чата БЕЗ кэширования (для polling)
             avito_service = get_avito_service()  # Убираем await
             messages = await avito_service.get_chat_messages_no_cache(chat_id)
             
-            if not messages:
-                return
-                
-            # Инициализируем set известных сообщений для чата
-            if chat_id not in self.known_messages:
-                self.known_messages[chat_id] = set()
-                # При первом запуске просто запоминаем все текущие сообщения
-                for msg in messages:
-                    self.known_messages[chat_id].add(msg.id)  # Используем атрибут объекта
-                return
-            
-            # Ищем новые сообщения
-            new_messages = []
-            for msg in messages:
-                if msg.id not in self.known_messages[chat_id]:  # Используем атрибут объекта
-                    new_messages.append(msg)
-                    self.known_messages[chat_id].add(msg.id)  # Используем атрибут объекта
+            # Новые - те, что позже курсора (сообщения с тем же created сверяем по ID)
+            new_messages = sorted(
+                (
+                    msg for msg in messages
+                    if msg.created > last_created or (msg.created == last_created and msg.id not in last_ids)
+                ),
+                key=lambda msg: msg.created
+            )
             
-            # Обрабатываем новые сообщения
-            if new_messages:
+            # При первом запуске (сохраненных курсоров нет) только запоминаем позицию
+            if new_messages and notify:
                 logger.info(f"Найдено {len(new_messages)} новых сообщений в чате {chat_id}")
                 for message in new_messages:
                     await self.process_new_message(chat, message)
+                    last_created, last_ids = self._advance(last_created, last_ids, message)
+                    # Позицию сохраняем после каждого сообщения, а chat_updated - только
+                    # в конце: при сбое чат перепроверится с первого необработанного
+                    await self._commit_cursor(chat_id, {
+                        "chat_updated": previous_updated,
+                        "last_message_created": last_created,
+                        "last_message_ids": sorted(last_ids)
+                    })
             else:
+                for message in new_messages:
+                    last_created, last_ids = self._advance(last_created, last_ids, message)
                 logger.debug(f"Новых сообщений в чате {chat_id} нет")
+            
+            return {
+                "chat_updated": chat.updated,
+                "last_message_created": last_created,
+                "last_message_ids": sorted(last_ids)
+            }
                 
         except Exception as e:
+            # chat_updated не сдвигаем - чат будет проверен на следующем цикле
+            # начиная с первого необработанного сообщения
             logger.error(f"Ошибка при проверке чата {chat_id}: {e}")
+            return None
+    
+    @staticmethod
+    def _advance(last_created: int, last_ids: set, message):
+        """Позиция курсора после сообщения (сообщения идут по возрастанию created)"""
+        if message.created > last_created:
+            return message.created, {message.id}
+        return last_created, last_ids | {message.id}
+    
+    async def _commit_cursor(self, chat_id: str, cursor: dict):
+        if self.cursors is not None:
+            self.cursors[chat_id] = cursor
+        await run_in_db_thread(self._save_cursors, {chat_id: cursor})
+    
+    @staticmethod
+    def _load_cursors(db) -> Dict[str, dict]:
+        return {
+            row.chat_id: {
+                "chat_updated": row.chat_updated or 0,
+                "last_message_created": row.last_message_created or 0,
+                "last_message_ids": row.last_message_ids or []
+            }
+            for row in db.query(AvitoPollCursor).all()
+        }
+    
+    @staticmethod
+    def _save_cursors(db, cursors: Dict[str, dict]):
+        existing = {
+            row.chat_id: row
+            for row in db.query(AvitoPollCursor).filter(AvitoPollCursor.chat_id.in_(list(cursors)))
+        }
+        for chat_id, cursor in cursors.items():
+            row = existing.get(chat_id)
+            if row is None:
+                row = AvitoPollCursor(chat_id=chat_id)
+                db.add(row)
+            row.chat_updated = cursor["chat_updated"]
+            row.last_message_created = cursor["last_message_created"]
+            row.last_message_ids = cursor["last_message_ids"]
     
     async def process_new_message(self, chat, message):
         """Обработка нового сообщения"""
@@ -16,6 +16,8 @@ import redis.asyncio as aioredis
 import pickle
 import hashlib
 
+from ..config.settings import settings
+
 logger = logging.getLogger(__name__)
 
 class MessageType(Enum):
@@ -102,44 +104,73 @@ class AvitoService:
         self.cache_ttl = 30   # 30 секунд TTL для кэша чатов
         self.messages_cache_ttl = 600  # 10 минут для сообщений
         
+        # Общая HTTP-сессия (создается лениво внутри event loop)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop = None
+        
         # Проверяем наличие обязательных параметров
         if not self.client_id or not self.client_secret:
             raise ValueError("client_id and client_secret are required for Avito service")
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Общая HTTP-сессия: keep-alive соединения и DNS-кэш переиспользуются между запросами"""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=settings.AVITO_HTTP_POOL_SIZE,
+                limit_per_host=settings.AVITO_HTTP_POOL_PER_HOST,
+                keepalive_timeout=settings.AVITO_HTTP_KEEPALIVE,
+                ttl_dns_cache=300
+            )
+            timeout = aiohttp.ClientTimeout(
+                total=settings.AVITO_HTTP_TIMEOUT,
+                connect=settings.AVITO_HTTP_CONNECT_TIMEOUT
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+            self._session_loop = loop
+        return self._session
+    
+    async def close(self):
+        """Закрыть HTTP-сессию (при остановке приложения)"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._session_loop = None
         
     async def _get_access_token(self) -> str:
         """Получение токена доступа через OAuth 2.0 client_credentials"""
         if self.access_token and self.token_expires_at and datetime.now() < self.token_expires_at:
             return self.access_token
             
-        async with aiohttp.ClientSession() as session:
-            data = {
-                "grant_type": "client_credentials",
-                "client_id": self.client_id,
-                "client_secret": self.client_secret,
-                "scope": "messenger:read messenger:write"
-            }
+        session = await self._get_session()
+        data = {
+            "grant_type": "client_credentials",
+            "client_id": self.client_id,
+            "client_secret": self.client_secret,
+            "scope": "messenger:read messenger:write"
+        }
             
-            headers = {
-                "Content-Type": "application/x-www-form-urlencoded"
-            }
+        headers = {
+            "Content-Type": "application/x-www-form-urlencoded"
+        }
             
-            logger.info(f"Getting access token for client_id: {self.client_id[:10] if self.client_id else 'None'}...")
+        logger.info(f"Getting access token for client_id: {self.client_id[:10] if self.client_id else 'None'}...")
             
-            async with session.post(self.auth_url, data=data, headers=headers) as response:
-                response_text = await response.text()
-                logger.info(f"Token response status: {response.status}")
+        async with session.post(self.auth_url, data=data, headers=headers) as response:
+            response_text = await response.text()
+            logger.info(f"Token response status: {response.status}")
                 
-                if response.status != 200:
-                    logger.error(f"Failed to get access token: {response_text}")
-                    raise Exception(f"Failed to get access token (status {response.status}): {response_text}")
+            if response.status != 200:
+                logger.error(f"Failed to get access token: {response_text}")
+                raise Exception(f"Failed to get access token (status {response.status}): {response_text}")
                     
-                result = await response.json()
-                self.access_token = result["access_token"]
-                expires_in = result.get("expires_in", 3600)
-                self.token_expires_at = datetime.now() + timedelta(seconds=expires_in - 60)
+            result = await response.json()
+            self.access_token = result["access_token"]
+            expires_in = result.get("expires_in", 3600)
+            self.token_expires_at = datetime.now() + timedelta(seconds=expires_in - 60)
                 
-                logger.info(f"Access token received, expires in {expires_in} seconds")
-                return self.access_token
+            logger.info(f"Access token received, expires in {expires_in} seconds")
+            return self.access_token
 
     async def _get_redis_client(self):
         """Получение клиента Redis для кэширования"""
@@ -215,37 +246,37 @@ class AvitoService:
         
         logger.info(f"Making API request: {method} {endpoint}")
         
-        async with aiohttp.ClientSession() as session:
-            async with session.request(method, url, headers=headers, **kwargs) as response:
-                response_text = await response.text()
-                logger.debug(f"API response status: {response.status}, body length: {len(response_text)}")
+        session = await self._get_session()
+        async with session.request(method, url, headers=headers, **kwargs) as response:
+            response_text = await response.text()
+            logger.debug(f"API response status: {response.status}, body length: {len(response_text)}")
                 
-                if response.status == 403:
-                    logger.error(f"Access denied (403): {response_text}")
-                    error_msg = "Permission denied. Check User ID and app permissions."
-                    try:
-                        error_data = await response.json()
-                        if error_data.get("error", {}).get("message"):
-                            error_msg = error_data["error"]["message"]
-                    except:
-                        pass
-                    raise Exception(f"403 Forbidden: {error_msg}")
+            if response.status == 403:
+                logger.error(f"Access denied (403): {response_text}")
+                error_msg = "Permission denied. Check User ID and app permissions."
+                try:
+                    error_data = await response.json()
+                    if error_data.get("error", {}).get("message"):
+                        error_msg = error_data["error"]["message"]
+                except:
+                    pass
+                raise Exception(f"403 Forbidden: {error_msg}")
                     
-                if response.status not in [200, 201]:
-                    logger.error(f"API request failed: {response_text}")
-                    raise Exception(f"API request failed with status {response.status}: {response_text}")
+            if response.status not in [200, 201]:
+                logger.error(f"API request failed: {response_text}")
+                raise Exception(f"API request failed with status {response.status}: {response_text}")
                     
-                try:
-                    return await response.json()
-                except Exception as e:
-                    logger.debug(f"Failed to parse JSON response: {e}")
-                    logger.debug(f"Response text: {response_text[:500]}")
-                    if response.status == 200:
-                        # Если статус 200, но JSON не парсится, пробуем интерпретировать как простой текст
-                        if response_text.strip() == '{"ok": true}' or 'true' in response_text.lower():
-                            return {"ok": True}
-                        return {"ok": True, "message": response_text}
-                    return {}
+            try:
+                return await response.json()
+            except Exception as e:
+                logger.debug(f"Failed to parse JSON response: {e}")
+                logger.debug(f"Response text: {response_text[:500]}")
+                if response.status == 200:
+                    # Если статус 200, но JSON не парсится, пробуем интерпретировать как простой текст
+                    if response_text.strip() == '{"ok": true}' or 'true' in response_text.lower():
+                        return {"ok": True}
+                    return {"ok": True, "message": response_text}
+                return {}
     
     async def get_chats(self, unread_only: bool = False, limit: int = 100, offset: int = 0) -> List[AvitoChat]:
         """Получение списка чатов с кэшированием"""
@@ -460,19 +491,19 @@ class AvitoService:
         
         url = f"{self.base_url}/messenger/v1/accounts/{self.user_id}/uploadImages"
         
-        async with aiohttp.ClientSession() as session:
-            data = aiohttp.FormData()
-            data.add_field('uploadfile[]', image_data, filename='image.jpg', content_type='image/jpeg')
+        session = await self._get_session()
+        data = aiohttp.FormData()
+        data.add_field('uploadfile[]', image_data, filename='image.jpg', content_type='image/jpeg')
             
-            async with session.post(url, headers=headers, data=data) as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    logger.error(f"Failed to upload image: {error_text}")
-                    raise Exception(f"Failed to upload image: {error_text}")
+        async with session.post(url, headers=headers, data=data) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                logger.error(f"Failed to upload image: {error_text}")
+                raise Exception(f"Failed to upload image: {error_text}")
                     
-                result = await response.json()
-                # Возвращаем ID первого загруженного изображения
-                return list(result.keys())[0]
+            result = await response.json()
+            # Возвращаем ID первого загруженного изображения
+            return list(result.keys())[0]
     
     async def mark_chat_as_read(self, chat_id: str) -> bool:
         """Отметить чат как прочитанный"""
@@ -574,7 +605,14 @@ avito_service = None
 def init_avito_service(client_id: str, client_secret: str, user_id: int):
     """Инициализация сервиса Авито"""
     global avito_service
+    previous = avito_service
     avito_service = AvitoService(client_id, client_secret, user_id)
+    if previous is not None:
+        # Закрываем HTTP-сессию заменяемого экземпляра
+        try:
+            asyncio.get_running_loop().create_task(previous.close())
+        except RuntimeError:
+            pass  # вне event loop сессия еще не создавалась
     return avito_service
 
 def get_avito_service() -> AvitoService:
@@ -0,0 +1,141 @@
+"""
+Снимок KPI дашборда на основе инкрементальных счетчиков
+"""
+import asyncio
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ..config.logging import get_logger
+from ..config.settings import settings
+from ..database.database import run_in_db_thread
+from ..database.dashboard_counters import ACTIVE_PROJECT_STATUSES, rebuild_counters
+from ..database.models import DashboardCounter
+
+logger = get_logger(__name__)
+
+
+class DashboardSnapshot:
+    """Прочитанные за один запрос счетчики дашборда"""
+
+    def __init__(self, counters: Dict[str, float], clients_count: int):
+        self.counters = counters
+        self.clients_count = clients_count
+
+    def get(self, key: str) -> float:
+        return self.counters.get(key, 0)
+
+    def by_prefix(self, prefix: str) -> Dict[str, float]:
+        """Счетчики с заданным префиксом: {остаток_ключа: значение}"""
+        prefix = prefix + '.'
+        return {
+            key[len(prefix):]: value
+            for key, value in self.counters.items()
+            if key.startswith(prefix)
+        }
+
+    def sum_for(self, prefix: str, suffixes: Iterable[str]) -> float:
+        return sum(self.get(f'{prefix}.{suffix}') for suffix in suffixes)
+
+    # ---- Проекты ----
+
+    def projects_by_status(self) -> Dict[str, int]:
+        return {status: int(count) for status, count in self.by_prefix('projects.count').items() if count}
+
+    @property
+    def total_projects(self) -> int:
+        return int(sum(self.by_prefix('projects.count').values()))
+
+    @property
+    def active_projects(self) -> int:
+        return int(self.sum_for('projects.count', ACTIVE_PROJECT_STATUSES))
+
+    # ---- Задачи ----
+
+    def tasks_by_status(self, include_archived: bool = True, assignee_id: Optional[int] = None) -> Dict[str, int]:
+        """Количество задач по статусам (всех или одного исполнителя)"""
+        prefix = 'tasks.status' if assignee_id is None else f'tasks.assignee.{assignee_id}'
+        result: Dict[str, int] = {}
+        for suffix, count in self.by_prefix(prefix).items():
+            archived, status = suffix.split('.', 1)
+            if archived == '1' and not include_archived:
+                continue
+            result[status] = result.get(status, 0) + int(count)
+        return result
+
+    def tasks_by_priority(self, include_archived: bool = False) -> Dict[str, int]:
+        result: Dict[str, int] = {}
+        for suffix, count in self.by_prefix('tasks.priority').items():
+            archived, priority = suffix.split('.', 1)
+            if archived == '1' and not include_archived:
+                continue
+            result[priority] = result.get(priority, 0) + int(count)
+        return result
+
+    # ---- Финансы ----
+
+    def month_revenue(self, month: datetime) -> float:
+        """Доходы минус расходы (завершенные транзакции) за месяц"""
+        key = month.strftime('%Y-%m')
+        return (
+            self.get(f'transactions.income.completed.{key}')
+            - self.get(f'transactions.expense.completed.{key}')
+        )
+
+
+class DashboardSnapshotService:
+    """Чтение снимка KPI и периодическая полная пересборка счетчиков"""
+
+    def __init__(self):
+        self.rebuild_interval = settings.DASHBOARD_REBUILD_INTERVAL
+        self.is_running = False
+        self.task_handle: Optional[asyncio.Task] = None
+
+    def get_snapshot(self, db: Session) -> DashboardSnapshot:
+        """Снимок за два запроса к небольшой таблице, независимо от объема данных"""
+        rows = db.query(DashboardCounter.key, DashboardCounter.value).filter(
+            ~DashboardCounter.key.like('projects.user.%')
+        ).all()
+        clients_count = db.query(func.count(DashboardCounter.key)).filter(
+            DashboardCounter.key.like('projects.user.%'),
+            DashboardCounter.value > 0.5
+        ).scalar() or 0
+        return DashboardSnapshot(dict(rows), clients_count)
+
+    def rebuild(self, db: Session) -> int:
+        """Полная пересборка счетчиков (исправляет накопившиеся расхождения)"""
+        keys = rebuild_counters(db)
+        logger.info(f"Счетчики дашборда пересобраны: {keys} ключей")
+        return keys
+
+    async def start(self):
+        """Запустить периодическую пересборку (первая - сразу при старте)"""
+        if self.is_running:
+            return
+        self.is_running = True
+        self.task_handle = asyncio.create_task(self._rebuild_loop())
+        logger.info("Периодическая пересборка счетчиков дашборда запущена")
+
+    async def stop(self):
+        self.is_running = False
+        if self.task_handle:
+            self.task_handle.cancel()
+            try:
+                await self.task_handle
+            except asyncio.CancelledError:
+                pass
+
+    async def _rebuild_loop(self):
+        while self.is_running:
+            try:
+                await run_in_db_thread(self.rebuild)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Ошибка пересборки счетчиков дашборда: {e}")
+            await asyncio.sleep(self.rebuild_interval)
+
+
+dashboard_snapshot_service = DashboardSnapshotService()
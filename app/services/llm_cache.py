@@ -0,0 +1,176 @@
+"""
+Кэш ответов LLM
+
+Ключ - sha256 от модели, параметров генерации, системного промпта и
+нормализованного пользовательского промпта (регистр и пробелы не влияют).
+Записи хранятся в таблице llm_cache_entries основной БД с TTL; сверх
+LLM_CACHE_MAX_ENTRIES вытесняются давно не использованные (LRU).
+
+Кэширование включается на месте вызова: OpenAIService._chat(..., cache="tz")
+или get/set для синхронных клиентов. Ответ возвращается как ChatCompletion,
+поэтому вызывающий код не отличает попадание в кэш от запроса к модели.
+"""
+
+import hashlib
+import json
+import re
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from openai.types.chat import ChatCompletion
+
+from ..config.logging import get_logger
+from ..config.settings import settings
+from ..database.database import get_db_context, run_in_db_thread
+from ..database.models import LLMCacheEntry
+
+try:
+    from ..core.metrics import llm_cache_latency_saved_seconds_total, llm_cache_requests_total
+except ImportError:  # метрики Prometheus необязательны
+    llm_cache_latency_saved_seconds_total = llm_cache_requests_total = None
+
+logger = get_logger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _normalize(text: str, casefold: bool = False) -> str:
+    text = _WHITESPACE.sub(" ", text or "").strip()
+    return text.casefold() if casefold else text
+
+
+class LLMResponseCache:
+    """Кэш ответов chat.completions с TTL, LRU-вытеснением и статистикой попаданий"""
+
+    def __init__(self, ttl: int = None, max_entries: int = None, enabled: bool = None):
+        self.ttl = ttl or settings.LLM_CACHE_TTL
+        self.max_entries = max_entries or settings.LLM_CACHE_MAX_ENTRIES
+        self.enabled = settings.LLM_CACHE_ENABLED if enabled is None else enabled
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict[str, Any]], **params) -> str:
+        """Ключ кэша; пользовательские сообщения сравниваются без учета регистра и пробелов"""
+        payload = {
+            "model": model,
+            "params": {k: params[k] for k in sorted(params)},
+            "messages": [
+                [m.get("role"), _normalize(m.get("content"), casefold=m.get("role") == "user")]
+                for m in messages
+            ],
+        }
+        return hashlib.sha256(json.dumps(payload, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Попадания, промахи, доля попаданий и сэкономленное время по местам вызова"""
+        result = {}
+        for namespace, s in self._stats.items():
+            lookups = s["hits"] + s["misses"]
+            result[namespace] = {
+                "hits": int(s["hits"]),
+                "misses": int(s["misses"]),
+                "hit_rate": round(s["hits"] / lookups, 3) if lookups else 0.0,
+                "latency_saved_seconds": round(s["latency_saved"], 2),
+            }
+        return result
+
+    def _record(self, namespace: str, hit: bool, latency_saved: float = 0.0):
+        s = self._stats.setdefault(namespace, {"hits": 0, "misses": 0, "latency_saved": 0.0})
+        s["hits" if hit else "misses"] += 1
+        s["latency_saved"] += latency_saved
+        if llm_cache_requests_total is not None:
+            llm_cache_requests_total.labels(namespace=namespace, result="hit" if hit else "miss").inc()
+        if hit and llm_cache_latency_saved_seconds_total is not None:
+            llm_cache_latency_saved_seconds_total.labels(namespace=namespace).inc(latency_saved)
+
+    # --- Синхронный интерфейс (для синхронных клиентов OpenAI) ---
+
+    def get(self, key: str, namespace: str) -> Optional[ChatCompletion]:
+        if not self.enabled:
+            return None
+        try:
+            with get_db_context() as db:
+                data, latency = self._load(db, key)
+        except Exception as e:
+            logger.warning(f"Кэш LLM недоступен: {e}")
+            return None
+        return self._result(data, latency, namespace)
+
+    def set(self, key: str, namespace: str, model: str, response: ChatCompletion, latency: float):
+        if not self.enabled:
+            return
+        try:
+            with get_db_context() as db:
+                self._store(db, key, namespace, model, response.model_dump(), latency)
+        except Exception as e:
+            logger.warning(f"Не удалось сохранить ответ LLM в кэш: {e}")
+
+    # --- Асинхронный интерфейс (запросы к БД в пуле потоков) ---
+
+    async def aget(self, key: str, namespace: str) -> Optional[ChatCompletion]:
+        if not self.enabled:
+            return None
+        try:
+            data, latency = await run_in_db_thread(self._load, key)
+        except Exception as e:
+            logger.warning(f"Кэш LLM недоступен: {e}")
+            return None
+        return self._result(data, latency, namespace)
+
+    async def aset(self, key: str, namespace: str, model: str, response: ChatCompletion, latency: float):
+        if not self.enabled:
+            return
+        try:
+            await run_in_db_thread(self._store, key, namespace, model, response.model_dump(), latency)
+        except Exception as e:
+            logger.warning(f"Не удалось сохранить ответ LLM в кэш: {e}")
+
+    def _result(self, data: Optional[dict], latency: float, namespace: str) -> Optional[ChatCompletion]:
+        if data is None:
+            self._record(namespace, hit=False)
+            return None
+        self._record(namespace, hit=True, latency_saved=latency)
+        logger.info(f"Ответ LLM взят из кэша ({namespace}), сэкономлено {latency:.2f}с")
+        return ChatCompletion.model_validate(data)
+
+    @staticmethod
+    def _load(db, key: str):
+        entry = db.query(LLMCacheEntry).filter(LLMCacheEntry.key == key).first()
+        if entry is None:
+            return None, 0.0
+        now = datetime.utcnow()
+        if entry.expires_at <= now:
+            db.delete(entry)
+            return None, 0.0
+        entry.hits = (entry.hits or 0) + 1
+        entry.last_used_at = now
+        return entry.response, entry.latency or 0.0
+
+    def _store(self, db, key: str, namespace: str, model: str, data: dict, latency: float):
+        now = datetime.utcnow()
+        db.merge(LLMCacheEntry(
+            key=key,
+            namespace=namespace,
+            model=model,
+            response=data,
+            latency=latency,
+            hits=0,
+            created_at=now,
+            last_used_at=now,
+            expires_at=now + timedelta(seconds=self.ttl)
+        ))
+        db.flush()
+
+        # Просроченные записи и LRU-вытеснение сверх лимита
+        db.query(LLMCacheEntry).filter(LLMCacheEntry.expires_at <= now).delete(synchronize_session=False)
+        overflow = db.query(LLMCacheEntry).count() - self.max_entries
+        if overflow > 0:
+            stale = [
+                row.key for row in db.query(LLMCacheEntry.key)
+                .order_by(LLMCacheEntry.last_used_at.asc())
+                .limit(overflow)
+            ]
+            db.query(LLMCacheEntry).filter(LLMCacheEntry.key.in_(stale)).delete(synchronize_session=False)
+
+
+llm_cache = LLMResponseCache()
@@ -0,0 +1,140 @@
+"""
+Ограничитель одновременных запросов к LLM
+
+Все вызовы chat.completions проходят через общий лимит (LLM_MAX_CONCURRENCY)
+и очередь своей модели (LLM_PER_MODEL_CONCURRENCY), поэтому долгая генерация
+ТЗ одного пользователя не занимает все слоты и не блокирует event loop.
+Каждый запрос ограничен таймаутом, временные ошибки API повторяются с
+экспоненциальной задержкой.
+"""
+
+import asyncio
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+import openai
+
+from ..config.logging import get_logger
+from ..config.settings import settings
+
+try:
+    from ..core.metrics import (
+        llm_in_flight,
+        llm_queue_depth,
+        llm_queue_wait_seconds,
+        llm_request_duration_seconds,
+        llm_requests_total,
+    )
+except ImportError:  # метрики Prometheus необязательны
+    llm_in_flight = llm_queue_depth = llm_queue_wait_seconds = None
+    llm_request_duration_seconds = llm_requests_total = None
+
+logger = get_logger(__name__)
+
+# Ошибки, после которых имеет смысл повторить запрос
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+    asyncio.TimeoutError,
+)
+
+
+class LLMGovernor:
+    """Общий лимит + очередь на модель, таймауты, повторы и метрики"""
+
+    def __init__(
+        self,
+        max_concurrency: int = None,
+        per_model_concurrency: int = None,
+        timeout: float = None,
+        max_retries: int = None
+    ):
+        self.max_concurrency = max_concurrency or settings.LLM_MAX_CONCURRENCY
+        self.per_model_concurrency = per_model_concurrency or settings.LLM_PER_MODEL_CONCURRENCY
+        self.timeout = timeout or settings.LLM_REQUEST_TIMEOUT
+        self.max_retries = settings.LLM_MAX_RETRIES if max_retries is None else max_retries
+        self._global: Optional[asyncio.Semaphore] = None
+        self._models: Dict[str, asyncio.Semaphore] = {}
+        self._waiting: Dict[str, int] = {}
+        self._in_flight: Dict[str, int] = {}
+
+    def _model_semaphore(self, model: str) -> asyncio.Semaphore:
+        if self._global is None:
+            self._global = asyncio.Semaphore(self.max_concurrency)
+        if model not in self._models:
+            self._models[model] = asyncio.Semaphore(self.per_model_concurrency)
+        return self._models[model]
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Текущая очередь и число выполняемых запросов по моделям"""
+        return {
+            model: {"waiting": self._waiting.get(model, 0), "in_flight": self._in_flight.get(model, 0)}
+            for model in self._models
+        }
+
+    def _track(self, store: Dict[str, int], gauge, model: str, delta: int):
+        store[model] = store.get(model, 0) + delta
+        if gauge is not None:
+            gauge.labels(model=model).set(store[model])
+
+    async def chat_completion(self, client: openai.AsyncOpenAI, model: str, messages: List[Dict[str, Any]], **kwargs):
+        """chat.completions.create через очередь модели с таймаутом и повторами"""
+        model_semaphore = self._model_semaphore(model)
+
+        for attempt in range(self.max_retries + 1):
+            queued_at = time.perf_counter()
+            self._track(self._waiting, llm_queue_depth, model, 1)
+            try:
+                await model_semaphore.acquire()
+                try:
+                    await self._global.acquire()
+                except BaseException:
+                    model_semaphore.release()
+                    raise
+            finally:
+                self._track(self._waiting, llm_queue_depth, model, -1)
+            if llm_queue_wait_seconds is not None:
+                llm_queue_wait_seconds.labels(model=model).observe(time.perf_counter() - queued_at)
+
+            started = time.perf_counter()
+            self._track(self._in_flight, llm_in_flight, model, 1)
+            try:
+                response = await asyncio.wait_for(
+                    client.chat.completions.create(model=model, messages=messages, **kwargs),
+                    timeout=self.timeout
+                )
+                self._observe(model, "success", started)
+                return response
+            except RETRYABLE_ERRORS as e:
+                status = "timeout" if isinstance(e, (asyncio.TimeoutError, openai.APITimeoutError)) else "retry"
+                self._observe(model, status, started)
+                if attempt >= self.max_retries:
+                    raise
+                error = e
+            except Exception:
+                self._observe(model, "error", started)
+                raise
+            finally:
+                self._track(self._in_flight, llm_in_flight, model, -1)
+                self._global.release()
+                model_semaphore.release()
+
+            # Пауза вне семафоров, чтобы не занимать слот во время ожидания
+            delay = min(2 ** attempt, 30) + random.uniform(0, 0.5)
+            logger.warning(
+                f"LLM запрос к {model} не удался ({type(error).__name__}), "
+                f"повтор {attempt + 1}/{self.max_retries} через {delay:.1f}с"
+            )
+            await asyncio.sleep(delay)
+
+    def _observe(self, model: str, status: str, started: float):
+        if llm_requests_total is not None:
+            llm_requests_total.labels(model=model, status=status).inc()
+        if llm_request_duration_seconds is not None:
+            llm_request_duration_seconds.labels(model=model).observe(time.perf_counter() - started)
+
+
+llm_governor = LLMGovernor()
@@ -0,0 +1,304 @@
+"""
+Транзакционный outbox уведомлений в Telegram
+
+Уведомление записывается в notification_outbox в той же транзакции, что и
+исходное событие (enqueue без commit), поэтому не теряется при падении
+процесса и не уходит, если транзакция откатилась. Таблицу разбирает один
+асинхронный воркер с общим клиентом Bot: уведомления одному получателю,
+накопившиеся за NOTIFICATION_OUTBOX_COALESCE_SECONDS, склеиваются в одно
+сообщение, временные ошибки Telegram повторяются с экспоненциальной задержкой.
+
+Строка берется в работу арендой: available_at сдвигается вперед, поэтому
+после падения воркера необработанные строки снова станут доступны
+(гарантия at-least-once).
+"""
+
+import asyncio
+import html
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup, WebAppInfo
+from telegram.error import NetworkError, RetryAfter, TelegramError
+
+from ..config.logging import get_logger
+from ..config.settings import settings
+from ..database.database import run_in_db_thread
+from ..database.models import NotificationOutbox
+
+try:
+    from ..core.metrics import notification_outbox_total
+except ImportError:  # метрики Prometheus необязательны
+    notification_outbox_total = None
+
+logger = get_logger(__name__)
+
+# Сколько держим строку за воркером до отправки (потом ее заберет другой проход)
+LEASE_SECONDS = 120
+PREVIEW_LENGTH = 150
+
+
+def _count(status: str, amount: int = 1):
+    if notification_outbox_total is not None and amount:
+        notification_outbox_total.labels(status=status).inc(amount)
+
+
+def _preview(text: Optional[str]) -> str:
+    if not text:
+        return "📎 Вложение"
+    if len(text) > PREVIEW_LENGTH:
+        text = text[:PREVIEW_LENGTH] + "..."
+    return html.escape(text)
+
+
+def render_project_chat_messages(payloads: List[Dict[str, Any]]) -> Tuple[str, InlineKeyboardMarkup]:
+    """Одно уведомление о сообщениях в чатах проектов (одно или серия подряд)"""
+    chats: "OrderedDict[int, List[Dict[str, Any]]]" = OrderedDict()
+    for payload in payloads:
+        chats.setdefault(payload["chat_id"], []).append(payload)
+
+    if len(payloads) == 1:
+        header = "💬 <b>Новое сообщение в проекте</b>"
+    else:
+        header = f"💬 <b>Новые сообщения в проекте ({len(payloads)})</b>"
+
+    sections = []
+    for messages in chats.values():
+        first = messages[0]
+        lines = [
+            f"📋 <b>Проект:</b> {html.escape(first['project_title'] or '')}",
+            f"👤 <b>От:</b> {html.escape(first['sender_name'])} ({first['sender_role']})",
+            "",
+        ]
+        if len(messages) == 1:
+            lines += ["💬 <b>Сообщение:</b>", _preview(first["message_text"])]
+        else:
+            lines += ["💬 <b>Сообщения:</b>"] + [f"• {_preview(m['message_text'])}" for m in messages]
+        sections.append("\n".join(lines))
+
+    sent_at = datetime.fromisoformat(payloads[-1]["created_at"]).strftime('%d.%m.%Y %H:%M')
+    text = f"{header}\n\n" + "\n\n".join(sections) + f"\n\n🕐 <b>Время:</b> {sent_at}"
+
+    # Для клиента используем WebAppInfo чтобы открыть мини-приложение
+    buttons = []
+    for chat_id, messages in chats.items():
+        label = "💬 Ответить" if len(chats) == 1 else f"💬 {messages[0]['project_title']}"
+        buttons.append([InlineKeyboardButton(label, web_app=WebAppInfo(url=f"{settings.MINIAPP_URL}#/chat/{chat_id}"))])
+    return text, InlineKeyboardMarkup(buttons)
+
+
+# Вид уведомления -> функция, собирающая сообщение из одного или нескольких payload
+RENDERERS = {
+    "project_chat_message": render_project_chat_messages,
+}
+
+
+class NotificationOutboxWorker:
+    """Фоновая отправка уведомлений из outbox общим клиентом Bot"""
+
+    def __init__(
+        self,
+        poll_interval: float = None,
+        coalesce_seconds: float = None,
+        max_attempts: int = None,
+        batch_size: int = None
+    ):
+        self.poll_interval = poll_interval or settings.NOTIFICATION_OUTBOX_POLL_INTERVAL
+        self.coalesce_seconds = settings.NOTIFICATION_OUTBOX_COALESCE_SECONDS if coalesce_seconds is None else coalesce_seconds
+        self.max_attempts = max_attempts or settings.NOTIFICATION_OUTBOX_MAX_ATTEMPTS
+        self.batch_size = batch_size or settings.NOTIFICATION_OUTBOX_BATCH_SIZE
+        self.is_running = False
+        self.task_handle: Optional[asyncio.Task] = None
+        self.bot: Optional[Bot] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    @staticmethod
+    def enqueue(db: Session, recipient_id: int, kind: str, payload: Dict[str, Any]) -> NotificationOutbox:
+        """Добавить уведомление в сессию вызывающего; уйдет после его commit"""
+        if kind not in RENDERERS:
+            raise ValueError(f"Unknown notification kind: {kind}")
+        entry = NotificationOutbox(
+            recipient_id=recipient_id,
+            kind=kind,
+            payload=payload,
+            status="pending",
+            attempts=0,
+            available_at=datetime.utcnow()
+        )
+        db.add(entry)
+        return entry
+
+    def wake(self):
+        """Сообщить воркеру о новых строках (можно вызывать из любого потока)"""
+        if self._loop is not None and self._wakeup is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._wakeup.set)
+            except RuntimeError:  # event loop уже закрыт
+                pass
+
+    async def start(self):
+        if self.is_running:
+            return
+        if not settings.BOT_TOKEN:
+            logger.warning("BOT_TOKEN не задан - outbox уведомлений не запущен")
+            return
+        self.bot = Bot(settings.BOT_TOKEN)
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self.is_running = True
+        self.task_handle = asyncio.create_task(self._run())
+        logger.info("Outbox уведомлений запущен")
+
+    async def stop(self):
+        self.is_running = False
+        if self.task_handle:
+            self.task_handle.cancel()
+            try:
+                await self.task_handle
+            except asyncio.CancelledError:
+                pass
+            self.task_handle = None
+        if self.bot is not None:
+            try:
+                await self.bot.shutdown()
+            except Exception as e:
+                logger.warning(f"Ошибка закрытия клиента Telegram: {e}")
+            self.bot = None
+        self._loop = None
+
+    async def _run(self):
+        while self.is_running:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                # Даем серии сообщений одному получателю накопиться и уйти одним уведомлением
+                await asyncio.sleep(self.coalesce_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                while await self.drain() >= self.batch_size:
+                    pass
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Ошибка обработки outbox уведомлений: {e}")
+
+    async def drain(self) -> int:
+        """Отправить готовые уведомления одной пачкой; возвращает число получателей"""
+        rows = await run_in_db_thread(self._claim)
+        if not rows:
+            return 0
+
+        groups: "OrderedDict[Tuple[int, str], List[dict]]" = OrderedDict()
+        for row in rows:
+            groups.setdefault((row["recipient_id"], row["kind"]), []).append(row)
+        recipients = len({recipient_id for recipient_id, _ in groups})
+
+        semaphore = asyncio.Semaphore(settings.TELEGRAM_BROADCAST_CONCURRENCY)
+
+        async def send(key, group):
+            async with semaphore:
+                return await self._send_group(key[0], key[1], group)
+
+        results = await asyncio.gather(*(send(key, group) for key, group in groups.items()))
+        await run_in_db_thread(self._save_results, [r for group_results in results for r in group_results])
+        return recipients
+
+    async def _send_group(self, recipient_id: int, kind: str, group: List[dict]) -> List[dict]:
+        """Отправка склеенного уведомления; возвращает обновления строк группы"""
+        now = datetime.utcnow()
+        try:
+            text, reply_markup = RENDERERS[kind]([row["payload"] for row in group])
+            await self.bot.send_message(
+                chat_id=recipient_id,
+                text=text,
+                parse_mode='HTML',
+                reply_markup=reply_markup,
+                disable_web_page_preview=True
+            )
+        except RetryAfter as e:
+            retry_after = e.retry_after
+            delay = retry_after.total_seconds() if hasattr(retry_after, 'total_seconds') else float(retry_after)
+            return self._retry_or_fail(group, str(e), delay)
+        except NetworkError as e:
+            # Временные сетевые ошибки (в т.ч. TimedOut) - повтор с backoff
+            return self._retry_or_fail(group, str(e))
+        except TelegramError as e:
+            # Заблокировал бота, чат не найден и т.п. - повтор бесполезен
+            logger.warning(f"Не удалось отправить уведомление пользователю {recipient_id}: {e}")
+            _count("failed", len(group))
+            return [{"id": row["id"], "status": "failed", "last_error": str(e)} for row in group]
+        except Exception as e:
+            logger.error(f"Ошибка отправки уведомления пользователю {recipient_id}: {e}")
+            return self._retry_or_fail(group, str(e))
+
+        _count("sent")
+        _count("coalesced", len(group) - 1)
+        if len(group) > 1:
+            logger.info(f"Уведомление пользователю {recipient_id}: склеено {len(group)} сообщений")
+        return [{"id": row["id"], "status": "sent", "sent_at": now, "last_error": None} for row in group]
+
+    def _retry_or_fail(self, group: List[dict], error: str, delay: float = None) -> List[dict]:
+        updates = []
+        for row in group:
+            if row["attempts"] >= self.max_attempts:
+                logger.warning(f"Уведомление {row['id']} не отправлено после {row['attempts']} попыток: {error}")
+                _count("failed")
+                updates.append({"id": row["id"], "status": "failed", "last_error": error})
+            else:
+                backoff = delay if delay is not None else min(2 ** row["attempts"], 300)
+                _count("retry")
+                updates.append({
+                    "id": row["id"],
+                    "status": "pending",
+                    "last_error": error,
+                    "available_at": datetime.utcnow() + timedelta(seconds=backoff)
+                })
+        return updates
+
+    def _claim(self, db: Session) -> List[dict]:
+        """Взять в работу получателей с готовыми уведомлениями вместе со всеми их новыми строками"""
+        now = datetime.utcnow()
+        recipients = [
+            row.recipient_id for row in db.query(NotificationOutbox.recipient_id).filter(
+                NotificationOutbox.status == "pending",
+                NotificationOutbox.available_at <= now
+            ).distinct().limit(self.batch_size)
+        ]
+        if not recipients:
+            return []
+
+        query = db.query(NotificationOutbox).filter(
+            NotificationOutbox.status == "pending",
+            NotificationOutbox.recipient_id.in_(recipients),
+            # Готовые к отправке и еще не бравшиеся в работу (склейка с серией)
+            or_(NotificationOutbox.available_at <= now, NotificationOutbox.attempts == 0)
+        ).order_by(NotificationOutbox.id)
+        if db.bind.dialect.name == "postgresql":
+            query = query.with_for_update(skip_locked=True)
+
+        rows = []
+        lease_until = now + timedelta(seconds=LEASE_SECONDS)
+        for entry in query.all():
+            entry.attempts = (entry.attempts or 0) + 1
+            entry.available_at = lease_until
+            rows.append({
+                "id": entry.id,
+                "recipient_id": entry.recipient_id,
+                "kind": entry.kind,
+                "payload": entry.payload,
+                "attempts": entry.attempts
+            })
+        return rows
+
+    @staticmethod
+    def _save_results(db: Session, updates: List[dict]):
+        if updates:
+            db.bulk_update_mappings(NotificationOutbox, updates)
+
+
+notification_outbox = NotificationOutboxWorker()
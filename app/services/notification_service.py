@@ -1,4 +1,3 @@
-import asyncio
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional, Union
 from telegram import Bot
@@ -336,40 +335,32 @@ class NotificationService:
             logger.error(f"Отсутствуют данные для напоминания {reminder_type}: {e}")
             return False
     
-    async def broadcast_message(self, user_ids: List[int], message: str, parse_mode: str = 'HTML') -> Dict[str, int]:
-        """Массовая рассылка сообщений"""
+    async def broadcast_message(self, user_ids: List[int], message: str, parse_mode: str = 'HTML',
+                                broadcast_id: str = None) -> Dict[str, Any]:
+        """Массовая рассылка сообщений (вызов с прежним broadcast_id продолжает прерванную)"""
         if not self.bot:
             logger.warning("Бот не настроен для рассылки")
             return {'sent': 0, 'failed': 0}
         
-        sent_count = 0
-        failed_count = 0
-        
-        for user_id in user_ids:
-            try:
-                await self.bot.send_message(
-                    chat_id=user_id,
-                    text=message,
-                    parse_mode=parse_mode
-                )
-                sent_count += 1
-                
-                # Небольшая задержка чтобы не превысить лимиты
-                await asyncio.sleep(0.1)
-                
-            except TelegramError as e:
-                logger.warning(f"Не удалось отправить сообщение пользователю {user_id}: {e}")
-                failed_count += 1
+        from .telegram_delivery_service import TelegramDeliveryEngine
+        
+        report = await TelegramDeliveryEngine(self.bot).broadcast(
+            user_ids, message, parse_mode=parse_mode, broadcast_id=broadcast_id
+        )
+        result = report.to_dict()
         
         # Отчет о рассылке
         await self.send_admin_notification(
             f"📤 <b>Результат рассылки</b>\n\n"
-            f"✅ Отправлено: {sent_count}\n"
-            f"❌ Не доставлено: {failed_count}\n"
-            f"📊 Всего: {len(user_ids)}"
+            f"✅ Отправлено: {report.sent}\n"
+            f"❌ Не доставлено: {report.failed}\n"
+            f"⏭ Отправлено ранее: {report.skipped}\n"
+            f"📊 Всего: {report.total}\n"
+            f"⚡ Скорость: {result['throughput_per_second']} сообщ./сек, "
+            f"p95 задержка: {result['latency_p95_seconds']} сек"
         )
         
-        return {'sent': sent_count, 'failed': failed_count}
+        return result
     
     async def notify_high_load(self, metric: str, value: Union[int, float], threshold: Union[int, float]) -> bool:
         """Уведомление о высокой нагрузке"""
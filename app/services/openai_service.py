@@ -6,9 +6,27 @@ import re
 from typing import Dict, Any, Optional, List
 from ..config.settings import settings
 from ..config.logging import get_logger, log_api_call, log_error
+from .llm_cache import llm_cache
+from .llm_governor import llm_governor
 
 logger = get_logger(__name__)
 
+# Асинхронные клиенты общие для всех экземпляров сервиса (пул соединений httpx)
+_async_clients: Dict[tuple, openai.AsyncOpenAI] = {}
+
+
+def _get_async_client(api_key: str, base_url: str) -> openai.AsyncOpenAI:
+    key = (api_key, base_url)
+    if key not in _async_clients:
+        # Таймауты и повторы выполняет llm_governor
+        _async_clients[key] = openai.AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            timeout=settings.LLM_REQUEST_TIMEOUT,
+            max_retries=0
+        )
+    return _async_clients[key]
+
 class OpenAIService:
     """Сервис для работы с OpenAI API через OpenRouter"""
     
@@ -25,6 +43,28 @@ class OpenAIService:
             )
         else:
             self.client = openai.OpenAI(api_key=self.api_key)
+        
+        # Асинхронный клиент для методов сервиса (синхронный self.client
+        # остается для get_openai_client)
+        self.async_client = _get_async_client(self.api_key, self.base_url)
+    
+    async def _chat(self, model: str, messages: List[Dict[str, Any]], cache: str = None, **kwargs):
+        """Запрос chat.completions через общий ограничитель (не блокирует event loop).
+
+        cache - имя места вызова; если задано, одинаковые запросы берутся из llm_cache
+        """
+        if not cache:
+            return await llm_governor.chat_completion(self.async_client, model=model, messages=messages, **kwargs)
+        
+        key = llm_cache.make_key(model, messages, **kwargs)
+        cached = await llm_cache.aget(key, cache)
+        if cached is not None:
+            return cached
+        
+        started = time.perf_counter()
+        response = await llm_governor.chat_completion(self.async_client, model=model, messages=messages, **kwargs)
+        await llm_cache.aset(key, cache, model, response, time.perf_counter() - started)
+        return response
     
     async def generate_response(self, prompt: str, user_id: int = None, system_prompt: str = None) -> str:
         """Базовый метод для генерации ответов от AI"""
@@ -42,8 +82,7 @@ class OpenAIService:
             
             start_time = time.time()
             
-            # Используем синхронный вызов, так как клиент синхронный
-            response = self.client.chat.completions.create(
+            response = await self._chat(
                 model=model or self.default_model,
                 messages=messages,
                 temperature=0.7,
@@ -171,14 +210,15 @@ class OpenAIService:
         try:
             start_time = time.time()
             
-            response = self.client.chat.completions.create(
+            response = await self._chat(
                 model=self.default_model,
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
                 ],
                 temperature=0.7,
-                max_tokens=2500
+                max_tokens=2500,
+                cache="tz"
             )
             
             response_time = time.time() - start_time
@@ -235,11 +275,13 @@ class OpenAIService:
         try:
             start_time = time.time()
             
-            response = self.client.chat.completions.create(
+            response = await self._chat(
                 model=self.default_model,
                 messages=messages,
                 temperature=getattr(settings, 'CONSULTANT_TEMPERATURE', 0.7),
-                max_tokens=getattr(settings, 'CONSULTANT_MAX_TOKENS', 1500)
+                max_tokens=getattr(settings, 'CONSULTANT_MAX_TOKENS', 1500),
+                # Без истории разговора вопрос типовой (FAQ) - ответ можно переиспользовать
+                cache=None if conversation_history else "consultant"
             )
             
             response_time = time.time() - start_time
@@ -280,7 +322,7 @@ class OpenAIService:
         try:
             start_time = time.time()
             
-            response = self.client.chat.completions.create(
+            response = await self._chat(
                 model=self.default_model,
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -336,7 +378,7 @@ class OpenAIService:
         try:
             start_time = time.time()
             
-            response = self.client.chat.completions.create(
+            response = await self._chat(
                 model=self.default_model,
                 messages=[
                     {"role": "system", "content": system_prompt},
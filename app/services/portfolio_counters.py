@@ -0,0 +1,286 @@
+"""
+Отложенная запись просмотров и лайков портфолио
+
+Лайк или просмотр не трогает строку Portfolio: приращение копится в атомарном
+счетчике (Redis HINCRBY в общих для всех процессов хешах, а если Redis
+недоступен - в шардированном счетчике процесса). Фоновый воркер раз в
+PORTFOLIO_COUNTER_FLUSH_INTERVAL секунд забирает накопленное и одним
+executemany UPDATE прибавляет к счетчикам в БД, после чего перечитывает
+сохраненные значения.
+
+Чтение складывает сохраненное значение с еще не записанным приращением.
+Воркер запускается в каждом процессе, который принимает лайки (админка и бот);
+забор из Redis атомарный (HGETALL + DEL в MULTI), поэтому процессы не
+записывают одно приращение дважды. При ошибке БД забранное возвращается
+обратно в счетчик.
+"""
+
+import asyncio
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import redis.asyncio as aioredis
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.orm import Session
+
+from ..config.logging import get_logger
+from ..config.settings import settings
+from ..database.database import run_in_db_thread
+from ..database.models import Portfolio
+
+logger = get_logger(__name__)
+
+FIELDS = ("views_count", "likes_count")
+REDIS_KEY_PREFIX = "crm:portfolio:pending:"
+# После ошибки Redis столько секунд считаем только в процессе, не ожидая таймаутов
+REDIS_RETRY_INTERVAL = 5.0
+SHARDS = 16
+
+# (project_id, поле) -> приращение
+Deltas = Dict[Tuple[int, str], int]
+
+
+class ShardedCounter:
+    """Счетчики процесса с отдельной блокировкой на шард"""
+
+    def __init__(self, shards: int = SHARDS):
+        self._shards = [(threading.Lock(), defaultdict(int)) for _ in range(shards)]
+
+    def _shard(self, project_id: int):
+        return self._shards[project_id % len(self._shards)]
+
+    def incr(self, project_id: int, field: str, amount: int = 1) -> int:
+        lock, values = self._shard(project_id)
+        with lock:
+            values[(project_id, field)] += amount
+            return values[(project_id, field)]
+
+    def get(self, project_id: int, field: str) -> int:
+        lock, values = self._shard(project_id)
+        with lock:
+            return values.get((project_id, field), 0)
+
+    def drain(self) -> Deltas:
+        """Забрать все накопленное и обнулить"""
+        drained: Deltas = {}
+        for lock, values in self._shards:
+            with lock:
+                drained.update(values)
+                values.clear()
+        return drained
+
+    def add(self, deltas: Deltas):
+        for (project_id, field), amount in deltas.items():
+            self.incr(project_id, field, amount)
+
+
+class PortfolioCounters:
+    """Буфер счетчиков портфолио с периодической записью в БД"""
+
+    def __init__(self, redis_url: str = None, flush_interval: float = None):
+        self.redis_url = redis_url or settings.REDIS_URL
+        self.flush_interval = flush_interval or settings.PORTFOLIO_COUNTER_FLUSH_INTERVAL
+        self.is_running = False
+        self.task_handle: Optional[asyncio.Task] = None
+        self._client: Optional[aioredis.Redis] = None
+        self._redis_down_until = 0.0
+        self._local = ShardedCounter()
+        # Забранное из счетчика процесса, но еще не записанное в БД
+        self._flushing: Deltas = {}
+        # Значения из БД после последней записи: project_id -> {поле: значение}
+        self._persisted: Dict[int, Dict[str, int]] = {}
+
+    # --- Счет ---
+
+    async def incr(self, project_id: int, field: str):
+        """Прибавить 1 к счетчику field проекта"""
+        if self._redis_available():
+            try:
+                await self._get_client().hincrby(REDIS_KEY_PREFIX + field, project_id, 1)
+                return
+            except Exception as e:
+                self._mark_redis_down(e)
+        self._local.incr(project_id, field)
+
+    async def merge(self, cards: List[Dict], fields: Iterable[str] = FIELDS) -> List[Dict]:
+        """Подставить в карточки сохраненные значения плюс незаписанные приращения"""
+        if not cards:
+            return cards
+        fields = list(fields)
+        pending = await self._pending([card["id"] for card in cards], fields)
+        for card in cards:
+            persisted = self._persisted.get(card["id"], {})
+            for field in fields:
+                card[field] = persisted.get(field, card.get(field) or 0) + pending.get((card["id"], field), 0)
+        return cards
+
+    async def value(self, card: Dict, field: str) -> int:
+        return (await self.merge([dict(card)], [field]))[0][field]
+
+    # --- Фоновая запись ---
+
+    async def start(self):
+        if self.is_running:
+            return
+        self.is_running = True
+        self.task_handle = asyncio.create_task(self._run())
+        logger.info("Запись счетчиков портфолио запущена")
+
+    async def stop(self):
+        self.is_running = False
+        if self.task_handle:
+            self.task_handle.cancel()
+            try:
+                await self.task_handle
+            except asyncio.CancelledError:
+                pass
+            self.task_handle = None
+        # Дописываем накопленное перед остановкой процесса
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Ошибка записи счетчиков портфолио при остановке: {e}")
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    async def _run(self):
+        while self.is_running:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Ошибка записи счетчиков портфолио: {e}")
+
+    async def flush(self) -> int:
+        """Записать накопленные приращения в БД; возвращает число обновленных проектов"""
+        local = self._local.drain()
+        for key, amount in local.items():
+            self._flushing[key] = self._flushing.get(key, 0) + amount
+        remote = await self._take_remote()
+
+        deltas: Deltas = dict(self._flushing)
+        for key, amount in remote.items():
+            deltas[key] = deltas.get(key, 0) + amount
+
+        try:
+            updated, self._persisted = await run_in_db_thread(self._apply, deltas)
+        except Exception:
+            # Возвращаем забранное, запишем в следующий раз
+            self._local.add(self._flushing)
+            self._flushing = {}
+            await self._restore_remote(remote)
+            raise
+        self._flushing = {}
+        if updated:
+            logger.debug(f"Счетчики портфолио записаны для {updated} проектов")
+        return updated
+
+    # --- Внутреннее ---
+
+    async def _pending(self, project_ids: List[int], fields: List[str]) -> Deltas:
+        pending: Deltas = {}
+        for project_id in project_ids:
+            for field in fields:
+                amount = self._local.get(project_id, field) + self._flushing.get((project_id, field), 0)
+                if amount:
+                    pending[(project_id, field)] = amount
+
+        if self._redis_available():
+            try:
+                async with self._get_client().pipeline(transaction=False) as pipe:
+                    for field in fields:
+                        pipe.hmget(REDIS_KEY_PREFIX + field, project_ids)
+                    results = await pipe.execute()
+            except Exception as e:
+                self._mark_redis_down(e)
+            else:
+                for field, values in zip(fields, results):
+                    for project_id, value in zip(project_ids, values):
+                        if value:
+                            key = (project_id, field)
+                            pending[key] = pending.get(key, 0) + int(value)
+        return pending
+
+    async def _take_remote(self) -> Deltas:
+        if not self._redis_available():
+            return {}
+        try:
+            async with self._get_client().pipeline(transaction=True) as pipe:
+                for field in FIELDS:
+                    pipe.hgetall(REDIS_KEY_PREFIX + field)
+                pipe.delete(*(REDIS_KEY_PREFIX + field for field in FIELDS))
+                results = await pipe.execute()
+        except Exception as e:
+            self._mark_redis_down(e)
+            return {}
+        return {
+            (int(project_id), field): int(amount)
+            for field, values in zip(FIELDS, results)
+            for project_id, amount in values.items()
+        }
+
+    async def _restore_remote(self, remote: Deltas):
+        if not remote:
+            return
+        try:
+            async with self._get_client().pipeline(transaction=False) as pipe:
+                for (project_id, field), amount in remote.items():
+                    pipe.hincrby(REDIS_KEY_PREFIX + field, project_id, amount)
+                await pipe.execute()
+        except Exception as e:
+            self._mark_redis_down(e)
+            self._local.add(remote)
+
+    @staticmethod
+    def _apply(db: Session, deltas: Deltas) -> Tuple[int, Dict[int, Dict[str, int]]]:
+        """Прибавить приращения одним executemany и перечитать счетчики"""
+        rows: Dict[int, Dict[str, int]] = {}
+        for (project_id, field), amount in deltas.items():
+            rows.setdefault(project_id, {"pid": project_id, "views_delta": 0, "likes_delta": 0})
+            rows[project_id][field.replace("_count", "_delta")] += amount
+
+        if rows:
+            table = Portfolio.__table__
+            # Core UPDATE: не поднимает события сессии и не сбрасывает снимок каталога
+            db.execute(
+                update(table)
+                .where(table.c.id == bindparam("pid"))
+                .values(
+                    views_count=func.coalesce(table.c.views_count, 0) + bindparam("views_delta"),
+                    likes_count=func.coalesce(table.c.likes_count, 0) + bindparam("likes_delta"),
+                ),
+                list(rows.values())
+            )
+
+        persisted = {
+            project_id: {"views_count": views_count or 0, "likes_count": likes_count or 0}
+            for project_id, views_count, likes_count in db.execute(
+                select(Portfolio.id, Portfolio.views_count, Portfolio.likes_count)
+            )
+        }
+        return len(rows), persisted
+
+    def _get_client(self) -> aioredis.Redis:
+        if self._client is None:
+            self._client = aioredis.from_url(
+                self.redis_url,
+                decode_responses=True,
+                socket_connect_timeout=2,
+                socket_timeout=2
+            )
+        return self._client
+
+    def _redis_available(self) -> bool:
+        return time.monotonic() >= self._redis_down_until
+
+    def _mark_redis_down(self, error: Exception):
+        self._redis_down_until = time.monotonic() + REDIS_RETRY_INTERVAL
+        logger.warning(f"Redis недоступен для счетчиков портфолио, считаем в процессе: {error}")
+
+
+portfolio_counters = PortfolioCounters()
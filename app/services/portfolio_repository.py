@@ -0,0 +1,304 @@
+"""
+Доступ к публичному портфолио для бота и публичных эндпоинтов админки
+
+Каталог видимых проектов читается целиком одним запросом в пуле потоков БД
+и хранится в процессе как снимок: карточки для бота и для API с уже
+собранными URL изображений, порядок проектов, списки id по категориям и
+рекомендуемые. Страницы - срезы этих списков, без count и offset в БД.
+
+Снимок привязан к версии каталога (строка portfolio_catalog_version в
+settings). Админка повышает версию при создании, изменении, удалении и
+публикации проекта (bump_catalog_version в той же транзакции); процессы
+сверяют версию не чаще раза в PORTFOLIO_CATALOG_CHECK_INTERVAL секунд и
+пересобирают снимок только при ее изменении. Любой commit изменений
+Portfolio через ORM в этом процессе сбрасывает снимок сразу (события сессии).
+
+ETag снимка - версия и хеш содержимого без счетчиков: публичные эндпоинты
+отвечают 304 на If-None-Match. Просмотры и лайки копятся в portfolio_counters
+и записываются в БД пачками; в отдаваемых карточках они складываются из
+сохраненного значения и незаписанного приращения, ETag от них не меняется.
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from itertools import chain
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import Request, Response
+from sqlalchemy import Integer, String, asc, cast, desc, event, func
+from sqlalchemy.orm import Session
+
+from ..config.logging import get_logger
+from ..config.settings import settings
+from ..database.database import run_in_db_thread
+from ..database.models import Portfolio, Settings
+from .portfolio_counters import portfolio_counters
+
+logger = get_logger(__name__)
+
+CATALOG_VERSION_KEY = "portfolio_catalog_version"
+
+# Единый порядок каталога: рекомендуемые, затем sort_order, затем новые
+CATALOG_ORDER = (desc(Portfolio.is_featured), asc(Portfolio.sort_order), desc(Portfolio.created_at))
+
+# Поля, которые меняются без повышения версии и не входят в ETag
+COUNTER_FIELDS = ("views_count", "likes_count")
+
+
+def public_image_url(image_path: str) -> Optional[str]:
+    """Полный URL изображения для публичного API (как get_image_url админки без request)"""
+    if not image_path:
+        return None
+    clean_path = image_path.replace("uploads/portfolio/", "").replace("uploads/", "").lstrip("/")
+    return f"http://localhost:{settings.ADMIN_PORT}/uploads/portfolio/{clean_path}"
+
+
+def _api_dict(project: Portfolio) -> Dict[str, Any]:
+    data = project.to_dict()
+    data["main_image"] = public_image_url(data["main_image"])
+    data["image_paths"] = [public_image_url(path) for path in data["image_paths"]]
+    return data
+
+
+class PortfolioCatalog:
+    """Снимок видимого портфолио одной версии"""
+
+    def __init__(self, version: int, projects: List[Portfolio]):
+        self.version = version
+        # Представления проекта: для бота и для API (как в админке, с полными URL)
+        self.views: Dict[str, Dict[int, Dict[str, Any]]] = {"bot": {}, "api": {}}
+        self.order: List[int] = []
+        self.by_category: Dict[str, List[int]] = {}
+        self.featured: List[int] = []
+
+        for project in projects:
+            self.views["bot"][project.id] = project.to_bot_dict()
+            self.views["api"][project.id] = _api_dict(project)
+            self.order.append(project.id)
+            if project.category:
+                self.by_category.setdefault(project.category, []).append(project.id)
+            if project.is_featured:
+                self.featured.append(project.id)
+        self._featured_ids = set(self.featured)
+
+        content = [
+            {key: value for key, value in self.views["api"][project_id].items() if key not in COUNTER_FIELDS}
+            for project_id in self.order
+        ]
+        digest = hashlib.sha1(json.dumps(content, sort_keys=True, default=str).encode()).hexdigest()
+        self.etag = f'W/"{version}-{digest[:16]}"'
+
+    @property
+    def categories(self) -> List[str]:
+        """Категории с видимыми проектами в порядке каталога"""
+        return list(self.by_category)
+
+    def page(
+        self,
+        category: Optional[str] = None,
+        featured_only: bool = False,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        view: str = "bot"
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """Страница проектов и их общее число"""
+        ids = self.by_category.get(category, []) if category else self.order
+        if featured_only:
+            ids = [project_id for project_id in ids if project_id in self._featured_ids]
+        offset = max(offset, 0)
+        end = offset + limit if limit is not None else None
+        cards = self.views[view]
+        return [dict(cards[project_id]) for project_id in ids[offset:end]], len(ids)
+
+    def get(self, project_id: int, view: str = "bot") -> Optional[Dict[str, Any]]:
+        card = self.views[view].get(project_id)
+        return dict(card) if card is not None else None
+
+
+class PortfolioRepository:
+    """Чтение публичного портфолио из версионированного снимка"""
+
+    def __init__(self, check_interval: float = None):
+        self.check_interval = (
+            settings.PORTFOLIO_CATALOG_CHECK_INTERVAL if check_interval is None else check_interval
+        )
+        self._catalog: Optional[PortfolioCatalog] = None
+        self._checked_at = 0.0
+        self._force_rebuild = False
+        self._loading: Optional[asyncio.Future] = None
+        self.builds = 0
+
+    def invalidate(self):
+        """Пересобрать снимок при следующем чтении (можно вызывать из любого потока)"""
+        self._force_rebuild = True
+
+    def stats(self) -> Dict[str, Any]:
+        catalog = self._catalog
+        return {
+            "version": catalog.version if catalog else None,
+            "projects": len(catalog.order) if catalog else 0,
+            "builds": self.builds,
+        }
+
+    # --- Чтение ---
+
+    async def catalog(self) -> PortfolioCatalog:
+        """Актуальный снимок; версия в БД сверяется не чаще check_interval"""
+        if (
+            self._catalog is not None
+            and not self._force_rebuild
+            and time.monotonic() - self._checked_at < self.check_interval
+        ):
+            return self._catalog
+
+        if self._loading is not None:
+            return await asyncio.shield(self._loading)
+
+        known_version = None if self._force_rebuild or self._catalog is None else self._catalog.version
+        self._force_rebuild = False
+        future = asyncio.get_running_loop().create_future()
+        self._loading = future
+        try:
+            catalog = await run_in_db_thread(self._refresh, known_version)
+        except BaseException as e:
+            if isinstance(e, Exception):
+                future.set_exception(e)
+                # Исключение уже передано ожидающим; без них future не должна ругаться в лог
+                future.exception()
+            else:
+                future.cancel()
+            raise
+        finally:
+            self._loading = None
+
+        if catalog is not None:
+            self.builds += 1
+            if self._catalog is not None and catalog.version != self._catalog.version:
+                logger.info(f"Каталог портфолио обновлен до версии {catalog.version}")
+            self._catalog = catalog
+        self._checked_at = time.monotonic()
+        future.set_result(self._catalog)
+        return self._catalog
+
+    async def categories(self) -> List[str]:
+        """Категории, в которых есть видимые проекты"""
+        return (await self.catalog()).categories
+
+    async def list_projects(
+        self,
+        category: Optional[str] = None,
+        featured_only: bool = False,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        view: str = "bot",
+        catalog: Optional[PortfolioCatalog] = None
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Страница видимых проектов и их общее число
+
+        catalog - снимок, по которому уже посчитан ETag ответа (иначе текущий)
+        """
+        catalog = catalog or await self.catalog()
+        projects, total = catalog.page(category, featured_only, offset, limit, view)
+        return await portfolio_counters.merge(projects), total
+
+    async def get_project(self, project_id: int, view: str = "bot", count_view: bool = True) -> Optional[Dict[str, Any]]:
+        """Карточка видимого проекта; count_view - засчитать просмотр"""
+        project = (await self.catalog()).get(project_id, view)
+        if project is None:
+            return None
+        if count_view:
+            await portfolio_counters.incr(project_id, "views_count")
+        return (await portfolio_counters.merge([project]))[0]
+
+    # --- Запись ---
+
+    async def like(self, project_id: int) -> Optional[int]:
+        """Лайк видимому проекту; новое число лайков или None, если проекта нет"""
+        project = (await self.catalog()).get(project_id)
+        if project is None:
+            return None
+        await portfolio_counters.incr(project_id, "likes_count")
+        return await portfolio_counters.value(project, "likes_count")
+
+    # --- Внутреннее ---
+
+    @staticmethod
+    def _refresh(db: Session, known_version: Optional[int]) -> Optional[PortfolioCatalog]:
+        """Новый снимок или None, если версия в БД не изменилась"""
+        version = read_catalog_version(db)
+        if version == known_version:
+            return None
+        projects = db.query(Portfolio).filter(Portfolio.is_visible == True).order_by(*CATALOG_ORDER).all()
+        return PortfolioCatalog(version, projects)
+
+
+def read_catalog_version(db: Session) -> int:
+    value = db.query(Settings.value).filter(Settings.key == CATALOG_VERSION_KEY).scalar()
+    return int(value) if value else 0
+
+
+def bump_catalog_version(db: Session):
+    """Повысить версию каталога в транзакции вызывающего (видна другим процессам после commit)"""
+    updated = db.query(Settings).filter(Settings.key == CATALOG_VERSION_KEY).update(
+        {Settings.value: cast(func.coalesce(cast(Settings.value, Integer), 0) + 1, String)},
+        synchronize_session=False
+    )
+    if not updated:
+        db.add(Settings(
+            key=CATALOG_VERSION_KEY,
+            value="1",
+            data_type="int",
+            description="Версия публичного каталога портфолио"
+        ))
+    db.info["portfolio_changed"] = True
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Слабое сравнение If-None-Match с ETag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    weak = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == weak:
+            return True
+    return False
+
+
+def not_modified(request: Request, response: Response, catalog: PortfolioCatalog) -> Optional[Response]:
+    """Ставит ETag ответу; если копия клиента актуальна - возвращает готовый ответ 304"""
+    headers = {"ETag": catalog.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), catalog.etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
+portfolio_repository = PortfolioRepository()
+
+
+def _mark_portfolio_changes(session: Session, flush_context):
+    if any(isinstance(obj, Portfolio) for obj in chain(session.new, session.dirty, session.deleted)):
+        session.info["portfolio_changed"] = True
+
+
+def _invalidate_after_commit(session: Session):
+    # После commit, а не после flush: иначе параллельное чтение успеет закешировать старые данные
+    if session.info.pop("portfolio_changed", False):
+        portfolio_repository.invalidate()
+
+
+def _forget_changes(session: Session):
+    session.info.pop("portfolio_changed", None)
+
+
+event.listen(Session, "after_flush", _mark_portfolio_changes)
+event.listen(Session, "after_commit", _invalidate_after_commit)
+event.listen(Session, "after_rollback", _forget_changes)
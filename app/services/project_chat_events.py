@@ -0,0 +1,131 @@
+"""
+События чатов проектов для push-обновлений
+
+Каналы realtime_hub:
+    project_chat:<chat_id>                - message, read, unread одного чата
+    project_chats:all                     - chat_updated всех чатов (руководитель)
+    project_chats:executor:<admin_id>     - chat_updated чатов исполнителя
+    project_chats:client:<telegram_id>    - chat_updated чатов клиента (мини-приложение)
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from ..database.database import run_in_db_thread
+from ..database.models import Project, ProjectChat, ProjectChatMessage
+from .realtime_hub import Event, format_sse
+
+ALL_CHATS_CHANNEL = "project_chats:all"
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no"  # nginx не должен буферизовать поток
+}
+
+
+def chat_channel(chat_id: int) -> str:
+    return f"project_chat:{chat_id}"
+
+
+def executor_channel(admin_id: int) -> str:
+    return f"project_chats:executor:{admin_id}"
+
+
+def client_channel(telegram_id: Any) -> str:
+    return f"project_chats:client:{telegram_id}"
+
+
+def message_data(message: ProjectChatMessage) -> Dict[str, Any]:
+    return {
+        'id': message.id,
+        'sender_type': message.sender_type,
+        'message_text': message.message_text,
+        'attachments': message.attachments or [],
+        'created_at': message.created_at.isoformat(),
+        'is_read': message.is_read_by_executor if message.sender_type == 'client' else message.is_read_by_client
+    }
+
+
+def _inbox_channels(project: Optional[Project]) -> List[str]:
+    channels = [ALL_CHATS_CHANNEL]
+    if project is None:
+        return channels
+    if project.assigned_executor_id:
+        channels.append(executor_channel(project.assigned_executor_id))
+    telegram_ids = {str(project.client_telegram_id)} if project.client_telegram_id else set()
+    if project.user and project.user.telegram_id:
+        telegram_ids.add(str(project.user.telegram_id))
+    channels.extend(client_channel(telegram_id) for telegram_id in sorted(telegram_ids))
+    return channels
+
+
+def _unread_data(chat: ProjectChat) -> Dict[str, Any]:
+    return {
+        'chat_id': chat.id,
+        'unread_by_executor': chat.unread_by_executor or 0,
+        'unread_by_client': chat.unread_by_client or 0,
+        'last_message_at': chat.last_message_at.isoformat() if chat.last_message_at else None
+    }
+
+
+def message_events(chat: ProjectChat, project: Optional[Project], message: ProjectChatMessage) -> List[Event]:
+    """Новое сообщение: само сообщение в канал чата и новые счетчики в списки чатов"""
+    unread = _unread_data(chat)
+    summary = {
+        **unread,
+        'last_message': {
+            'sender_type': message.sender_type,
+            'message_text': message.message_text,
+            'created_at': message.created_at.isoformat()
+        }
+    }
+    events: List[Event] = [
+        (chat_channel(chat.id), "message", {'chat_id': chat.id, 'message': message_data(message)}),
+        (chat_channel(chat.id), "unread", unread),
+    ]
+    events.extend((channel, "chat_updated", summary) for channel in _inbox_channels(project))
+    return events
+
+
+def read_events(
+    chat: ProjectChat,
+    project: Optional[Project],
+    reader: str,
+    message_ids: List[int]
+) -> List[Event]:
+    """Прочтение: reader ('client' или 'executor') прочитал message_ids"""
+    unread = _unread_data(chat)
+    events: List[Event] = [
+        (chat_channel(chat.id), "unread", unread),
+    ]
+    if message_ids:
+        events.insert(0, (chat_channel(chat.id), "read", {
+            'chat_id': chat.id,
+            'reader': reader,
+            'message_ids': message_ids,
+            'read_at': datetime.utcnow().isoformat()
+        }))
+    events.extend((channel, "chat_updated", unread) for channel in _inbox_channels(project))
+    return events
+
+
+def message_event_id(item: Dict[str, Any]) -> Optional[int]:
+    """id SSE-события - id сообщения, чтобы клиент мог переподключиться с Last-Event-ID"""
+    if item["event"] == "message":
+        return item["data"]["message"]["id"]
+    return None
+
+
+async def replay_chat_messages(chat_id: int, after_id: int) -> List[str]:
+    """Сообщения чата новее after_id в виде SSE-событий message"""
+    def _load(db):
+        messages = db.query(ProjectChatMessage).filter(
+            ProjectChatMessage.chat_id == chat_id,
+            ProjectChatMessage.id > after_id
+        ).order_by(ProjectChatMessage.id.asc()).all()
+        return [message_data(message) for message in messages]
+
+    return [
+        format_sse("message", {'chat_id': chat_id, 'message': data}, data['id'])
+        for data in await run_in_db_thread(_load)
+    ]
@@ -0,0 +1,242 @@
+"""
+Доставка событий в реальном времени между воркерами uvicorn
+
+События публикуются в Redis (PUBLISH crm:rt:<канал>); каждый процесс держит
+одно подключение PSUBSCRIBE crm:rt:* и раздает полученное своим локальным
+подписчикам (SSE/WebSocket-соединениям) через asyncio.Queue. Поэтому
+сообщение, отправленное через один воркер, получают клиенты, подключенные
+к любому другому.
+
+Если Redis недоступен, событие доставляется только подписчикам текущего
+процесса (как при запуске в один воркер) и в лог пишется предупреждение.
+"""
+
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import redis
+import redis.asyncio as aioredis
+
+from ..config.logging import get_logger
+from ..config.settings import settings
+
+logger = get_logger(__name__)
+
+CHANNEL_PREFIX = "crm:rt:"
+SUBSCRIBER_QUEUE_SIZE = 1000
+RECONNECT_DELAY = 2.0
+MAX_RECONNECT_DELAY = 60.0
+# После ошибки Redis столько секунд публикуем только локально, не ожидая таймаутов
+REDIS_RETRY_INTERVAL = 5.0
+KEEPALIVE_INTERVAL = 15.0
+
+# (канал, событие, данные)
+Event = Tuple[str, str, Dict[str, Any]]
+
+
+def format_sse(event: str, data: Dict[str, Any], event_id: Optional[Any] = None) -> str:
+    """Format one Server-Sent Event"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+class RealtimeHub:
+    """Публикация событий через Redis pub/sub и раздача локальным подписчикам"""
+
+    def __init__(self, redis_url: str = None):
+        self.redis_url = redis_url or settings.REDIS_URL
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._client: Optional[aioredis.Redis] = None
+        self._sync_client: Optional[redis.Redis] = None
+        self._listener: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._redis_down_until = 0.0
+        self._dropped = 0
+
+    def subscriber_count(self, prefix: str = "") -> int:
+        """Локальные подписки на каналы с заданным префиксом"""
+        return sum(len(queues) for channel, queues in self._subscribers.items() if channel.startswith(prefix))
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "channels": len(self._subscribers),
+            "subscribers": self.subscriber_count(),
+            "dropped": self._dropped,
+        }
+
+    # --- Публикация ---
+
+    async def publish(self, channel: str, event: str, data: Dict[str, Any]):
+        await self.publish_many([(channel, event, data)])
+
+    async def publish_many(self, events: Iterable[Event]):
+        messages = [(channel, self._encode(channel, event, data)) for channel, event, data in events]
+        if self._redis_available():
+            try:
+                client = self._get_client()
+                async with client.pipeline(transaction=False) as pipe:
+                    for channel, message in messages:
+                        pipe.publish(CHANNEL_PREFIX + channel, message)
+                    await pipe.execute()
+                return
+            except Exception as e:
+                self._mark_redis_down(e)
+        for channel, message in messages:
+            self._dispatch(channel, message)
+
+    def publish_sync(self, events: Iterable[Event]):
+        """Публикация из синхронного кода (эндпоинты def, выполняемые в пуле потоков)"""
+        messages = [(channel, self._encode(channel, event, data)) for channel, event, data in events]
+        if self._redis_available():
+            try:
+                if self._sync_client is None:
+                    self._sync_client = redis.Redis.from_url(
+                        self.redis_url, socket_timeout=2, socket_connect_timeout=2
+                    )
+                pipe = self._sync_client.pipeline(transaction=False)
+                for channel, message in messages:
+                    pipe.publish(CHANNEL_PREFIX + channel, message)
+                pipe.execute()
+                return
+            except Exception as e:
+                self._mark_redis_down(e)
+        if self._loop is not None:
+            for channel, message in messages:
+                try:
+                    self._loop.call_soon_threadsafe(self._dispatch, channel, message)
+                except RuntimeError:  # event loop уже закрыт
+                    return
+
+    # --- Подписка ---
+
+    @asynccontextmanager
+    async def subscribe(self, *channels: str) -> AsyncIterator[asyncio.Queue]:
+        """Очередь событий {"channel", "event", "data"} по каналам на время блока"""
+        self._ensure_listener()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        for channel in channels:
+            self._subscribers.setdefault(channel, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            for channel in channels:
+                queues = self._subscribers.get(channel)
+                if queues is not None:
+                    queues.discard(queue)
+                    if not queues:
+                        del self._subscribers[channel]
+
+    async def sse_stream(
+        self,
+        channels: List[str],
+        is_disconnected: Callable[[], Awaitable[bool]],
+        replay: Optional[Callable[[], Awaitable[List[str]]]] = None,
+        event_id: Optional[Callable[[Dict[str, Any]], Any]] = None
+    ) -> AsyncIterator[str]:
+        """
+        Поток SSE по каналам
+
+        Подписка оформляется до replay, поэтому события, пришедшие во время
+        догрузки пропущенного, не теряются (клиент отбрасывает дубли по id).
+        """
+        async with self.subscribe(*channels) as queue:
+            if replay is not None:
+                for chunk in await replay():
+                    yield chunk
+            while not await is_disconnected():
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(item["event"], item["data"], event_id(item) if event_id else None)
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+        if self._sync_client is not None:
+            self._sync_client.close()
+            self._sync_client = None
+
+    # --- Внутреннее ---
+
+    def _get_client(self) -> aioredis.Redis:
+        if self._client is None:
+            self._client = aioredis.from_url(
+                self.redis_url,
+                decode_responses=True,
+                socket_connect_timeout=2,
+                health_check_interval=30
+            )
+        return self._client
+
+    def _redis_available(self) -> bool:
+        return time.monotonic() >= self._redis_down_until
+
+    def _mark_redis_down(self, error: Exception):
+        self._redis_down_until = time.monotonic() + REDIS_RETRY_INTERVAL
+        logger.warning(f"Redis недоступен для realtime-событий, доставка только в текущем процессе: {error}")
+
+    @staticmethod
+    def _encode(channel: str, event: str, data: Dict[str, Any]) -> str:
+        return json.dumps({"channel": channel, "event": event, "data": data}, ensure_ascii=False, default=str)
+
+    def _dispatch(self, channel: str, message: str):
+        queues = self._subscribers.get(channel)
+        if not queues:
+            return
+        item = json.loads(message)
+        for queue in list(queues):
+            try:
+                queue.put_nowait(item)
+            except asyncio.QueueFull:
+                # Медленный клиент: пропускаем событие, он дочитает пропущенное при переподключении
+                self._dropped += 1
+
+    def _ensure_listener(self):
+        if self._listener is None or self._listener.done():
+            self._loop = asyncio.get_running_loop()
+            self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self):
+        delay = RECONNECT_DELAY
+        while True:
+            pubsub = None
+            try:
+                pubsub = self._get_client().pubsub()
+                await pubsub.psubscribe(CHANNEL_PREFIX + "*")
+                logger.info("Подписка на realtime-события Redis активна")
+                delay = RECONNECT_DELAY
+                async for message in pubsub.listen():
+                    if message.get("type") == "pmessage":
+                        self._dispatch(message["channel"][len(CHANNEL_PREFIX):], message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Подписка на realtime-события Redis прервана: {e}")
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.close()
+                    except Exception:
+                        pass
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+
+realtime_hub = RealtimeHub()
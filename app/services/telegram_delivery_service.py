@@ -0,0 +1,292 @@
+"""
+Движок массовой доставки сообщений в Telegram
+
+Отправки идут параллельно (TELEGRAM_BROADCAST_CONCURRENCY), но в пределах
+общего лимита (token bucket, TELEGRAM_BROADCAST_RATE сообщений/сек) и
+лимита на чат (TELEGRAM_PER_CHAT_INTERVAL). RetryAfter от Telegram
+приостанавливает все отправки на запрошенное время. Итог по каждому
+получателю пишется в broadcast_deliveries, поэтому прерванную рассылку
+можно перезапустить, явно передав тот же broadcast_id: доставленным и
+недоступным (заблокировали бота, чат не найден) повторно не уйдет, а
+получателям с временными ошибками отправка повторится (кроме последней
+незаписанной пачки: гарантия at-least-once). Без broadcast_id каждый вызов -
+новая рассылка, даже с тем же текстом и получателями.
+"""
+
+import asyncio
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+
+from telegram import Bot
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TelegramError
+
+from ..config.logging import get_logger
+from ..config.settings import settings
+from ..database.database import run_in_db_thread
+from ..database.models import BroadcastDelivery
+
+try:
+    from ..core.metrics import telegram_messages_total, telegram_send_duration_seconds
+except ImportError:  # метрики Prometheus необязательны
+    telegram_messages_total = telegram_send_duration_seconds = None
+
+logger = get_logger(__name__)
+
+
+# Итоговые статусы получателя: повторная отправка при возобновлении не нужна
+FINAL_STATUSES = ('sent', 'blocked')
+
+
+def make_broadcast_id() -> str:
+    """ID новой рассылки; чтобы возобновить прерванную, передайте ее прежний ID"""
+    return uuid.uuid4().hex
+
+
+def _is_permanent(error: TelegramError) -> bool:
+    """Получатель недоступен: заблокировал бота или чат не существует"""
+    return isinstance(error, Forbidden) or (
+        isinstance(error, BadRequest) and "chat not found" in str(error).lower()
+    )
+
+
+def _count(status: str):
+    if telegram_messages_total is not None:
+        telegram_messages_total.labels(status=status).inc()
+
+
+class TokenBucket:
+    """Общий лимит скорости: rate токенов в секунду, не больше capacity подряд"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        """Остановить выдачу токенов (Telegram вернул RetryAfter)"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class PerChatLimiter:
+    """Минимальный интервал между сообщениями в один чат"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._next_slot: Dict[int, float] = {}
+
+    async def wait(self, chat_id: int):
+        now = time.monotonic()
+        slot = max(now, self._next_slot.get(chat_id, 0.0))
+        self._next_slot[chat_id] = slot + self.interval
+        if len(self._next_slot) > 10000:
+            self._next_slot = {cid: t for cid, t in self._next_slot.items() if t > now}
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+@dataclass
+class DeliveryReport:
+    """Итоги рассылки: счетчики, пропускная способность и задержки отправки"""
+    broadcast_id: str
+    total: int
+    sent: int = 0
+    failed: int = 0
+    skipped: int = 0  # доставлены или недоступны в прошлом запуске
+    retries: int = 0
+    elapsed: float = 0.0
+    latencies: List[float] = field(default_factory=list)
+
+    def _percentile(self, q: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def to_dict(self) -> Dict[str, Any]:
+        processed = self.sent + self.failed
+        return {
+            "broadcast_id": self.broadcast_id,
+            "total": self.total,
+            "sent": self.sent,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "retries": self.retries,
+            "elapsed_seconds": round(self.elapsed, 3),
+            "throughput_per_second": round(processed / self.elapsed, 2) if self.elapsed else 0.0,
+            "latency_p50_seconds": round(self._percentile(0.5), 3),
+            "latency_p95_seconds": round(self._percentile(0.95), 3),
+        }
+
+
+class TelegramDeliveryEngine:
+    """Параллельная доставка рассылки с лимитами Telegram и сохранением прогресса"""
+
+    def __init__(
+        self,
+        bot: Bot,
+        rate: float = None,
+        concurrency: int = None,
+        per_chat_interval: float = None,
+        max_retries: int = 3,
+        flush_every: int = 20
+    ):
+        self.bot = bot
+        self.bucket = TokenBucket(rate or settings.TELEGRAM_BROADCAST_RATE)
+        self.per_chat = PerChatLimiter(
+            settings.TELEGRAM_PER_CHAT_INTERVAL if per_chat_interval is None else per_chat_interval
+        )
+        self.concurrency = concurrency or settings.TELEGRAM_BROADCAST_CONCURRENCY
+        self.max_retries = max_retries
+        self.flush_every = flush_every
+
+    async def broadcast(
+        self,
+        chat_ids: List[int],
+        text: str,
+        parse_mode: str = 'HTML',
+        broadcast_id: str = None
+    ) -> DeliveryReport:
+        """Разослать text по chat_ids; с тем же broadcast_id продолжает прерванную рассылку"""
+        broadcast_id = broadcast_id or make_broadcast_id()
+        recipients = list(dict.fromkeys(chat_ids))
+        done = await run_in_db_thread(self._load_done, broadcast_id)
+        pending = [chat_id for chat_id in recipients if chat_id not in done]
+
+        report = DeliveryReport(broadcast_id=broadcast_id, total=len(recipients), skipped=len(recipients) - len(pending))
+        logger.info(
+            f"Рассылка {broadcast_id}: получателей {len(recipients)}, "
+            f"уже обработано {report.skipped}, к отправке {len(pending)}"
+        )
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for chat_id in pending:
+            queue.put_nowait(chat_id)
+        buffer: List[dict] = []
+
+        async def worker():
+            while True:
+                try:
+                    chat_id = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                status, error, attempts = await self._send(chat_id, text, parse_mode, report)
+                if status == 'sent':
+                    report.sent += 1
+                else:
+                    report.failed += 1
+                buffer.append({
+                    "broadcast_id": broadcast_id,
+                    "chat_id": chat_id,
+                    "status": status,
+                    "error": error,
+                    "attempts": attempts
+                })
+                if len(buffer) >= self.flush_every:
+                    await self._flush(buffer)
+
+        started = time.perf_counter()
+        try:
+            workers = [asyncio.create_task(worker()) for _ in range(min(self.concurrency, len(pending)))]
+            await asyncio.gather(*workers)
+        finally:
+            report.elapsed = time.perf_counter() - started
+            # Сохраняем прогресс и при прерывании (отмена задачи, остановка приложения)
+            await asyncio.shield(self._flush(buffer))
+
+        logger.info(f"Рассылка {broadcast_id} завершена: {report.to_dict()}")
+        return report
+
+    async def _send(self, chat_id: int, text: str, parse_mode: str, report: DeliveryReport):
+        """Отправка одному получателю с повторами; возвращает (статус, ошибка, попытки)"""
+        last_error = None
+        for attempt in range(1, self.max_retries + 2):
+            await self.per_chat.wait(chat_id)
+            await self.bucket.acquire()
+            started = time.perf_counter()
+            try:
+                await self.bot.send_message(chat_id=chat_id, text=text, parse_mode=parse_mode)
+                latency = time.perf_counter() - started
+                report.latencies.append(latency)
+                if telegram_send_duration_seconds is not None:
+                    telegram_send_duration_seconds.observe(latency)
+                _count('sent')
+                return 'sent', None, attempt
+            except RetryAfter as e:
+                retry_after = e.retry_after
+                delay = retry_after.total_seconds() if hasattr(retry_after, 'total_seconds') else float(retry_after)
+                logger.warning(f"Telegram RetryAfter {delay} сек, рассылка приостановлена")
+                self.bucket.pause(delay)
+                last_error = str(e)
+                _count('retry_after')
+            except BadRequest as e:
+                # BadRequest наследует NetworkError, но повтор запроса не поможет
+                return self._rejected(chat_id, e, attempt)
+            except NetworkError as e:
+                # Временные сетевые ошибки (в т.ч. TimedOut) - повтор с backoff
+                last_error = str(e)
+                _count('network_error')
+                if attempt <= self.max_retries:
+                    await asyncio.sleep(min(2 ** attempt, 30))
+            except TelegramError as e:
+                return self._rejected(chat_id, e, attempt)
+            if attempt <= self.max_retries:
+                report.retries += 1
+
+        _count('failed')
+        logger.warning(f"Не удалось отправить сообщение пользователю {chat_id} после повторов: {last_error}")
+        return 'failed', last_error, self.max_retries + 1
+
+    @staticmethod
+    def _rejected(chat_id: int, error: TelegramError, attempt: int):
+        """Заблокировал бота, чат не найден и т.п. - повтор бесполезен"""
+        logger.warning(f"Не удалось отправить сообщение пользователю {chat_id}: {error}")
+        _count('failed')
+        return ('blocked' if _is_permanent(error) else 'failed'), str(error), attempt
+
+    async def _flush(self, buffer: List[dict]):
+        if not buffer:
+            return
+        rows = buffer[:]
+        del buffer[:]
+        try:
+            await run_in_db_thread(self._save_rows, rows)
+        except Exception as e:
+            logger.error(f"Не удалось сохранить прогресс рассылки: {e}")
+
+    @staticmethod
+    def _load_done(db, broadcast_id: str) -> Set[int]:
+        """Получатели, которым при возобновлении отправлять уже не нужно"""
+        return {
+            row.chat_id for row in db.query(BroadcastDelivery.chat_id).filter(
+                BroadcastDelivery.broadcast_id == broadcast_id,
+                BroadcastDelivery.status.in_(FINAL_STATUSES)
+            )
+        }
+
+    @staticmethod
+    def _save_rows(db, rows: List[dict]):
+        # Повторная попытка после временной ошибки заменяет прежнюю строку получателя
+        db.query(BroadcastDelivery).filter(
+            BroadcastDelivery.broadcast_id == rows[0]["broadcast_id"],
+            BroadcastDelivery.chat_id.in_([row["chat_id"] for row in rows])
+        ).delete(synchronize_session=False)
+        db.bulk_insert_mappings(BroadcastDelivery, rows)
@@ -3,22 +3,248 @@ Transcription Service
 Handles audio/video transcription using faster-whisper and GPT analysis
 """
 
+import io
 import os
+import re
+import json
+import math
 import asyncio
 import tempfile
 import uuid
 from pathlib import Path
-from typing import Dict, Optional
+from typing import BinaryIO, Dict, List, Optional, Tuple
 from datetime import datetime
 
 import aiofiles
-import httpx
+import openai
 from docx import Document
 from docx.shared import Pt, RGBColor
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 
 from app.core.logging import logger
 from app.core.config import settings
+from app.services.llm_governor import llm_governor
+from app.services.whisper_pool import whisper_pool
+
+# Короче этого сегменты не режем: накладные расходы ffmpeg и потеря контекста
+MIN_SEGMENT_SECONDS = 60
+# Сколько слов на стыке сегментов проверяем на повтор
+MAX_BOUNDARY_WORDS = 15
+
+# Файлы сессии возобновляемой загрузки
+UPLOAD_PART = "upload.part"
+UPLOAD_META = "upload.json"
+UPLOAD_SESSION_RE = re.compile(r"^[\w-]{1,100}$")
+COPY_BLOCK_SIZE = 1024 * 1024
+
+
+def _copy_into(src: BinaryIO, dst_fd: int, offset: int, count: int) -> None:
+    """
+    Copy count bytes from the start of src into dst_fd at offset
+
+    Данные копирует ядро (copy_file_range, затем sendfile), без буферов Python;
+    если src не файл на диске или ФС не поддерживает - блоками по 1 МБ
+    """
+    copied = 0
+    try:
+        src.flush()
+        src_fd = src.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        src_fd = None
+
+    if src_fd is not None and hasattr(os, "copy_file_range"):
+        try:
+            while copied < count:
+                n = os.copy_file_range(src_fd, dst_fd, count - copied, copied, offset + copied)
+                if n == 0:
+                    break
+                copied += n
+        except OSError:  # EXDEV (разные ФС), ENOSYS, EINVAL
+            pass
+
+    if src_fd is not None and copied < count and hasattr(os, "sendfile"):
+        try:
+            os.lseek(dst_fd, offset + copied, os.SEEK_SET)
+            while copied < count:
+                n = os.sendfile(dst_fd, src_fd, copied, count - copied)
+                if n == 0:
+                    break
+                copied += n
+        except OSError:
+            pass
+
+    src.seek(copied)
+    while copied < count:
+        block = src.read(min(COPY_BLOCK_SIZE, count - copied))
+        if not block:
+            break
+        os.pwrite(dst_fd, block, offset + copied)
+        copied += len(block)
+
+    if copied != count:
+        raise IOError(f"Chunk copy incomplete: {copied} of {count} bytes")
+
+
+# Анализ транскрипции: грубая оценка токенов для русского текста (без токенизатора модели)
+CHARS_PER_TOKEN = 3
+MAP_MAX_TOKENS = 400
+
+ANALYSIS_SYSTEM_PROMPT = "Ты - эксперт по анализу текста и выделению ключевой информации. Отвечай на русском языке."
+
+MAP_PROMPT = """
+Это фрагмент {index} из {total} транскрипции аудио/видео. Составь его сжатый конспект:
+- о чем говорили (2-3 предложения)
+- ключевые факты, решения, цифры
+- упомянутые действия и задачи (кто, что, срок), если есть
+
+Фрагмент:
+{text}
+"""
+
+COMBINE_PROMPT = """
+Объедини конспекты последовательных фрагментов транскрипции в один сжатый конспект,
+сохранив ключевые факты, решения и упомянутые действия и задачи.
+
+{text}
+"""
+
+ANALYSIS_PROMPT = """
+Проанализируй следующую транскрипцию аудио/видео и предоставь:
+
+1. Краткое резюме (2-3 предложения)
+2. Ключевые моменты (список из 5-7 пунктов)
+3. Действия и задачи, которые были упомянуты (если есть)
+
+{material}
+
+Формат ответа должен быть структурированным и четким.
+"""
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _pack(pieces: List[str], max_chars: int, separator: str = " ") -> List[str]:
+    """Жадно собирает фрагменты в окна не длиннее max_chars (кроме слишком длинных фрагментов)"""
+    windows: List[str] = []
+    current: List[str] = []
+    size = 0
+    for piece in pieces:
+        if current and size + len(separator) + len(piece) > max_chars:
+            windows.append(separator.join(current))
+            current, size = [], 0
+        current.append(piece)
+        size += len(piece) + (len(separator) if size else 0)
+    if current:
+        windows.append(separator.join(current))
+    return windows
+
+
+def split_into_windows(text: str, max_tokens: int) -> List[str]:
+    """Split text into windows of at most max_tokens (estimated) on sentence boundaries"""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    pieces: List[str] = []
+    for sentence in re.split(r"(?<=[.!?…])\s+", text.strip()):
+        # Whisper без пунктуации может выдать "предложение" длиннее окна - режем по словам
+        if len(sentence) > max_chars:
+            pieces.extend(_pack(sentence.split(), max_chars))
+        elif sentence:
+            pieces.append(sentence)
+    return _pack(pieces, max_chars)
+
+
+def _boundary_words(text: str) -> List[str]:
+    return [re.sub(r"[^\w]", "", word.lower()) for word in text.split()]
+
+
+def _drop_repeated_prefix(previous: str, text: str) -> str:
+    """Убирает из начала text слова, которыми уже закончился previous (повтор на стыке)"""
+    tail = _boundary_words(previous)[-MAX_BOUNDARY_WORDS:]
+    head = _boundary_words(text)[:MAX_BOUNDARY_WORDS]
+    for k in range(min(len(tail), len(head)), 0, -1):
+        if tail[-k:] == head[:k]:
+            return " ".join(text.split()[k:])
+    return text
+
+
+def _keep_window(offsets: List[float], index: int, overlap: float) -> Tuple[float, float]:
+    """Диапазон времени, за который отвечает сегмент index: стыки по середине перекрытий"""
+    keep_from = offsets[index] + overlap / 2 if index > 0 else float("-inf")
+    keep_to = offsets[index + 1] + overlap / 2 if index + 1 < len(offsets) else float("inf")
+    return keep_from, keep_to
+
+
+def stitch_segments(parts: List[Tuple[float, list]], overlap: float) -> str:
+    """
+    Stitch per-segment transcripts in order
+
+    Args:
+        parts: [(offset, [(start, end, text), ...]), ...] - offset of each audio
+            segment and whisper segments with timestamps relative to it
+        overlap: overlap between neighbouring audio segments in seconds
+
+    Фразы из зоны перекрытия попадают в результат один раз: стык проходит
+    по середине перекрытия, а повтор слов на границе удаляется по тексту.
+    """
+    pieces: List[str] = []
+    offsets = [offset for offset, _ in parts]
+    for i, (offset, segments) in enumerate(parts):
+        keep_from, keep_to = _keep_window(offsets, i, overlap)
+        text = " ".join(
+            segment_text.strip()
+            for start, end, segment_text in segments
+            if keep_from <= offset + (start + end) / 2 < keep_to and segment_text.strip()
+        )
+        if text and pieces:
+            text = _drop_repeated_prefix(pieces[-1], text)
+        if text:
+            pieces.append(text)
+    return " ".join(pieces).strip()
+
+
+class TranscriptStream:
+    """
+    Transcript segments of a task in decoding order, for streaming subscribers
+    """
+
+    def __init__(self):
+        self.segments: List[Dict] = []
+        self.closed = False
+        self._waiters: List[asyncio.Future] = []
+
+    def publish(self, start: float, end: float, text: str, part: int = 0):
+        self.segments.append({"start": round(start, 2), "end": round(end, 2), "text": text.strip(), "part": part})
+        self._wake()
+
+    def close(self):
+        self.closed = True
+        self._wake()
+
+    def _wake(self):
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+        self._waiters = []
+
+    async def wait(self, position: int, timeout: float) -> None:
+        """Ждет фраз после position или закрытия потока, не дольше timeout"""
+        if position < len(self.segments) or self.closed:
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def text(self) -> str:
+        """Частичная транскрипция: уже декодированные фразы в порядке времени"""
+        ordered = sorted(self.segments, key=lambda segment: segment["start"])
+        return " ".join(segment["text"] for segment in ordered if segment["text"])
 
 
 class TranscriptionService:
@@ -28,11 +254,14 @@ class TranscriptionService:
         self.upload_dir = Path("./uploads/transcriptions")
         self.upload_dir.mkdir(parents=True, exist_ok=True)
         self.tasks: Dict[str, Dict] = {}
+        self.streams: Dict[str, TranscriptStream] = {}
+        self._upload_locks: Dict[str, asyncio.Lock] = {}
 
         # OpenRouter configuration
         self.openrouter_api_key = os.getenv("OPENROUTER_API_KEY")
         self.openrouter_base_url = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
         self.default_model = os.getenv("DEFAULT_MODEL", "openai/gpt-4o-mini")
+        self._llm_client: Optional[openai.AsyncOpenAI] = None
 
     async def cleanup_old_files(self, days_old: int = 7):
         """
@@ -107,6 +336,7 @@ class TranscriptionService:
 
     async def process_audio(self, audio_file: Path, task_id: str) -> Dict:
         """Process audio file: transcribe and analyze"""
+        stream = self.streams.setdefault(task_id, TranscriptStream())
         try:
             # Update task status (don't overwrite if already exists from chunked upload)
             if task_id not in self.tasks:
@@ -133,13 +363,14 @@ class TranscriptionService:
             # Step 2: Transcribe audio with faster-whisper using subprocess (50% progress)
             self.tasks[task_id]["stage"] = "Транскрипция аудио (это может занять несколько минут)..."
             logger.info(f"transcribing_audio task_id={task_id}")
-            transcript = await self._transcribe_file_subprocess(audio_path)
+            transcript = await self._transcribe_audio(audio_path, task_id)
+            stream.close()
             self.tasks[task_id]["progress"] = 60
             self.tasks[task_id]["stage"] = "Транскрипция завершена, анализ текста..."
 
             # Step 3: Analyze with GPT (20% progress)
             logger.info(f"analyzing_with_gpt task_id={task_id}")
-            analysis = await self._analyze_with_gpt(transcript)
+            analysis = await self._analyze_with_gpt(transcript, task_id)
             self.tasks[task_id]["progress"] = 75
             self.tasks[task_id]["stage"] = "Анализ завершен, создание документа..."
 
@@ -203,6 +434,22 @@ class TranscriptionService:
             }
             raise
 
+        finally:
+            # Подписчики, уже читающие поток, дочитают его; новые получат итог из tasks
+            stream.close()
+            self.streams.pop(task_id, None)
+
+    def get_stream(self, task_id: str) -> Optional[TranscriptStream]:
+        """Live transcript stream of a task being transcribed"""
+        return self.streams.get(task_id)
+
+    def _publish_segment(self, task_id: str, part: int, offset: float, keep: Tuple[float, float], segment: tuple):
+        """Передает фразу подписчикам, если она в зоне ответственности своего сегмента"""
+        stream = self.streams.get(task_id)
+        start, end, text = segment
+        if stream is not None and keep[0] <= offset + (start + end) / 2 < keep[1]:
+            stream.publish(offset + start, offset + end, text, part)
+
     async def _split_video_into_parts(self, video_file: Path, task_id: str) -> list[Path]:
         """
         Split large video file into smaller parts for processing
@@ -223,22 +470,7 @@ class TranscriptionService:
             )
 
             # First, get video duration using ffprobe
-            probe_process = await asyncio.create_subprocess_exec(
-                'ffprobe',
-                '-v', 'error',
-                '-show_entries', 'format=duration',
-                '-of', 'default=noprint_wrappers=1:nokey=1',
-                str(video_file),
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-
-            stdout, stderr = await probe_process.communicate()
-
-            if probe_process.returncode != 0:
-                raise Exception(f"FFprobe error: {stderr.decode()}")
-
-            total_duration = float(stdout.decode().strip())
+            total_duration = await self._probe_duration(video_file)
             segment_duration = total_duration / num_parts
 
             logger.info(
@@ -297,6 +529,138 @@ class TranscriptionService:
             logger.error(f"video_split_error task_id={task_id}, error={str(e)}")
             raise
 
+    async def _probe_duration(self, media_file: Path) -> float:
+        """Get media duration in seconds using ffprobe"""
+        probe_process = await asyncio.create_subprocess_exec(
+            'ffprobe',
+            '-v', 'error',
+            '-show_entries', 'format=duration',
+            '-of', 'default=noprint_wrappers=1:nokey=1',
+            str(media_file),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+
+        stdout, stderr = await probe_process.communicate()
+
+        if probe_process.returncode != 0:
+            raise Exception(f"FFprobe error: {stderr.decode()}")
+
+        return float(stdout.decode().strip())
+
+    async def _split_audio_into_segments(
+        self,
+        audio_path: Path,
+        total_duration: float,
+        segment_duration: float,
+        overlap: float
+    ) -> List[Tuple[Path, float]]:
+        """
+        Cut audio into overlapping 16 kHz mono WAV segments
+
+        Returns:
+            [(segment_path, offset_seconds), ...]
+        """
+        num_parts = math.ceil(total_duration / segment_duration)
+        segments = []
+        try:
+            for i in range(num_parts):
+                # Каждый сегмент захватывает по overlap/2 с обеих сторон границы
+                start = max(0.0, i * segment_duration - overlap / 2)
+                end = min(total_duration, (i + 1) * segment_duration + overlap / 2)
+                segment_path = self.upload_dir / f"{audio_path.stem}_seg{i + 1}.wav"
+
+                process = await asyncio.create_subprocess_exec(
+                    'ffmpeg',
+                    '-y',
+                    '-ss', f"{start:.3f}",
+                    '-t', f"{end - start:.3f}",
+                    '-i', str(audio_path),
+                    '-vn',
+                    '-ac', '1',
+                    '-ar', '16000',  # Формат, который whisper использует внутри
+                    str(segment_path),
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE
+                )
+
+                stdout, stderr = await process.communicate()
+
+                if process.returncode != 0:
+                    raise Exception(f"FFmpeg split error: {stderr.decode()}")
+
+                segments.append((segment_path, start))
+
+        except Exception:
+            for segment_path, _ in segments:
+                segment_path.unlink(missing_ok=True)
+            raise
+
+        return segments
+
+    async def _transcribe_audio(self, audio_path: Path, task_id: str) -> str:
+        """
+        Transcribe audio, splitting long files into segments that are
+        transcribed in parallel by the worker pool
+        """
+        total_duration = await self._probe_duration(audio_path)
+        overlap = settings.TRANSCRIPTION_SEGMENT_OVERLAP
+
+        # Сегментов не меньше, чем воркеров, чтобы загрузить все ядра
+        segment_duration = min(
+            settings.TRANSCRIPTION_SEGMENT_SECONDS,
+            max(MIN_SEGMENT_SECONDS, total_duration / whisper_pool.workers)
+        )
+        if total_duration <= segment_duration + overlap:
+            return await self._transcribe_file_subprocess(
+                audio_path,
+                on_segment=lambda segment: self._publish_segment(
+                    task_id, 0, 0.0, (float("-inf"), float("inf")), segment
+                )
+            )
+
+        segments = await self._split_audio_into_segments(audio_path, total_duration, segment_duration, overlap)
+        total = len(segments)
+        done = 0
+        self.tasks[task_id]["segments"] = {"done": 0, "total": total}
+        logger.info(
+            f"parallel_transcription_started task_id={task_id}, segments={total}, "
+            f"duration={round(total_duration, 1)}, workers={whisper_pool.workers}"
+        )
+
+        offsets = [offset for _, offset in segments]
+
+        async def transcribe_segment(part: int, segment_path: Path) -> list:
+            nonlocal done
+            keep = _keep_window(offsets, part, overlap)
+            result = await whisper_pool.transcribe(
+                str(segment_path),
+                on_segment=lambda segment: self._publish_segment(task_id, part, offsets[part], keep, segment)
+            )
+            done += 1
+            # Транскрипция занимает диапазон прогресса 20-60%
+            self.tasks[task_id]["segments"] = {"done": done, "total": total}
+            self.tasks[task_id]["progress"] = 20 + int(40 * done / total)
+            self.tasks[task_id]["stage"] = f"Транскрипция аудио: готово {done} из {total} частей..."
+            return result["segments"]
+
+        jobs = [asyncio.create_task(transcribe_segment(i, path)) for i, (path, _) in enumerate(segments)]
+        try:
+            results = await asyncio.gather(*jobs)
+        finally:
+            # При ошибке одного сегмента снимаем остальные с очереди пула
+            for job in jobs:
+                job.cancel()
+            for segment_path, _ in segments:
+                segment_path.unlink(missing_ok=True)
+
+        transcript = stitch_segments(
+            [(offset, segment_results) for (_, offset), segment_results in zip(segments, results)],
+            overlap
+        )
+        logger.info(f"parallel_transcription_completed task_id={task_id}, chars={len(transcript)}")
+        return transcript
+
     async def _extract_audio_from_video(self, file_path: Path) -> Path:
         """Extract audio from video file using ffmpeg"""
         try:
@@ -329,65 +693,12 @@ class TranscriptionService:
             logger.error(f"audio_extraction_error: {e}")
             raise
 
-    async def _transcribe_file_subprocess(self, audio_path: Path) -> str:
-        """Transcribe using subprocess to isolate memory - РЕШЕНИЕ ПРОБЛЕМЫ OOM"""
+    async def _transcribe_file_subprocess(self, audio_path: Path, on_segment=None) -> str:
+        """Transcribe in a warm worker process (isolated memory, model loaded once)"""
         try:
-            import json
-            logger.info(f"transcribing_via_subprocess audio_file={str(audio_path)}")
+            logger.info(f"transcribing_via_worker_pool audio_file={str(audio_path)}")
 
-            # Создаем временный Python скрипт для транскрипции
-            script = f"""
-import sys
-import json
-from faster_whisper import WhisperModel
-
-audio_file = "{audio_path}"
-model_size = "tiny"
-
-try:
-    model = WhisperModel(model_size, device="cpu", compute_type="int8", num_workers=1)
-    segments, info = model.transcribe(
-        audio_file,
-        beam_size=1,
-        best_of=1,
-        language="ru",
-        vad_filter=True,
-        vad_parameters=dict(min_silence_duration_ms=500),
-        condition_on_previous_text=False,
-        temperature=0.0
-    )
-
-    transcript_parts = []
-    for segment in segments:
-        transcript_parts.append(segment.text)
-
-    transcript = " ".join(transcript_parts).strip()
-    print(json.dumps({{"success": True, "transcript": transcript}}))
-
-except Exception as e:
-    print(json.dumps({{"success": False, "error": str(e)}}), file=sys.stderr)
-    sys.exit(1)
-"""
-
-            # Запускаем в отдельном процессе
-            process = await asyncio.create_subprocess_exec(
-                'python3',
-                '-c',
-                script,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-
-            stdout, stderr = await process.communicate()
-
-            if process.returncode != 0:
-                error_msg = stderr.decode() if stderr else "Unknown error"
-                logger.error("subprocess_transcription_error", error=error_msg)
-                raise Exception(f"Transcription failed: {error_msg}")
-
-            result = json.loads(stdout.decode())
-            if not result.get("success"):
-                raise Exception(result.get("error", "Unknown error"))
+            result = await whisper_pool.transcribe(str(audio_path), on_segment=on_segment)
 
             transcript = result["transcript"]
             logger.info(f"subprocess_transcription_completed chars={len(transcript)}")
@@ -415,8 +726,43 @@ except Exception as e:
             logger.error(f"whisper_transcription_error: {e}")
             raise
 
-    async def _analyze_with_gpt(self, transcript: str) -> Dict:
-        """Analyze transcript using OpenRouter GPT"""
+    def _get_llm_client(self) -> openai.AsyncOpenAI:
+        """OpenRouter client for analysis requests (limits and retries are in llm_governor)"""
+        if self._llm_client is None:
+            self._llm_client = openai.AsyncOpenAI(
+                api_key=self.openrouter_api_key,
+                base_url=self.openrouter_base_url,
+                default_headers={
+                    "HTTP-Referer": "https://nikolaevcodev.ru",
+                    "X-Title": "Enterprise CRM - Transcription"
+                },
+                max_retries=0
+            )
+        return self._llm_client
+
+    async def _complete(self, prompt: str, max_tokens: int) -> str:
+        """Single analysis request to the model"""
+        response = await llm_governor.chat_completion(
+            self._get_llm_client(),
+            model=self.default_model,
+            messages=[
+                {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.3,
+            max_tokens=max_tokens
+        )
+        return response.choices[0].message.content or ""
+
+    async def _analyze_with_gpt(self, transcript: str, task_id: str = None) -> Dict:
+        """
+        Analyze transcript using OpenRouter GPT
+
+        Длинная транскрипция делится на окна по TRANSCRIPTION_ANALYSIS_WINDOW_TOKENS:
+        окна конспектируются параллельно (map), затем по конспектам строится
+        итоговый анализ (reduce). Если конспекты сами не помещаются в окно,
+        они сворачиваются в несколько проходов.
+        """
         try:
             if not self.openrouter_api_key:
                 logger.warning(f'openrouter_key_missing message="Skipping GPT analysis"')
@@ -426,52 +772,47 @@ except Exception as e:
                     "action_items": []
                 }
 
-            # Prepare prompt
-            prompt = f"""
-Проанализируй следующую транскрипцию аудио/видео и предоставь:
-
-1. Краткое резюме (2-3 предложения)
-2. Ключевые моменты (список из 5-7 пунктов)
-3. Действия и задачи, которые были упомянуты (если есть)
-
-Транскрипция:
-{transcript[:4000]}  # Limit to avoid token limits
-
-Формат ответа должен быть структурированным и четким.
-"""
-
-            # Call OpenRouter API
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                response = await client.post(
-                    f"{self.openrouter_base_url}/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {self.openrouter_api_key}",
-                        "Content-Type": "application/json",
-                        "HTTP-Referer": "https://nikolaevcodev.ru",
-                        "X-Title": "Enterprise CRM - Transcription"
-                    },
-                    json={
-                        "model": self.default_model,
-                        "messages": [
-                            {
-                                "role": "system",
-                                "content": "Ты - эксперт по анализу текста и выделению ключевой информации. Отвечай на русском языке."
-                            },
-                            {
-                                "role": "user",
-                                "content": prompt
-                            }
-                        ],
-                        "temperature": 0.3,
-                        "max_tokens": 1000
-                    }
-                )
+            window_tokens = settings.TRANSCRIPTION_ANALYSIS_WINDOW_TOKENS
+            windows = split_into_windows(transcript, window_tokens)
+
+            if len(windows) <= 1:
+                material = f"Транскрипция:\n{transcript}"
+            else:
+                logger.info(f"gpt_analysis_map task_id={task_id}, windows={len(windows)}")
+                done = 0
+
+                async def summarize(i: int, window: str) -> str:
+                    nonlocal done
+                    note = await self._complete(
+                        MAP_PROMPT.format(index=i + 1, total=len(windows), text=window),
+                        max_tokens=MAP_MAX_TOKENS
+                    )
+                    done += 1
+                    if task_id in self.tasks:
+                        self.tasks[task_id]["stage"] = f"Анализ текста: обработано {done} из {len(windows)} фрагментов..."
+                    return f"Фрагмент {i + 1}:\n{note.strip()}"
+
+                notes = await asyncio.gather(*(summarize(i, window) for i, window in enumerate(windows)))
+
+                # Конспекты не помещаются в одно окно - сворачиваем группами
+                while len(notes) > 1 and estimate_tokens("\n\n".join(notes)) > window_tokens:
+                    groups = _pack(notes, window_tokens * CHARS_PER_TOKEN, separator="\n\n")
+                    if len(groups) >= len(notes):
+                        # Окно меньше двух конспектов (~2 * MAP_MAX_TOKENS) - свертка
+                        # их не сокращает; отдаем в итоговый анализ как есть
+                        logger.warning(
+                            f"gpt_analysis_fold_stalled task_id={task_id}, notes={len(notes)}, "
+                            f"window_tokens={window_tokens}"
+                        )
+                        break
+                    notes = await asyncio.gather(*(
+                        self._complete(COMBINE_PROMPT.format(text=group), max_tokens=MAP_MAX_TOKENS)
+                        for group in groups
+                    ))
 
-            if response.status_code != 200:
-                raise Exception(f"OpenRouter API error: {response.status_code} - {response.text}")
+                material = "Конспекты последовательных фрагментов транскрипции:\n" + "\n\n".join(notes)
 
-            result = response.json()
-            analysis_text = result["choices"][0]["message"]["content"]
+            analysis_text = await self._complete(ANALYSIS_PROMPT.format(material=material), max_tokens=1000)
 
             # Parse the analysis (simple parsing)
             analysis = {
@@ -481,7 +822,7 @@ except Exception as e:
                 "action_items": self._extract_action_items(analysis_text)
             }
 
-            logger.info(f"gpt_analysis_completed model={self.default_model}")
+            logger.info(f"gpt_analysis_completed model={self.default_model}, windows={len(windows)}")
             return analysis
 
         except Exception as e:
@@ -669,90 +1010,184 @@ except Exception as e:
             return file_path
         return None
 
-    async def combine_chunks_and_process(
+    def _upload_session_dir(self, session_id: str) -> Path:
+        """Directory of a resumable upload session"""
+        if not UPLOAD_SESSION_RE.match(session_id or ""):
+            raise ValueError("Invalid upload session id")
+        return self.upload_dir / session_id
+
+    def get_upload_session(self, session_id: str) -> Optional[Dict]:
+        """Upload session metadata (received chunks and layout) or None"""
+        meta_path = self._upload_session_dir(session_id) / UPLOAD_META
+        if not meta_path.exists():
+            return None
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    async def save_upload_chunk(
+        self,
+        session_id: str,
+        chunk_index: int,
+        total_chunks: int,
+        chunk_file: BinaryIO,
+        chunk_size: Optional[int] = None,
+        total_size: Optional[int] = None
+    ) -> Dict:
+        """
+        Write an uploaded chunk straight into the session file at its offset
+
+        Args:
+            chunk_file: Chunk data (UploadFile.file), copied by the kernel when possible
+            chunk_size: Nominal size of every chunk except the last one
+                (defaults to the size of the first non-last chunk received)
+            total_size: Final file size, used to preallocate the file
+
+        Returns:
+            {"received": int, "total": int, "size": int}
+        """
+        if not 0 <= chunk_index < total_chunks:
+            raise ValueError(f"Invalid chunk index {chunk_index} of {total_chunks}")
+
+        session_dir = self._upload_session_dir(session_id)
+        lock = self._upload_locks.setdefault(session_id, asyncio.Lock())
+        async with lock:
+            meta = await asyncio.to_thread(
+                self._write_upload_chunk,
+                session_dir, chunk_index, total_chunks, chunk_file, chunk_size, total_size
+            )
+
+        return {
+            "received": len(meta["chunks"]),
+            "total": meta["total_chunks"],
+            "size": meta["chunks"][str(chunk_index)]
+        }
+
+    def _write_upload_chunk(
+        self,
+        session_dir: Path,
+        chunk_index: int,
+        total_chunks: int,
+        chunk_file: BinaryIO,
+        chunk_size: Optional[int],
+        total_size: Optional[int]
+    ) -> Dict:
+        size = chunk_file.seek(0, os.SEEK_END)
+        chunk_file.seek(0)
+
+        session_dir.mkdir(parents=True, exist_ok=True)
+        meta = self.get_upload_session(session_dir.name) or {
+            "chunk_size": None,
+            "total_chunks": total_chunks,
+            "total_size": None,
+            "chunks": {},
+            "pending": []
+        }
+        if meta["total_chunks"] != total_chunks:
+            raise ValueError("totalChunks changed within upload session")
+
+        is_last = chunk_index == total_chunks - 1
+        layout = meta["chunk_size"] or chunk_size or (size if not is_last else None)
+        if chunk_size and layout != chunk_size:
+            raise ValueError("chunkSize changed within upload session")
+        if layout and (size > layout or (not is_last and size != layout)):
+            raise ValueError(f"Chunk {chunk_index} has {size} bytes, expected {layout}")
+
+        fd = os.open(session_dir / UPLOAD_PART, os.O_WRONLY | os.O_CREAT, 0o644)
+        try:
+            if total_size and not meta["total_size"]:
+                # Резервируем место под весь файл сразу, чанки пишутся по своим смещениям
+                try:
+                    os.posix_fallocate(fd, 0, total_size)
+                except (AttributeError, OSError):
+                    os.ftruncate(fd, total_size)
+                meta["total_size"] = total_size
+
+            if chunk_index > 0 and layout is None:
+                # Последний чанк пришел раньше остальных - смещение пока неизвестно
+                with open(session_dir / f"pending_{chunk_index}", "wb") as pending:
+                    _copy_into(chunk_file, pending.fileno(), 0, size)
+                if chunk_index not in meta["pending"]:
+                    meta["pending"].append(chunk_index)
+            else:
+                _copy_into(chunk_file, fd, chunk_index * (layout or 0), size)
+
+            if layout and meta["pending"]:
+                for pending_index in meta["pending"]:
+                    pending_path = session_dir / f"pending_{pending_index}"
+                    with open(pending_path, "rb") as pending:
+                        _copy_into(pending, fd, pending_index * layout, meta["chunks"][str(pending_index)])
+                    pending_path.unlink()
+                meta["pending"] = []
+        finally:
+            os.close(fd)
+
+        meta["chunk_size"] = layout
+        meta["chunks"][str(chunk_index)] = size
+
+        # Метаданные заменяем атомарно, чтобы обрыв не оставил битый JSON
+        tmp_path = session_dir / (UPLOAD_META + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, session_dir / UPLOAD_META)
+        return meta
+
+    async def process_chunked_upload(
         self,
         session_id: str,
         filename: str,
         task_id: str
     ) -> None:
-        """Combine uploaded chunks and start transcription processing"""
+        """Move the assembled upload into place and start transcription processing"""
         try:
-            import aiofiles
-
-            # Update task status
-            self.tasks[task_id]["stage"] = "Объединение файлов..."
+            self.tasks[task_id]["stage"] = "Проверка загруженного файла..."
             self.tasks[task_id]["progress"] = 5
 
-            session_dir = self.upload_dir / session_id
-
-            if not session_dir.exists():
-                raise Exception(f"Session directory not found: {session_id}")
-
-            # Get all chunks sorted by index
-            chunks = sorted(
-                session_dir.glob("chunk_*"),
-                key=lambda x: int(x.name.split("_")[1])
-            )
+            session_dir = self._upload_session_dir(session_id)
+            meta = self.get_upload_session(session_id)
 
-            if not chunks:
-                raise Exception("No chunks found")
+            if not meta:
+                raise Exception(f"Session not found: {session_id}")
 
-            logger.info(
-                "combining_chunks",
-                task_id=task_id,
-                session_id=session_id,
-                chunk_count=len(chunks)
-            )
+            missing = [i for i in range(meta["total_chunks"]) if str(i) not in meta["chunks"]]
+            if missing or meta["pending"]:
+                raise Exception(f"Upload incomplete, missing chunks: {missing[:20]}")
 
-            # Combine chunks into final file
+            # Чанки уже лежат на своих местах - файл только переименовываем
             file_extension = Path(filename).suffix
-            final_filename = f"upload_{task_id}{file_extension}"
-            final_path = self.upload_dir / final_filename
-
-            async with aiofiles.open(final_path, "wb") as outfile:
-                for i, chunk_path in enumerate(chunks):
-                    async with aiofiles.open(chunk_path, "rb") as infile:
-                        content = await infile.read()
-                        await outfile.write(content)
+            final_path = self.upload_dir / f"upload_{task_id}{file_extension}"
+            file_size = sum(meta["chunks"].values())
+            part_path = session_dir / UPLOAD_PART
 
-                    # Update progress during combination
-                    progress = 5 + int((i + 1) / len(chunks) * 10)
-                    self.tasks[task_id]["progress"] = progress
-
-            # Delete chunks and session directory
-            for chunk_path in chunks:
-                chunk_path.unlink()
+            os.truncate(part_path, file_size)  # Если резервировали больше, чем пришло
+            os.replace(part_path, final_path)
 
+            (session_dir / UPLOAD_META).unlink(missing_ok=True)
             try:
                 session_dir.rmdir()
-            except:
+            except OSError:
                 pass
+            self._upload_locks.pop(session_id, None)
 
             logger.info(
-                "chunks_combined",
-                task_id=task_id,
-                final_path=str(final_path),
-                file_size=final_path.stat().st_size
+                f"chunked_upload_completed task_id={task_id}, session_id={session_id}, "
+                f"chunks={meta['total_chunks']}, file_size={file_size}"
             )
 
             # Update task before processing
             self.tasks[task_id]["stage"] = "Начало обработки видео..."
             self.tasks[task_id]["progress"] = 15
 
-            # Now process the combined file
             await self.process_audio(final_path, task_id)
 
         except Exception as e:
             logger.error(
-                "chunk_combination_error",
-                task_id=task_id,
-                error=str(e),
+                f"chunked_upload_error task_id={task_id}, error={str(e)}",
                 exc_info=True
             )
             self.tasks[task_id] = {
                 "status": "error",
                 "progress": 0,
-                "error": f"Ошибка при объединении файлов: {e}",
+                "error": f"Ошибка при сборке загруженного файла: {e}",
                 "failed_at": datetime.now().isoformat()
             }
 
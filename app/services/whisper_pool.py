@@ -0,0 +1,340 @@
+"""
+Whisper Worker Pool
+Long-lived transcription processes that load the faster-whisper model once
+"""
+
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.logging import logger
+
+# Параметры транскрипции по умолчанию (как в прежнем subprocess-скрипте)
+DEFAULT_TRANSCRIBE_OPTIONS = {
+    "beam_size": 1,
+    "best_of": 1,
+    "language": "ru",
+    "vad_filter": True,
+    "vad_parameters": {"min_silence_duration_ms": 500},
+    "condition_on_previous_text": False,
+    "temperature": 0.0,
+}
+
+
+def _peak_rss_mb() -> float:
+    """Пиковое потребление памяти текущим процессом, МБ"""
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдает килобайты, macOS - байты
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _worker_main(conn, model_size: str, compute_type: str, cpu_threads: int, memory_limit_mb: int):
+    """
+    Цикл процесса-воркера: модель загружается один раз, затем задания
+    принимаются из conn до команды остановки (None) или превышения лимита памяти
+    """
+    try:
+        from faster_whisper import WhisperModel
+        model = WhisperModel(
+            model_size,
+            device="cpu",
+            compute_type=compute_type,
+            cpu_threads=cpu_threads,
+            num_workers=1
+        )
+    except Exception as e:
+        conn.send({"ready": False, "error": f"Model load failed: {e}"})
+        return
+    conn.send({"ready": True, "rss_mb": _peak_rss_mb()})
+
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+
+        started = time.perf_counter()
+        try:
+            segments, info = model.transcribe(job["audio_path"], **job["options"])
+            parts = []
+            # segments - генератор: фразы декодируются по мере итерации
+            for segment in segments:
+                part = (segment.start, segment.end, segment.text)
+                parts.append(part)
+                if job.get("stream"):
+                    conn.send({"segment": part})
+            reply = {
+                "success": True,
+                "transcript": " ".join(text for _, _, text in parts).strip(),
+                "segments": parts,
+                "duration": getattr(info, "duration", None),
+            }
+        except Exception as e:
+            reply = {"success": False, "error": str(e)}
+
+        rss_mb = _peak_rss_mb()
+        reply["rss_mb"] = round(rss_mb, 1)
+        reply["elapsed"] = round(time.perf_counter() - started, 2)
+        # Превысили потолок памяти - завершаемся, пул поднимет свежий процесс
+        reply["recycle"] = bool(memory_limit_mb) and rss_mb > memory_limit_mb
+        conn.send(reply)
+        if reply["recycle"]:
+            return
+
+
+class WorkerCrashed(Exception):
+    """Процесс-воркер завершился во время задания (например, OOM killer)"""
+
+
+@dataclass
+class _Job:
+    audio_path: str
+    options: Dict[str, Any]
+    future: asyncio.Future
+    on_segment: Optional[Callable[[tuple], None]] = None
+
+
+class _Worker:
+    """Процесс-воркер и его конец канала"""
+
+    def __init__(self, ctx, index: int, pool: "WhisperWorkerPool"):
+        self.index = index
+        self.jobs_done = 0
+        parent_conn, child_conn = ctx.Pipe()
+        self.conn = parent_conn
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, pool.model_size, pool.compute_type, pool.cpu_threads, pool.memory_limit_mb),
+            name=f"whisper-worker-{index}",
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+    def receive(self, timeout: Optional[float], on_segment: Callable[[tuple], None] = None) -> Dict[str, Any]:
+        """Блокирующее ожидание ответа (вызывается в потоке); промежуточные фразы - в on_segment"""
+        deadline = time.monotonic() + timeout if timeout else None
+        while True:
+            while not self.conn.poll(1.0):
+                if not self.process.is_alive():
+                    raise WorkerCrashed(f"worker exited with code {self.process.exitcode}")
+                if deadline and time.monotonic() > deadline:
+                    raise asyncio.TimeoutError()
+            try:
+                message = self.conn.recv()
+            except EOFError:
+                self.process.join(1)
+                raise WorkerCrashed(f"worker exited with code {self.process.exitcode}")
+            if "segment" not in message:
+                return message
+            if on_segment is not None:
+                on_segment(tuple(message["segment"]))
+
+    def stop(self, graceful: bool = True):
+        if graceful and self.process.is_alive():
+            try:
+                self.conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            self.process.join(5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(5)
+        self.conn.close()
+
+
+class WhisperWorkerPool:
+    """
+    Pool of warm faster-whisper processes with a shared job queue.
+
+    Each process keeps its model loaded between jobs; a process whose peak RSS
+    exceeds WHISPER_WORKER_MEMORY_LIMIT_MB (or that dies) is replaced, so the
+    OOM isolation of the old per-file subprocess is preserved.
+    """
+
+    def __init__(
+        self,
+        workers: int = None,
+        model_size: str = None,
+        compute_type: str = None,
+        cpu_threads: int = None,
+        memory_limit_mb: int = None,
+        job_timeout: float = None
+    ):
+        cores = os.cpu_count() or 1
+        self.workers = workers or settings.WHISPER_WORKERS or min(cores, 4)
+        self.model_size = model_size or settings.WHISPER_MODEL_SIZE
+        self.compute_type = compute_type or settings.WHISPER_COMPUTE_TYPE
+        # Потоки делим между воркерами, чтобы параллельные сегменты не конкурировали за ядра
+        cpu_threads = settings.WHISPER_CPU_THREADS if cpu_threads is None else cpu_threads
+        self.cpu_threads = cpu_threads or max(1, cores // self.workers)
+        self.memory_limit_mb = settings.WHISPER_WORKER_MEMORY_LIMIT_MB if memory_limit_mb is None else memory_limit_mb
+        self.job_timeout = job_timeout or settings.WHISPER_JOB_TIMEOUT
+        # spawn: не копируем в воркер потоки и event loop основного процесса
+        self._ctx = multiprocessing.get_context("spawn")
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: List[asyncio.Task] = []
+        self._workers: Dict[int, _Worker] = {}
+        self._recycled = 0
+        self._crashed = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._slots)
+
+    async def start(self):
+        """Запуск слотов пула; процессы поднимаются и прогревают модель при первом задании"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._slots = [asyncio.create_task(self._run_slot(i)) for i in range(self.workers)]
+        logger.info(
+            f"whisper_pool_started workers={self.workers}, model={self.model_size}, "
+            f"memory_limit_mb={self.memory_limit_mb}"
+        )
+
+    async def stop(self):
+        """Остановка слотов и процессов; ожидающие задания отменяются"""
+        if not self.running:
+            return
+        for slot in self._slots:
+            slot.cancel()
+        await asyncio.gather(*self._slots, return_exceptions=True)
+        self._slots = []
+        while not self._queue.empty():
+            job = self._queue.get_nowait()
+            if not job.future.done():
+                job.future.cancel()
+        for worker in list(self._workers.values()):
+            await asyncio.to_thread(worker.stop)
+        self._workers.clear()
+        logger.info("whisper_pool_stopped")
+
+    async def transcribe(
+        self,
+        audio_path: str,
+        on_segment: Callable[[tuple], None] = None,
+        **options
+    ) -> Dict[str, Any]:
+        """
+        Транскрипция файла в одном из воркеров
+
+        Args:
+            on_segment: вызывается в event loop для каждой фразы (start, end, text)
+                сразу после ее декодирования
+
+        Returns:
+            {"transcript": str, "segments": [(start, end, text)], "duration": float}
+        """
+        await self.start()
+        job = _Job(
+            audio_path=str(audio_path),
+            options={**DEFAULT_TRANSCRIBE_OPTIONS, **options},
+            future=asyncio.get_running_loop().create_future(),
+            on_segment=on_segment
+        )
+        await self._queue.put(job)
+        return await job.future
+
+    def stats(self) -> Dict[str, Any]:
+        """Состояние пула: очередь, живые процессы, перезапуски"""
+        return {
+            "workers": self.workers,
+            "model": self.model_size,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "alive": sum(1 for w in self._workers.values() if w.process.is_alive()),
+            "recycled": self._recycled,
+            "crashed": self._crashed,
+        }
+
+    async def _spawn(self, index: int) -> _Worker:
+        worker = _Worker(self._ctx, index, self)
+        try:
+            # Загрузка модели может идти долго (скачивание весов при первом запуске)
+            ready = await asyncio.to_thread(worker.receive, self.job_timeout)
+        except BaseException:
+            await asyncio.to_thread(worker.stop, False)
+            raise
+        if not ready.get("ready"):
+            await asyncio.to_thread(worker.stop, False)
+            raise RuntimeError(ready.get("error", "Whisper worker failed to start"))
+        logger.info(f"whisper_worker_ready index={index}, pid={worker.process.pid}, rss_mb={ready.get('rss_mb')}")
+        return worker
+
+    async def _run_slot(self, index: int):
+        while True:
+            job = await self._queue.get()
+            if job.future.cancelled():
+                continue
+            try:
+                worker = self._workers.get(index)
+                if worker is None or not worker.process.is_alive():
+                    worker = self._workers[index] = await self._spawn(index)
+                reply = await self._execute(index, worker, job)
+            except asyncio.CancelledError:
+                if not job.future.done():
+                    job.future.cancel()
+                raise
+            except Exception as e:
+                if not job.future.done():
+                    job.future.set_exception(e)
+                continue
+
+            if not job.future.done():
+                if reply.get("success"):
+                    job.future.set_result({
+                        "transcript": reply["transcript"],
+                        "segments": reply["segments"],
+                        "duration": reply.get("duration"),
+                    })
+                else:
+                    job.future.set_exception(Exception(f"Transcription failed: {reply.get('error')}"))
+
+    async def _execute(self, index: int, worker: _Worker, job: _Job) -> Dict[str, Any]:
+        try:
+            worker.conn.send({
+                "audio_path": job.audio_path,
+                "options": job.options,
+                "stream": job.on_segment is not None
+            })
+            loop = asyncio.get_running_loop()
+            on_segment = (
+                (lambda segment: loop.call_soon_threadsafe(job.on_segment, segment))
+                if job.on_segment is not None else None
+            )
+            reply = await asyncio.to_thread(worker.receive, self.job_timeout, on_segment)
+        except (WorkerCrashed, BrokenPipeError, asyncio.TimeoutError) as e:
+            # Процесс убит (OOM) или завис - заменим его при следующем задании
+            self._crashed += 1
+            self._workers.pop(index, None)
+            await asyncio.to_thread(worker.stop, False)
+            logger.error(f"whisper_worker_failed index={index}, error={type(e).__name__}: {e}")
+            raise WorkerCrashed(f"Transcription worker failed: {e or 'timeout'}") from e
+        except asyncio.CancelledError:
+            self._workers.pop(index, None)
+            await asyncio.shield(asyncio.to_thread(worker.stop, False))
+            raise
+
+        worker.jobs_done += 1
+        logger.info(
+            f"whisper_job_done index={index}, elapsed={reply.get('elapsed')}, "
+            f"rss_mb={reply.get('rss_mb')}, jobs={worker.jobs_done}"
+        )
+        if reply.get("recycle"):
+            self._recycled += 1
+            self._workers.pop(index, None)
+            await asyncio.to_thread(worker.stop, False)
+            logger.info(f"whisper_worker_recycled index={index}, rss_mb={reply.get('rss_mb')}")
+        return reply
+
+
+# Global pool instance
+whisper_pool = WhisperWorkerPool()
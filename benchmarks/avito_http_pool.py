@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк HTTP-клиента AvitoService на локальном stub-сервере.
+
+Сравнивает:
+  per_call - новая aiohttp.ClientSession на каждый запрос (прежнее поведение)
+  pooled   - AvitoService._make_request через общую keep-alive сессию
+
+Stub работает по обычному HTTP на localhost, поэтому выигрыш здесь - только
+TCP-handshake и создание сессии; на api.avito.ru добавляются TLS и DNS.
+
+Запуск:
+    python benchmarks/avito_http_pool.py --requests 2000 --concurrency 20
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aiohttp
+from aiohttp import web
+
+from app.services.avito_service import AvitoService
+
+USER_ID = 1
+CHATS_PATH = f"/messenger/v2/accounts/{USER_ID}/chats"
+
+
+async def _token(request):
+    return web.json_response({"access_token": "stub-token", "expires_in": 3600})
+
+
+async def _chats(request):
+    return web.json_response({"chats": [{"id": "chat-1", "created": 0, "updated": 0}]})
+
+
+async def start_stub_server():
+    app = web.Application()
+    app.router.add_post("/token", _token)
+    app.router.add_get(CHATS_PATH, _chats)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+async def run_load(make_request, total: int, concurrency: int) -> float:
+    """Выполняет total запросов с заданной конкурентностью, возвращает RPS"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await make_request()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return total / (time.perf_counter() - started)
+
+
+async def main(total: int, concurrency: int):
+    runner, base_url = await start_stub_server()
+    try:
+        async def per_call():
+            async with aiohttp.ClientSession() as session:
+                async with session.get(
+                    base_url + CHATS_PATH,
+                    headers={"Authorization": "Bearer stub-token", "Accept": "application/json"}
+                ) as response:
+                    await response.json()
+
+        service = AvitoService("bench-client", "bench-secret", USER_ID)
+        service.base_url = base_url
+        service.auth_url = base_url + "/token"
+
+        async def pooled():
+            await service._make_request("GET", CHATS_PATH)
+
+        # Прогрев (токен, первое соединение)
+        await per_call()
+        await pooled()
+
+        per_call_rps = await run_load(per_call, total, concurrency)
+        pooled_rps = await run_load(pooled, total, concurrency)
+        await service.close()
+    finally:
+        await runner.cleanup()
+
+    print(f"Запросов: {total}, конкурентность: {concurrency}")
+    print(f"per_call (сессия на запрос): {per_call_rps:8.0f} req/s")
+    print(f"pooled   (общая сессия):     {pooled_rps:8.0f} req/s")
+    print(f"Ускорение: x{pooled_rps / per_call_rps:.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
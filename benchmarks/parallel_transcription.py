@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк параллельной транскрипции на синтетическом аудио.
+
+Сравнивает:
+  sequential - весь файл одним воркером со всеми ядрами (прежнее поведение)
+  parallel   - TranscriptionService._transcribe_audio: сегменты с перекрытием
+               на пуле из --workers процессов
+
+Синтетический файл (тон + розовый шум) генерирует ffmpeg. На нем нет речи,
+поэтому VAD по умолчанию отключается (--vad включает), иначе модель
+пропустит почти всю запись и время не будет показательным.
+
+Нужны ffmpeg/ffprobe, faster-whisper и переменные окружения приложения (.env).
+
+Запуск:
+    python benchmarks/parallel_transcription.py --minutes 30 --workers 4
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app.services.transcription_service as service_module
+from app.services import whisper_pool as pool_module
+from app.services.whisper_pool import WhisperWorkerPool
+
+
+def make_synthetic_audio(path: Path, seconds: int):
+    """Тон с модуляцией поверх розового шума, 16 кГц моно"""
+    subprocess.run(
+        [
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-f", "lavfi", "-i", f"sine=frequency=220:duration={seconds}",
+            "-f", "lavfi", "-i", f"anoisesrc=color=pink:amplitude=0.2:duration={seconds}",
+            "-filter_complex", "[0][1]amix=inputs=2,tremolo=f=3:d=0.8",
+            "-ac", "1", "-ar", "16000",
+            str(path),
+        ],
+        check=True
+    )
+
+
+async def main(minutes: float, workers: int, vad: bool):
+    cores = os.cpu_count() or 1
+    pool_module.DEFAULT_TRANSCRIBE_OPTIONS["vad_filter"] = vad
+
+    with tempfile.TemporaryDirectory() as tmp:
+        audio = Path(tmp) / "synthetic.wav"
+        warmup = Path(tmp) / "warmup.wav"
+        make_synthetic_audio(audio, int(minutes * 60))
+        make_synthetic_audio(warmup, 5)
+
+        # Прогрев (загрузка модели) не входит в замер: пул держит модель в памяти
+        sequential_pool = WhisperWorkerPool(workers=1, cpu_threads=cores)
+        await sequential_pool.transcribe(str(warmup))
+        started = time.perf_counter()
+        await sequential_pool.transcribe(str(audio))
+        sequential = time.perf_counter() - started
+        await sequential_pool.stop()
+
+        # Сервис берет глобальный пул модуля - подставляем пул с нужным числом воркеров
+        parallel_pool = WhisperWorkerPool(workers=workers)
+        service_module.whisper_pool = parallel_pool
+        await asyncio.gather(*(parallel_pool.transcribe(str(warmup)) for _ in range(workers)))
+        service = service_module.transcription_service
+        service.tasks["bench"] = {"progress": 20, "stage": ""}
+        started = time.perf_counter()
+        await service._transcribe_audio(audio, "bench")
+        parallel = time.perf_counter() - started
+        segments = service.tasks["bench"].get("segments", {}).get("total", 1)
+        await parallel_pool.stop()
+
+    print(f"Аудио: {minutes} мин, ядер: {cores}, воркеров: {workers}, сегментов: {segments}")
+    print(f"sequential (один процесс):  {sequential:8.1f} s")
+    print(f"parallel   (сегменты):      {parallel:8.1f} s")
+    print(f"Ускорение: x{sequential / parallel:.2f} (идеал ~x{min(workers, cores)})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=30)
+    parser.add_argument("--workers", type=int, default=min(os.cpu_count() or 1, 4))
+    parser.add_argument("--vad", action="store_true", help="не отключать VAD")
+    args = parser.parse_args()
+    asyncio.run(main(args.minutes, args.workers, args.vad))
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""Migration: Bot persistence table
+
+Состояние бота хранится построчно в таблице bot_persistence вместо
+data/bot_persistence.pkl. Миграция создает таблицу и переносит в нее
+содержимое старого pickle-файла, если он есть.
+"""
+
+import sys
+import os
+import json
+import pickle
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./data/bot.db")
+
+# Конвертируем async драйверы в синхронные для миграции
+if "aiosqlite" in DATABASE_URL:
+    DATABASE_URL = DATABASE_URL.replace("sqlite+aiosqlite", "sqlite")
+if "asyncpg" in DATABASE_URL:
+    DATABASE_URL = DATABASE_URL.replace("postgresql+asyncpg", "postgresql")
+
+# INSERT OR IGNORE и BLOB в DDL ниже есть только в SQLite
+if not DATABASE_URL.startswith("sqlite"):
+    sys.exit(f"❌ Миграция поддерживает только SQLite, а DATABASE_URL указывает на: {DATABASE_URL.split(':', 1)[0]}")
+
+PICKLE_FILE = "data/bot_persistence.pkl"
+engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+
+CREATE_TABLE = """
+    CREATE TABLE IF NOT EXISTS bot_persistence (
+        id INTEGER PRIMARY KEY,
+        namespace VARCHAR(100) NOT NULL,
+        key VARCHAR(255) NOT NULL,
+        data BLOB NOT NULL,
+        updated_at DATETIME,
+        CONSTRAINT uq_bot_persistence_namespace_key UNIQUE (namespace, key)
+    )
+"""
+
+CREATE_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_bot_persistence_id ON bot_persistence (id)",
+    "CREATE INDEX IF NOT EXISTS ix_bot_persistence_updated_at ON bot_persistence (updated_at)",
+]
+
+INSERT_ENTRY = """
+    INSERT OR IGNORE INTO bot_persistence (namespace, key, data, updated_at)
+    VALUES (:namespace, :key, :data, CURRENT_TIMESTAMP)
+"""
+
+
+class _PersistenceUnpickler(pickle.Unpickler):
+    """PicklePersistence заменяет ссылки на бота меткой; без бота подставляем None"""
+
+    def persistent_load(self, pid):
+        return None
+
+
+def _pickle_entries():
+    """Строки (namespace, key, data) из старого файла PicklePersistence"""
+    with open(PICKLE_FILE, "rb") as f:
+        stored = _PersistenceUnpickler(f).load()
+
+    def dump(value):
+        return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+    for namespace in ("user_data", "chat_data"):
+        for entity_id, data in (stored.get(namespace) or {}).items():
+            if data:
+                yield namespace, str(entity_id), dump(data)
+    if stored.get("bot_data"):
+        yield "bot_data", "", dump(stored["bot_data"])
+    if stored.get("callback_data"):
+        yield "callback_data", "", dump(stored["callback_data"])
+    for name, conversations in (stored.get("conversations") or {}).items():
+        for key, state in conversations.items():
+            if state is not None:
+                yield f"conversation:{name}", json.dumps(list(key)), dump(state)
+
+
+def upgrade():
+    """Create the bot_persistence table and import the old pickle file"""
+    print("🔄 Creating bot_persistence table...")
+
+    with engine.connect() as conn:
+        try:
+            conn.execute(text(CREATE_TABLE))
+            for statement in CREATE_INDEXES:
+                conn.execute(text(statement))
+            print("✅ Table bot_persistence is present")
+
+            if os.path.exists(PICKLE_FILE):
+                print(f"🔄 Importing {PICKLE_FILE}...")
+                rows = [
+                    {"namespace": namespace, "key": key, "data": data}
+                    for namespace, key, data in _pickle_entries()
+                ]
+                if rows:
+                    conn.execute(text(INSERT_ENTRY), rows)
+                print(f"✅ Imported {len(rows)} entries")
+            else:
+                print(f"⚠️ {PICKLE_FILE} not found, nothing to import")
+
+            conn.commit()
+
+        except Exception as e:
+            print(f"❌ Error: {e}")
+            conn.rollback()
+            raise
+
+if __name__ == "__main__":
+    print("🚀 Running migration: Bot persistence table\n")
+    upgrade()
+    print("\n✅ Migration completed successfully!")
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Migration: Chat inbox index and chats for existing projects
+
+Список чатов выбирает последнее сообщение каждого чата по (chat_id, created_at).
+Чаты теперь создаются вместе с проектом, а не при чтении списка в мини-приложении,
+поэтому проектам без чата он создается здесь.
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./data/bot.db")
+
+# Конвертируем async драйверы в синхронные для миграции
+if "aiosqlite" in DATABASE_URL:
+    DATABASE_URL = DATABASE_URL.replace("sqlite+aiosqlite", "sqlite")
+if "asyncpg" in DATABASE_URL:
+    DATABASE_URL = DATABASE_URL.replace("postgresql+asyncpg", "postgresql")
+
+engine = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
+)
+
+INDEXES = {
+    "ix_project_chat_messages_chat_created": (
+        "CREATE INDEX IF NOT EXISTS ix_project_chat_messages_chat_created "
+        "ON project_chat_messages (chat_id, created_at)"
+    ),
+}
+
+BACKFILL_CHATS = """
+    INSERT INTO project_chats (project_id, created_at, updated_at, unread_by_executor, unread_by_client)
+    SELECT p.id, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP, 0, 0
+    FROM projects p
+    WHERE NOT EXISTS (SELECT 1 FROM project_chats c WHERE c.project_id = p.id)
+"""
+
+def upgrade():
+    """Create inbox index and missing project chats"""
+    print("🔄 Preparing project chats for the inbox query...")
+
+    with engine.connect() as conn:
+        try:
+            for name, ddl in INDEXES.items():
+                conn.execute(text(ddl))
+                print(f"✅ Index '{name}' is present")
+            created = conn.execute(text(BACKFILL_CHATS)).rowcount
+            print(f"✅ Chats created for existing projects: {created}")
+            conn.commit()
+
+        except Exception as e:
+            print(f"❌ Error: {e}")
+            conn.rollback()
+            raise
+
+if __name__ == "__main__":
+    print("🚀 Running migration: Chat inbox index and project chats\n")
+    upgrade()
+    print("\n✅ Migration completed successfully!")
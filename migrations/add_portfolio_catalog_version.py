@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Migration: Portfolio catalog version
+
+Публичный каталог портфолио кешируется в процессах снимком, привязанным к
+версии в settings. Админка повышает версию при изменении проектов; строка
+создается здесь, чтобы первое повышение не вставляло ее конкурентно.
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./data/bot.db")
+
+# Конвертируем async драйверы в синхронные для миграции
+if "aiosqlite" in DATABASE_URL:
+    DATABASE_URL = DATABASE_URL.replace("sqlite+aiosqlite", "sqlite")
+if "asyncpg" in DATABASE_URL:
+    DATABASE_URL = DATABASE_URL.replace("postgresql+asyncpg", "postgresql")
+
+engine = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
+)
+
+SEED_VERSION = """
+    INSERT INTO settings (key, value, description, data_type, created_at, updated_at)
+    SELECT 'portfolio_catalog_version', '1', 'Версия публичного каталога портфолио', 'int',
+           CURRENT_TIMESTAMP, CURRENT_TIMESTAMP
+    WHERE NOT EXISTS (SELECT 1 FROM settings WHERE key = 'portfolio_catalog_version')
+"""
+
+def upgrade():
+    """Create the portfolio catalog version row"""
+    print("🔄 Preparing portfolio catalog version...")
+
+    with engine.connect() as conn:
+        try:
+            created = conn.execute(text(SEED_VERSION)).rowcount
+            print("✅ Catalog version created" if created else "✅ Catalog version is present")
+            conn.commit()
+
+        except Exception as e:
+            print(f"❌ Error: {e}")
+            conn.rollback()
+            raise
+
+if __name__ == "__main__":
+    print("🚀 Running migration: Portfolio catalog version\n")
+    upgrade()
+    print("\n✅ Migration completed successfully!")
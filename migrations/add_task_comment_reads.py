@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Миграция: Таблица отметок о прочтении комментариев к задачам
+Описание: Создает task_comment_reads (comment_id, user_id, read_at) и
+переносит в нее данные из JSON-массива task_comments.read_by
+"""
+
+import sys
+import os
+import json
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./data/bot.db")
+
+# Конвертируем async драйверы в синхронные для миграции
+if "aiosqlite" in DATABASE_URL:
+    DATABASE_URL = DATABASE_URL.replace("sqlite+aiosqlite", "sqlite")
+if "asyncpg" in DATABASE_URL:
+    DATABASE_URL = DATABASE_URL.replace("postgresql+asyncpg", "postgresql")
+
+engine = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
+)
+
+
+def _read_by(value) -> list:
+    """read_by хранится как JSON-строка (SQLite) или массив (PostgreSQL)"""
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return []
+    return [int(user_id) for user_id in value or [] if str(user_id).isdigit()]
+
+
+def upgrade():
+    """Создать task_comment_reads и перенести отметки из read_by"""
+    print("🔄 Создание таблицы task_comment_reads...")
+
+    with engine.connect() as conn:
+        try:
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS task_comment_reads (
+                    comment_id INTEGER NOT NULL REFERENCES task_comments (id) ON DELETE CASCADE,
+                    user_id INTEGER NOT NULL REFERENCES admin_users (id),
+                    read_at TIMESTAMP,
+                    PRIMARY KEY (comment_id, user_id)
+                )
+            """))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS idx_task_comments_task ON task_comments (task_id)"
+            ))
+            print("✅ Таблица task_comment_reads создана")
+
+            if "sqlite" in DATABASE_URL:
+                result = conn.execute(text("PRAGMA table_info(task_comments)"))
+                columns = [row[1] for row in result.fetchall()]
+            else:  # PostgreSQL
+                result = conn.execute(text("""
+                    SELECT column_name FROM information_schema.columns
+                    WHERE table_name = 'task_comments'
+                """))
+                columns = [row[0] for row in result.fetchall()]
+
+            if 'read_by' not in columns:
+                print("ℹ️  Колонки read_by нет, переносить нечего")
+                conn.commit()
+                return
+
+            existing = {
+                (row[0], row[1])
+                for row in conn.execute(text("SELECT comment_id, user_id FROM task_comment_reads"))
+            }
+            rows = conn.execute(text(
+                "SELECT id, read_by, created_at FROM task_comments WHERE read_by IS NOT NULL"
+            )).fetchall()
+
+            reads = []
+            for comment_id, read_by, created_at in rows:
+                for user_id in set(_read_by(read_by)):
+                    if (comment_id, user_id) not in existing:
+                        reads.append({"comment_id": comment_id, "user_id": user_id, "read_at": created_at})
+
+            if reads:
+                conn.execute(
+                    text("""
+                        INSERT INTO task_comment_reads (comment_id, user_id, read_at)
+                        VALUES (:comment_id, :user_id, :read_at)
+                    """),
+                    reads
+                )
+
+            conn.commit()
+            print(f"✅ Перенесено отметок о прочтении: {len(reads)}")
+
+        except Exception as e:
+            print(f"❌ Ошибка при выполнении миграции: {e}")
+            conn.rollback()
+            raise
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("МИГРАЦИЯ: Создание task_comment_reads")
+    print("=" * 60)
+
+    try:
+        upgrade()
+        print("\n✅ Миграция выполнена успешно!")
+    except Exception as e:
+        print(f"\n❌ Ошибка выполнения миграции: {e}")
+        sys.exit(1)
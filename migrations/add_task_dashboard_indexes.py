@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""Migration: Add deadline/created_at indexes to tasks table
+
+Дашборд выбирает просроченные, предстоящие и новые задачи запросами
+с LIMIT по этим колонкам.
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./data/bot.db")
+
+# Конвертируем async драйверы в синхронные для миграции
+if "aiosqlite" in DATABASE_URL:
+    DATABASE_URL = DATABASE_URL.replace("sqlite+aiosqlite", "sqlite")
+if "asyncpg" in DATABASE_URL:
+    DATABASE_URL = DATABASE_URL.replace("postgresql+asyncpg", "postgresql")
+
+engine = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
+)
+
+INDEXES = {
+    "ix_tasks_deadline": "CREATE INDEX IF NOT EXISTS ix_tasks_deadline ON tasks (deadline)",
+    "ix_tasks_created_at": "CREATE INDEX IF NOT EXISTS ix_tasks_created_at ON tasks (created_at)",
+}
+
+def upgrade():
+    """Create dashboard indexes on tasks table"""
+    print("🔄 Adding dashboard indexes to tasks table...")
+
+    with engine.connect() as conn:
+        try:
+            for name, ddl in INDEXES.items():
+                conn.execute(text(ddl))
+                print(f"✅ Index '{name}' is present")
+            conn.commit()
+
+        except Exception as e:
+            print(f"❌ Error: {e}")
+            conn.rollback()
+            raise
+
+if __name__ == "__main__":
+    print("🚀 Running migration: Add dashboard indexes to tasks\n")
+    upgrade()
+    print("\n✅ Migration completed successfully!")
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Миграция: Индексируемый флаг архивации задач
+Описание: Добавляет колонку tasks.is_archived, заполняет ее из
+task_metadata['archived'] и создает индексы для фильтрации, пагинации
+и подсчетов задач в SQL
+"""
+
+import sys
+import os
+import json
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./data/bot.db")
+
+# Конвертируем async драйверы в синхронные для миграции
+if "aiosqlite" in DATABASE_URL:
+    DATABASE_URL = DATABASE_URL.replace("sqlite+aiosqlite", "sqlite")
+if "asyncpg" in DATABASE_URL:
+    DATABASE_URL = DATABASE_URL.replace("postgresql+asyncpg", "postgresql")
+
+engine = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
+)
+
+INDEXES = {
+    "ix_tasks_is_archived": "CREATE INDEX IF NOT EXISTS ix_tasks_is_archived ON tasks (is_archived)",
+    "ix_tasks_assignee_status_created": (
+        "CREATE INDEX IF NOT EXISTS ix_tasks_assignee_status_created "
+        "ON tasks (assigned_to_id, status, created_at)"
+    ),
+}
+
+BATCH_SIZE = 500
+
+
+def _is_archived(metadata) -> bool:
+    """archived в метаданных встречается как boolean, строка или число"""
+    if isinstance(metadata, str):
+        try:
+            metadata = json.loads(metadata)
+        except ValueError:
+            return False
+    if not isinstance(metadata, dict):
+        return False
+    return metadata.get('archived') in (True, 1, 'true', 'True', '1')
+
+
+def upgrade():
+    """Добавить колонку is_archived, заполнить ее и создать индексы"""
+    print("🔄 Добавление поля is_archived в таблицу tasks...")
+
+    with engine.connect() as conn:
+        try:
+            if "sqlite" in DATABASE_URL:
+                result = conn.execute(text("PRAGMA table_info(tasks)"))
+                columns = [row[1] for row in result.fetchall()]
+            else:  # PostgreSQL
+                result = conn.execute(text("""
+                    SELECT column_name FROM information_schema.columns
+                    WHERE table_name = 'tasks'
+                """))
+                columns = [row[0] for row in result.fetchall()]
+
+            if 'is_archived' in columns:
+                print("✅ Column 'is_archived' already exists, skipping...")
+            else:
+                default = "0" if "sqlite" in DATABASE_URL else "FALSE"
+                conn.execute(text(f"""
+                    ALTER TABLE tasks
+                    ADD COLUMN is_archived BOOLEAN NOT NULL DEFAULT {default}
+                """))
+                print("✅ Поле is_archived добавлено")
+
+            # Заполняем флаг из JSON-метаданных
+            rows = conn.execute(text(
+                "SELECT id, task_metadata FROM tasks WHERE task_metadata IS NOT NULL"
+            )).fetchall()
+            archived_ids = [row[0] for row in rows if _is_archived(row[1])]
+
+            for i in range(0, len(archived_ids), BATCH_SIZE):
+                conn.execute(
+                    text("UPDATE tasks SET is_archived = :archived WHERE id = :id"),
+                    [{"archived": True, "id": task_id} for task_id in archived_ids[i:i + BATCH_SIZE]]
+                )
+            print(f"✅ Архивных задач отмечено: {len(archived_ids)}")
+
+            for name, ddl in INDEXES.items():
+                conn.execute(text(ddl))
+                print(f"✅ Index '{name}' is present")
+
+            conn.commit()
+
+        except Exception as e:
+            print(f"❌ Ошибка при выполнении миграции: {e}")
+            conn.rollback()
+            raise
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("МИГРАЦИЯ: Добавление is_archived в tasks")
+    print("=" * 60)
+
+    try:
+        upgrade()
+        print("\n✅ Миграция выполнена успешно!")
+        print("ℹ️  Счетчики дашборда пересоберутся при следующем запуске админки")
+    except Exception as e:
+        print(f"\n❌ Ошибка выполнения миграции: {e}")
+        sys.exit(1)
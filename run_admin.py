@@ -91,6 +91,13 @@ async def run_admin_panel():
     
     @app.on_event("startup")
     async def startup_event():
+        # Мониторинг задержки event loop (метрика crm_event_loop_lag_seconds)
+        try:
+            from app.core.metrics import monitor_event_loop_lag
+            app.state.lag_monitor = asyncio.create_task(monitor_event_loop_lag())
+        except Exception as e:
+            print(f"⚠️  Мониторинг event loop недоступен: {e}")
+
         # Запускаем Avito polling
         await start_avito_polling()
 
@@ -101,7 +108,69 @@ async def run_admin_panel():
             print("✅ Планировщик напоминаний о задачах запущен")
         except Exception as e:
             print(f"⚠️  Ошибка запуска планировщика задач: {e}")
+
+        # Периодическая пересборка счетчиков дашборда
+        try:
+            from app.services.dashboard_snapshot_service import dashboard_snapshot_service
+            await dashboard_snapshot_service.start()
+        except Exception as e:
+            print(f"⚠️  Ошибка запуска пересборки счетчиков дашборда: {e}")
+
+        # Отправка уведомлений из outbox
+        try:
+            from app.services.notification_outbox import notification_outbox
+            await notification_outbox.start()
+        except Exception as e:
+            print(f"⚠️  Ошибка запуска outbox уведомлений: {e}")
+
+        # Запись накопленных просмотров и лайков портфолио
+        try:
+            from app.services.portfolio_counters import portfolio_counters
+            await portfolio_counters.start()
+        except Exception as e:
+            print(f"⚠️  Ошибка запуска записи счетчиков портфолио: {e}")
     
+    @app.on_event("shutdown")
+    async def shutdown_event():
+        lag_monitor = getattr(app.state, "lag_monitor", None)
+        if lag_monitor:
+            lag_monitor.cancel()
+
+        from app.services.dashboard_snapshot_service import dashboard_snapshot_service
+        await dashboard_snapshot_service.stop()
+
+        from app.services.notification_outbox import notification_outbox
+        await notification_outbox.stop()
+
+        from app.services.portfolio_counters import portfolio_counters
+        await portfolio_counters.stop()
+
+        # Подписка на realtime-события в Redis
+        from app.services.realtime_hub import realtime_hub
+        await realtime_hub.close()
+
+        # Закрываем общую HTTP-сессию Avito
+        from app.services import avito_service as avito_module
+        if avito_module.avito_service is not None:
+            await avito_module.avito_service.close()
+
+        # Останавливаем процессы транскрипции
+        try:
+            from app.services.whisper_pool import whisper_pool
+            await whisper_pool.stop()
+        except Exception as e:
+            print(f"⚠️  Ошибка остановки пула транскрипции: {e}")
+
+        from app.database.database import shutdown_db_executor
+        shutdown_db_executor()
+
+    # Метрики Prometheus (включая задержку event loop)
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        from fastapi.responses import Response
+        from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+        return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
     # Подключаем статические файлы React (assets)
     try:
         app.mount("/admin/assets", StaticFiles(directory="app/admin/static/assets"), name="react-assets")
@@ -115,7 +184,9 @@ async def run_admin_panel():
     # Подключаем роутер транскрибации
     try:
         from app.api.transcription import router as transcription_router
+        from app.api.transcription_stream import router as transcription_stream_router
         app.include_router(transcription_router, prefix="/api/v1", tags=["transcription"])
+        app.include_router(transcription_stream_router, prefix="/api/v1", tags=["transcription"])
         print("✅ Роутер транскрибаций подключен")
     except Exception as e:
         print(f"⚠️  Не удалось подключить роутер транскрибаций: {e}")
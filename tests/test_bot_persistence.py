@@ -0,0 +1,194 @@
+"""
+DatabasePersistence: ленивая подгрузка, запись только изменений, TTL
+
+Состояние бота хранится в SQLite в памяти. Вызовы повторяют то, что делает
+Application: update_*_data получает копию словаря (deepcopy), а refresh_*_data -
+сам словарь приложения.
+
+Запуск:
+    python -m pytest tests/test_bot_persistence.py
+"""
+
+import asyncio
+import copy
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import database
+from app.database.models import Base, BotPersistenceEntry
+from app.bot.persistence import USER_DATA, DatabasePersistence
+
+USER_ID = 42
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """БД в памяти; возвращает (фабрику сессий, список выполненных SQL-запросов)"""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    executed = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    monkeypatch.setattr(database, "SessionLocal", session_factory)
+    yield session_factory, executed
+    engine.dispose()
+
+
+def _persistence() -> DatabasePersistence:
+    return DatabasePersistence(ttl_days=30)
+
+
+def _stored_user_data():
+    persistence = _persistence()
+    app_data = {}
+    asyncio.run(persistence.refresh_user_data(USER_ID, app_data))
+    return app_data
+
+
+def _row_count(session_factory) -> int:
+    session = session_factory()
+    try:
+        return session.query(BotPersistenceEntry).count()
+    finally:
+        session.close()
+
+
+def test_user_data_is_loaded_lazily_and_once(db):
+    _, executed = db
+    asyncio.run(_persistence().update_user_data(USER_ID, {"a": 1}))
+
+    persistence = _persistence()
+    assert asyncio.run(persistence.get_user_data()) == {}
+
+    app_data = {}
+    asyncio.run(persistence.refresh_user_data(USER_ID, app_data))
+    assert app_data == {"a": 1}
+
+    del executed[:]
+    asyncio.run(persistence.refresh_user_data(USER_ID, app_data))
+    assert executed == []
+
+
+def test_unchanged_data_is_not_written_again(db):
+    _, executed = db
+    persistence = _persistence()
+    app_data = {}
+    asyncio.run(persistence.refresh_user_data(USER_ID, app_data))
+    app_data["a"] = 1
+    asyncio.run(persistence.update_user_data(USER_ID, copy.deepcopy(app_data)))
+
+    del executed[:]
+    asyncio.run(persistence.update_user_data(USER_ID, copy.deepcopy(app_data)))
+    assert executed == []
+
+    asyncio.run(persistence.update_user_data(USER_ID, {"a": 2}))
+    assert executed
+    assert _stored_user_data() == {"a": 2}
+
+
+def test_job_update_before_refresh_keeps_stored_fields(db):
+    """Задача пишет в user_data до первого апдейта пользователя"""
+    asyncio.run(_persistence().update_user_data(USER_ID, {"a": 1}))
+
+    persistence = _persistence()
+    app_user_data = {USER_ID: {}}
+
+    # Задача
+    app_user_data[USER_ID]["b"] = 2
+    asyncio.run(persistence.update_user_data(USER_ID, copy.deepcopy(app_user_data[USER_ID])))
+
+    # Апдейт пользователя
+    asyncio.run(persistence.refresh_user_data(USER_ID, app_user_data[USER_ID]))
+    assert app_user_data[USER_ID] == {"a": 1, "b": 2}
+    app_user_data[USER_ID]["c"] = 3
+    asyncio.run(persistence.update_user_data(USER_ID, copy.deepcopy(app_user_data[USER_ID])))
+
+    assert _stored_user_data() == {"a": 1, "b": 2, "c": 3}
+
+
+def test_failed_refresh_does_not_overwrite_stored_fields(db, monkeypatch):
+    asyncio.run(_persistence().update_user_data(USER_ID, {"a": 1}))
+
+    persistence = _persistence()
+    load_row = DatabasePersistence._load_row
+    failures = [RuntimeError("database is locked")]
+
+    def flaky_load_row(*args):
+        if failures:
+            raise failures.pop()
+        return load_row(*args)
+
+    monkeypatch.setattr(DatabasePersistence, "_load_row", staticmethod(flaky_load_row))
+
+    app_data = {}
+    asyncio.run(persistence.refresh_user_data(USER_ID, app_data))
+    assert app_data == {}
+    app_data["c"] = 3
+    asyncio.run(persistence.update_user_data(USER_ID, copy.deepcopy(app_data)))
+    assert _stored_user_data() == {"a": 1, "c": 3}
+
+    # Следующий апдейт подгружает сохраненное в словарь приложения
+    asyncio.run(persistence.refresh_user_data(USER_ID, app_data))
+    assert app_data == {"a": 1, "c": 3}
+
+
+def test_drop_user_and_chat_data(db):
+    session_factory, _ = db
+    persistence = _persistence()
+    asyncio.run(persistence.update_user_data(USER_ID, {"a": 1}))
+    asyncio.run(persistence.update_chat_data(USER_ID, {"b": 2}))
+    assert _row_count(session_factory) == 2
+
+    asyncio.run(persistence.drop_user_data(USER_ID))
+    asyncio.run(persistence.drop_chat_data(USER_ID))
+    assert _row_count(session_factory) == 0
+    assert _stored_user_data() == {}
+
+
+def test_expired_rows_are_purged_on_start(db):
+    session_factory, _ = db
+    session = session_factory()
+    session.add(BotPersistenceEntry(
+        namespace=USER_DATA, key="1", data=b"x", updated_at=datetime.utcnow() - timedelta(days=31)
+    ))
+    session.add(BotPersistenceEntry(
+        namespace=USER_DATA, key="2", data=b"x", updated_at=datetime.utcnow() - timedelta(days=1)
+    ))
+    session.commit()
+    session.close()
+
+    asyncio.run(_persistence().get_user_data())
+
+    session = session_factory()
+    assert [row.key for row in session.query(BotPersistenceEntry).all()] == ["2"]
+    session.close()
+
+
+def test_conversation_round_trip(db):
+    persistence = _persistence()
+    asyncio.run(persistence.update_conversation("order", (1, 2), "WAITING_BUDGET"))
+    asyncio.run(persistence.update_conversation("order", (3, "inline"), 5))
+
+    conversations = asyncio.run(_persistence().get_conversations("order"))
+    assert conversations == {(1, 2): "WAITING_BUDGET", (3, "inline"): 5}
+
+    asyncio.run(persistence.update_conversation("order", (1, 2), None))
+    conversations = asyncio.run(_persistence().get_conversations("order"))
+    assert conversations == {(3, "inline"): 5}
@@ -0,0 +1,128 @@
+"""
+Индекс CallbackRouter выбирает тот же маршрут, что и перебор всех паттернов
+
+Паттерны и приоритеты берутся из вызовов router.register в app/main_old.py
+и дополняются паттернами, которые индекс разбирает по-особому: альтернативы,
+квантификаторы у первого атома, регулярные выражения без литерала.
+Эталон - проверка re.match по маршрутам в порядке (priority, регистрация).
+
+Запуск:
+    python -m pytest tests/test_callback_router.py
+"""
+
+import ast
+import os
+import re
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.bot.routing.callback_router import CallbackRouter, analyze_pattern
+
+EXTRA_PATTERNS = [
+    (r"^(?:dup)$", 50),
+    (r"^(ab|cd)*$", 50),
+    (r"^a|b$", 120),
+    (r"^tz\w+", 40),
+    (r"^x?step", 20),
+    (r"^step_\d*$", 5),
+    (r"^\d+_x$", 50),
+    (r"^(quick|budget)_\d{2,}", 30),
+    (r"^project_\d+$", 30),
+    (r"^[pq]roject", 200),
+]
+
+SUFFIXES = ["", "1", "12", "_", "_1", "x", "abc", "\n", "1\n", "_1\n"]
+EXTRA_DATA = ["", "\n", "a", "b", "b\n", "abcd", "abab\n", "dup", "dup\n", "12_x", "step", "xstep", "tz", "tzx"]
+
+
+def _main_old_routes():
+    """(паттерн, priority) из router.register(...) в app/main_old.py"""
+    with open(os.path.join(ROOT, "app", "main_old.py"), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    routes = []
+    for node in ast.walk(tree):
+        if (
+            isinstance(node, ast.Call)
+            and isinstance(node.func, ast.Attribute)
+            and node.func.attr == "register"
+            and isinstance(node.func.value, ast.Name)
+            and node.func.value.id == "router"
+        ):
+            priority = next((kw.value.value for kw in node.keywords if kw.arg == "priority"), 100)
+            routes.append((node.lineno, node.args[0].value, priority))
+    # ast.walk обходит дерево в ширину - восстанавливаем порядок регистрации
+    return [(pattern, priority) for _, pattern, priority in sorted(routes)]
+
+
+async def _handler(update, context):
+    pass
+
+
+def _build(routes):
+    router = CallbackRouter()
+    for pattern, priority in routes:
+        router.register(pattern, _handler, priority)
+    return router
+
+
+def _linear_resolve(router, callback_data):
+    for route in sorted(router.routes, key=lambda route: route.order):
+        if re.match(route.pattern, callback_data):
+            return route
+    return None
+
+
+def _samples(router):
+    data = set(EXTRA_DATA)
+    for route in router.routes:
+        for literal in route.literals:
+            data.update(literal + suffix for suffix in SUFFIXES)
+    return sorted(data)
+
+
+@pytest.fixture
+def routes():
+    routes = _main_old_routes()
+    assert routes
+    return routes + EXTRA_PATTERNS
+
+
+def test_resolve_matches_linear_scan(routes):
+    router = _build(routes)
+    for callback_data in _samples(router):
+        assert router.resolve(callback_data) is _linear_resolve(router, callback_data), repr(callback_data)
+
+
+def test_main_old_patterns_have_no_conflicts():
+    assert _build(_main_old_routes()).conflicts == []
+
+
+@pytest.mark.parametrize("pattern", [r"^(?:dup)$", r"^(ab|cd)*$"])
+def test_unanchored_regex_does_not_conflict_with_unrelated_routes(pattern):
+    routes = _main_old_routes()
+    assert _build([(pattern, 50)] + routes).conflicts == []
+    assert _build(routes + [(pattern, 50)]).conflicts == []
+
+
+def test_unanchored_regex_reports_real_overlap():
+    router = _build(_main_old_routes() + [(r"^[a-z_]+$", 50)])
+    assert any("^step_" in conflict for conflict in router.conflicts)
+    assert any("'main_menu'" in conflict for conflict in router.conflicts)
+
+
+@pytest.mark.parametrize("pattern, expected", [
+    (r"^main_menu$", ("exact", ["main_menu"], None)),
+    (r"^(faq|contacts)$", ("exact", ["faq", "contacts"], None)),
+    (r"^step_", ("prefix", ["step_"], None)),
+    (r"^project_\d+$", ("regex", ["project_"], r"\d")),
+    (r"^tz\w*", ("regex", ["tz"], None)),
+    (r"^x?step", ("regex", [""], None)),
+    (r"^a|b$", ("regex", [""], None)),
+    (r"^(?:dup)$", ("regex", [""], None)),
+])
+def test_analyze_pattern(pattern, expected):
+    assert analyze_pattern(pattern) == expected
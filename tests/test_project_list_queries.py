@@ -0,0 +1,122 @@
+"""
+Число SQL-запросов страницы списка проектов не зависит от per_page
+
+GET /api/projects/ выполняется на SQLite в памяти; запросы считаются
+через событие before_cursor_execute. Если какое-то поле снова начнет
+загружаться по проекту (N+1), число запросов вырастет вместе с per_page.
+
+Запуск:
+    python -m pytest tests/test_project_list_queries.py
+"""
+
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import database
+from app.database.models import (
+    AdminUser, Base, Project, ProjectFile, ProjectRevision, User
+)
+from app.admin.routers.projects import get_projects
+
+PROJECTS = 60
+OWNER = {"id": 1, "username": "owner", "role": "owner"}
+
+
+@pytest.fixture
+def statements(monkeypatch):
+    """Заполненная БД в памяти; возвращает список выполненных SQL-запросов"""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    db = session_factory()
+    admins = [
+        AdminUser(username=f"admin{i}", password_hash="x", role="executor" if i else "owner")
+        for i in range(5)
+    ]
+    db.add_all(admins)
+    db.flush()
+    client = User(telegram_id=1000, first_name="Client", preferences={"telegram_id": "1000"})
+    db.add(client)
+    db.flush()
+
+    started = datetime(2024, 1, 1)
+    for i in range(PROJECTS):
+        project = Project(
+            user_id=client.id,
+            title=f"Project {i}",
+            description="",
+            status="new",
+            estimated_cost=1000,
+            planned_end_date=started + timedelta(days=30),
+            created_at=started + timedelta(hours=i),
+            assigned_executor_id=admins[1 + i % 4].id,
+            responsible_manager_id=admins[0].id,
+            project_metadata={"bot_token": "token", "timeweb_login": "login"}
+        )
+        db.add(project)
+        db.flush()
+        db.add(ProjectFile(
+            filename=f"{i}.zip",
+            original_filename=f"{i}.zip",
+            file_path=f"uploads/{i}.zip",
+            file_size=1,
+            file_type="zip",
+            project_id=project.id,
+            uploaded_by_id=admins[0].id
+        ))
+        db.add(ProjectRevision(
+            project_id=project.id,
+            revision_number=1,
+            title="Fix",
+            description="Fix",
+            created_by_id=client.id
+        ))
+    db.commit()
+    db.close()
+
+    executed = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    monkeypatch.setattr(database, "SessionLocal", session_factory)
+    yield executed
+    engine.dispose()
+
+
+def _load_page(statements, per_page: int):
+    del statements[:]
+    response = asyncio.run(get_projects(request=None, per_page=per_page, current_user=OWNER))
+    assert response["success"], response
+    assert len(response["projects"]) == per_page
+    return list(statements)
+
+
+def test_query_count_does_not_grow_with_page_size(statements):
+    small = _load_page(statements, 1)
+    large = _load_page(statements, 50)
+    assert len(small) == len(large), "\n\n".join(large)
+
+
+def test_page_includes_batched_relations(statements):
+    response = asyncio.run(get_projects(request=None, per_page=50, current_user=OWNER))
+    project = response["projects"][0]
+    assert project["executor"]["username"].startswith("admin")
+    assert project["responsible_manager"]["username"] == "admin0"
+    assert project["files_count"] == 1
+    assert project["revisions_count"] == 1